@@ -0,0 +1,29 @@
+"""
+Shared pytest fixtures.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+@pytest.fixture
+def webapi_sim(request, monkeypatch, tmp_path):
+    """A running PI Web API simulator (pi_monitor.webapi_sim) with a private WebId cache.
+
+    Configure it per test with indirect parametrization, e.g.
+    ``@pytest.mark.parametrize("webapi_sim", [{"rate_429": 0.1}], indirect=True)``.
+    """
+    from pi_monitor import adaptive_concurrency
+    from pi_monitor.webapi_sim import WebAPISimulator
+
+    overrides = {"latency_ms": 2.0, **getattr(request, "param", {})}
+    monkeypatch.setenv("PI_WEBID_CACHE", str(tmp_path / "webids.sqlite"))
+    adaptive_concurrency.reset()
+    with WebAPISimulator(**overrides) as sim:
+        yield sim
+    adaptive_concurrency.reset()
@@ -18,6 +18,7 @@ sys.path.insert(0, '/app')
 from pi_monitor.parquet_auto_scan import ParquetAutoScanner
 from pi_monitor.config import Config
 from pi_monitor.parquet_database import ParquetDatabase
+from pi_monitor.freshness import FreshnessSnapshot
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -34,7 +35,7 @@ DATA_PATH = os.getenv('DATA_PATH', '/app/data')
 # Initialize components
 config = Config()
 scanner = ParquetAutoScanner(config, Path(DATA_PATH))
-db = ParquetDatabase(Path(DATA_PATH))
+db = ParquetDatabase.shared(Path(DATA_PATH))
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -55,16 +56,16 @@ def health_check():
             'timestamp': datetime.now().isoformat()
         }), 500
 
+def _unit_info():
+    """Freshness summary of this container's unit from the shared snapshot."""
+    unit = FreshnessSnapshot.current(db).get(UNIT_ID)
+    return unit.to_dict() if unit is not None else None
+
 @app.route('/status', methods=['GET'])
 def unit_status():
     """Get unit status and data freshness"""
     try:
-        # Scan unit data
-        unit_data = scanner.scan_all_units()
-
-        unit_info = None
-        if UNIT_ID in unit_data:
-            unit_info = unit_data[UNIT_ID]
+        unit_info = _unit_info()
 
         return jsonify({
             'unit_id': UNIT_ID,
@@ -111,8 +112,7 @@ def run_analysis():
         analysis_type = request.json.get('type', 'basic') if request.json else 'basic'
 
         # Run unit analysis
-        unit_data = scanner.scan_all_units()
-        unit_info = unit_data.get(UNIT_ID, {})
+        unit_info = _unit_info() or {}
 
         return jsonify({
             'unit_id': UNIT_ID,
@@ -134,8 +134,7 @@ def run_analysis():
 def get_metrics():
     """Get Prometheus-style metrics"""
     try:
-        unit_data = scanner.scan_all_units()
-        unit_info = unit_data.get(UNIT_ID, {})
+        unit_info = _unit_info() or {}
 
         metrics = []
         metrics.append(f'# HELP turbopredict_unit_status Unit operational status')
@@ -148,7 +147,7 @@ def get_metrics():
             metrics.append(f'# TYPE turbopredict_unit_records gauge')
             metrics.append(f'turbopredict_unit_records{{unit="{UNIT_ID}",plant="{PLANT}"}} {unit_info["records"]}')
 
-        if 'age_hours' in unit_info:
+        if unit_info.get('age_hours') is not None:
             metrics.append(f'# HELP turbopredict_unit_age_hours Age of unit data in hours')
             metrics.append(f'# TYPE turbopredict_unit_age_hours gauge')
             metrics.append(f'turbopredict_unit_age_hours{{unit="{UNIT_ID}",plant="{PLANT}"}} {unit_info["age_hours"]}')
@@ -95,7 +95,8 @@ class MLTrainingSystem:
             index='time',
             columns='tag',
             values='value',
-            aggfunc='mean'
+            aggfunc='mean',
+            observed=True
         ).fillna(method='ffill').fillna(method='bfill')
 
         if len(pivot_df) < 10:
@@ -256,7 +257,8 @@ class MLTrainingSystem:
             index='time',
             columns='tag',
             values='value',
-            aggfunc='mean'
+            aggfunc='mean',
+            observed=True
         ).fillna(method='ffill').fillna(method='bfill')
 
         # Add synthetic anomalies for training
@@ -0,0 +1,305 @@
+"""
+Adaptive (AIMD) concurrency control for PI Web API requests.
+
+The fixed PI_WEBAPI_QPS / PI_WEBAPI_MAX_WORKERS pair had to be tuned by
+hand per plant and either under-used the server or produced 429 storms.
+:class:`AdaptiveConcurrency` bounds the number of requests in flight and
+adjusts that bound from what the server reports:
+
+- additive increase: after a window of healthy responses (p95 latency
+  under PI_WEBAPI_TARGET_P95_MS, error rate under
+  PI_WEBAPI_TARGET_ERROR_RATE) in which the limit was actually reached,
+  the limit grows by one,
+- multiplicative decrease: a 429/503 halves the limit at once (at most
+  once per cool-down), a window with too many errors or a latency spike
+  (p95 above the target, or above PI_WEBAPI_LATENCY_SPIKE x the healthy
+  median) cuts it to 70%.
+
+Latency is measured per request over the whole body transfer, so a
+response of more than PI_WEBAPI_LATENCY_ITEMS values (default 10000; 0
+turns this off) counts with its latency scaled down to that many values.
+Otherwise year-long per-tag or ~100k-value streamset requests would
+exceed any fixed target and cut the limit to the minimum.
+
+The limit stays within PI_WEBAPI_MIN_CONCURRENCY..PI_WEBAPI_MAX_CONCURRENCY
+and starts at PI_WEBAPI_INITIAL_CONCURRENCY. One controller is kept per PI
+server (:func:`controller_for`), shared by the threaded and asyncio
+clients of a process; :func:`metrics` reports limits, latencies and
+recent decisions of all of them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+OK = "ok"
+THROTTLED = "throttled"
+ERROR = "error"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def adaptive_enabled() -> bool:
+    """PI_WEBAPI_ADAPTIVE (default on); '0' restores fixed QPS pacing."""
+    return os.getenv("PI_WEBAPI_ADAPTIVE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def outcome_for_status(status: Optional[int]) -> str:
+    """Classify an HTTP status for the controller (None: no response)."""
+    if status in (429, 503):
+        return THROTTLED
+    if status is None or status >= 500:
+        return ERROR
+    return OK
+
+
+def response_items(result: Any) -> int:
+    """Number of values in a decoded Web API response (0 when it carries none)."""
+    n = getattr(result, "n", None)  # webapi_decode.ItemBuffers
+    if isinstance(n, int):
+        return n
+    if isinstance(result, dict):
+        items = result.get("Items")
+        if not isinstance(items, list):
+            return 0
+        # Streamset responses nest one Items list per stream
+        return sum(len(i["Items"]) if isinstance(i, dict) and isinstance(i.get("Items"), list) else 1
+                   for i in items)
+    try:
+        return len(result)  # DataFrame
+    except TypeError:
+        return 0
+
+
+def _quantile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on in-flight requests for one server.
+
+    Callers wrap each request in ``acquire()`` / ``release(token, outcome, items)``
+    (or ``with controller.slot() as s: ...; s.outcome = ...; s.items = ...``);
+    the async client uses ``acquire_async()``.
+    """
+
+    def __init__(
+        self,
+        name: str = "",
+        *,
+        min_limit: Optional[int] = None,
+        max_limit: Optional[int] = None,
+        initial: Optional[int] = None,
+        target_p95_s: Optional[float] = None,
+        target_error_rate: Optional[float] = None,
+        spike_factor: Optional[float] = None,
+        latency_items: Optional[int] = None,
+        min_window: int = 8,
+    ) -> None:
+        self.name = name
+        self.min_limit = max(1, min_limit or int(_env_float("PI_WEBAPI_MIN_CONCURRENCY", 1)))
+        self.max_limit = max(self.min_limit, max_limit or int(_env_float("PI_WEBAPI_MAX_CONCURRENCY", 32)))
+        start = initial or int(_env_float("PI_WEBAPI_INITIAL_CONCURRENCY", 4))
+        self.limit = float(min(self.max_limit, max(self.min_limit, start)))
+        self.target_p95_s = (target_p95_s if target_p95_s is not None
+                             else _env_float("PI_WEBAPI_TARGET_P95_MS", 2000.0) / 1000.0)
+        self.target_error_rate = (target_error_rate if target_error_rate is not None
+                                  else _env_float("PI_WEBAPI_TARGET_ERROR_RATE", 0.05))
+        self.spike_factor = spike_factor if spike_factor is not None else _env_float("PI_WEBAPI_LATENCY_SPIKE", 3.0)
+        self.latency_items = max(0, int(latency_items if latency_items is not None
+                                        else _env_float("PI_WEBAPI_LATENCY_ITEMS", 10000)))
+        self.min_window = max(1, min_window)
+
+        self._cond = threading.Condition()
+        self.inflight = 0
+        self._window: List[Tuple[float, str]] = []
+        self._saturated = False
+        self._baseline: Optional[float] = None  # EWMA of healthy-window median latency
+        self._last_cut = 0.0
+        self._last_p50: Optional[float] = None
+        self._last_p95: Optional[float] = None
+        self.counters: Dict[str, int] = {
+            "requests": 0, "throttled": 0, "errors": 0, "increases": 0, "decreases": 0,
+        }
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=50)
+
+    # -- admission -------------------------------------------------------
+    def _admit(self) -> bool:
+        if self.inflight < int(self.limit):
+            self.inflight += 1
+            if self.inflight >= int(self.limit):
+                self._saturated = True
+            return True
+        self._saturated = True
+        return False
+
+    def acquire(self) -> float:
+        """Block until a request may start; returns the token for ``release``."""
+        with self._cond:
+            while not self._admit():
+                self._cond.wait()
+        return time.monotonic()
+
+    def try_acquire(self) -> Optional[float]:
+        with self._cond:
+            return time.monotonic() if self._admit() else None
+
+    async def acquire_async(self, poll_s: float = 0.005) -> float:
+        """Event-loop friendly ``acquire`` (never blocks the loop)."""
+        while True:
+            token = self.try_acquire()
+            if token is not None:
+                return token
+            await asyncio.sleep(poll_s)
+
+    def release(self, token: float, outcome: str = OK, items: int = 0) -> None:
+        """Record a finished request started at ``token`` that returned ``items`` values; adapt the limit."""
+        now = time.monotonic()
+        latency = now - token
+        if self.latency_items and items > self.latency_items:
+            # Large responses count as if they had carried ``latency_items`` values
+            latency *= self.latency_items / items
+        with self._cond:
+            self.inflight = max(0, self.inflight - 1)
+            self.counters["requests"] += 1
+            if outcome == THROTTLED:
+                self.counters["throttled"] += 1
+            elif outcome == ERROR:
+                self.counters["errors"] += 1
+            self._window.append((latency, outcome))
+            if outcome == THROTTLED:
+                self._on_throttle(now)
+            elif len(self._window) >= max(self.min_window, int(self.limit)):
+                self._evaluate(now)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self) -> Iterator["_Slot"]:
+        """``with controller.slot() as s:`` - set ``s.outcome`` (and ``s.items``) from the response."""
+        s = _Slot(self.acquire())
+        try:
+            yield s
+        except BaseException:
+            # No response recorded: connection error, timeout, cancellation
+            self.release(s.token, s.outcome or ERROR)
+            raise
+        self.release(s.token, s.outcome or OK, s.items)
+
+    # -- AIMD decisions (called with the lock held) ----------------------
+    def _decide(self, action: str, reason: str, new_limit: float, now: float) -> None:
+        old = int(self.limit)
+        self.limit = float(min(self.max_limit, max(self.min_limit, new_limit)))
+        if action == "decrease":
+            self.counters["decreases"] += 1
+            self._last_cut = now
+        else:
+            self.counters["increases"] += 1
+        entry = {"time": time.time(), "action": action, "reason": reason, "from": old, "to": int(self.limit)}
+        self.history.append(entry)
+        if old != int(self.limit):
+            logger.info(f"Web API concurrency [{self.name}] {action}: {old} -> {int(self.limit)} ({reason})")
+
+    def _cooling_down(self, now: float) -> bool:
+        # One cut per burst: responses to requests sent before the cut say nothing new
+        return now - self._last_cut < max(0.5, self._last_p95 or 0.0)
+
+    def _on_throttle(self, now: float) -> None:
+        if not self._cooling_down(now):
+            self._decide("decrease", "throttled (429/503)", self.limit * 0.5, now)
+        self._window.clear()
+        self._saturated = False
+
+    def _evaluate(self, now: float) -> None:
+        latencies = [lat for lat, _ in self._window]
+        errors = sum(1 for _, o in self._window if o != OK)
+        p50, p95 = _quantile(latencies, 0.5), _quantile(latencies, 0.95)
+        error_rate = errors / len(self._window)
+        self._last_p50, self._last_p95 = p50, p95
+        saturated = self._saturated
+        self._window.clear()
+        self._saturated = False
+
+        if error_rate > self.target_error_rate:
+            if not self._cooling_down(now):
+                self._decide("decrease", f"error rate {error_rate:.0%}", self.limit * 0.7, now)
+            return
+        if p95 > self.target_p95_s:
+            if not self._cooling_down(now):
+                self._decide("decrease", f"p95 {p95 * 1000:.0f} ms over target", self.limit * 0.7, now)
+            return
+        if self._baseline is not None and p95 > self.spike_factor * self._baseline:
+            if not self._cooling_down(now):
+                self._decide("decrease", f"latency spike p95 {p95 * 1000:.0f} ms "
+                                         f"(baseline {self._baseline * 1000:.0f} ms)", self.limit * 0.7, now)
+            return
+        self._baseline = p50 if self._baseline is None else 0.8 * self._baseline + 0.2 * p50
+        if saturated and int(self.limit) < self.max_limit:
+            self._decide("increase", f"healthy at limit (p95 {p95 * 1000:.0f} ms)", self.limit + 1, now)
+
+    # -- metrics ---------------------------------------------------------
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "server": self.name,
+                "limit": int(self.limit),
+                "inflight": self.inflight,
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "p50_ms": None if self._last_p50 is None else round(self._last_p50 * 1000, 1),
+                "p95_ms": None if self._last_p95 is None else round(self._last_p95 * 1000, 1),
+                "baseline_ms": None if self._baseline is None else round(self._baseline * 1000, 1),
+                **self.counters,
+                "last_decision": self.history[-1] if self.history else None,
+                "decisions": list(self.history),
+            }
+
+
+class _Slot:
+    __slots__ = ("token", "outcome", "items")
+
+    def __init__(self, token: float) -> None:
+        self.token = token
+        self.outcome: Optional[str] = None
+        self.items = 0
+
+
+_controllers: Dict[str, AdaptiveConcurrency] = {}
+_controllers_lock = threading.Lock()
+
+
+def controller_for(server: str) -> AdaptiveConcurrency:
+    """Process-wide controller of one PI server (names normalized like the WebId cache)."""
+    key = str(server or "").strip().lstrip("\\").lower() or "default"
+    with _controllers_lock:
+        ctl = _controllers.get(key)
+        if ctl is None:
+            ctl = _controllers[key] = AdaptiveConcurrency(key)
+        return ctl
+
+
+def metrics() -> Dict[str, Dict[str, Any]]:
+    """Current limits, latencies, counters and recent decisions per server."""
+    with _controllers_lock:
+        controllers = list(_controllers.items())
+    return {key: ctl.snapshot() for key, ctl in controllers}
+
+
+def reset() -> None:
+    """Forget all controllers (tests, or after changing PI_WEBAPI_* limits)."""
+    with _controllers_lock:
+        _controllers.clear()
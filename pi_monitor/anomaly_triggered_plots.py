@@ -111,9 +111,10 @@ class AnomalyTriggeredPlotter:
     def _get_one_year_extremes(self, unit: str, tag: str) -> tuple[float, float]:
         """Return (low, high) over the last 1 year for a tag.
 
-        Uses DuckDB aggregation over Parquet for performance. Falls back to
-        loading a 1-year window via ParquetDatabase.get_unit_data() if needed.
-        Results are cached per (unit, tag) for the duration of the run.
+        Answered from the 1d/1h rollups (raw rows only at the window edges).
+        Falls back to DuckDB aggregation over Parquet, then to a per-tag
+        1-year read. Results are cached per (unit, tag) for the duration of
+        the run.
         """
         key = (unit, tag)
         if key in self._year_extreme_cache:
@@ -124,17 +125,22 @@ class AnomalyTriggeredPlotter:
         low, high = float('nan'), float('nan')
         try:
             from .parquet_database import ParquetDatabase
-            db = ParquetDatabase()
-            if db.conn is not None:
+            db = ParquetDatabase.shared()
+            try:
+                low, high = db.get_tag_extremes(unit, tag, start, end)
+            except Exception as rollup_err:
+                logger.debug(f"Rollup extremes unavailable for {unit}/{tag}: {rollup_err}")
+            if not (low == low and high == high) and db.conn is not None:
                 q = (
                     "SELECT MIN(value) AS l, MAX(value) AS h "
                     f"FROM read_parquet('{db._parquet_glob(True)}') "
                     "WHERE unit = ? AND tag = ? AND time >= ? AND time <= ?"
                 )
-                row = db.conn.execute(q, [unit, tag, start, end]).fetchone()
-                if row is not None:
-                    low = float(row[0]) if row[0] is not None else float('nan')
-                    high = float(row[1]) if row[1] is not None else float('nan')
+                res = db.query_with_duckdb(q, [unit, tag, start, end])
+                if not res.empty:
+                    row = res.iloc[0]
+                    low = float(row['l']) if pd.notna(row['l']) else float('nan')
+                    high = float(row['h']) if pd.notna(row['h']) else float('nan')
             if not (low == low and high == high):  # any NaN -> fallback
                 # Memory-safe fallback: read only the requested tag within window
                 df = db.get_unit_tag_data(unit, tag, start_time=start, end_time=end)
@@ -153,6 +159,46 @@ class AnomalyTriggeredPlotter:
         self._year_extreme_cache[key] = (low, high)
         return low, high
 
+    def _plot_render_frame(self, unit: str, tag: str, data: pd.DataFrame,
+                           lower_bound: float, upper_bound: float) -> pd.DataFrame:
+        """Points to draw for a long window: rollup envelope + recent raw rows.
+
+        When the window holds more than PLOT_MAX_POINTS rows, everything older
+        than PLOT_RAW_RECENT_DAYS is drawn from the min/max envelope of the
+        coarsest rollup level within the budget; the recent span keeps its raw
+        rows so anomaly markers stay exact. Statistics are still computed by
+        the callers from ``data``.
+        """
+        frame = data.sort_values('time')
+        try:
+            budget = int(os.getenv('PLOT_MAX_POINTS', '3000'))
+            recent_days = float(os.getenv('PLOT_RAW_RECENT_DAYS', '7'))
+        except ValueError:
+            budget, recent_days = 3000, 7.0
+        if budget <= 0 or len(frame) <= budget:
+            return frame
+        try:
+            from .parquet_database import ParquetDatabase
+            from .rollups import envelope_points
+            times = pd.to_datetime(frame['time'])
+            cutoff = times.max() - pd.Timedelta(days=recent_days)
+            rolled = ParquetDatabase.shared().get_tag_rollup(
+                unit, tag, times.min().to_pydatetime(), cutoff.to_pydatetime(), max_points=budget
+            )
+            if rolled.attrs.get('level', 'raw') == 'raw' or rolled.empty:
+                return frame
+            env = envelope_points(rolled)
+            env = env[env['time'] < cutoff].dropna(subset=['value'])
+            env['running'] = True
+            env['anomaly'] = (env['value'] < lower_bound) | (env['value'] > upper_bound)
+            recent = frame[times >= cutoff]
+            logger.debug(f"Plot {unit}/{tag}: {len(frame):,} rows -> {len(env) + len(recent):,} points "
+                         f"({rolled.attrs['level']} envelope)")
+            return pd.concat([env, recent], ignore_index=True)
+        except Exception as e:
+            logger.debug(f"Rollup envelope unavailable for {unit}/{tag}: {e}")
+            return frame
+
     # --- verification helpers to enforce true threshold exceedance ---------
     def _compute_sigma_bounds(self, values: pd.Series) -> tuple[float, float, float, str]:
         """Return (center, lower, upper, label) using robust median/MAD fallback.
@@ -175,12 +221,16 @@ class AnomalyTriggeredPlotter:
         upper_bound = center_val + 2.5 * std_val
         return center_val, lower_bound, upper_bound, 'Mean/Std 2.5Ïƒ'
 
-    def _has_recent_threshold_exceedance(self, unit: str, tag: str) -> tuple[bool, pd.DataFrame]:
+    def _has_recent_threshold_exceedance(self, unit: str, tag: str,
+                                         data: pd.DataFrame | None = None) -> tuple[bool, pd.DataFrame]:
         """Load 90d data and check if any points in the last 24h exceed +/- 2.5 sigma.
 
-        Returns (has_exceedance, data). Data is preloaded to avoid re-reading.
+        ``data`` may be passed in when it was already read for the unit (see
+        :meth:`_preload_unit_histories`). Returns (has_exceedance, data).
+        Data is preloaded to avoid re-reading.
         """
-        data = self._load_tag_historical_data(unit, tag)
+        if data is None:
+            data = self._load_tag_historical_data(unit, tag)
         if data.empty or 'time' not in data.columns or 'value' not in data.columns:
             return False, data
 
@@ -322,6 +372,14 @@ class AnomalyTriggeredPlotter:
 
         logger.info(f"Processing anomaly detection results for plotting")
 
+        # Pick up files written by the refresh that preceded this run; the
+        # per-tag loaders below then reuse the shared database as-is
+        try:
+            from .parquet_database import ParquetDatabase
+            ParquetDatabase.shared().invalidate_cache()
+        except Exception as cache_err:
+            logger.warning(f"Cache invalidation failed (non-fatal): {cache_err}")
+
         # Extract verified anomalies from detection results
         verified_anomalies = self._extract_verified_anomalies(detection_results)
 
@@ -354,19 +412,22 @@ class AnomalyTriggeredPlotter:
                 # This metric is used by TurboBubble to size bubbles meaningfully.
                 try:
                     from .parquet_database import ParquetDatabase as _DB
-                    db = _DB()
+                    db = _DB.shared()
                     for unit, udata in filtered_results.items():
                         try:
                             # Pull last ~3 months to compute (current vs current-3 months)
                             months = int(os.getenv('RELATIVE_CHANGE_MONTHS', '3').strip() or '3')
                             end_dt = pd.Timestamp.now().to_pydatetime()
                             start_dt = (pd.Timestamp(end_dt) - pd.DateOffset(months=months)).to_pydatetime()
-                            for tag, info in list(udata.get('by_tag', {}).items()):
+                            by_tag = udata.get('by_tag', {})
+                            # Single pass over the unit for all verified tags
+                            arrays = db.get_unit_tags_window(unit, list(by_tag), start_dt, end_dt)
+                            for tag, info in list(by_tag.items()):
                                 try:
-                                    # Memory-safe per-tag load instead of full unit
-                                    sub = db.get_unit_tag_data(unit, tag, start_time=start_dt, end_time=end_dt)
-                                    if sub.empty or 'time' not in sub.columns or 'value' not in sub.columns:
+                                    times, values = arrays.get(tag, ((), ()))
+                                    if len(times) == 0:
                                         continue
+                                    sub = self._frame_from_arrays(times, values)
                                     sub['time'] = pd.to_datetime(sub['time'], errors='coerce')
                                     sub = sub.dropna(subset=['time','value'])
                                     if sub.empty:
@@ -620,13 +681,22 @@ class AnomalyTriggeredPlotter:
         # "only plot on exceed threshold" requirement.
         prefiltered: List[Dict[str, Any]] = []
         print("\n[DURATION DEBUG] Preparing anomalies for plotting (no 24h filter)...")
+        # One read per unit for all of its flagged tags
+        tags_by_unit: Dict[str, List[str]] = {}
+        for anom in verified_anomalies:
+            tags_by_unit.setdefault(anom['unit'], []).append(anom['tag'])
+        unit_histories: Dict[str, Dict[str, pd.DataFrame]] = {
+            unit: self._preload_unit_histories(unit, tags) for unit, tags in tags_by_unit.items()
+        }
         for idx, anom in enumerate(verified_anomalies, 1):
             unit = anom['unit']
             tag = anom['tag']
             # Try to preload 90d data for duration calc and faster draw; do not gate on recency
             data = None
             try:
-                _ok, data = self._has_recent_threshold_exceedance(unit, tag)
+                _ok, data = self._has_recent_threshold_exceedance(
+                    unit, tag, unit_histories.get(unit, {}).get(tag)
+                )
             except Exception:
                 data = None
             if data is not None and not data.empty:
@@ -862,15 +932,17 @@ class AnomalyTriggeredPlotter:
             # Identify anomalous points
             historical_data['anomaly'] = (historical_data['value'] < lower_bound) | (historical_data['value'] > upper_bound)
 
-            # Plot time series with color-coded segments
-            times = historical_data['time'].values
-            values = historical_data['value'].values
+            # Plot time series with color-coded segments (rollup envelope for
+            # the older part of long windows)
+            render = self._plot_render_frame(unit, tag, historical_data, lower_bound, upper_bound)
+            times = render['time'].values
+            values = render['value'].values
 
             # Vectorized rendering using LineCollection (much faster than per-segment loop)
             try:
                 from matplotlib.collections import LineCollection
                 from matplotlib import dates as mdates
-                t_num = mdates.date2num(pd.to_datetime(historical_data['time']).values)
+                t_num = mdates.date2num(pd.to_datetime(render['time']).values)
                 x0, x1 = t_num[:-1], t_num[1:]
                 y0, y1 = values[:-1], values[1:]
                 segs = np.stack([np.stack([x0, y0], axis=1), np.stack([x1, y1], axis=1)], axis=1)
@@ -1237,6 +1309,46 @@ class AnomalyTriggeredPlotter:
             )
             return False
 
+    def _historical_window(self) -> tuple[datetime, datetime]:
+        """(start, end) of the ~3-month plot window ending now."""
+        end_date = datetime.now()
+        try:
+            start_date = (pd.Timestamp(end_date) - pd.DateOffset(months=self.historical_months)).to_pydatetime()
+        except Exception:
+            start_date = end_date - timedelta(days=self.historical_days)
+        return start_date, end_date
+
+    @staticmethod
+    def _frame_from_arrays(times: np.ndarray, values: np.ndarray) -> pd.DataFrame:
+        """Plot frame (time, value, running) from int64-ns time and value arrays."""
+        return pd.DataFrame({
+            'time': pd.to_datetime(times, unit='ns'),
+            'value': values,
+            'running': True,
+        })
+
+    def _preload_unit_histories(self, unit: str, tags: List[str]) -> Dict[str, pd.DataFrame]:
+        """Historical plot data for several tags of a unit from one read.
+
+        Uses ParquetDatabase.get_unit_tags_window (a single pass over the
+        unit's data) instead of one get_unit_tag_data scan per tag. Tags
+        without rows are returned as empty frames; on failure the mapping is
+        empty and callers fall back to per-tag loads.
+        """
+        start_date, end_date = self._historical_window()
+        try:
+            from .parquet_database import ParquetDatabase
+            arrays = ParquetDatabase.shared().get_unit_tags_window(unit, tags, start_date, end_date)
+        except Exception as e:
+            logger.warning(f"Batched history read failed for {unit}: {e}")
+            return {}
+        out: Dict[str, pd.DataFrame] = {}
+        for tag, (times, values) in arrays.items():
+            out[tag] = self._frame_from_arrays(times, values) if len(times) else pd.DataFrame()
+        logger.info(f"Loaded {sum(len(d) for d in out.values()):,} historical records for "
+                    f"{len(out)} tag(s) of {unit} in one pass")
+        return out
+
     def _load_tag_historical_data(self, unit: str, tag: str) -> pd.DataFrame:
         """Load 90 days of historical data for a specific tag (performance optimized).
 
@@ -1248,22 +1360,13 @@ class AnomalyTriggeredPlotter:
         from hours to minutes on large datasets (8M+ records).
         """
         # Calculate ~3-month lookback period
-        end_date = datetime.now()
-        try:
-            start_date = (pd.Timestamp(end_date) - pd.DateOffset(months=self.historical_months)).to_pydatetime()
-        except Exception:
-            start_date = end_date - timedelta(days=self.historical_days)
+        start_date, end_date = self._historical_window()
 
         try:
             # Import parquet database to load historical data
             from .parquet_database import ParquetDatabase
-            db = ParquetDatabase()
-
-            # Invalidate DuckDB cache to ensure fresh data after Excel refresh
-            try:
-                db.invalidate_cache()
-            except Exception as cache_err:
-                logger.warning(f"Cache invalidation failed (non-fatal): {cache_err}")
+            # Shared instance: invalidated once per plotting run, not per tag
+            db = ParquetDatabase.shared()
 
             # MEMORY OPTIMIZATION: Load only the requested tag for the 90-day window.
             # This avoids loading the whole unit into memory and prevents OOM on
@@ -1416,8 +1519,10 @@ class AnomalyTriggeredPlotter:
 
         # Forward fill gaps for continuous visualization
         # Create a complete time range with regular intervals
-        data_sorted = data.sort_values('time').copy()
+        data_sorted = self._plot_render_frame(unit, tag, data, lower_bound, upper_bound).copy()
         time_series = pd.to_datetime(data_sorted['time'])
+        # The rollup envelope has no regular spacing to fill against
+        downsampled = len(data_sorted) < len(data)
 
         # Validate required columns exist
         required_cols = ['time', 'value']
@@ -1427,7 +1532,7 @@ class AnomalyTriggeredPlotter:
             original_data = data_sorted
             filled_data = pd.DataFrame()
         # Detect time interval (median difference between consecutive timestamps)
-        elif len(time_series) > 1:
+        elif len(time_series) > 1 and not downsampled:
             time_diffs = time_series.diff().dropna()
             median_interval = time_diffs.median()
 
@@ -1451,7 +1556,7 @@ class AnomalyTriggeredPlotter:
                 original_data = data_filled[data_filled['is_filled'] == False].copy()
                 filled_data = data_filled[data_filled['is_filled'] == True].copy()
         else:
-            # Not enough data for forward fill
+            # Not enough data for forward fill (or already downsampled)
             data_filled = data_sorted
             original_data = data_sorted
             filled_data = pd.DataFrame()
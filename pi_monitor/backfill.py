@@ -0,0 +1,453 @@
+"""
+Resumable, time-sharded historical backfills over the PI Web API.
+
+Full-history builds fetched a year per tag in one request: one slow or
+failed call restarted the tag and a crashed run started over.
+:class:`BackfillJob` splits every tag's range into time shards
+(BACKFILL_SHARD, default 30 days, on a fixed epoch-aligned grid so shard
+boundaries do not move between runs), fetches the shards of all tags
+concurrently through one :class:`~pi_monitor.webapi.PIWebAPIClient`
+(adaptive per-server concurrency or PI_WEBAPI_QPS pacing, cached WebIds)
+and writes each shard to its own Parquet file as soon as it arrives. With
+PI_WEBAPI_BULK (on by default) the tags of one shard window are resolved
+through ``/batch`` and fetched through ``/streamsets``; shards bulk mode
+could not serve fall back to per-tag requests.
+
+Work directory (default ``data/processed/_backfill/<unit>``)::
+
+    plan.json          resolved absolute range, step and shard length
+    checkpoint.jsonl   one line per completed shard (append-only)
+    shards/<tag>/<start>_<end>.parquet
+
+A re-run of the same job reads the checkpoint and fetches only missing
+or failed shards; :meth:`BackfillJob.finalize` merges the shards into the
+unit's master Parquet (``<unit>_1y_0p1h.parquet``).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+import pyarrow.parquet as pq
+import requests
+
+from .parquet_io import to_compact_table
+from .tag_manifest import _naive_local
+from .webapi import PIWebAPIClient, _bool_env, _interval_from_step, _with_retries, client_from_env
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_DIRNAME = "_backfill"
+PLAN_FILE = "plan.json"
+CHECKPOINT_FILE = "checkpoint.jsonl"
+
+_RELATIVE = re.compile(r"^\*?\s*([+-])\s*(\d+(?:\.\d+)?)\s*(mo|y|w|d|h|m|s)$", re.IGNORECASE)
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400, "mo": 30 * 86400, "y": 365 * 86400}
+
+
+def resolve_time(spec: str, now: Optional[pd.Timestamp] = None) -> pd.Timestamp:
+    """UTC timestamp of a PI time string ("*", "-1y", "*-30d", "-0.1h" or absolute)."""
+    now = now if now is not None else pd.Timestamp.now(tz="UTC")
+    s = str(spec).strip()
+    if s in ("*", ""):
+        return now
+    m = _RELATIVE.match(s)
+    if m:
+        sign = -1 if m.group(1) == "-" else 1
+        return now + sign * pd.Timedelta(seconds=float(m.group(2)) * _UNIT_SECONDS[m.group(3).lower()])
+    ts = pd.Timestamp(s)
+    return ts.tz_localize(datetime.now().astimezone().tzinfo).tz_convert("UTC") if ts.tz is None else ts.tz_convert("UTC")
+
+
+def parse_duration(spec: str) -> pd.Timedelta:
+    """Shard length like "30d", "7d", "12h" or "1w" (PI time units)."""
+    m = re.match(r"^\s*(\d+(?:\.\d+)?)\s*(mo|y|w|d|h|m|s)\s*$", str(spec), re.IGNORECASE)
+    if not m:
+        raise ValueError(f"Invalid shard length: {spec!r}")
+    return pd.Timedelta(seconds=float(m.group(1)) * _UNIT_SECONDS[m.group(2).lower()])
+
+
+def _slug(tag: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", tag)
+
+
+def _stamp(ts: pd.Timestamp) -> str:
+    return ts.strftime("%Y%m%dT%H%M%SZ")
+
+
+@dataclass(frozen=True)
+class Shard:
+    tag: str
+    start: pd.Timestamp  # UTC, inclusive
+    end: pd.Timestamp  # UTC, exclusive unless ``last``
+    last: bool = False
+
+    @property
+    def key(self) -> str:
+        return f"{self.tag}|{_stamp(self.start)}|{_stamp(self.end)}"
+
+    def relpath(self) -> str:
+        return f"shards/{_slug(self.tag)}/{_stamp(self.start)}_{_stamp(self.end)}.parquet"
+
+
+def plan_shards(tags: Iterable[str], start: pd.Timestamp, end: pd.Timestamp, shard: pd.Timedelta) -> List[Shard]:
+    """Shards of every tag on the epoch-aligned ``shard`` grid, interleaved across tags.
+
+    Interleaving (all tags' first shard, then all second shards, ...) spreads
+    concurrent requests over many tags.
+    """
+    if end <= start:
+        return []
+    step = shard.value
+    bounds = [start]
+    b = (start.value // step + 1) * step
+    while b < end.value:
+        bounds.append(pd.Timestamp(b, tz="UTC"))
+        b += step
+    bounds.append(end)
+    tags = list(dict.fromkeys(tags))
+    out: List[Shard] = []
+    for i in range(len(bounds) - 1):
+        last = i == len(bounds) - 2
+        out.extend(Shard(t, bounds[i], bounds[i + 1], last) for t in tags)
+    return out
+
+
+class BackfillJob:
+    """Sharded, checkpointed backfill of one unit's tags."""
+
+    def __init__(
+        self,
+        tags: Iterable[str],
+        *,
+        plant: str,
+        unit: str,
+        server: str,
+        start: str = "-1y",
+        end: str = "*",
+        step: str = "-0.1h",
+        shard: Optional[str] = None,
+        work_dir: Optional[Path] = None,
+        client: Optional[PIWebAPIClient] = None,
+        retries: Optional[int] = None,
+        resume: bool = True,
+    ) -> None:
+        self.tags = [s for s in (str(t).strip() for t in tags) if s and not s.startswith("#")]
+        self.plant = plant
+        self.unit = unit
+        self.server = server
+        self.step = step
+        self.interval = _interval_from_step(step)
+        self.shard = parse_duration(shard or os.getenv("BACKFILL_SHARD", "30d"))
+        self.retries = int(os.getenv("PI_WEBAPI_RETRIES", "2")) if retries is None else retries
+        self.work_dir = Path(work_dir) if work_dir is not None else (
+            Path(__file__).parent.parent / "data" / "processed" / BACKFILL_DIRNAME / _slug(unit)
+        )
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.client = client or client_from_env(server, timeout=float(os.getenv("PI_WEBAPI_TIMEOUT", "60")))
+        self._lock = threading.Lock()
+        self.start, self.end = self._load_or_create_plan(start, end, resume)
+        self.stats: Dict[str, int] = {"fetched": 0, "skipped": 0, "failed": 0, "rows": 0}
+
+    # ------------------------------------------------------------ plan/state
+    def _load_or_create_plan(self, start: str, end: str, resume: bool):
+        path = self.work_dir / PLAN_FILE
+        spec = {"start_spec": start, "end_spec": end, "step": self.step, "shard_s": self.shard.total_seconds()}
+        if resume and path.exists():
+            try:
+                plan = json.loads(path.read_text(encoding="utf-8"))
+                if all(plan.get(k) == v for k, v in spec.items()):
+                    return pd.Timestamp(plan["start"]), pd.Timestamp(plan["end"])
+                logger.info(f"Backfill plan for {self.unit} changed; starting a new plan")
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable backfill plan {path}: {e}")
+        now = pd.Timestamp.now(tz="UTC")
+        s, e = resolve_time(start, now), resolve_time(end, now)
+        plan = {**spec, "unit": self.unit, "plant": self.plant, "start": s.isoformat(), "end": e.isoformat(),
+                "created": now.isoformat()}
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(plan, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+        return s, e
+
+    def shards(self) -> List[Shard]:
+        return plan_shards(self.tags, self.start, self.end, self.shard)
+
+    def completed(self) -> Dict[str, dict]:
+        """Checkpoint entries (shard key -> entry) whose shard file still exists."""
+        path = self.work_dir / CHECKPOINT_FILE
+        done: Dict[str, dict] = {}
+        if not path.exists():
+            return done
+        for line in path.read_text(encoding="utf-8").splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn last line of a crashed run
+            if entry.get("file") is None or (self.work_dir / entry["file"]).exists():
+                done[entry["key"]] = entry
+        return done
+
+    def pending(self) -> List[Shard]:
+        done = self.completed()
+        return [s for s in self.shards() if s.key not in done]
+
+    def _checkpoint(self, shard: Shard, rows: int, file: Optional[str]) -> None:
+        entry = {"key": shard.key, "tag": shard.tag, "rows": rows, "file": file, "at": time.time()}
+        with self._lock:
+            with open(self.work_dir / CHECKPOINT_FILE, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(entry) + "\n")
+                fh.flush()
+                os.fsync(fh.fileno())
+
+    # ----------------------------------------------------------------- fetch
+    def _fetch_shard(self, shard: Shard) -> int:
+        webid = _with_retries(lambda: self.client.resolve_point_webid(self.server, shard.tag), self.retries)
+        if not webid:
+            return self._write_shard(shard, None)  # unknown tag: nothing to fetch, ever
+        try:
+            df = _with_retries(
+                lambda: self.client.fetch_interpolated(webid, shard.start.isoformat(), shard.end.isoformat(),
+                                                       self.interval),
+                self.retries,
+            )
+        except requests.HTTPError as he:
+            if getattr(he.response, "status_code", None) in (400, 404):
+                self.client.forget_webid(self.server, shard.tag)
+            raise
+        return self._write_shard(shard, df)
+
+    def _fetch_window(self, shards: List[Shard]) -> Dict[Shard, int]:
+        """Fetch the shards of one window (several tags) through ``/batch`` + ``/streamsets``.
+
+        Returns rows per shard served; the others are left for per-tag requests.
+        """
+        by_tag = {s.tag: s for s in shards}
+        first = shards[0]
+        webids, retry = self.client.resolve_point_webids(self.server, list(by_tag), retries=self.retries)
+        served: Dict[Shard, int] = {}
+        for tag, df in self.client.iter_streamset(webids, first.start.isoformat(), first.end.isoformat(),
+                                                  self.interval, retries=self.retries):
+            served[by_tag[tag]] = self._write_shard(by_tag[tag], df)
+        for tag, shard in by_tag.items():
+            if tag not in webids and tag not in retry:
+                served[shard] = self._write_shard(shard, None)  # unknown tag
+        return served
+
+    def _write_shard(self, shard: Shard, df: Optional[pd.DataFrame]) -> int:
+        """Write the shard's rows of a (time UTC, value) response and checkpoint it."""
+        if df is not None and not df.empty:
+            t = pd.to_datetime(df["time"], utc=True)
+            keep = (t >= shard.start) & ((t <= shard.end) if shard.last else (t < shard.end))
+            df = df.loc[keep]
+        if df is None or df.empty:
+            self._checkpoint(shard, 0, None)
+            return 0
+        frame = pd.DataFrame({
+            "time": _naive_local(df["time"]).to_numpy(),
+            "value": df["value"].astype("float64").to_numpy(),
+            "plant": self.plant,
+            "unit": self.unit,
+            "tag": shard.tag.replace(".", "_"),
+        })
+        rel = shard.relpath()
+        path = self.work_dir / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".tmp-{os.getpid()}-{threading.get_ident()}")
+        pq.write_table(to_compact_table(frame), tmp)
+        os.replace(tmp, path)
+        self._checkpoint(shard, len(frame), rel)
+        return len(frame)
+
+    def run(self, max_workers: Optional[int] = None, progress: bool = True) -> Dict[str, int]:
+        """Fetch all pending shards concurrently; returns fetched/skipped/failed/rows counts."""
+        todo = self.pending()
+        total = len(self.shards())
+        self.stats["skipped"] = total - len(todo)
+        if progress:
+            print(f"[backfill] {self.unit}: {len(self.tags)} tag(s) x {self.shard} shards "
+                  f"{self.start:%Y-%m-%d} -> {self.end:%Y-%m-%d}; {len(todo)}/{total} shard(s) to fetch")
+        if not todo:
+            return dict(self.stats)
+        ctl = getattr(self.client, "controller", None)
+        workers = max_workers or int(os.getenv("BACKFILL_WORKERS", "0")) or (ctl.max_limit if ctl else 4)
+        windows: Dict[tuple, List[Shard]] = {}
+        for s in todo:
+            windows.setdefault((s.start, s.end), []).append(s)
+        bulk = _bool_env("PI_WEBAPI_BULK", True)
+        started = time.perf_counter()
+        done = 0
+
+        def finished(shard: Shard, rows: Optional[int], error: Optional[Exception] = None) -> None:
+            nonlocal done
+            done += 1
+            if error is None:
+                self.stats["fetched"] += 1
+                self.stats["rows"] += rows or 0
+            else:
+                self.stats["failed"] += 1
+                logger.warning(f"Backfill shard {shard.key} failed: {type(error).__name__}: {error}")
+            if progress and (done % 50 == 0 or done == len(todo)):
+                print(f"[backfill] {done}/{len(todo)} shard(s), {self.stats['rows']:,} rows, "
+                      f"{self.stats['failed']} failed, {time.perf_counter() - started:.1f}s")
+
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            running: Dict[object, object] = {}
+            for group in windows.values():
+                if bulk and len(group) > 1:
+                    running[ex.submit(self._fetch_window, group)] = group
+                else:
+                    running.update({ex.submit(self._fetch_shard, s): s for s in group})
+            while running:
+                complete, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for f in complete:
+                    item = running.pop(f)
+                    if isinstance(item, Shard):
+                        try:
+                            finished(item, f.result())
+                        except Exception as e:
+                            finished(item, None, e)
+                        continue
+                    try:
+                        served = f.result()
+                    except Exception as e:
+                        logger.info(f"Backfill bulk fetch failed ({type(e).__name__}: {e}); using per-tag requests")
+                        served = {}
+                    for shard, rows in served.items():
+                        finished(shard, rows)
+                    running.update({ex.submit(self._fetch_shard, s): s for s in item if s not in served})
+        return dict(self.stats)
+
+    # -------------------------------------------------------------- finalize
+    def is_complete(self) -> bool:
+        return not self.pending()
+
+    def shard_files(self) -> List[Path]:
+        return sorted(self.work_dir / e["file"] for e in self.completed().values() if e.get("file"))
+
+    def finalize(self, out_parquet: Path, *, merge_existing: bool = True, allow_partial: bool = False) -> Path:
+        """Merge the shard files into ``out_parquet``, one tag at a time.
+
+        Each tag's shards are merged and written as that tag's row groups,
+        so at most one tag is ever a pandas frame. With ``merge_existing``
+        rows already in ``out_parquet`` are kept where the backfill has no
+        value for the same (tag, time); the existing file is held as one
+        compact Arrow table and its tags outside the backfill are carried
+        over. The tag manifest and catalogs are refreshed like
+        ``ingest.write_parquet``.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        from .delta_store import last_write_wins
+        from .feature_store import note_rows_written
+        from .file_catalog import refresh as refresh_catalog
+        from .parquet_io import DICTIONARY_TYPE, ROW_GROUP_ROWS, table_to_pandas, value_float32
+        from .rollups import note_rows_written as note_rollup_rows
+        from .tag_manifest import TagManifest, _notify_catalog
+
+        missing = self.pending()
+        if missing and not allow_partial:
+            raise RuntimeError(f"Backfill of {self.unit} incomplete: {len(missing)} shard(s) missing; run it again")
+        shards: Dict[str, List[Path]] = {}
+        for e in self.completed().values():
+            if e.get("file"):
+                shards.setdefault(e["tag"].replace(".", "_"), []).append(self.work_dir / e["file"])
+        out_parquet = Path(out_parquet)
+        existing = existing_tags = None
+        if merge_existing and out_parquet.exists():
+            existing = pq.read_table(out_parquet)
+            existing_tags = pc.cast(existing.column("tag"), pa.string())
+
+        schema = pa.schema([
+            ("time", pa.timestamp("ns")),
+            ("value", pa.float32() if value_float32() else pa.float64()),
+            ("plant", DICTIONARY_TYPE),
+            ("unit", DICTIONARY_TYPE),
+            ("tag", DICTIONARY_TYPE),
+        ])
+        names = set(shards) | (set(pc.unique(existing_tags).to_pylist()) if existing is not None else set())
+        manifest = TagManifest()
+        rows = 0
+        earliest = None
+        out_parquet.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out_parquet.with_suffix(out_parquet.suffix + f".tmp-{os.getpid()}")
+        writer = pq.ParquetWriter(str(tmp), schema, compression="zstd")
+        try:
+            for name in sorted(n for n in names if n is not None):
+                frames = [table_to_pandas(pq.read_table(p)) for p in sorted(shards.get(name, []))]
+                for f in frames:
+                    if not f.empty:
+                        lo = _naive_local(f["time"]).min()
+                        earliest = lo if earliest is None or lo < earliest else earliest
+                if existing is not None:
+                    frames.insert(0, table_to_pandas(existing.filter(pc.equal(existing_tags, name))))
+                frames = [f[list(schema.names)].astype({c: "string" for c in ("plant", "unit", "tag")})
+                          for f in frames if not f.empty]
+                merged = last_write_wins(frames)
+                if merged.empty:
+                    continue
+                merged["time"] = _naive_local(merged["time"])
+                writer.write_table(to_compact_table(merged).select(schema.names).cast(schema),
+                                   row_group_size=ROW_GROUP_ROWS)
+                manifest.update(merged)
+                rows += len(merged)
+            writer.close()
+            writer = None
+            if not rows:
+                raise RuntimeError(f"Backfill of {self.unit} produced no rows")
+            os.replace(tmp, out_parquet)
+        finally:
+            if writer is not None:
+                writer.close()
+            tmp.unlink(missing_ok=True)
+        try:
+            manifest.save(out_parquet)
+        except Exception:
+            pass
+        _notify_catalog(out_parquet)
+        refresh_catalog(out_parquet)
+        note_rows_written(out_parquet.parent, self.unit, earliest)
+        note_rollup_rows(out_parquet.parent, self.unit, earliest)
+        logger.info(f"Backfill of {self.unit}: {rows:,} rows from {sum(map(len, shards.values()))} shard(s) -> {out_parquet}")
+        return out_parquet
+
+
+def backfill_unit(
+    tags: Iterable[str],
+    out_parquet: Path,
+    *,
+    plant: str,
+    unit: str,
+    server: str,
+    start: str = "-1y",
+    end: str = "*",
+    step: str = "-0.1h",
+    shard: Optional[str] = None,
+    work_dir: Optional[Path] = None,
+    max_workers: Optional[int] = None,
+    client: Optional[PIWebAPIClient] = None,
+) -> Optional[Path]:
+    """Run (or resume) a backfill and merge it into ``out_parquet`` once every shard is in.
+
+    Returns the written path, or None when shards are still missing (run
+    again to fetch only those).
+    """
+    job = BackfillJob(tags, plant=plant, unit=unit, server=server, start=start, end=end, step=step,
+                      shard=shard, work_dir=work_dir, client=client)
+    stats = job.run(max_workers=max_workers)
+    if stats["failed"] or not job.is_complete():
+        print(f"[backfill] {unit}: {stats['failed']} shard(s) failed; re-run to resume")
+        return None
+    return job.finalize(out_parquet)
@@ -9,6 +9,10 @@ import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
 
+from .parquet_io import to_compact_table
+from .file_catalog import refresh as refresh_catalog
+from .tag_manifest import TagManifest
+
 try:
     import xlwings as xw
 except Exception:
@@ -429,7 +433,8 @@ def build_unit_from_tags(
 ) -> Path:
     """Loop over tags, pull 1y/0.1h via DataLink, and write a single Parquet.
 
-    Parquet schema columns: time (timestamp[ns]), value (float64), plant, unit, tag.
+    Parquet schema columns: time (timestamp[ns]), value (float64, or float32 with
+    PARQUET_VALUE_FLOAT32=1), plant, unit, tag (dictionary-encoded).
     Uses a streaming ParquetWriter to avoid holding all tags in memory.
     """
     if xw is None:
@@ -461,6 +466,7 @@ def build_unit_from_tags(
 
         app = xw.App(visible=visible, add_book=False)
         writer: pq.ParquetWriter | None = None
+        manifest = TagManifest()
         rows_this_try = 0
         try:
             app.display_alerts = False
@@ -640,10 +646,11 @@ def build_unit_from_tags(
                 # Reorder columns
                 df = df[["time", "value", "plant", "unit", "tag"]]
 
-                table = pa.Table.from_pandas(df, preserve_index=False)
+                table = to_compact_table(df)
                 if writer is None:
                     writer = pq.ParquetWriter(str(out_parquet), table.schema, compression="zstd")
                 writer.write_table(table)
+                manifest.update(df)
                 rows_this_try += len(df)
 
             # Print final summary
@@ -664,6 +671,11 @@ def build_unit_from_tags(
         finally:
             if writer is not None:
                 writer.close()
+                try:
+                    manifest.save(out_parquet)
+                except Exception:
+                    pass
+                refresh_catalog(out_parquet)
             app.quit()
             # Clean up the working copy if used
             if working_path is not None:
@@ -2,8 +2,15 @@ from __future__ import annotations
 
 from pathlib import Path
 from typing import Sequence
+import logging
 import os
 
+from .parquet_io import ROW_GROUP_ROWS, to_compact_table, value_float32
+from .file_catalog import refresh as refresh_catalog
+from .tag_manifest import record_write
+
+logger = logging.getLogger(__name__)
+
 
 def _ensure_duckdb():
     try:
@@ -22,8 +29,10 @@ def dedup_parquet(
 ) -> Path:
     """Remove duplicate rows based on `keys` and write a clean Parquet.
 
-    Prefer DuckDB for streaming performance. Falls back to pandas if DuckDB
-    is not available.
+    Prefer DuckDB for streaming performance. Falls back to a bounded-memory
+    pyarrow external sort (:func:`external_sort_dedup`) if DuckDB is not
+    available. String keys are stored dictionary-encoded (read back
+    as categoricals); ``value`` is float32 when PARQUET_VALUE_FLOAT32=1.
     """
     in_path = Path(in_path)
     if out_path is None:
@@ -63,23 +72,247 @@ def dedup_parquet(
             pass
 
         key_list = ", ".join(keys)
+        # Time-major order keeps each row group's time range narrow so
+        # window reads can prune row groups by their min/max statistics.
+        order_list = ", ".join(["time"] + [k for k in keys if k != "time"]) if "time" in keys else key_list
         # any_value picks a representative value when duplicates exist.
+        value_type = "FLOAT" if value_float32() else "DOUBLE"
         sql = f"""
 COPY (
-  SELECT {key_list}, any_value(value) AS value
+  SELECT {key_list}, CAST(any_value(value) AS {value_type}) AS value
   FROM read_parquet('{in_path.as_posix()}')
   GROUP BY {key_list}
-  ORDER BY {key_list}
-) TO '{out_path.as_posix()}' (FORMAT PARQUET, COMPRESSION '{compression}');
+  ORDER BY {order_list}
+) TO '{out_path.as_posix()}' (FORMAT PARQUET, COMPRESSION '{compression}', ROW_GROUP_SIZE {ROW_GROUP_ROWS});
 """
         con.execute(sql)
         con.close()
+        record_write(out_path)
+        refresh_catalog(out_path)
         return out_path
 
-    # Fallback to pandas (may be memory heavy for very large files)
-    import pandas as pd
-
-    df = pd.read_parquet(in_path)
-    df = df.sort_values(list(keys)).drop_duplicates(subset=list(keys), keep="first")
-    df.to_parquet(out_path, index=False)
+    # Fallback: bounded-memory external sort in pyarrow (no full-file load)
+    external_sort_dedup(in_path, out_path, keys=keys, compression=compression)
+    record_write(out_path)
+    refresh_catalog(out_path)
     return out_path
+
+
+def _dedup_memory_limit_bytes() -> int:
+    try:
+        return max(16, int(os.getenv("DEDUP_MEMORY_LIMIT_MB", "512"))) * 1024 * 1024
+    except ValueError:
+        return 512 * 1024 * 1024
+
+
+def _first_of_key(table, keys: Sequence[str]):
+    """Keep the first row of each run of equal ``keys`` in a sorted table."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    n = table.num_rows
+    if n <= 1:
+        return table
+    same = None
+    for k in keys:
+        col = table.column(k).combine_chunks()
+        a, b = col.slice(1), col.slice(0, n - 1)
+        eq = pc.or_(pc.fill_null(pc.equal(a, b), False), pc.and_(pc.is_null(a), pc.is_null(b)))
+        same = eq if same is None else pc.and_(same, eq)
+    keep = pa.concat_arrays([pa.array([True]), pc.invert(same)])
+    return table.filter(keep)
+
+
+def _comparable(scalar):
+    """Python value ordering like the Arrow sort (nulls last)."""
+    import pyarrow as pa
+
+    if not scalar.is_valid:
+        return (1, 0)
+    # Timestamps compare on their integer value (as_py() would drop nanoseconds)
+    return (0, scalar.value if pa.types.is_timestamp(scalar.type) else scalar.as_py())
+
+
+def _rows_upto(table, order: Sequence[str], frontier) -> int:
+    """Number of leading rows of a sorted table whose key is <= ``frontier``."""
+    import pyarrow.compute as pc
+
+    le = None
+    for k, f in reversed(list(zip(order, frontier))):
+        col = table.column(k)
+        if f.is_valid:
+            lt = pc.fill_null(pc.less(col, f), False)
+            eq = pc.fill_null(pc.equal(col, f), False)
+        else:
+            lt = pc.is_valid(col)
+            eq = pc.is_null(col)
+        le = eq if le is None else pc.and_(eq, le)
+        le = pc.or_(lt, le)
+    return int(pc.sum(le).as_py() or 0)
+
+
+def external_sort_dedup(
+    in_path: Path,
+    out_path: Path,
+    *,
+    keys: Sequence[str] = ("plant", "unit", "tag", "time"),
+    compression: str = "ZSTD",
+    memory_limit_bytes: int | None = None,
+    tmp_dir: Path | None = None,
+    progress=None,
+) -> Path:
+    """Deduplicate ``in_path`` on ``keys`` with a bounded-memory external sort.
+
+    Row groups are streamed into sorted, locally de-duplicated spill runs of
+    at most a quarter of the memory ceiling (DEDUP_MEMORY_LIMIT_MB, default
+    512), which are then k-way merged block by block: every block holds the
+    rows of all runs up to the smallest "last key" buffered, so duplicates
+    never straddle blocks. Output is time-major like the DuckDB path and
+    keeps the first occurrence of each key (file order). ``progress``
+    receives status lines (default: the module logger).
+    """
+    import shutil
+    import tempfile
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    in_path, out_path = Path(in_path), Path(out_path)
+    report = progress or logger.info
+    limit = memory_limit_bytes or _dedup_memory_limit_bytes()
+    run_budget = max(1, limit // 4)
+
+    pf = pq.ParquetFile(str(in_path))
+    names = pf.schema_arrow.names
+    keys = [k for k in keys if k in names]
+    if not keys:
+        raise ValueError(f"None of the dedup keys are present in {in_path.name}")
+    # Time-major order (same as the DuckDB path) keeps row-group time ranges narrow
+    order = (["time"] + [k for k in keys if k != "time"]) if "time" in keys else list(keys)
+    total_rows = pf.metadata.num_rows
+
+    base_tmp = Path(tmp_dir or os.getenv("DEDUP_TEMP_DIR", str(out_path.parent / "_dedup_tmp")))
+    try:
+        base_tmp.mkdir(parents=True, exist_ok=True)
+        work = Path(tempfile.mkdtemp(prefix="runs-", dir=str(base_tmp)))
+    except OSError:
+        work = Path(tempfile.mkdtemp(prefix="dedup-runs-"))
+
+    tmp_out = out_path.with_name(out_path.name + f".tmp-{os.getpid()}")
+    writer = None
+    try:
+        # Phase 1: sorted spill runs
+        runs: list[Path] = []
+        pending: list = []
+        pending_bytes = 0
+        read_rows = 0
+
+        def _spill() -> None:
+            nonlocal pending, pending_bytes
+            if not pending:
+                return
+            run = pa.concat_tables(pending)
+            pending, pending_bytes = [], 0
+            run = _first_of_key(run.sort_by([(k, "ascending") for k in order]), order)
+            path = work / f"run-{len(runs):05d}.parquet"
+            pq.write_table(run, path, compression="NONE", row_group_size=64_000)
+            runs.append(path)
+            report(f"dedup: spilled run {len(runs)} ({run.num_rows:,} rows), read {read_rows:,}/{total_rows:,}")
+
+        for batch in pf.iter_batches(batch_size=64_000):
+            table = pa.Table.from_batches([batch])
+            read_rows += table.num_rows
+            pending.append(table)
+            pending_bytes += table.nbytes
+            if pending_bytes >= run_budget:
+                _spill()
+        _spill()
+
+        # Phase 2: block-wise k-way merge of the runs
+        # Per-run read-ahead so that all buffers together stay within the budget
+        row_bytes = 64
+        if runs:
+            sample = pq.ParquetFile(str(runs[0])).read_row_group(0)
+            if sample.num_rows:
+                row_bytes = max(1, sample.nbytes // sample.num_rows)
+        merge_batch = max(1_024, (limit // 4) // max(1, len(runs)) // row_bytes)
+        readers = [pq.ParquetFile(str(r)).iter_batches(batch_size=merge_batch) for r in runs]
+        buffers: list = [None] * len(runs)
+        exhausted = [False] * len(runs)
+
+        def _refill(i: int) -> None:
+            while (buffers[i] is None or buffers[i].num_rows == 0) and not exhausted[i]:
+                try:
+                    b = next(readers[i])
+                except StopIteration:
+                    exhausted[i] = True
+                    buffers[i] = None
+                    return
+                buffers[i] = pa.Table.from_batches([b]).append_column(
+                    "__run", pa.array([i] * b.num_rows, type=pa.int32())
+                )
+
+        for i in range(len(runs)):
+            _refill(i)
+
+        out_chunks: list = []
+        out_rows = 0
+        written = 0
+
+        def _write(force: bool = False) -> None:
+            nonlocal writer, out_chunks, out_rows, written
+            if not out_chunks or (out_rows < ROW_GROUP_ROWS and not force):
+                return
+            table = to_compact_table(pa.concat_tables(out_chunks))
+            out_chunks, out_rows = [], 0
+            if writer is None:
+                writer = pq.ParquetWriter(str(tmp_out), table.schema, compression=compression.lower())
+            writer.write_table(table, row_group_size=ROW_GROUP_ROWS)
+            written += table.num_rows
+            report(f"dedup: wrote {written:,} unique rows")
+
+        while any(b is not None and b.num_rows for b in buffers):
+            live = [i for i, b in enumerate(buffers) if b is not None and b.num_rows]
+            bounding = [i for i in live if not exhausted[i]]
+            frontier = None
+            if bounding:
+                lasts = {
+                    i: [buffers[i].column(k)[buffers[i].num_rows - 1] for k in order] for i in bounding
+                }
+                frontier = min(lasts.values(), key=lambda row: tuple(_comparable(v) for v in row))
+            taken = []
+            for i in live:
+                b = buffers[i]
+                n = b.num_rows if frontier is None else _rows_upto(b, order, frontier)
+                if n:
+                    taken.append(b.slice(0, n))
+                    buffers[i] = b.slice(n)
+                _refill(i)
+            if not taken:
+                continue
+            block = pa.concat_tables(taken)
+            block = block.sort_by([(k, "ascending") for k in order] + [("__run", "ascending")])
+            block = _first_of_key(block, order).drop_columns(["__run"])
+            out_chunks.append(block)
+            out_rows += block.num_rows
+            _write()
+        _write(force=True)
+
+        if writer is None:
+            # Empty input: keep the schema
+            writer = pq.ParquetWriter(str(tmp_out), to_compact_table(pf.schema_arrow.empty_table()).schema,
+                                      compression=compression.lower())
+        writer.close()
+        writer = None
+        os.replace(tmp_out, out_path)
+        report(f"dedup: {total_rows:,} -> {written:,} rows ({total_rows - written:,} duplicates dropped)")
+        return out_path
+    finally:
+        if writer is not None:
+            writer.close()
+        try:
+            if tmp_out.exists():
+                tmp_out.unlink()
+        except OSError:
+            pass
+        shutil.rmtree(work, ignore_errors=True)
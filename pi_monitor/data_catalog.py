@@ -0,0 +1,412 @@
+"""
+Persistent per-tag catalog of the processed data.
+
+``scripts/build_catalog.py`` used to rescan the whole partitioned dataset
+with DuckDB to produce ``catalog_tags.parquet`` / ``catalog_units.parquet``,
+and nothing read them; unit listings, tag summaries and the database status
+scanned the data files instead.
+
+The catalog is now maintained incrementally from the per-tag manifest
+sidecars (see ``tag_manifest``) that every writer updates on each write or
+append. Per tag it holds min/max time, row and null counts, value
+min/max/mean/std, the last value and the last write time. Each unit row
+records the fingerprint of its source (newest stable file plus pending
+delta segments, or the partitioned dataset); :meth:`DataCatalog.refresh`
+only recomputes units whose fingerprint changed. Writers call
+:func:`note_write`, which only drops a dirty marker for the unit; the next
+reader that asks for the catalog folds the marked units in. Updates of the
+persisted tables run under a lock file and start from the tables on disk,
+so concurrent processes do not overwrite each other's units.
+
+Tables live under ``data/processed/_catalog/`` (kept out of the top-level
+``*.parquet`` globs that serve unit reads).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote, unquote
+
+import pandas as pd
+
+from .dataset import dataset_units, latest_partition_mtime
+from .tag_manifest import TagManifest
+
+logger = logging.getLogger(__name__)
+
+CATALOG_DIRNAME = "_catalog"
+TAGS_FILE = "catalog_tags.parquet"
+UNITS_FILE = "catalog_units.parquet"
+DIRTY_DIRNAME = "dirty"
+LOCK_FILE = ".refresh.lock"
+# Dirty marker of a write whose unit is unknown: re-check every unit
+ALL_UNITS = "_all"
+
+TAG_COLUMNS = [
+    "plant", "unit", "tag", "min_time", "max_time", "rows", "null_count",
+    "value_min", "value_max", "value_mean", "value_std", "last_value", "last_write",
+]
+UNIT_COLUMNS = [
+    "plant", "unit", "tag_count", "min_time", "max_time", "rows", "null_count",
+    "last_write", "source", "fingerprint",
+]
+
+
+def _ttl_seconds() -> float:
+    try:
+        return float(os.getenv("DATA_CATALOG_TTL_S", "30"))
+    except ValueError:
+        return 30.0
+
+
+def _lock_wait_seconds() -> float:
+    try:
+        return float(os.getenv("DATA_CATALOG_LOCK_WAIT_S", "10"))
+    except ValueError:
+        return 10.0
+
+
+def infer_plant(unit: str) -> str:
+    """Best-effort plant of a unit id (same conventions as the auto-scanner)."""
+    u = unit.strip()
+    if u.upper().startswith("ABF") or re.match(r"^\d{2}-", u):
+        return "ABF"
+    if u.startswith("K-"):
+        return "PCFS"
+    if u.startswith("C-") or u.startswith("XT-"):
+        return "PCMSB"
+    return "UNKNOWN"
+
+
+def _tag_rows(plant: str, unit: str, manifest: TagManifest) -> List[Dict[str, Any]]:
+    rows = []
+    for tag, v in sorted(manifest.tags.items()):
+        st = manifest.tag_stats(tag)
+        rows.append({
+            "plant": plant,
+            "unit": unit,
+            "tag": tag,
+            "min_time": v["first"],
+            "max_time": v["last"],
+            "rows": st["rows"],
+            "null_count": st["nulls"],
+            "value_min": st["min"],
+            "value_max": st["max"],
+            "value_mean": st["mean"],
+            "value_std": st["std"],
+            "last_value": v.get("last_value"),
+            "last_write": v.get("last_write"),
+        })
+    return rows
+
+
+def _tags_frame(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=TAG_COLUMNS)
+    for col in ("min_time", "max_time", "last_write"):
+        df[col] = pd.to_datetime(df[col])
+    for col in ("value_min", "value_max", "value_mean", "value_std", "last_value"):
+        df[col] = pd.to_numeric(df[col]).astype("float64")
+    for col in ("rows", "null_count"):
+        df[col] = df[col].astype("int64")
+    return df
+
+
+class DataCatalog:
+    """Per-unit / per-tag statistics of a ParquetDatabase, kept up to date incrementally."""
+
+    def __init__(self, db: Any):
+        self.db = db
+        self.root = Path(db.processed_dir) / CATALOG_DIRNAME
+        self._lock = threading.RLock()
+        # unit -> {"plant", "fingerprint", "source", "tags": [row dicts]}
+        self._units: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        self._disk_stamp: Optional[int] = None
+        self._refreshed_at: Optional[float] = None
+
+    # ------------------------------------------------------------- sources
+    def source_units(self) -> Dict[str, str]:
+        """Units with data on disk (flat unit files and the partitioned dataset) -> plant.
+
+        Derived from file and directory names only; no data is read.
+        """
+        db = self.db
+        out: Dict[str, str] = {}
+        for entry in db.catalog.entries():
+            if db._is_temp_file(entry.name):
+                continue
+            token = entry.name.split("_")[0] if "_" in entry.name else entry.name.replace(".parquet", "")
+            unit = db._normalize_unit_from_token(token)
+            if unit and not db._is_temp_unit(unit):
+                out.setdefault(unit, infer_plant(unit))
+        try:
+            for unit, dirs in dataset_units(db.dataset_dir).items():
+                if unit.lower() in ("pcfs", "pcmsb", "abf") or db._is_temp_unit(unit):
+                    continue
+                plant = dirs[0].parent.name.partition("=")[2] if dirs else ""
+                out[unit] = plant or out.get(unit) or infer_plant(unit)
+        except Exception as e:
+            logger.warning(f"Failed to list partitioned dataset units: {e}")
+        return out
+
+    def _fingerprint(self, unit: str) -> str:
+        """Changes whenever the data serving ``unit`` is written."""
+        db = self.db
+        files = db._get_stable_parquet_files(unit=unit, dedup_preferred=False)
+        if files:
+            st = os.stat(files[0])
+            base: List[Any] = ["file", Path(files[0]).name, int(st.st_size), int(st.st_mtime_ns)]
+        else:
+            base = ["dataset", latest_partition_mtime(db.dataset_dir, unit)]
+        deltas = [p.name for p in db.deltas.segments(unit)]
+        return json.dumps([base, deltas])
+
+    def _unit_stats(self, unit: str) -> tuple[str, Optional[TagManifest]]:
+        manifest = self.db._unit_manifest(unit)
+        if manifest is not None:
+            return "manifest", manifest
+        # Dataset-only units (or files without a tag column): one column scan
+        table = self.db.get_unit_data_arrow(unit, columns=["time", "value", "tag"])
+        if table.num_rows == 0:
+            return "scan", None
+        return "scan", TagManifest().update(table.to_pandas())
+
+    # ---------------------------------------------------------- persistence
+    def _stamp(self) -> Optional[int]:
+        try:
+            return (self.root / UNITS_FILE).stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self, reload: bool = False) -> None:
+        """Read the persisted tables; with ``reload`` only if another process saved since."""
+        if self._loaded and not (reload and self._stamp() != self._disk_stamp):
+            return
+        self._loaded = True
+        self._disk_stamp = self._stamp()
+        units_path, tags_path = self.root / UNITS_FILE, self.root / TAGS_FILE
+        if not units_path.exists() or not tags_path.exists():
+            return
+        try:
+            units = pd.read_parquet(units_path)
+            tags = pd.read_parquet(tags_path)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable data catalog in {self.root}: {e}")
+            return
+        by_unit = {u: g for u, g in tags.groupby("unit", sort=False)}
+        self._units = {}
+        for rec in units.to_dict("records"):
+            g = by_unit.get(rec["unit"])
+            self._units[rec["unit"]] = {
+                "plant": rec["plant"],
+                "fingerprint": rec["fingerprint"],
+                "source": rec["source"],
+                "tags": g[TAG_COLUMNS].to_dict("records") if g is not None else [],
+            }
+
+    def _save(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tags = self.tags()
+        units = self.units()
+        for frame, name in ((tags, TAGS_FILE), (units, UNITS_FILE)):
+            target = self.root / name
+            tmp = target.with_name(target.name + f".tmp-{os.getpid()}-{threading.get_ident()}")
+            frame.to_parquet(tmp, index=False)
+            os.replace(tmp, target)
+        self._disk_stamp = self._stamp()
+
+    def _dirty(self) -> Dict[str, int]:
+        """Units marked by writers (see :func:`note_unit_write`) -> marker mtime."""
+        out: Dict[str, int] = {}
+        try:
+            for p in (self.root / DIRTY_DIRNAME).iterdir():
+                out[unquote(p.name)] = p.stat().st_mtime_ns
+        except OSError:
+            pass
+        return out
+
+    def _clear_dirty(self, marks: Dict[str, int]) -> None:
+        # Markers touched again since they were read stay for the next refresh
+        for unit, mtime in marks.items():
+            p = self.root / DIRTY_DIRNAME / quote(unit, safe="")
+            try:
+                if p.stat().st_mtime_ns == mtime:
+                    p.unlink()
+            except OSError:
+                pass
+
+    def _acquire_file_lock(self, stale_after_s: float = 600.0) -> bool:
+        lock = self.root / LOCK_FILE
+        deadline = time.monotonic() + _lock_wait_seconds()
+        while True:
+            try:
+                if lock.exists() and (time.time() - lock.stat().st_mtime) > stale_after_s:
+                    lock.unlink(missing_ok=True)
+            except OSError:
+                pass
+            try:
+                fd = os.open(str(lock), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                return True
+            except FileExistsError:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.05)
+
+    # ------------------------------------------------------------- updates
+    def refresh(self, units: Optional[List[str]] = None, *, force: bool = False) -> List[str]:
+        """Recompute units whose source changed; returns the units that were updated.
+
+        With ``units`` only those (and units marked dirty by writers) are
+        checked. A full check runs at most every DATA_CATALOG_TTL_S seconds
+        unless ``force`` is set or a writer marked an unknown unit.
+        """
+        with self._lock:
+            self._load()
+            marks = self._dirty()
+            full = units is None and (
+                force or ALL_UNITS in marks or self._refreshed_at is None
+                or time.monotonic() - self._refreshed_at >= _ttl_seconds()
+            )
+            wanted = list(dict.fromkeys([*(units or []), *(u for u in marks if u != ALL_UNITS)]))
+            if not full and not wanted:
+                return []
+            present = self.source_units()
+            check = list(present) if full else [u for u in wanted if u in present]
+            gone = [u for u in (self._units if full else wanted) if u not in present and u in self._units]
+            if not gone and not marks and all(
+                    u in self._units and self._units[u]["fingerprint"] == self._fingerprint(u) for u in check):
+                if full:
+                    self._refreshed_at = time.monotonic()
+                return []
+
+            # Something changed: update from the tables on disk under the lock file,
+            # so units another process folded in meanwhile are kept (and not recomputed)
+            self.root.mkdir(parents=True, exist_ok=True)
+            locked = self._acquire_file_lock()
+            if not locked:
+                logger.info(f"Data catalog in {self.root} is being updated elsewhere; not persisting")
+            try:
+                if locked:
+                    self._load(reload=True)
+                changed: List[str] = []
+                for unit in check:
+                    try:
+                        fp = self._fingerprint(unit)
+                        cur = self._units.get(unit)
+                        if cur is not None and cur["fingerprint"] == fp:
+                            continue
+                        source, manifest = self._unit_stats(unit)
+                        plant = present[unit]
+                        self._units[unit] = {
+                            "plant": plant,
+                            "fingerprint": fp,
+                            "source": source,
+                            "tags": _tag_rows(plant, unit, manifest) if manifest is not None else [],
+                        }
+                        changed.append(unit)
+                    except Exception as e:
+                        logger.warning(f"Catalog refresh failed for {unit}: {e}")
+                gone = [u for u in (self._units if full else wanted) if u not in present and u in self._units]
+                for unit in gone:
+                    self._units.pop(unit, None)
+                if full:
+                    self._refreshed_at = time.monotonic()
+                if locked:
+                    try:
+                        if changed or gone:
+                            self._save()
+                        self._clear_dirty(marks)
+                    except Exception as e:
+                        logger.warning(f"Could not persist data catalog: {e}")
+            finally:
+                if locked:
+                    try:
+                        (self.root / LOCK_FILE).unlink(missing_ok=True)
+                    except OSError:
+                        pass
+            if changed or gone:
+                logger.info(f"Data catalog: {len(changed)} unit(s) updated, {len(gone)} removed")
+            return changed
+
+    def invalidate(self) -> None:
+        """Force the next query to re-check every unit's fingerprint."""
+        with self._lock:
+            self._refreshed_at = None
+
+    # ------------------------------------------------------------- queries
+    def unit_names(self) -> List[str]:
+        """Units with data on disk (no statistics needed, nothing is read)."""
+        return sorted(self.source_units())
+
+    def tags(self, unit: Optional[str] = None) -> pd.DataFrame:
+        """Per-tag catalog rows (TAG_COLUMNS), for one unit or all units."""
+        with self._lock:
+            rows = [r for u, e in self._units.items() if unit is None or u == unit for r in e["tags"]]
+        return _tags_frame(rows).sort_values(["plant", "unit", "tag"]).reset_index(drop=True)
+
+    def units(self) -> pd.DataFrame:
+        """Per-unit catalog rows (UNIT_COLUMNS)."""
+        with self._lock:
+            recs = []
+            for unit, e in self._units.items():
+                t = e["tags"]
+                recs.append({
+                    "plant": e["plant"],
+                    "unit": unit,
+                    "tag_count": len(t),
+                    "min_time": min((r["min_time"] for r in t), default=None),
+                    "max_time": max((r["max_time"] for r in t), default=None),
+                    "rows": sum(int(r["rows"]) for r in t),
+                    "null_count": sum(int(r["null_count"]) for r in t),
+                    "last_write": max((r["last_write"] for r in t if r["last_write"] is not None
+                                       and pd.notna(r["last_write"])), default=None),
+                    "source": e["source"],
+                    "fingerprint": e["fingerprint"],
+                })
+        df = pd.DataFrame(recs, columns=UNIT_COLUMNS)
+        for col in ("min_time", "max_time", "last_write"):
+            df[col] = pd.to_datetime(df[col])
+        return df.sort_values(["plant", "unit"]).reset_index(drop=True)
+
+    def unit_tags(self, unit: str) -> pd.DataFrame:
+        """Catalog rows of one unit, refreshed if its source changed."""
+        self.refresh([unit])
+        return self.tags(unit)
+
+
+def note_unit_write(processed_dir: Path | str, unit: Optional[str]) -> None:
+    """Writer hook: mark ``unit`` dirty so the next catalog reader folds the write in.
+
+    Only acts when a catalog already exists for ``processed_dir``; a write of
+    an unknown unit marks every unit for re-checking. Cheap (one empty file,
+    no data is read) and best-effort: failures are logged, never raised.
+    """
+    try:
+        root = Path(processed_dir) / CATALOG_DIRNAME
+        if not (root / UNITS_FILE).exists():
+            return
+        dirty = root / DIRTY_DIRNAME
+        dirty.mkdir(exist_ok=True)
+        (dirty / quote(unit or ALL_UNITS, safe="")).touch()
+    except Exception as e:
+        logger.debug(f"Catalog update failed for {unit} in {processed_dir}: {e}")
+
+
+def note_write(parquet_path: Path | str) -> None:
+    """Writer hook for a top-level unit file (unit parsed from the file name)."""
+    path = Path(parquet_path)
+    if not (path.parent / CATALOG_DIRNAME / UNITS_FILE).exists():
+        return
+    from .parquet_database import ParquetDatabase
+
+    token = path.name.split("_")[0] if "_" in path.name else path.name.replace(".parquet", "")
+    note_unit_write(path.parent, ParquetDatabase._normalize_unit_from_token(token))
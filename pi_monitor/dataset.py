@@ -1,6 +1,28 @@
+"""
+Hive-partitioned (plant=/unit=/tag=/year=/month=) Parquet dataset helpers.
+
+Deciding whether a unit read goes to the dataset needs the unit's
+directories (:func:`dataset_units`) and its newest partition file
+(:func:`latest_partition_mtime`), which walks every tag's year/month
+directories. Both answers are cached per *generation*: the mtimes of the
+dataset root and plant directories (units) or of the unit's directories
+(partitions), as in ``file_catalog``. Files added inside existing tag
+partitions do not touch those directories, so :func:`write_dataset`
+invalidates the cache in-process and other processes' writes are picked
+up after at most DATASET_INDEX_TTL_S seconds (default 60).
+"""
+
 from __future__ import annotations
 
+import os
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
+from typing import Any, Iterable, Sequence
+from urllib.parse import unquote
+
+import numpy as np
 import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
@@ -49,4 +71,201 @@ def write_dataset(
         table = pa.Table.from_pandas(df, preserve_index=False)
         pq.write_to_dataset(table, root_path=str(out_dir), partition_cols=partition_cols, compression=compression)
 
+    invalidate_index(out_dir)
     return out_dir
+
+
+def _partition_value(dirname: str) -> tuple[str, str]:
+    """Split a Hive directory name 'key=value' (value URL-decoded)."""
+    key, _, value = dirname.partition("=")
+    return key, unquote(value)
+
+
+def _month_overlaps(year: int, month: int, start: datetime | None, end: datetime | None) -> bool:
+    first = pd.Timestamp(year=year, month=month, day=1)
+    last = first + pd.offsets.MonthBegin(1)  # exclusive
+    if start is not None and last <= pd.Timestamp(start).tz_localize(None):
+        return False
+    if end is not None and first > pd.Timestamp(end).tz_localize(None):
+        return False
+    return True
+
+
+_index_lock = threading.Lock()
+# key -> (generation, checked at (monotonic), answer)
+_units_index: dict[str, tuple[tuple, float, dict[str, list[Path]]]] = {}
+_latest_index: dict[tuple[str, str], tuple[tuple, float, float | None]] = {}
+
+
+def _mtime_ns(path: Path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _index_ttl() -> float:
+    try:
+        return float(os.getenv("DATASET_INDEX_TTL_S", "60"))
+    except ValueError:
+        return 60.0
+
+
+def _cached(index: dict, key: Any, generation: tuple) -> Any:
+    with _index_lock:
+        hit = index.get(key)
+    if hit is not None and hit[0] == generation and time.monotonic() - hit[1] < _index_ttl():
+        return hit
+    return None
+
+
+def invalidate_index(root: Path | None = None) -> None:
+    """Writer hook: forget cached unit/partition answers of ``root`` (all roots when None)."""
+    key = None if root is None else str(Path(root))
+    with _index_lock:
+        for k in [k for k in _units_index if key is None or k == key]:
+            del _units_index[k]
+        for k in [k for k in _latest_index if key is None or k[0] == key]:
+            del _latest_index[k]
+
+
+def dataset_units(root: Path) -> dict[str, list[Path]]:
+    """Map unit -> its ``plant=*/unit=*`` directories in a partitioned dataset (cached per generation)."""
+    root = Path(root)
+    plants = sorted(root.glob("plant=*")) if root.exists() else []
+    generation = (_mtime_ns(root),) + tuple(_mtime_ns(p) for p in plants)
+    hit = _cached(_units_index, str(root), generation)
+    if hit is None:
+        hit = (generation, time.monotonic(), _scan_units(root))
+        with _index_lock:
+            _units_index[str(root)] = hit
+    return {unit: list(dirs) for unit, dirs in hit[2].items()}
+
+
+def _scan_units(root: Path) -> dict[str, list[Path]]:
+    out: dict[str, list[Path]] = {}
+    if not root.exists():
+        return out
+    for plant_dir in root.glob("plant=*"):
+        for unit_dir in plant_dir.glob("unit=*"):
+            _, unit = _partition_value(unit_dir.name)
+            if unit:
+                out.setdefault(unit, []).append(unit_dir)
+    return out
+
+
+def list_partition_files(
+    root: Path,
+    unit: str,
+    *,
+    tags: Iterable[str] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+) -> list[tuple[dict[str, str], Path]]:
+    """Return (partition values, file) pairs for a unit, pruned by tag/year/month.
+
+    Directories are pruned before any file is opened: only the unit's
+    ``unit=`` directories are walked, only requested ``tag=`` directories
+    are entered, and only ``year=/month=`` partitions overlapping
+    [start, end] are listed.
+    """
+    tag_set = set(tags) if tags is not None else None
+    out: list[tuple[dict[str, str], Path]] = []
+    for unit_dir in dataset_units(root).get(unit, []):
+        _, plant = _partition_value(unit_dir.parent.name)
+        for tag_dir in unit_dir.glob("tag=*"):
+            _, tag = _partition_value(tag_dir.name)
+            if tag_set is not None and tag not in tag_set:
+                continue
+            for year_dir in tag_dir.glob("year=*"):
+                try:
+                    year = int(_partition_value(year_dir.name)[1])
+                except ValueError:
+                    continue
+                if start is not None and year < pd.Timestamp(start).year:
+                    continue
+                if end is not None and year > pd.Timestamp(end).year:
+                    continue
+                for month_dir in year_dir.glob("month=*"):
+                    try:
+                        month = int(_partition_value(month_dir.name)[1])
+                    except ValueError:
+                        continue
+                    if not _month_overlaps(year, month, start, end):
+                        continue
+                    values = {"plant": plant, "unit": unit, "tag": tag, "year": str(year), "month": str(month)}
+                    out.extend((values, f) for f in sorted(month_dir.glob("*.parquet")))
+    return out
+
+
+def latest_partition_mtime(root: Path, unit: str) -> float | None:
+    """Newest file mtime in the unit's most recent year/month partitions (cached per generation)."""
+    unit_dirs = dataset_units(root).get(unit, [])
+    generation = tuple((str(d), _mtime_ns(d)) for d in unit_dirs)
+    key = (str(Path(root)), unit)
+    hit = _cached(_latest_index, key, generation)
+    if hit is None:
+        hit = (generation, time.monotonic(), _scan_latest_partition_mtime(unit_dirs))
+        with _index_lock:
+            _latest_index[key] = hit
+    return hit[2]
+
+
+def _scan_latest_partition_mtime(unit_dirs: list[Path]) -> float | None:
+    newest: float | None = None
+    for unit_dir in unit_dirs:
+        for tag_dir in unit_dir.glob("tag=*"):
+            months = []
+            for year_dir in tag_dir.glob("year=*"):
+                for month_dir in year_dir.glob("month=*"):
+                    try:
+                        months.append((int(_partition_value(year_dir.name)[1]), int(_partition_value(month_dir.name)[1]), month_dir))
+                    except ValueError:
+                        continue
+            if not months:
+                continue
+            for f in max(months)[2].glob("*.parquet"):
+                try:
+                    m = f.stat().st_mtime
+                except OSError:
+                    continue
+                newest = m if newest is None else max(newest, m)
+    return newest
+
+
+def read_dataset(
+    root: Path,
+    unit: str,
+    *,
+    tags: Iterable[str] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    columns: Sequence[str] | None = None,
+) -> pa.Table:
+    """Read unit rows from a plant/unit/tag/year/month dataset as an Arrow table.
+
+    Partition values are re-attached as dictionary-encoded plant/unit/tag
+    columns, matching the flat unit files. Rows are time-sorted.
+    """
+    from .parquet_io import DICTIONARY_TYPE, read_window
+
+    file_cols = [c for c in columns if c not in ("plant", "unit", "tag")] if columns else None
+    tables = []
+    for values, path in list_partition_files(root, unit, tags=tags, start=start, end=end):
+        t = read_window(path, start, end, columns=file_cols)
+        t = t.drop_columns([c for c in ("year", "month") if c in t.column_names])
+        n = t.num_rows
+        if n == 0:
+            continue
+        for name in ("plant", "unit", "tag"):
+            if (columns and name not in columns) or name in t.column_names:
+                continue
+            arr = pa.DictionaryArray.from_arrays(pa.array(np.zeros(n, dtype=np.int32)), pa.array([values[name]], type=pa.string()))
+            t = t.append_column(pa.field(name, DICTIONARY_TYPE), arr)
+        tables.append(t)
+    if not tables:
+        return pa.table({"time": pa.array([], type=pa.timestamp("ns")), "value": pa.array([], type=pa.float64())})
+    table = pa.concat_tables(tables, promote_options="permissive")
+    if "time" in table.column_names:
+        table = table.sort_by("time")
+    return table
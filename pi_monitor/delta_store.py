@@ -0,0 +1,289 @@
+"""
+Append-only delta segments for unit master files.
+
+Instead of rewriting a year of history on every refresh, a refresh can
+append a small immutable segment under
+``data/processed/_deltas/<unit>/<seq>.parquet``. Readers overlay the
+segments on top of the unit's base file with last-write-wins on
+(plant, unit, tag, time), and :meth:`DeltaStore.compact` folds the
+segments into the base once a segment-count or size threshold is hit.
+
+Enable for the hourly writers with ``MASTER_STORAGE_MODE=delta``.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+from .parquet_io import read_window, table_to_pandas
+from .tag_manifest import TagManifest, load_or_build, manifest_path_for
+from .data_catalog import note_unit_write
+from .feature_store import note_rows_written
+from .rollups import note_rows_written as note_rollup_rows
+
+logger = logging.getLogger(__name__)
+
+DELTA_DIRNAME = "_deltas"
+DEFAULT_KEYS = ("plant", "unit", "tag", "time")
+
+_compaction_locks: dict[str, threading.Lock] = {}
+_compaction_locks_guard = threading.Lock()
+
+
+def storage_mode() -> str:
+    """Return the configured master storage mode ('rewrite' or 'delta')."""
+    mode = os.getenv("MASTER_STORAGE_MODE", "rewrite").strip().lower()
+    return "delta" if mode in ("delta", "deltas", "append") else "rewrite"
+
+
+def _unit_dirname(unit: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", unit)
+
+
+def default_master_path(processed_dir: Path, unit: str) -> Path:
+    """Conventional master path for a unit (``<unit>_1y_0p1h.parquet``)."""
+    return Path(processed_dir) / f"{unit}_1y_0p1h.parquet"
+
+
+def last_write_wins(frames: Sequence[pd.DataFrame], keys: Sequence[str] = DEFAULT_KEYS) -> pd.DataFrame:
+    """Concatenate frames oldest-first and keep the last row per key."""
+    frames = [f for f in frames if f is not None and not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        out = frames[0]
+    else:
+        out = pd.concat(frames, ignore_index=True)
+    subset = [k for k in keys if k in out.columns]
+    if subset:
+        out = out.drop_duplicates(subset=subset, keep="last")
+    if "time" in out.columns:
+        out = out.sort_values("time", kind="stable")
+    return out.reset_index(drop=True)
+
+
+class DeltaStore:
+    """Immutable per-unit delta segments layered over a base Parquet file."""
+
+    def __init__(self, processed_dir: Path | str):
+        self.processed_dir = Path(processed_dir)
+        self.root = self.processed_dir / DELTA_DIRNAME
+        try:
+            self.max_segments = int(os.getenv("DELTA_COMPACT_MAX_SEGMENTS", "24"))
+        except Exception:
+            self.max_segments = 24
+        try:
+            self.max_bytes = int(float(os.getenv("DELTA_COMPACT_MAX_MB", "64")) * 1024 * 1024)
+        except Exception:
+            self.max_bytes = 64 * 1024 * 1024
+
+    # ---------------------------------------------------------------- layout
+    def unit_dir(self, unit: str) -> Path:
+        return self.root / _unit_dirname(unit)
+
+    def segments(self, unit: str) -> List[Path]:
+        """Segments for ``unit`` in write order (oldest first)."""
+        d = self.unit_dir(unit)
+        if not d.exists():
+            return []
+        return sorted(p for p in d.glob("*.parquet") if not p.name.startswith("."))
+
+    def has_segments(self, unit: str) -> bool:
+        return bool(self.segments(unit))
+
+    # ----------------------------------------------------------------- write
+    def append(self, unit: str, df: pd.DataFrame) -> Optional[Path]:
+        """Write ``df`` as a new immutable segment; cost scales with len(df)."""
+        if df is None or df.empty:
+            return None
+        from .ingest import write_parquet
+
+        d = self.unit_dir(unit)
+        d.mkdir(parents=True, exist_ok=True)
+        # Zero-padded nanosecond stamp keeps lexical order == write order
+        seg = d / f"{time.time_ns():020d}-{os.getpid()}.parquet"
+        frame = df.copy()
+        if "time" in frame.columns:
+            frame["time"] = pd.to_datetime(frame["time"])
+        write_parquet(frame, seg)
+        logger.info(f"Appended delta segment for {unit}: {seg.name} ({len(frame):,} rows)")
+        note_unit_write(self.processed_dir, unit)
+        if "time" in frame.columns:
+            note_rows_written(self.processed_dir, unit, frame["time"].min())
+            note_rollup_rows(self.processed_dir, unit, frame["time"].min())
+        return seg
+
+    # ------------------------------------------------------------------ read
+    def read_deltas(
+        self,
+        unit: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        *,
+        tags: Optional[Iterable[str]] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[pd.DataFrame]:
+        """Window-filtered segment frames, oldest first."""
+        tags = list(tags) if tags is not None else None
+        frames: List[pd.DataFrame] = []
+        for seg in self.segments(unit):
+            try:
+                frames.append(table_to_pandas(read_window(seg, start, end, tags=tags, columns=columns)))
+            except FileNotFoundError:
+                # Folded into the base by a concurrent compaction
+                continue
+            except Exception as e:
+                logger.warning(f"Skipping unreadable delta segment {seg}: {e}")
+        return frames
+
+    def overlay(
+        self,
+        base: pd.DataFrame,
+        unit: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        *,
+        tags: Optional[Iterable[str]] = None,
+        keys: Sequence[str] = DEFAULT_KEYS,
+    ) -> pd.DataFrame:
+        """Merge segments over ``base`` rows with last-write-wins on ``keys``."""
+        columns = list(base.columns) if base is not None and not base.empty else None
+        deltas = self.read_deltas(unit, start, end, tags=tags, columns=columns)
+        if not deltas:
+            return base
+        if base is not None and not base.empty and "time" in base.columns:
+            base = base.copy()
+            base["time"] = pd.to_datetime(base["time"])
+        return last_write_wins([base] + deltas, keys)
+
+    def manifests(self, unit: str) -> List[TagManifest]:
+        """Per-segment tag manifests (used to fold deltas into freshness answers)."""
+        out: List[TagManifest] = []
+        for seg in self.segments(unit):
+            m = load_or_build(seg)
+            if m is not None:
+                out.append(m)
+        return out
+
+    # ------------------------------------------------------------ compaction
+    def needs_compaction(self, unit: str) -> bool:
+        segs = self.segments(unit)
+        if not segs:
+            return False
+        if len(segs) >= self.max_segments:
+            return True
+        total = 0
+        for s in segs:
+            try:
+                total += s.stat().st_size
+            except OSError:
+                pass
+        return total >= self.max_bytes
+
+    def _lock_path(self, unit: str) -> Path:
+        return self.unit_dir(unit) / ".compact.lock"
+
+    def _acquire_file_lock(self, unit: str, stale_after_s: float = 3600.0) -> bool:
+        lock = self._lock_path(unit)
+        try:
+            if lock.exists() and (time.time() - lock.stat().st_mtime) > stale_after_s:
+                lock.unlink(missing_ok=True)
+        except OSError:
+            pass
+        try:
+            fd = os.open(str(lock), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(fd, str(os.getpid()).encode())
+            os.close(fd)
+            return True
+        except FileExistsError:
+            return False
+
+    def compact(
+        self,
+        unit: str,
+        base_path: Optional[Path] = None,
+        *,
+        force: bool = False,
+        keys: Sequence[str] = DEFAULT_KEYS,
+        write_dedup: bool = True,
+    ) -> Optional[Path]:
+        """Fold the current segments into the unit's base file.
+
+        Only the segments present when compaction starts are folded and
+        removed, so appends that race with compaction are preserved.
+        Returns the base path, or None when nothing was compacted.
+        """
+        from .ingest import write_parquet
+
+        if not force and not self.needs_compaction(unit):
+            return None
+        with _compaction_locks_guard:
+            thread_lock = _compaction_locks.setdefault(unit, threading.Lock())
+        if not thread_lock.acquire(blocking=False):
+            return None
+        try:
+            self.unit_dir(unit).mkdir(parents=True, exist_ok=True)
+            if not self._acquire_file_lock(unit):
+                logger.info(f"Compaction for {unit} already running elsewhere; skipping")
+                return None
+            try:
+                segs = self.segments(unit)
+                if not segs:
+                    return None
+                base_path = Path(base_path) if base_path else default_master_path(self.processed_dir, unit)
+                dedup_path = base_path.parent / (base_path.stem + ".dedup.parquet")
+                # Fall back to the dedup copy when only that one exists
+                source = base_path if base_path.exists() else dedup_path
+                frames: List[pd.DataFrame] = []
+                if source.exists():
+                    base = pd.read_parquet(source)
+                    if "time" in base.columns:
+                        base["time"] = pd.to_datetime(base["time"])
+                    frames.append(base)
+                for seg in segs:
+                    frames.append(pd.read_parquet(seg))
+                combined = last_write_wins(frames, keys)
+                del frames
+
+                write_parquet(combined, base_path)
+                if write_dedup:
+                    write_parquet(combined, dedup_path)
+                for seg in segs:
+                    try:
+                        seg.unlink(missing_ok=True)
+                        manifest_path_for(seg).unlink(missing_ok=True)
+                    except OSError as e:
+                        logger.warning(f"Could not remove compacted segment {seg}: {e}")
+                logger.info(f"Compacted {len(segs)} delta segment(s) into {base_path.name} ({len(combined):,} rows)")
+                return base_path
+            finally:
+                try:
+                    self._lock_path(unit).unlink(missing_ok=True)
+                except OSError:
+                    pass
+        finally:
+            thread_lock.release()
+
+    def compact_in_background(self, unit: str, base_path: Optional[Path] = None) -> Optional[threading.Thread]:
+        """Start a daemon compaction thread if the unit crossed a threshold."""
+        if not self.needs_compaction(unit):
+            return None
+
+        def _run() -> None:
+            try:
+                self.compact(unit, base_path)
+            except Exception as e:
+                logger.error(f"Background compaction failed for {unit}: {e}")
+
+        t = threading.Thread(target=_run, name=f"compact-{unit}", daemon=True)
+        t.start()
+        return t
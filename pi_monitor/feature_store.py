@@ -0,0 +1,390 @@
+"""
+Materialized wide (time x tag) feature matrices per unit.
+
+The multivariate detectors (MTD, Isolation Forest) and their tuning scripts
+all start from the same matrix: long-format rows resampled to a fixed rule
+(hourly, 6-minute) with one column per tag holding the bucket mean. The
+store keeps that matrix as Parquet under
+``data/processed/features/<unit>/<rule>.parquet`` (a ``time`` column plus
+one float64 column per tag) and maintains it incrementally: after a
+refresh only buckets that closed since the last update are computed from
+the new long rows and added. The bucket that is still open is never
+stored; readers get it computed live from the unit data.
+
+Rows can also land in buckets that are already stored (a lagging tag
+catching up, a delta segment overwriting values, a backfill). Writers
+report the earliest time they wrote, either directly to
+:meth:`FeatureStore.update` (``changed_from``) or through the
+:func:`note_rows_written` hook, which leaves a small ``<rule>.changed``
+marker next to each store. The next update recomputes every bucket from
+that time on; until then readers can see the pending change through
+:meth:`FeatureStore.pending_change` and pivot the long rows instead.
+
+Stores are created by the first :meth:`FeatureStore.get_unit_feature_matrix`
+call with ``update=True`` for a (unit, rule) pair (e.g. the optimizer
+scripts); refresh code calls :meth:`FeatureStore.update_existing` to keep
+every existing store current. Detection reads with ``update=False``.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+FEATURES_DIRNAME = "features"
+CHANGED_SUFFIX = ".changed"
+
+Window = Union[None, str, pd.Timedelta, Tuple[Any, Any]]
+
+
+def _history_days() -> int:
+    return int(os.getenv("FEATURE_STORE_HISTORY_DAYS", "400"))
+
+
+def _build_chunk_days() -> int:
+    return max(1, int(os.getenv("FEATURE_STORE_BUILD_CHUNK_DAYS", "31")))
+
+
+def _rule_token(rule: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", rule.strip()) or "h"
+
+
+def _unit_token(unit: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", unit)
+
+
+def _read_mark(path: Path) -> Optional[pd.Timestamp]:
+    try:
+        return pd.Timestamp(path.read_text().strip())
+    except Exception:
+        return None
+
+
+def _merge_mark(path: Path, earliest: pd.Timestamp) -> None:
+    """Lower the time recorded in ``path`` to ``earliest`` (never raise it)."""
+    current = _read_mark(path)
+    if current is not None and current <= earliest:
+        return
+    tmp = path.with_name(path.name + f".tmp-{os.getpid()}")
+    tmp.write_text(earliest.isoformat())
+    os.replace(tmp, path)
+
+
+def _clear_mark(path: Path, seen: Optional[pd.Timestamp]) -> None:
+    """Drop the marker unless a writer lowered it after ``seen`` was read."""
+    if seen is None:
+        return
+    current = _read_mark(path)
+    if current is not None and current >= seen:
+        path.unlink(missing_ok=True)
+
+
+def _earliest_naive(earliest: Any) -> Optional[pd.Timestamp]:
+    from .tag_manifest import _naive_local
+
+    ts = _naive_local(pd.Series([earliest])).iloc[0]
+    return None if pd.isna(ts) else pd.Timestamp(ts)
+
+
+def note_rows_written(processed_dir: Union[Path, str], unit: Optional[str], earliest: Any) -> None:
+    """Writer hook: mark the stores of ``unit`` stale from ``earliest`` on.
+
+    Only acts when ``unit`` already has stores; each gets (or lowers) its
+    ``<rule>.changed`` marker. Cheap (no data is read) and best-effort:
+    failures are logged, never raised.
+    """
+    try:
+        if not unit or earliest is None:
+            return
+        unit_dir = Path(processed_dir) / FEATURES_DIRNAME / _unit_token(unit)
+        if not unit_dir.exists():
+            return
+        ts = _earliest_naive(earliest)
+        if ts is None:
+            return
+        for store in unit_dir.glob("*.parquet"):
+            _merge_mark(store.with_suffix(CHANGED_SUFFIX), ts)
+    except Exception as e:
+        logger.debug(f"Feature store marker failed for {unit} in {processed_dir}: {e}")
+
+
+def pivot_mean(df: pd.DataFrame, rule: str, tags: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Bucket means per tag as a wide frame indexed by bucket start ('time').
+
+    Same bucket means as ``df.set_index('time').groupby('tag').resample(rule)['value']
+    .mean().unstack(level=0)``, computed with one flooring pass and a single
+    grouped mean. It is not an exact drop-in for that frame: the index spans
+    every bucket between the overall first and last bucket (the resample
+    version only spans each tag's own range, so all-NaN rows outside every
+    tag's range differ), columns are sorted and float64, and rows whose time
+    or tag is missing are dropped.
+    """
+    if df is None or df.empty or not {"time", "tag", "value"}.issubset(df.columns):
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="time"))
+    times = df["time"]
+    if not pd.api.types.is_datetime64_any_dtype(times):
+        times = pd.to_datetime(times, errors="coerce")
+    tag = df["tag"]
+    if isinstance(tag.dtype, pd.CategoricalDtype):
+        tag = tag.astype(str)
+    frame = pd.DataFrame({
+        "time": times.dt.floor(rule),
+        "tag": tag,
+        "value": pd.to_numeric(df["value"], errors="coerce"),
+    })
+    frame = frame.dropna(subset=["time", "tag"])
+    if tags is not None:
+        frame = frame[frame["tag"].isin(list(tags))]
+    if frame.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="time"))
+    wide = frame.groupby(["time", "tag"], sort=False)["value"].mean().unstack("tag")
+    wide = wide.sort_index()
+    full = pd.date_range(wide.index.min(), wide.index.max(), freq=rule, name="time")
+    wide = wide.reindex(full)
+    wide.columns.name = None
+    return wide[sorted(wide.columns)].astype("float64")
+
+
+class FeatureStore:
+    """Per-unit wide feature matrices backed by Parquet."""
+
+    def __init__(self, db: Any):
+        # db: ParquetDatabase (kept untyped to avoid an import cycle)
+        self.db = db
+        self.root = Path(db.processed_dir) / FEATURES_DIRNAME
+
+    # ---------------------------------------------------------------- paths
+    def path_for(self, unit: str, rule: str) -> Path:
+        return self.root / _unit_token(unit) / f"{_rule_token(rule)}.parquet"
+
+    def pending_change(self, unit: str, rule: str) -> Optional[pd.Timestamp]:
+        """Earliest time written since the (unit, rule) store was last updated, if any."""
+        return _read_mark(self.path_for(unit, rule).with_suffix(CHANGED_SUFFIX))
+
+    def existing_rules(self, unit: str) -> List[str]:
+        """Rules that already have a store for ``unit`` (read from file metadata)."""
+        unit_dir = self.root / _unit_token(unit)
+        rules: List[str] = []
+        for p in sorted(unit_dir.glob("*.parquet")) if unit_dir.exists() else []:
+            try:
+                meta = pq.read_schema(p).metadata or {}
+                rule = meta.get(b"feature_rule")
+                if rule:
+                    rules.append(rule.decode())
+            except Exception:
+                continue
+        return rules
+
+    # --------------------------------------------------------------- state
+    def _bounds(self, path: Path) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+        """First/last stored bucket from the row-group statistics of ``time``."""
+        if not path.exists():
+            return None, None
+        try:
+            pf = pq.ParquetFile(str(path))
+            idx = pf.schema_arrow.get_field_index("time")
+            lo = hi = None
+            for i in range(pf.metadata.num_row_groups):
+                st = pf.metadata.row_group(i).column(idx).statistics
+                if st is None or not st.has_min_max:
+                    raise ValueError("no statistics")
+                lo = pd.Timestamp(st.min) if lo is None else min(lo, pd.Timestamp(st.min))
+                hi = pd.Timestamp(st.max) if hi is None else max(hi, pd.Timestamp(st.max))
+            return lo, hi
+        except Exception:
+            t = pd.read_parquet(path, columns=["time"])["time"]
+            return (t.min(), t.max()) if len(t) else (None, None)
+
+    def _coverage_start(self, path: Path, first: Optional[pd.Timestamp]) -> Optional[pd.Timestamp]:
+        """Start of the span the store was built for (may precede the first bucket with data)."""
+        try:
+            raw = (pq.read_schema(path).metadata or {}).get(b"feature_from")
+            if raw:
+                return pd.Timestamp(raw.decode())
+        except Exception:
+            pass
+        return first
+
+    def _latest_data_time(self, unit: str) -> Optional[pd.Timestamp]:
+        latest = self.db.get_latest_timestamp(unit)
+        return pd.Timestamp(latest) if latest is not None and not pd.isna(latest) else None
+
+    def _write(self, path: Path, wide: pd.DataFrame, rule: str, covered_from: pd.Timestamp) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        out = wide.reset_index()
+        table = pa.Table.from_pandas(out, preserve_index=False)
+        meta = dict(table.schema.metadata or {})
+        meta[b"feature_rule"] = rule.encode()
+        meta[b"feature_from"] = covered_from.isoformat().encode()
+        meta[b"feature_updated"] = datetime.now().isoformat().encode()
+        table = table.replace_schema_metadata(meta)
+        tmp = path.with_name(path.name + f".tmp-{os.getpid()}")
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, path)
+
+    # -------------------------------------------------------------- update
+    def update(
+        self,
+        unit: str,
+        rule: str = "h",
+        *,
+        since: Optional[datetime] = None,
+        changed_from: Optional[datetime] = None,
+    ) -> int:
+        """Add the buckets of ``unit`` that closed since the last update.
+
+        ``since`` extends the store backwards (rebuilding it) when it starts
+        before the first stored bucket. Stored buckets from ``changed_from``
+        (or a pending :func:`note_rows_written` marker, whichever is earlier)
+        on are recomputed. Returns the number of buckets written.
+        """
+        path = self.path_for(unit, rule)
+        mark_path = path.with_suffix(CHANGED_SUFFIX)
+        marked = _read_mark(mark_path)
+        dirty = [t for t in (marked, _earliest_naive(changed_from) if changed_from is not None else None)
+                 if t is not None]
+        dirty_from = min(dirty).floor(rule) if dirty else None
+        latest = self._latest_data_time(unit)
+        if latest is None:
+            return 0
+        # The bucket containing the newest sample is still open
+        closed_end = latest.floor(rule)
+        first, last = self._bounds(path)
+        covered = self._coverage_start(path, first) if first is not None else None
+
+        rebuild = first is None or (since is not None and pd.Timestamp(since).floor(rule) < covered)
+        if rebuild:
+            start = pd.Timestamp(since) if since is not None else latest - pd.Timedelta(days=_history_days())
+            start = start.floor(rule)
+        else:
+            start = last + pd.tseries.frequencies.to_offset(rule)
+            if dirty_from is not None and dirty_from < start:
+                # Rows landed in stored buckets; recompute them
+                start = max(dirty_from, covered)
+        if start >= closed_end:
+            _clear_mark(mark_path, marked)
+            return 0
+
+        # Read the long rows in bounded chunks so a first build over a year
+        # of history never holds more than one chunk of raw rows
+        chunk = pd.Timedelta(days=_build_chunk_days())
+        parts = []
+        lo = start
+        while lo < closed_end:
+            hi = min(lo + chunk, closed_end)
+            long_df = self.db.get_unit_data(unit, start_time=lo.to_pydatetime(), end_time=hi.to_pydatetime())
+            if long_df is not None and not long_df.empty:
+                long_df = long_df[pd.to_datetime(long_df["time"]) < hi]
+                part = pivot_mean(long_df, rule)
+                if not part.empty:
+                    parts.append(part)
+            lo = hi
+        if not parts:
+            _clear_mark(mark_path, marked)
+            return 0
+        new = pd.concat(parts)
+        new = new.reindex(pd.date_range(new.index.min(), new.index.max(), freq=rule, name="time"))
+        new = new[sorted(new.columns)]
+
+        if rebuild:
+            wide = new
+        else:
+            old = pd.read_parquet(path).set_index("time")
+            wide = pd.concat([old, new])
+            wide = wide[~wide.index.duplicated(keep="last")].sort_index()
+            wide = wide.reindex(pd.date_range(wide.index.min(), wide.index.max(), freq=rule, name="time"))
+            wide = wide[sorted(wide.columns)]
+        keep_from = closed_end - pd.Timedelta(days=_history_days())
+        if since is not None:
+            keep_from = min(keep_from, pd.Timestamp(since).floor(rule))
+        wide = wide[wide.index >= keep_from]
+        covered_from = start if rebuild else max(covered, keep_from)
+        self._write(path, wide, rule, covered_from)
+        _clear_mark(mark_path, marked)
+        logger.info(f"Feature store {unit}/{rule}: +{len(new)} bucket(s), {len(wide)} total")
+        return len(new)
+
+    def update_existing(self, unit: str, changed_from: Optional[datetime] = None) -> int:
+        """Bring every existing store of ``unit`` up to date (refresh hook).
+
+        ``changed_from`` is the earliest time of the rows just written.
+        """
+        added = 0
+        for rule in self.existing_rules(unit):
+            try:
+                added += self.update(unit, rule, changed_from=changed_from)
+            except Exception as e:
+                logger.warning(f"Feature store update failed for {unit}/{rule}: {e}")
+        return added
+
+    # ---------------------------------------------------------------- read
+    def get_unit_feature_matrix(
+        self,
+        unit: str,
+        rule: str = "h",
+        window: Window = None,
+        *,
+        tags: Optional[Iterable[str]] = None,
+        include_open: bool = True,
+        update: bool = True,
+    ) -> pd.DataFrame:
+        """Wide matrix (index 'time', one column per tag) for ``unit`` at ``rule``.
+
+        ``window`` is a lookback ending at the newest data ('90D' or a
+        Timedelta), an explicit (start, end) pair, or None for everything
+        stored. The still-open bucket is appended live unless
+        ``include_open`` is False.
+        """
+        start = end = None
+        latest = None
+        if isinstance(window, tuple):
+            start, end = (pd.Timestamp(w) if w is not None else None for w in window)
+        elif window is not None:
+            latest = self._latest_data_time(unit)
+            if latest is None:
+                return pd.DataFrame(index=pd.DatetimeIndex([], name="time"))
+            start = latest - pd.Timedelta(window)
+
+        if update:
+            self.update(unit, rule, since=start.to_pydatetime() if start is not None else None)
+
+        path = self.path_for(unit, rule)
+        if path.exists():
+            filters = []
+            if start is not None:
+                filters.append(("time", ">=", start.floor(rule).to_pydatetime()))
+            if end is not None:
+                filters.append(("time", "<=", end.to_pydatetime()))
+            columns = None
+            if tags is not None:
+                names = set(pq.read_schema(path).names)
+                columns = ["time"] + [t for t in tags if t in names]
+            stored = pd.read_parquet(path, columns=columns, filters=filters or None).set_index("time")
+        else:
+            stored = pd.DataFrame(index=pd.DatetimeIndex([], name="time"))
+
+        if include_open and (end is None or stored.empty or end > stored.index.max()):
+            last = stored.index.max() if not stored.empty else None
+            tail_start = last + pd.tseries.frequencies.to_offset(rule) if last is not None else start
+            if tail_start is not None:
+                tail = self.db.get_unit_data(
+                    unit,
+                    start_time=tail_start.to_pydatetime(),
+                    end_time=end.to_pydatetime() if end is not None else None,
+                )
+                live = pivot_mean(tail, rule, tags=tags)
+                if not live.empty:
+                    stored = pd.concat([stored, live[live.index >= tail_start]]) if not stored.empty else live
+                    stored = stored[sorted(stored.columns)]
+        stored.index.name = "time"
+        return stored
@@ -0,0 +1,172 @@
+"""
+In-process catalog of the Parquet files in a processed directory.
+
+Unit and tag reads used to glob ``data/processed`` on every call, re-run
+the temp-file heuristics and stat each candidate. The catalog lists the
+directory once per *generation* -- identified by the directory's own
+mtime, which changes whenever a file is created, renamed over or removed --
+and keeps the size/mtime of every file. Unit lookups are then answered
+from a dictionary.
+
+Writers call :func:`refresh` after they publish a file, which also covers
+in-place appends (those do not bump the directory mtime).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    path: Path
+    size: int
+    mtime: float
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+
+class FileCatalog:
+    """Cached top-level ``*.parquet`` listing of one directory."""
+
+    def __init__(self, directory: Path | str, suffix: str = ".parquet"):
+        self.directory = Path(directory)
+        self.suffix = suffix
+        self.scans = 0
+        self._lock = threading.RLock()
+        self._generation: Optional[int] = None
+        self._entries: Dict[str, CatalogEntry] = {}
+        self._by_unit: Dict[str, List[CatalogEntry]] = {}
+
+    # ------------------------------------------------------------ generation
+    def _current_generation(self) -> Optional[int]:
+        try:
+            return self.directory.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _ensure(self) -> None:
+        gen = self._current_generation()
+        with self._lock:
+            if self._generation is not None and gen == self._generation:
+                return
+            self._scan(gen)
+
+    def _scan(self, gen: Optional[int]) -> None:
+        entries: Dict[str, CatalogEntry] = {}
+        if gen is not None:
+            try:
+                with os.scandir(self.directory) as it:
+                    for de in it:
+                        if not de.name.endswith(self.suffix):
+                            continue
+                        try:
+                            if not de.is_file():
+                                continue
+                            st = de.stat()
+                        except OSError:
+                            continue
+                        entries[de.name] = CatalogEntry(Path(de.path), int(st.st_size), float(st.st_mtime))
+            except OSError:
+                pass
+        self._entries = entries
+        self._by_unit = {}
+        # A missing directory is rescanned on the next call
+        self._generation = gen
+        self.scans += 1
+
+    # --------------------------------------------------------------- queries
+    def entries(self) -> List[CatalogEntry]:
+        """All catalogued files, sorted by name."""
+        self._ensure()
+        with self._lock:
+            return [self._entries[k] for k in sorted(self._entries)]
+
+    def files(self) -> List[Path]:
+        return [e.path for e in self.entries()]
+
+    def unit_entries(self, unit: str) -> List[CatalogEntry]:
+        """Files named ``<unit>_*`` (the unit file naming convention)."""
+        self._ensure()
+        with self._lock:
+            hit = self._by_unit.get(unit)
+            if hit is None:
+                prefix = f"{unit}_"
+                hit = [e for k, e in sorted(self._entries.items()) if k.startswith(prefix)]
+                self._by_unit[unit] = hit
+            return list(hit)
+
+    def matching(self, substrings: Iterable[str]) -> List[CatalogEntry]:
+        """Files whose name contains any of ``substrings``."""
+        subs = [s for s in dict.fromkeys(substrings) if s]
+        self._ensure()
+        with self._lock:
+            return [e for k, e in sorted(self._entries.items()) if any(s in k for s in subs)]
+
+    def get(self, name: str) -> Optional[CatalogEntry]:
+        self._ensure()
+        with self._lock:
+            return self._entries.get(name)
+
+    # ---------------------------------------------------------- invalidation
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation = None
+
+    def refresh(self, path: Path | str | None = None) -> None:
+        """Pick up a published file (or, without ``path``, the whole directory)."""
+        if path is None:
+            self.invalidate()
+            return
+        p = Path(path)
+        if not p.name.endswith(self.suffix):
+            return
+        with self._lock:
+            if self._generation is None or self._current_generation() != self._generation:
+                self._generation = None
+                return
+            try:
+                st = p.stat()
+            except OSError:
+                self._entries.pop(p.name, None)
+            else:
+                self._entries[p.name] = CatalogEntry(self.directory / p.name, int(st.st_size), float(st.st_mtime))
+            self._by_unit = {}
+
+
+_CATALOGS: Dict[str, FileCatalog] = {}
+_CATALOGS_LOCK = threading.Lock()
+
+
+def _key(directory: Path | str) -> str:
+    return os.path.normcase(os.path.abspath(str(directory)))
+
+
+def catalog_for(directory: Path | str) -> FileCatalog:
+    """Return the process-wide catalog for ``directory``."""
+    key = _key(directory)
+    with _CATALOGS_LOCK:
+        cat = _CATALOGS.get(key)
+        if cat is None:
+            cat = FileCatalog(directory)
+            _CATALOGS[key] = cat
+        return cat
+
+
+def refresh(path: Path | str) -> None:
+    """Writer hook: call after publishing ``path`` (a file or a directory)."""
+    p = Path(path)
+    if p.is_dir():
+        cat = _CATALOGS.get(_key(p))
+        if cat is not None:
+            cat.invalidate()
+        return
+    cat = _CATALOGS.get(_key(p.parent))
+    if cat is not None:
+        cat.refresh(p)
@@ -0,0 +1,310 @@
+"""
+Fleet-wide data freshness in one pass.
+
+``ParquetAutoScanner.scan_all_units`` used to call
+``get_data_freshness_info`` per unit, which aggregated the unit file and
+then loaded it again for the per-tag 50% rule -- two reads per unit, one unit
+after another. :class:`FreshnessSnapshot` computes, for every unit at once:
+
+- latest/earliest timestamp and total row count,
+- per-tag latest timestamp (distinct tags, fresh tags, fresh-tag ratio),
+
+from the per-tag manifest sidecars where they are current (file metadata,
+no data read) and otherwise from a single ``time``/``tag`` column scan.
+Units are processed in parallel (FRESHNESS_WORKERS threads).
+
+:meth:`FreshnessSnapshot.current` returns a process-wide snapshot that is
+reused until the processed files change or FRESHNESS_SNAPSHOT_TTL_S seconds
+pass, so the scanner, refresh scripts, the container API and the freshness
+monitor can all ask for it without rescanning.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+logger = logging.getLogger(__name__)
+
+# A unit is fresh when at least this share of its tags is fresh
+FRESH_TAG_RATIO = 0.5
+
+
+def default_max_age_hours() -> float:
+    try:
+        return float(os.getenv("MAX_AGE_HOURS", "1.0"))
+    except ValueError:
+        return 1.0
+
+
+def _workers() -> int:
+    return max(1, int(os.getenv("FRESHNESS_WORKERS", str(min(8, (os.cpu_count() or 2))))))
+
+
+def _ttl_seconds() -> float:
+    return float(os.getenv("FRESHNESS_SNAPSHOT_TTL_S", "60"))
+
+
+@dataclass
+class UnitFreshness:
+    """Freshness of one unit at snapshot time."""
+
+    unit: str
+    taken_at: datetime
+    max_age_hours: float
+    total_records: int = 0
+    latest: Optional[pd.Timestamp] = None
+    earliest: Optional[pd.Timestamp] = None
+    tag_latest: Dict[str, pd.Timestamp] = field(default_factory=dict)
+    source: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def tag_count(self) -> int:
+        return len(self.tag_latest)
+
+    @property
+    def fresh_tag_count(self) -> int:
+        cutoff = self.taken_at - timedelta(hours=self.max_age_hours)
+        return sum(1 for t in self.tag_latest.values() if t is not None and t > cutoff)
+
+    @property
+    def fresh_ratio(self) -> float:
+        return self.fresh_tag_count / self.tag_count if self.tag_count else 0.0
+
+    def active_tag_count(self, days: float = 90.0) -> int:
+        """Tags with data in the last ``days`` days."""
+        cutoff = self.taken_at - timedelta(days=days)
+        return sum(1 for t in self.tag_latest.values() if t is not None and t > cutoff)
+
+    @property
+    def data_age_hours(self) -> Optional[float]:
+        if self.latest is None:
+            return None
+        # Unit files store naive local timestamps
+        return (self.taken_at - self.latest).total_seconds() / 3600
+
+    @property
+    def date_range_days(self) -> Optional[float]:
+        if self.latest is None or self.earliest is None:
+            return None
+        return (self.latest - self.earliest).total_seconds() / (24 * 3600)
+
+    @property
+    def is_empty(self) -> bool:
+        return self.total_records == 0
+
+    @property
+    def is_stale(self) -> bool:
+        """Stale unless at least FRESH_TAG_RATIO of the tags are fresh."""
+        if not self.tag_latest:
+            age = self.data_age_hours
+            return age is None or age > self.max_age_hours
+        return self.fresh_ratio < FRESH_TAG_RATIO
+
+    def to_info(self) -> Dict[str, Any]:
+        """Same shape as ``ParquetDatabase.get_data_freshness_info(unit)``."""
+        return {
+            "unit": self.unit,
+            "tag": None,
+            "total_records": self.total_records,
+            "latest_timestamp": self.latest,
+            "earliest_timestamp": self.earliest,
+            "data_age_hours": self.data_age_hours,
+            "is_stale": self.is_stale,
+            "unique_tags": sorted(self.tag_latest),
+            "date_range_days": self.date_range_days,
+            "fresh_tag_count": self.fresh_tag_count,
+            "total_tag_count": self.tag_count,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-friendly summary (API responses, status files)."""
+        age = self.data_age_hours
+        return {
+            "unit": self.unit,
+            "fresh": not self.is_empty and not self.is_stale,
+            "records": self.total_records,
+            "age_hours": round(age, 3) if age is not None else None,
+            "latest_timestamp": self.latest.isoformat() if self.latest is not None else None,
+            "earliest_timestamp": self.earliest.isoformat() if self.earliest is not None else None,
+            "tags": self.tag_count,
+            "fresh_tags": self.fresh_tag_count,
+            "fresh_ratio": round(self.fresh_ratio, 4),
+            "source": self.source,
+            "error": self.error,
+        }
+
+
+def _from_table(uf: UnitFreshness, table: pa.Table) -> UnitFreshness:
+    """Fill ``uf`` from a (time, tag) table with one grouped aggregation."""
+    uf.total_records = int(table.num_rows)
+    if table.num_rows == 0 or "time" not in table.column_names:
+        return uf
+    times = table.column("time")
+    if not pa.types.is_timestamp(times.type):
+        table = table.set_column(table.column_names.index("time"), "time", pc.cast(times, pa.timestamp("ns")))
+    if "tag" in table.column_names:
+        tag = table.column("tag")
+        if pa.types.is_dictionary(tag.type):
+            table = table.set_column(table.column_names.index("tag"), "tag", pc.cast(tag, pa.string()))
+        agg = table.group_by("tag").aggregate([("time", "min"), ("time", "max")]).to_pandas()
+        agg = agg[agg["tag"].notna()]
+        uf.tag_latest = {str(t): pd.Timestamp(v) for t, v in zip(agg["tag"], agg["time_max"]) if pd.notna(v)}
+        if not agg.empty:
+            uf.earliest = pd.Timestamp(agg["time_min"].min())
+            uf.latest = pd.Timestamp(agg["time_max"].max())
+            return uf
+    mm = pc.min_max(table.column("time")).as_py()
+    uf.earliest = pd.Timestamp(mm["min"]) if mm["min"] is not None else None
+    uf.latest = pd.Timestamp(mm["max"]) if mm["max"] is not None else None
+    return uf
+
+
+def unit_freshness(db: Any, unit: str, *, max_age_hours: Optional[float] = None,
+                   taken_at: Optional[datetime] = None) -> UnitFreshness:
+    """Freshness of one unit: manifest sidecar if current, else one column scan."""
+    uf = UnitFreshness(
+        unit=unit,
+        taken_at=taken_at or datetime.now(),
+        max_age_hours=default_max_age_hours() if max_age_hours is None else max_age_hours,
+    )
+    try:
+        manifest = db._unit_manifest(unit)
+        if manifest is not None:
+            uf.total_records = manifest.total_rows
+            uf.latest = manifest.latest()
+            uf.earliest = manifest.earliest()
+            uf.tag_latest = manifest.tag_latest()
+            uf.source = "manifest"
+            return uf
+        # Partitioned dataset or files without a usable manifest
+        table = db.get_unit_data_arrow(unit, columns=["time", "tag"])
+        uf.source = "scan"
+        return _from_table(uf, table)
+    except Exception as e:
+        logger.warning(f"Freshness check failed for {unit}: {e}")
+        uf.error = str(e)
+        return uf
+
+
+class FreshnessSnapshot:
+    """Freshness of every unit, computed in one parallel pass."""
+
+    # Shared snapshots for current(), keyed by (processed dir, max age)
+    _current: Dict[tuple, "FreshnessSnapshot"] = {}
+    _current_lock = threading.Lock()
+
+    def __init__(self, units: Dict[str, UnitFreshness], taken_at: datetime, max_age_hours: float):
+        self.units = units
+        self.taken_at = taken_at
+        self.max_age_hours = max_age_hours
+        self.fingerprint: Any = None
+        self.built_monotonic = time.monotonic()
+
+    @classmethod
+    def build(
+        cls,
+        db: Any,
+        units: Optional[List[str]] = None,
+        *,
+        max_age_hours: Optional[float] = None,
+        workers: Optional[int] = None,
+    ) -> "FreshnessSnapshot":
+        """Compute freshness for ``units`` (default: all units of ``db``)."""
+        max_age = default_max_age_hours() if max_age_hours is None else max_age_hours
+        units = list(units) if units is not None else db.get_all_units()
+        taken_at = datetime.now()
+        n = min(workers or _workers(), max(1, len(units)))
+        start = time.perf_counter()
+        if n == 1:
+            results = [unit_freshness(db, u, max_age_hours=max_age, taken_at=taken_at) for u in units]
+        else:
+            with ThreadPoolExecutor(max_workers=n) as ex:
+                results = list(ex.map(
+                    lambda u: unit_freshness(db, u, max_age_hours=max_age, taken_at=taken_at), units
+                ))
+        snap = cls({r.unit: r for r in results}, taken_at, max_age)
+        logger.info(f"Freshness snapshot: {len(units)} unit(s) in {time.perf_counter() - start:.2f}s "
+                    f"({n} worker(s))")
+        return snap
+
+    # ------------------------------------------------------------- sharing
+    @staticmethod
+    def _fingerprint(db: Any) -> tuple:
+        """Changes whenever a unit file or delta segment is written."""
+        files = tuple((e.name, e.size, e.mtime) for e in db.catalog.entries())
+        deltas = []
+        try:
+            if db.deltas.root.exists():
+                deltas = [(p.name, p.stat().st_mtime_ns) for p in sorted(db.deltas.root.iterdir())]
+        except OSError:
+            pass
+        return files, tuple(deltas)
+
+    @classmethod
+    def current(
+        cls,
+        db: Any,
+        *,
+        max_age_hours: Optional[float] = None,
+        ttl_seconds: Optional[float] = None,
+    ) -> "FreshnessSnapshot":
+        """Process-wide snapshot for ``db``, rebuilt when files change or the TTL expires."""
+        max_age = default_max_age_hours() if max_age_hours is None else max_age_hours
+        ttl = _ttl_seconds() if ttl_seconds is None else ttl_seconds
+        key = (str(db.processed_dir), max_age)
+        fp = cls._fingerprint(db)
+        with cls._current_lock:
+            snap = cls._current.get(key)
+            if snap is not None and snap.fingerprint == fp and time.monotonic() - snap.built_monotonic < ttl:
+                return snap
+        snap = cls.build(db, max_age_hours=max_age)
+        snap.fingerprint = fp
+        with cls._current_lock:
+            cls._current[key] = snap
+        return snap
+
+    @classmethod
+    def invalidate(cls) -> None:
+        with cls._current_lock:
+            cls._current.clear()
+
+    # ------------------------------------------------------------- queries
+    def get(self, unit: str) -> Optional[UnitFreshness]:
+        return self.units.get(unit)
+
+    def __contains__(self, unit: str) -> bool:
+        return unit in self.units
+
+    def __iter__(self) -> Iterator[UnitFreshness]:
+        return iter(self.units.values())
+
+    def __len__(self) -> int:
+        return len(self.units)
+
+    def empty_units(self) -> List[str]:
+        return [u.unit for u in self if u.is_empty]
+
+    def stale_units(self) -> List[str]:
+        return [u.unit for u in self if not u.is_empty and u.is_stale]
+
+    def fresh_units(self) -> List[str]:
+        return [u.unit for u in self if not u.is_empty and not u.is_stale]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "taken_at": self.taken_at.isoformat(),
+            "max_age_hours": self.max_age_hours,
+            "units": {u.unit: u.to_dict() for u in self},
+        }
@@ -152,11 +152,12 @@ def _sigma_2p5_candidates(df: pd.DataFrame) -> Tuple[Set[pd.Timestamp], Dict[str
         grouped = _ensure_datetime(grouped)
 
         # SHUTDOWN DETECTION DISABLED - was causing false positives
-        # Use all data for cleaner, more accurate detection
-        grouped_running = grouped.copy()
+        # Use all data for cleaner, more accurate detection (no extra copy:
+        # 'grouped' is already a fresh frame from the selection above)
+        grouped_running = grouped
 
         # Using groupby to compute mean/std ON ALL DATA
-        stats = grouped_running.groupby('tag')['value'].agg(['mean', 'std'])
+        stats = grouped_running.groupby('tag', observed=True)['value'].agg(['mean', 'std'])
         stats = stats.replace({np.nan: 0.0})
 
         # Join to compute z-scores efficiently
@@ -176,8 +177,8 @@ def _sigma_2p5_candidates(df: pd.DataFrame) -> Tuple[Set[pd.Timestamp], Dict[str
             candidate_times = set(times.dt.tz_convert(None) if times.dt.tz is not None else times)
 
             # Per-tag counts and rates
-            counts = cand_rows.groupby('tag').size()
-            totals = grouped.groupby('tag').size()
+            counts = cand_rows.groupby('tag', observed=True).size()
+            totals = grouped.groupby('tag', observed=True).size()
             for tag, cnt in counts.items():
                 total = int(totals.get(tag, 0)) or 1
                 by_tag[tag] = {
@@ -331,7 +332,7 @@ def _verify_candidates_with_mtd_if(
     df_local['_t'] = df_times
 
     # Precompute per-tag stats for fallback thresholds
-    stats = df_local.dropna(subset=['value']).groupby('tag')['value'].agg(['mean', 'std'])
+    stats = df_local.dropna(subset=['value']).groupby('tag', observed=True)['value'].agg(['mean', 'std'])
     stats = stats.replace({np.nan: 0.0})
 
     by_tag_verified: Dict[str, Any] = {}
@@ -339,7 +340,7 @@ def _verify_candidates_with_mtd_if(
     detail_times: Dict[str, Dict[str, Set[pd.Timestamp]]] = {}
 
     # Group by tag for efficiency
-    for tag, tag_df in df_local.groupby('tag'):
+    for tag, tag_df in df_local.groupby('tag', observed=True):
         tag_df = tag_df.dropna(subset=['value', '_t'])
         if tag_df.empty:
             continue
@@ -589,7 +590,7 @@ def _build_ae_frame_from_df(
 
     try:
         df = _ensure_datetime(df)
-        piv = df.pivot_table(index='time', columns='tag', values='value', aggfunc='mean')
+        piv = df.pivot_table(index='time', columns='tag', values='value', aggfunc='mean', observed=True)
         piv = piv.sort_index().ffill()
         available_cols = list(piv.columns)
 
@@ -6,6 +6,10 @@ import time
 import re
 import pandas as pd
 
+from .parquet_io import ROW_GROUP_ROWS, compact_frame, sort_for_write, to_compact_table
+from .file_catalog import refresh as refresh_catalog
+from .tag_manifest import TagManifest, record_append, record_write
+
 
 def _detect_header_row(raw: pd.DataFrame, search_rows: int = 10) -> int | None:
     """Return index of header row containing 'TIME' within first search_rows."""
@@ -225,9 +229,15 @@ def write_parquet(df: pd.DataFrame, out_path: Path, *, engine: str | None = None
 
     - Writes to a temp file first, then replaces the target (best‑effort atomic).
     - Prefers 'pyarrow'; falls back to 'fastparquet'.
+    - Rows are written time-sorted in bounded row groups so window reads
+      can prune by row-group statistics (see ``parquet_io``).
+    - plant/unit/tag are stored dictionary-encoded; ``value`` as float32
+      when PARQUET_VALUE_FLOAT32=1.
+    - Refreshes the per-tag manifest sidecar (see ``tag_manifest``).
     """
     out_path = Path(out_path)
     out_path.parent.mkdir(parents=True, exist_ok=True)
+    df = sort_for_write(df)
 
     engines = [engine] if engine else ["pyarrow", "fastparquet"]
     last_err: Exception | None = None
@@ -235,7 +245,11 @@ def write_parquet(df: pd.DataFrame, out_path: Path, *, engine: str | None = None
         tmp_path = out_path.with_suffix(out_path.suffix + f".tmp-{int(time.time()*1000)}")
         try:
             # Write to temp path first
-            df.to_parquet(tmp_path, index=False, engine=eng)
+            if eng == "pyarrow":
+                import pyarrow.parquet as pq
+                pq.write_table(to_compact_table(df), tmp_path, row_group_size=ROW_GROUP_ROWS)
+            else:
+                compact_frame(df).to_parquet(tmp_path, index=False, engine=eng)
             try:
                 os.replace(tmp_path, out_path)
             except Exception as rep_err:
@@ -255,6 +269,8 @@ def write_parquet(df: pd.DataFrame, out_path: Path, *, engine: str | None = None
                     except Exception:
                         pass
                     continue
+            record_write(out_path, df)
+            refresh_catalog(out_path)
             return out_path
         except Exception as e:
             last_err = e
@@ -318,8 +334,24 @@ def append_parquet(df: pd.DataFrame, out_path: Path) -> Path:
         # Reorder columns to match existing file
         df = df[existing_cols]
 
+        # Match the file's dtypes: write_parquet stores plant/unit/tag
+        # dictionary-encoded and (PARQUET_VALUE_FLOAT32) value as float32
+        for col, dtype in pf.dtypes.items():
+            if col not in df.columns:
+                continue
+            if isinstance(dtype, pd.CategoricalDtype):
+                if not isinstance(df[col].dtype, pd.CategoricalDtype):
+                    df[col] = df[col].astype("category")
+            elif col == 'value' and df[col].dtype != dtype:
+                df[col] = df[col].astype(dtype)
+
+        # Capture the manifest before the file changes so it can be extended
+        previous = TagManifest.load(out_path)
+
         # Append rows as a new row group
         fp_write(str(out_path), df, append=True)
+        record_append(out_path, df, previous)
+        refresh_catalog(out_path)
         return out_path
     except Exception as e:
         # Surface the error to allow callers to switch to a different path
@@ -19,6 +19,13 @@ from .excel_refresh import refresh_excel_safe
 from .breakout import detect_breakouts
 from .batch import build_unit_from_tags
 from .clean import dedup_parquet
+from .parquet_io import ROW_GROUP_ROWS
+from .delta_store import storage_mode
+from .feature_store import pivot_mean
+from .file_catalog import refresh as refresh_catalog
+from .freshness import FreshnessSnapshot
+from .tag_manifest import record_write
+from .tag_watermarks import describe, fetch_batches_to_parquet, plan_fetch, trim_to_watermarks
 from .memory_optimizer import MemoryMonitor, ChunkedProcessor, StreamingParquetHandler, memory_efficient_dedup, optimize_dataframe_memory
 
 logger = logging.getLogger(__name__)
@@ -271,12 +278,17 @@ class ParquetAutoScanner:
         # Get all available units
         units = self.db.get_all_units()
         logger.info(f"Found {len(units)} units with data")
-        
+
+        # One parallel pass over manifests/files for every unit
+        snapshot = FreshnessSnapshot.current(self.db)
+        missing = [u for u in units if u not in snapshot]
+        if missing:
+            snapshot = FreshnessSnapshot.build(self.db, units)
+
         for unit in units:
             try:
-                # Get freshness info
-                info = self.db.get_data_freshness_info(unit)
-                
+                info = snapshot.get(unit).to_info()
+
                 unit_result = {
                     'unit': unit,
                     'total_records': info['total_records'],
@@ -286,10 +298,10 @@ class ParquetAutoScanner:
                     'is_stale': info['is_stale'],
                     'date_range_days': info['date_range_days']
                 }
-                
+
                 results['units_scanned'].append(unit_result)
                 results['total_records'] += info['total_records']
-                
+
                 # Categorize units
                 if info['total_records'] == 0:
                     results['empty_units'].append(unit)
@@ -297,10 +309,10 @@ class ParquetAutoScanner:
                     results['stale_units'].append(unit)
                 else:
                     results['fresh_units'].append(unit)
-                    
+
             except Exception as e:
                 logger.error(f"Error scanning unit {unit}: {e}")
-        
+
         # Calculate summary statistics
         results['summary'] = {
             'total_units': len(units),
@@ -737,7 +749,7 @@ class ParquetAutoScanner:
                 anomalies['analysis_period'] = 'full_dataset'
             
             # Use MTD for multivariate anomaly detection
-            mtd_results = self._mahalanobis_taguchi_detection(analysis_df)
+            mtd_results = self._mahalanobis_taguchi_detection(analysis_df, unit_hint)
             
             # Check if MTD found anomalies - if not, use Isolation Forest as fallback
             # Also trigger if anomaly rate is suspiciously high (>50%), suggesting MTD sensitivity issues
@@ -782,13 +794,44 @@ class ParquetAutoScanner:
         
         return anomalies
     
-    def _mahalanobis_taguchi_detection(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _feature_pivot(self, df: pd.DataFrame, rule: str, unit: Optional[str] = None) -> pd.DataFrame:
+        """Wide bucket-mean matrix (``time`` column + one column per tag) for ``df``.
+
+        When the unit already has a feature store for ``rule`` that covers the
+        time span of ``df`` the matrix is read from it; otherwise ``df`` is
+        pivoted directly, as it is when rows were written inside that span
+        since the store was last updated. Detection never builds or updates
+        the store (the refresh hook ``FeatureStore.update_existing`` does).
+        """
+        wide = None
+        if unit and not df.empty and 'time' in df.columns and 'tag' in df.columns:
+            try:
+                if rule in self.db.features.existing_rules(unit):
+                    times = pd.to_datetime(df['time'])
+                    stale = self.db.features.pending_change(unit, rule)
+                    if stale is None or stale > times.max():
+                        wide = self.db.get_unit_feature_matrix(
+                            unit, rule, window=(times.min(), times.max()),
+                            tags=[str(t) for t in df['tag'].dropna().unique()],
+                            update=False,
+                        )
+                        if wide.empty or wide.index.min() > times.min().floor(rule):
+                            wide = None  # the store starts after df; pivot what we have
+            except Exception as e:
+                logger.debug(f"Feature store unavailable for {unit}/{rule}: {e}")
+                wide = None
+        if wide is None or wide.empty:
+            wide = pivot_mean(df, rule)
+        return wide.reset_index()
+
+    def _mahalanobis_taguchi_detection(self, df: pd.DataFrame, unit_hint: Optional[str] = None) -> Dict[str, Any]:
         """Implement Mahalanobis-Taguchi Distance for turbomachinery anomaly detection.
         
         Speed as dominant X-axis, all other parameters as Y-axis variables.
         
         Args:
             df: DataFrame with time series data
+            unit_hint: Unit of ``df``; enables the feature-store matrix
             
         Returns:
             MTD-based anomaly results
@@ -892,13 +935,10 @@ class ParquetAutoScanner:
                 pass
             
             # Create multivariate dataset with speed as dominant axis
-            # Use time-based resampling to handle sparse data
-            df_time_indexed = df.set_index('time')
-            
-            # Resample to create aligned dataset (configurable)
+            # Resample to create aligned dataset (configurable); served from
+            # the unit feature store when the unit is known
             resample_rule = mtd_cfg.get('resample', 'h') or 'h'
-            pivot_df = df_time_indexed.groupby(['tag']).resample(resample_rule)['value'].mean().unstack(level=0).reset_index()
-            pivot_df.columns.name = None  # Remove multi-level column name
+            pivot_df = self._feature_pivot(df, resample_rule, unit_hint)
             
             # Ensure we have the speed column and other parameters
             available_tags = [col for col in pivot_df.columns if col != 'time']
@@ -1248,7 +1288,6 @@ class ParquetAutoScanner:
                 return results
             
             # Resample to configured interval for consistent batch processing
-            df_time_indexed = df.set_index('time')
             resample_rule_if = 'h'
             try:
                 # Try to align IF resample to MTD config for this unit
@@ -1269,8 +1308,7 @@ class ParquetAutoScanner:
                             resample_rule_if = _m.get('resample')
             except Exception:
                 pass
-            pivot_df = df_time_indexed.groupby(['tag']).resample(resample_rule_if)['value'].mean().unstack(level=0).reset_index()
-            pivot_df.columns.name = None
+            pivot_df = self._feature_pivot(df, resample_rule_if, unit_hint)
             
             # Get available features
             available_tags = [col for col in pivot_df.columns if col != 'time']
@@ -2150,10 +2188,11 @@ class ParquetAutoScanner:
         """Perform incremental refresh using PI Web API (primary) or Excel PI DataLink (fallback).
 
         This function:
-        1. Gets the latest timestamp from the parquet database
-        2. Calculates the time gap from last data to now
+        1. Gets each tag's latest stored timestamp (watermark) from the tag manifests
+        2. Plans fetch batches of tags with similar watermarks (see ``tag_watermarks``)
         3. Tries PI Web API fetch first (faster, no Excel overhead)
-        4. Falls back to Excel PI DataLink if Web API unavailable/fails
+        4. Falls back to Excel PI DataLink for batches the Web API did not serve
+        5. Keeps only rows after each tag's own watermark and appends them
 
         Args:
             unit: Unit identifier (e.g., 'K-12-01')
@@ -2170,24 +2209,13 @@ class ParquetAutoScanner:
                 print(f"   SKIPPED: ABF refresh disabled by SKIP_ABF_REFRESH env var")
                 return False
 
-            # Step 1: Get latest timestamp from database
-            latest_ts = self.db.get_latest_timestamp(unit)
-            if latest_ts is None:
+            # Step 1: Per-tag watermarks (tag manifests) instead of one unit-level latest timestamp
+            watermarks = self.db.get_tag_latest_timestamps(unit)
+            if not watermarks:
                 print(f"   No existing data for {unit} - need full historical fetch")
                 return False
 
-            # Step 2: Calculate time gap
-            now = pd.Timestamp.now()
-            gap_hours = (now - latest_ts).total_seconds() / 3600
-
-            # Add 10% buffer to ensure we don't miss any data
-            fetch_hours = gap_hours * 1.10
-
-            print(f"   Latest data: {latest_ts.strftime('%Y-%m-%d %H:%M:%S')}")
-            print(f"   Gap detected: {gap_hours:.1f} hours")
-            print(f"   Fetching: {fetch_hours:.1f} hours (with 10% buffer)")
-
-            # Step 3: Get tags for this unit
+            # Step 2: Get tags for this unit
             tags_file = self._find_tags_file_for_unit(unit)
             if not tags_file or not tags_file.exists():
                 print(f"   WARNING: No tags file found for {unit}")
@@ -2203,62 +2231,66 @@ class ParquetAutoScanner:
             # Determine plant and server
             plant = self._infer_plant_from_unit(unit)
             server = "PTSG-1MMPDPdb01"  # No backslashes for Web API
-
-            # Calculate incremental start/end/step
-            start = f"-{fetch_hours:.1f}h"
             end = "*"
             step = "-0.1h"  # 6-minute intervals
 
-            # Create temp parquet for incremental data
-            temp_parquet = self.db.processed_dir / f"{unit}_incremental_temp.parquet"
+            # Step 3: Each tag from its own watermark, tags with similar starts batched together
+            now = pd.Timestamp.now()
+            batches = plan_fetch(tags, watermarks, now=now, step=step)
+            lagging = min(pd.Timestamp(t) for t in watermarks.values())
+            print(f"   Latest data: {max(pd.Timestamp(t) for t in watermarks.values()).strftime('%Y-%m-%d %H:%M:%S')}"
+                  f" (most behind tag: {lagging.strftime('%Y-%m-%d %H:%M:%S')})")
+            if not batches:
+                print(f"   All tags up to date - nothing to fetch")
+                return True
+            for line in describe(batches, now):
+                print(f"   Fetch {line}")
+
+            frames: List[pd.DataFrame] = []
+            pending = list(batches)  # batches still to fetch
 
             # STRATEGY: Try PI Web API first, fallback to Excel if needed
-            webapi_success = False
             import os as _os_web
             webapi_url = _os_web.getenv('PI_WEBAPI_URL', '').strip()
 
             if webapi_url:
-                # Try PI Web API fetch (PRIMARY METHOD)
+                # Try PI Web API fetch (PRIMARY METHOD): streamed per tag into one file per batch
+                import tempfile as _tempfile
+                from .webapi import client_from_env
+                from .parquet_io import table_to_pandas
+                import pyarrow.parquet as _pq
+
+                print(f"   [PRIMARY] Trying PI Web API fetch...")
+                print(f"   Web API URL: {webapi_url}")
                 try:
-                    from .webapi import fetch_tags_via_webapi
-
-                    print(f"   [PRIMARY] Trying PI Web API fetch...")
-                    print(f"   Web API URL: {webapi_url}")
-
-                    df_web = fetch_tags_via_webapi(
-                        tags=tags,
-                        server=server,
-                        start=start,
-                        end=end,
-                        step=step,
+                    client = client_from_env(
+                        server,
                         base_url=webapi_url,
                         auth_mode='windows',  # Windows auth
                         verify_ssl=False,     # Often needed for internal servers
                         timeout=30.0,
-                        max_workers=4,
-                        qps=3.0,
-                        retries=2
                     )
-
-                    if not df_web.empty:
-                        # Save to temp parquet
-                        df_web.to_parquet(temp_parquet, index=False, engine='pyarrow')
-                        print(f"   [SUCCESS] Web API fetched {len(df_web):,} records from {len(df_web['tag'].unique())} tags")
-                        webapi_success = True
-                    else:
-                        print(f"   [WARNING] Web API returned no data")
-
+                    with _tempfile.TemporaryDirectory(dir=self.db.processed_dir, prefix=f".{unit}_webapi_") as tmp_dir:
+                        files, pending = fetch_batches_to_parquet(
+                            batches, tmp_dir, plant=plant, unit=unit, server=server, end=end, step=step, client=client)
+                        for f in files:
+                            df_web = table_to_pandas(_pq.read_table(f))
+                            print(f"   [SUCCESS] Web API fetched {len(df_web):,} records from {df_web['tag'].nunique()} tags")
+                            frames.append(df_web)
                 except Exception as web_err:
                     print(f"   [WARNING] Web API fetch failed: {web_err}")
-                    print(f"   [FALLBACK] Will try Excel PI DataLink...")
+                    pending = list(batches)
+                if pending:
+                    print(f"   [FALLBACK] Will try Excel PI DataLink for {len(pending)} batch(es)...")
             else:
                 print(f"   [INFO] PI_WEBAPI_URL not configured, using Excel PI DataLink")
 
-            # FALLBACK: Use Excel PI DataLink if Web API failed or not configured
-            if not webapi_success:
+            # FALLBACK: Use Excel PI DataLink for batches the Web API did not serve
+            if pending:
                 from .batch import build_unit_from_tags
 
                 print(f"   [FALLBACK] Using Excel PI DataLink fetch...")
+                window = None  # longest span one Excel fetch may cover
 
                 # Plant-specific timeout configuration
                 if plant.upper().startswith("PCMSB"):
@@ -2267,10 +2299,12 @@ class ParquetAutoScanner:
                 elif plant.upper().startswith("ABF") or plant.upper().startswith("07-"):
                     settle_time = 60.0
                     timeout_seconds = 600  # 10 minutes for ABF
-                    if fetch_hours > 1.0:
-                        print(f"   WARNING: ABF fetch limited to 1 hour max (was {fetch_hours:.1f}h)")
-                        fetch_hours = 1.0
-                        start = f"-{fetch_hours:.1f}h"
+                    window = pd.Timedelta(hours=1)
+                    for batch in pending:
+                        if batch.start < now - window:
+                            # Page from the real start; skipping ahead would leave a hole
+                            print(f"   WARNING: ABF fetch limited to 1 hour max ({(now - batch.start).total_seconds() / 3600:.1f}h behind);"
+                                  f" fetching from {batch.start:%Y-%m-%d %H:%M}, the rest on later runs")
                 elif plant.upper() == "PCFS":
                     # PCFS needs longer timeout for incremental fetches
                     settle_time = 5.0  # Increased from 1.0 for reliability
@@ -2296,19 +2330,30 @@ class ParquetAutoScanner:
                         use_visible = True
                         print(f"   Using visible=True for {plant} (PI DataLink reliability)")
 
-                    build_unit_from_tags(
-                        xlsx=xlsx_path,
-                        tags=tags,
-                        out_parquet=temp_parquet,
-                        plant=plant,
-                        unit=unit,
-                        server=f"\\\\{server}",  # Excel needs backslashes
-                        start=start,
-                        end=end,
-                        step=step,
-                        settle_seconds=settle_time,
-                        visible=use_visible  # Use visible Excel for reliability
-                    )
+                    for i, batch in enumerate(pending):
+                        # Temp parquet per batch of incremental data
+                        temp_parquet = self.db.processed_dir / f"{unit}_incremental_temp_{i}.parquet"
+                        fetch_now = pd.Timestamp.now()
+                        try:
+                            build_unit_from_tags(
+                                xlsx=xlsx_path,
+                                tags=batch.tags,
+                                out_parquet=temp_parquet,
+                                plant=plant,
+                                unit=unit,
+                                server=f"\\\\{server}",  # Excel needs backslashes
+                                start=batch.relative_start(fetch_now),
+                                end=batch.relative_end(window, fetch_now) if window is not None else end,
+                                step=step,
+                                settle_seconds=settle_time,
+                                visible=use_visible  # Use visible Excel for reliability
+                            )
+                            if temp_parquet.exists():
+                                frames.append(pd.read_parquet(temp_parquet))
+                        except Exception as excel_err:
+                            print(f"   [WARNING] Excel fetch of {len(batch.tags)} tag(s) failed: {excel_err}")
+                        finally:
+                            temp_parquet.unlink(missing_ok=True)
                 finally:
                     # Restore original timeout
                     if old_timeout:
@@ -2316,14 +2361,23 @@ class ParquetAutoScanner:
                     elif 'PI_FETCH_TIMEOUT' in _os_timeout.environ:
                         del _os_timeout.environ['PI_FETCH_TIMEOUT']
 
+            # Step 4: Keep only rows after each tag's own watermark
+            since = {tag: mark for batch in batches for tag, mark in batch.since.items()}
+            frames = [f for f in frames if f is not None and not f.empty]
+            df_new = trim_to_watermarks(pd.concat(frames, ignore_index=True), since) if frames else pd.DataFrame()
+
             # Step 5: Append incremental data to master parquet
-            if temp_parquet.exists():
-                df_new = pd.read_parquet(temp_parquet)
+            if not df_new.empty:
                 print(f"   Fetched {len(df_new):,} new records")
 
                 # Append to master parquet
                 master_parquet = self.db.processed_dir / f"{unit}_1y_0p1h.parquet"
-                if master_parquet.exists():
+                if storage_mode() == 'delta':
+                    # Immutable delta segment; compaction folds it in later
+                    self.db.deltas.append(unit, df_new)
+                    self.db.deltas.compact_in_background(unit, master_parquet)
+                    print(f"   Appended delta segment for {unit}")
+                elif master_parquet.exists():
                     # Append new data
                     from .ingest import append_parquet
                     try:
@@ -2335,15 +2389,33 @@ class ParquetAutoScanner:
                         df_old = pd.read_parquet(master_parquet)
                         df_combined = pd.concat([df_old, df_new], ignore_index=True)
                         df_combined = df_combined.sort_values('time').drop_duplicates(subset=['time', 'tag'], keep='last')
-                        df_combined.to_parquet(master_parquet, index=False, engine='pyarrow')
+                        df_combined.to_parquet(master_parquet, index=False, engine='pyarrow', row_group_size=ROW_GROUP_ROWS)
+                        record_write(master_parquet, df_combined)
+                        refresh_catalog(master_parquet)
                         print(f"   Combined {len(df_combined):,} total records")
                 else:
                     # First time - just copy
                     df_new.to_parquet(master_parquet, index=False, engine='pyarrow')
+                    record_write(master_parquet, df_new)
+                    refresh_catalog(master_parquet)
                     print(f"   Created new {master_parquet.name}")
 
-                # Clean up temp file
-                temp_parquet.unlink(missing_ok=True)
+                # Roll newly closed buckets into the unit's feature matrices;
+                # buckets the new rows land in are recomputed (lagging tags)
+                changed_from = pd.to_datetime(df_new['time']).min()
+                try:
+                    added = self.db.features.update_existing(unit, changed_from=changed_from)
+                    if added:
+                        print(f"   Feature store: +{added} closed bucket(s)")
+                except Exception as feat_err:
+                    logger.warning(f"Feature store update failed for {unit}: {feat_err}")
+                # Build (first refresh) or extend the rollups here, never on the plot path
+                try:
+                    rolled = sum(self.db.rollups.update(unit, changed_from=changed_from).values())
+                    if rolled:
+                        print(f"   Rollups: +{rolled} closed bucket(s)")
+                except Exception as roll_err:
+                    logger.warning(f"Rollup update failed for {unit}: {roll_err}")
                 return True
             else:
                 print(f"   WARNING: No data fetched")
@@ -2387,32 +2459,28 @@ class ParquetAutoScanner:
 
         plant = self._infer_plant_from_unit(unit)
 
-        # Find the last timestamp in existing master parquet file
-        master = self.db.processed_dir / f"{unit}_1y_0p1h.parquet"
-        start_time = None
+        # Each tag from its own watermark (tag manifests); tags without one fetch ``lookback``
+        from .backfill import parse_duration
 
-        if master.exists():
-            try:
-                # Read just the time column to find last timestamp
-                existing_df = pd.read_parquet(master, columns=['time'])
-                if not existing_df.empty:
-                    last_timestamp = pd.to_datetime(existing_df['time']).max()
-                    # Start from last timestamp + 1 minute to avoid overlap
-                    start_time = (last_timestamp + pd.Timedelta(minutes=1)).strftime('%Y-%m-%d %H:%M:%S')
-                    print(f"   Last data in master: {last_timestamp}")
-                    print(f"   Fetching from: {start_time} to current time")
-                else:
-                    print(f"   Master file exists but empty, fetching last 24h")
-                    start_time = '-1d'
-            except Exception as e:
-                print(f"   Error reading master file: {e}, fetching last 24h")
-                start_time = '-1d'
+        try:
+            watermarks = self.db.get_tag_latest_timestamps(unit)
+        except Exception as e:
+            print(f"   Error reading tag watermarks: {e}, fetching {lookback}")
+            watermarks = {}
+        now = pd.Timestamp.now()
+        batches = plan_fetch(tags, watermarks, now=now, step='-0.1h',
+                             new_tag_lookback=parse_duration(str(lookback).lstrip('-*')))
+        if watermarks:
+            print(f"   Last data in master: {max(pd.Timestamp(t) for t in watermarks.values())}")
         else:
-            print(f"   No master file exists, fetching last 24h")
-            start_time = '-1d'
+            print(f"   No existing data, fetching {lookback}")
+        if not batches:
+            print(f"   All tags of {unit} are up to date - nothing to fetch")
+            return pd.DataFrame()
 
         print(f"   Fallback: fetching {len(tags)} tags from PI for {unit} (plant {plant}) using {excel_path.name}...")
-        print(f"   Time range: {start_time} to current")
+        for line in describe(batches, now):
+            print(f"   Fetch {line}")
 
         # Use a unique temp parquet to avoid collisions/locks across runs
         import time as _tmod
@@ -2434,19 +2502,33 @@ class ParquetAutoScanner:
                     elif plant.upper().startswith('PCFS'):
                         server_override = _os_env.getenv('PCFS_PI_SERVER')
 
-                    build_unit_from_tags(
-                        excel_path,
-                        tags,
-                        temp_parquet,
-                        plant=plant,
-                        unit=unit,
-                        server=(server_override or "\\\\PTSG-1MMPDPdb01"),
-                        start=start_time,
-                        end='*',
-                        step='-0.1h',
-                        visible=False,
-                        settle_seconds=0.5,
-                    )
+                    parts = []
+                    for i, batch in enumerate(batches):
+                        batch_parquet = temp_parquet.with_name(f"{temp_parquet.stem}_{i}.parquet")
+                        try:
+                            build_unit_from_tags(
+                                excel_path,
+                                batch.tags,
+                                batch_parquet,
+                                plant=plant,
+                                unit=unit,
+                                server=(server_override or "\\\\PTSG-1MMPDPdb01"),
+                                start=batch.relative_start(),
+                                end='*',
+                                step='-0.1h',
+                                visible=False,
+                                settle_seconds=0.5,
+                            )
+                            if batch_parquet.exists():
+                                parts.append(pd.read_parquet(batch_parquet))
+                        finally:
+                            batch_parquet.unlink(missing_ok=True)
+                    # Only rows after each tag's own watermark
+                    since = {tag: mark for batch in batches for tag, mark in batch.since.items()}
+                    parts = [p for p in parts if not p.empty]
+                    if parts:
+                        trim_to_watermarks(pd.concat(parts, ignore_index=True), since).to_parquet(
+                            temp_parquet, index=False, engine='pyarrow')
                     result_container['success'] = True
                 except Exception as e:
                     result_container['error'] = e
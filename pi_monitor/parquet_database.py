@@ -5,7 +5,10 @@ Works with existing Parquet files in data directory
 
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import duckdb
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Union
@@ -13,15 +16,92 @@ from datetime import datetime, timedelta
 import logging
 import glob
 import os
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
 
 from .polars_optimizer import PolarsOptimizer
+from .tag_manifest import TagManifest, file_fingerprint, load_or_build
+from .parquet_io import (
+    decode_dictionary_columns,
+    open_parquet,
+    read_window,
+    select_row_groups,
+    table_to_pandas,
+    time_value_arrays,
+    to_compact_table,
+)
+from .delta_store import DeltaStore
+from .file_catalog import catalog_for
+from .dataset import dataset_units, latest_partition_mtime, read_dataset
+from .feature_store import FeatureStore
+from .rollups import RollupStore
+from .query_cache import QueryCache
+from .data_catalog import DataCatalog
 
 logger = logging.getLogger(__name__)
 
+# Idle DuckDB cursors kept per database for reuse across threads
+CURSOR_POOL_SIZE = int(os.getenv("DUCKDB_CURSOR_POOL", "8"))
+
+
+@lru_cache(maxsize=None)
+def _window_sql(by_tag: bool, has_start: bool, has_end: bool) -> str:
+    """Parameterized SQL for the hot unit / unit+tag window reads.
+
+    The file list is bound as ``$files`` so the statement text is identical
+    for every unit and tag; only the parameters change between calls. Only
+    the text is cached: DuckDB's Python API has no reusable prepared
+    statements, so each ``execute`` still parses and plans the query.
+    """
+    q = (
+        "SELECT CAST(time AS TIMESTAMP) AS time, value, plant, unit, tag "
+        "FROM read_parquet($files) WHERE unit = $unit"
+    )
+    if by_tag:
+        q += " AND tag = $tag"
+    if has_start:
+        q += " AND time >= $start"
+    if has_end:
+        q += " AND time <= $end"
+    return q + " ORDER BY time"
+
+
+# Per-tag latest timestamp for one unit
+_TAG_LATEST_SQL = (
+    "SELECT tag, MAX(time) AS latest FROM read_parquet($files) "
+    "WHERE unit = $unit AND tag IS NOT NULL GROUP BY tag"
+)
+
 
 class ParquetDatabase:
     """Parquet-based database manager for PI data"""
-    
+
+    _shared: Dict[str, "ParquetDatabase"] = {}
+    _shared_lock = threading.Lock()
+
+    @staticmethod
+    def _default_data_dir() -> Path:
+        # Default to data directory relative to current location
+        return Path(__file__).parent.parent / "data"
+
+    @classmethod
+    def shared(cls, data_dir: Path | str = None) -> "ParquetDatabase":
+        """Return the process-wide instance for ``data_dir``.
+
+        Use this instead of constructing a database per tag or per widget:
+        the DuckDB connection, cursor pool, file catalog and manifests are
+        set up once. Call :meth:`invalidate_cache` after files change.
+        """
+        path = Path(data_dir) if data_dir is not None else cls._default_data_dir()
+        key = os.path.normcase(os.path.abspath(str(path)))
+        with cls._shared_lock:
+            db = cls._shared.get(key)
+            if db is None:
+                db = cls(path)
+                cls._shared[key] = db
+            return db
+
     def __init__(self, data_dir: Path | str = None):
         """Initialize Parquet database manager.
         
@@ -29,17 +109,36 @@ class ParquetDatabase:
             data_dir: Path to data directory containing Parquet files
         """
         if data_dir is None:
-            # Default to data directory relative to current location
-            current_dir = Path(__file__).parent.parent
-            data_dir = current_dir / "data"
+            data_dir = self._default_data_dir()
         
         self.data_dir = Path(data_dir)
         self.processed_dir = self.data_dir / "processed"
         self.raw_dir = self.data_dir / "raw"
+        # Hive-partitioned plant=/unit=/tag=/year=/month= dataset (scripts/build_dataset.py)
+        self.dataset_dir = self.processed_dir / "dataset"
+        # Cached directory listing, rescanned only when the directory changes
+        self.catalog = catalog_for(self.processed_dir)
+
+        # Append-only delta segments layered over the unit base files
+        self.deltas = DeltaStore(self.processed_dir)
+        # Materialized wide (time x tag) matrices, see feature_store
+        self.features = FeatureStore(self)
+        # Per-tag 1h/1d min/max/mean/count/last pyramid, see rollups
+        self.rollups = RollupStore(self)
+        # LRU of recent unit/tag window reads (PARQUET_QUERY_CACHE_MB), see query_cache
+        self.query_cache = QueryCache()
+        # Per-tag statistics maintained from the manifests, see data_catalog
+        self.data_catalog = DataCatalog(self)
+        # unit -> (base fingerprint + segments, exact entries of tags deltas overwrite)
+        self._overlap_counts: Dict[str, tuple] = {}
         
         # Initialize DuckDB for fast queries if available
         self.duckdb_path = self.processed_dir / "pi.duckdb"
         self.conn = None
+        # Bumped by invalidate_cache(); pooled cursors from older generations are dropped
+        self.generation = 0
+        self._cursor_pool: List[tuple[int, Any]] = []
+        self._pool_lock = threading.Lock()
         self._init_duckdb()
         
         # Initialize Polars optimizer for high-performance operations
@@ -78,18 +177,56 @@ class ParquetDatabase:
             self.conn = None
 
     def invalidate_cache(self):
-        """Force invalidation of DuckDB file cache by recreating connection.
+        """Invalidate cached file state after Parquet files were updated.
 
-        Call this after Parquet files have been updated to ensure fresh reads.
+        Bumps the generation counter: pooled DuckDB cursors opened before the
+        change are discarded and the file catalog is rescanned on next use.
+        The connection itself is kept.
         """
-        if self.conn is not None:
+        with self._pool_lock:
+            self.generation += 1
+            stale, self._cursor_pool = self._cursor_pool, []
+        for _, cur in stale:
             try:
-                self.conn.close()
+                cur.close()
             except Exception:
                 pass
-            self.conn = None
-            self._init_duckdb()
-            logger.info("DuckDB cache invalidated - connection recreated")
+        self.catalog.invalidate()
+        self.query_cache.clear()
+        self.data_catalog.invalidate()
+        logger.info(f"Parquet cache invalidated (generation {self.generation})")
+
+    @contextmanager
+    def _cursor(self):
+        """Borrow a DuckDB cursor from the pool (thread-safe)."""
+        if self.conn is None:
+            raise RuntimeError("DuckDB connection not available")
+        cur = None
+        with self._pool_lock:
+            gen = self.generation
+            while self._cursor_pool:
+                cur_gen, pooled = self._cursor_pool.pop()
+                if cur_gen == gen:
+                    cur = pooled
+                    break
+                try:
+                    pooled.close()
+                except Exception:
+                    pass
+            if cur is None:
+                cur = self.conn.cursor()
+        try:
+            yield cur
+        finally:
+            with self._pool_lock:
+                keep = gen == self.generation and len(self._cursor_pool) < CURSOR_POOL_SIZE
+                if keep:
+                    self._cursor_pool.append((gen, cur))
+            if not keep:
+                try:
+                    cur.close()
+                except Exception:
+                    pass
 
     def _is_temp_file(self, filename: str) -> bool:
         """Check if a filename is a temporary/backup file that should be excluded.
@@ -148,43 +285,25 @@ class ParquetDatabase:
         Returns:
             List of absolute file paths to query
         """
-        import glob as _glob
-        from pathlib import Path as _Path
-        import os as _os
-
-        # Get all parquet files
-        all_files = _glob.glob(str(self.processed_dir / "*.parquet"))
-
-        # Filter out temp files
-        stable_files = [f for f in all_files if not self._is_temp_file(_os.path.basename(f))]
+        # Listing and stats come from the cached catalog
+        stable_files = [e for e in self.catalog.entries() if not self._is_temp_file(e.name)]
 
         # If unit specified, filter to that unit and select best file
         if unit:
-            unit_files = []
-            for f in stable_files:
-                filename = _os.path.basename(f)
-                if filename.startswith(f"{unit}_"):
-                    unit_files.append(f)
+            unit_files = [e for e in self.catalog.unit_entries(unit) if not self._is_temp_file(e.name)]
 
             if not unit_files:
                 return []
 
             # Prefer dedup files over master files
-            dedup_files = [f for f in unit_files if f.endswith('.dedup.parquet')]
-            if dedup_preferred and dedup_files:
-                # Among dedup files, select the most recently modified
-                unit_files_with_mtime = [(f, _os.path.getmtime(f)) for f in dedup_files]
-            else:
-                # Select from all stable files for this unit
-                unit_files_with_mtime = [(f, _os.path.getmtime(f)) for f in unit_files]
+            dedup_files = [e for e in unit_files if e.name.endswith('.dedup.parquet')]
+            candidates = dedup_files if dedup_preferred and dedup_files else unit_files
 
             # Return only the most recent file for this unit to avoid duplicates
-            if unit_files_with_mtime:
-                latest_file = max(unit_files_with_mtime, key=lambda x: x[1])[0]
-                return [latest_file]
-            return []
+            latest = max(candidates, key=lambda e: e.mtime)
+            return [str(latest.path)]
 
-        return stable_files
+        return [str(e.path) for e in stable_files]
 
     def _parquet_glob(self, dedup_preferred: bool = True, exclude_temp: bool = True) -> str:
         """Return glob pattern for Parquet reads.
@@ -223,52 +342,48 @@ class ParquetDatabase:
         """Get list of available Parquet files with metadata"""
         files = []
         
-        # Find only root-level Parquet files, not partitioned dataset files
-        parquet_patterns = [
-            "*.parquet"  # Only root level, not recursive
-        ]
-        
-        for pattern in parquet_patterns:
-            for file_path in self.processed_dir.glob(pattern):
+        # Root-level Parquet files from the catalog (not partitioned dataset files)
+        for entry in self.catalog.entries():
+            file_path = entry.path
+            try:
+                # File stats from the catalog
+                size_mb = entry.size / (1024 * 1024)
+                modified = datetime.fromtimestamp(entry.mtime)
+                
+                # Try to get basic info from file
                 try:
-                    # Get file stats
-                    stat = file_path.stat()
-                    size_mb = stat.st_size / (1024 * 1024)
-                    modified = datetime.fromtimestamp(stat.st_mtime)
-                    
-                    # Try to get basic info from file
-                    try:
-                        df_info = pd.read_parquet(file_path, engine="pyarrow").head(1)
-                        columns = list(df_info.columns)
-                        sample_data = df_info.to_dict('records')[0] if len(df_info) > 0 else {}
-                    except Exception:
-                        columns = []
-                        sample_data = {}
-                    
-                    # Parse filename for unit info (only accept realistic unit patterns)
-                    filename = file_path.name
-                    candidate = filename.split('_')[0] if '_' in filename else filename.replace('.parquet', '')
-                    unit_match = self._normalize_unit_from_token(candidate)
-                    
-                    files.append({
-                        'file_path': str(file_path),
-                        'filename': filename,
-                        'unit': unit_match,
-                        'size_mb': round(size_mb, 2),
-                        'modified': modified,
-                        'columns': columns,
-                        'sample_data': sample_data,
-                        'is_dedup': 'dedup' in filename.lower()
-                    })
-                    
-                except Exception as e:
-                    logger.warning(f"Could not read file {file_path}: {e}")
+                    df_info = pd.read_parquet(file_path, engine="pyarrow").head(1)
+                    columns = list(df_info.columns)
+                    sample_data = df_info.to_dict('records')[0] if len(df_info) > 0 else {}
+                except Exception:
+                    columns = []
+                    sample_data = {}
+                
+                # Parse filename for unit info (only accept realistic unit patterns)
+                filename = file_path.name
+                candidate = filename.split('_')[0] if '_' in filename else filename.replace('.parquet', '')
+                unit_match = self._normalize_unit_from_token(candidate)
+                
+                files.append({
+                    'file_path': str(file_path),
+                    'filename': filename,
+                    'unit': unit_match,
+                    'size_mb': round(size_mb, 2),
+                    'modified': modified,
+                    'columns': columns,
+                    'sample_data': sample_data,
+                    'is_dedup': 'dedup' in filename.lower()
+                })
+                
+            except Exception as e:
+                logger.warning(f"Could not read file {file_path}: {e}")
         
         # Sort by modification time (newest first)
         files.sort(key=lambda x: x['modified'], reverse=True)
         return files
 
-    def _normalize_unit_from_token(self, token: str) -> Optional[str]:
+    @staticmethod
+    def _normalize_unit_from_token(token: str) -> Optional[str]:
         """Return a normalized unit id from a filename token if it looks like a real unit.
 
         This guards against tag-prefixed files (e.g., 'FI-07001_...') being
@@ -402,55 +517,347 @@ class ParquetDatabase:
             return list(units)
         return sorted(list(units))
     
-    def get_unit_data(self, unit: str, start_time: datetime = None, end_time: datetime = None) -> pd.DataFrame:
+    def get_unit_data(self, unit: str, start_time: datetime = None, end_time: datetime = None, *,
+                      as_strings: bool = False) -> pd.DataFrame:
         """Get data for a specific unit.
 
+        Rows from pending delta segments (see ``delta_store``) are merged
+        over the base file with last-write-wins. plant/unit/tag are pandas
+        categoricals (observed, sorted categories).
+
         Args:
             unit: Unit identifier (e.g., 'K-31-01')
             start_time: Optional start time filter
             end_time: Optional end time filter
+            as_strings: Return plant/unit/tag as plain string columns instead
 
         Returns:
             DataFrame with unit data
         """
-        # Fast path: DuckDB over Parquet - use stable file selection to avoid duplicates
-        if self.conn is not None:
-            try:
-                # Get the stable file(s) for this unit (excludes temp files, handles duplicates)
-                stable_files = self._get_stable_parquet_files(unit=unit, dedup_preferred=True)
-
-                if not stable_files:
-                    logger.warning(f"No stable parquet files found for unit {unit}")
-                    return pd.DataFrame()
+        df = self._cached_read(unit, None, start_time, end_time, self._read_unit_uncached)
+        return decode_dictionary_columns(df) if as_strings else df
+
+    def _read_unit_uncached(self, unit: str, tag: None, start_time: datetime = None,
+                            end_time: datetime = None) -> pd.DataFrame:
+        if self._use_dataset_backend(unit):
+            df = table_to_pandas(read_dataset(self.dataset_dir, unit, start=start_time, end=end_time))
+            logger.info(f"Loaded {len(df)} records for unit {unit} from partitioned dataset")
+        else:
+            df = self._read_unit_base(unit, start_time, end_time)
+        if self.deltas.has_segments(unit):
+            df = self.deltas.overlay(df, unit, start_time, end_time)
+        return df
+
+    def _read_source(self, unit: str, tag: Optional[str], start_time: datetime = None) -> Optional[tuple]:
+        """Fingerprint of everything a unit (tag=None) or unit+tag read touches.
+
+        Mirrors the file choice of the read paths -- partitioned dataset,
+        DuckDB stable files, the selected unit file, or (tag reads without
+        DuckDB) all top-level files -- with (path, size, mtime) of each plus
+        the unit's delta segments. Returns None when the source cannot be
+        determined; such reads bypass the query cache.
+        """
+        def _stat(paths) -> tuple:
+            out = []
+            for p in paths:
+                st = os.stat(p)
+                out.append((str(p), st.st_size, st.st_mtime_ns))
+            return tuple(out)
 
-                # Build file list for DuckDB query
-                if len(stable_files) == 1:
-                    file_pattern = f"'{stable_files[0]}'"
-                else:
-                    file_list = ", ".join(f"'{f}'" for f in stable_files)
-                    file_pattern = f"[{file_list}]"
+        try:
+            if self._use_dataset_backend(unit):
+                base: tuple = ("dataset", latest_partition_mtime(self.dataset_dir, unit))
+            elif tag is None:
+                base = ("file",) + _stat(self._unit_base_files(unit, start_time))
+            elif self.conn is not None:
+                base = ("duckdb",) + _stat(self._get_stable_parquet_files(unit=unit, dedup_preferred=True))
+            else:
+                base = ("files",) + _stat(self.catalog.files())
+            deltas = tuple((p.name, p.stat().st_mtime_ns) for p in self.deltas.segments(unit))
+            return base, deltas
+        except Exception as e:
+            logger.debug(f"Query cache source check failed for {unit}: {e}")
+            return None
 
-                q = (
-                    "SELECT CAST(time AS TIMESTAMP) AS time, value, plant, unit, tag "
-                    f"FROM read_parquet({file_pattern}) WHERE unit = ?"
-                )
-                params = [unit]
-                if start_time is not None:
-                    q += " AND time >= ?"
-                    params.append(start_time)
-                if end_time is not None:
-                    q += " AND time <= ?"
-                    params.append(end_time)
-                q += " ORDER BY time"
-                df = self.conn.execute(q, params).fetchdf()
-                logger.info(f"Loaded {len(df)} records for unit {unit} via DuckDB (from {len(stable_files)} file(s))")
+    def _cached_read(self, unit: str, tag: Optional[str], start_time, end_time, reader) -> pd.DataFrame:
+        """Serve a window read from ``self.query_cache`` or read, cache and slice it."""
+        cache = self.query_cache
+        if not cache.enabled:
+            return reader(unit, tag, start_time, end_time)
+        source = self._read_source(unit, tag, start_time)
+        if source is None:
+            return reader(unit, tag, start_time, end_time)
+        hit = cache.get(source, unit, tag, start_time, end_time)
+        if hit is not None:
+            return hit
+
+        # Read the bucket-aligned window so nearby requests share the entry,
+        # unless widening would change which file serves the read
+        read_start, read_end = cache.widen(start_time, end_time)
+        if (read_start, read_end) != (start_time, end_time):
+            if self._read_source(unit, tag, read_start) != source:
+                read_start, read_end = start_time, end_time
+        df = reader(unit, tag, read_start, read_end)
+        if not cache.put(source, unit, tag, read_start, read_end, df):
+            if (read_start, read_end) == (start_time, end_time):
                 return df
-            except Exception as e:
-                logger.warning(f"DuckDB read failed for {unit}: {e}; falling back to pandas")
+        return cache.slice(df, start_time, end_time)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and size of the query-result cache."""
+        return self.query_cache.stats()
+
+    def get_unit_data_arrow(
+        self,
+        unit: str,
+        start_time: datetime = None,
+        end_time: datetime = None,
+        *,
+        tags: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+        memory_map: Optional[bool] = None,
+    ) -> pa.Table:
+        """Arrow variant of :meth:`get_unit_data` (no pandas conversion).
+
+        Reads the same file ``get_unit_data`` would (``_unit_base_files``,
+        or the partitioned dataset), decoding only the row groups overlapping the window, and
+        returns a ``pyarrow.Table`` with plant/unit/tag dictionary-encoded.
+        Local files are memory-mapped only with ``memory_map`` (default:
+        PARQUET_MEMORY_MAP, off, so writers can still replace the file on
+        Windows). Pending delta segments are merged through the pandas
+        overlay, so that case costs one conversion.
 
+        Args:
+            unit: Unit identifier (e.g., 'K-31-01')
+            start_time: Optional start time filter
+            end_time: Optional end time filter
+            tags: Optional tag filter
+            columns: Optional column subset (e.g., ['time', 'value'])
+            memory_map: Memory-map local files (None: ``memory_map_default()``)
+
+        Returns:
+            pyarrow.Table sorted by time
+        """
+        has_deltas = self.deltas.has_segments(unit)
+        # The delta overlay needs the key columns; select after merging
+        read_cols = None if has_deltas else columns
+        if self._use_dataset_backend(unit):
+            table = read_dataset(self.dataset_dir, unit, tags=tags, start=start_time, end=end_time, columns=read_cols)
+        else:
+            files = self._unit_base_files(unit, start_time)
+            if not files:
+                return pa.table({"time": pa.array([], type=pa.timestamp("ns")), "value": pa.array([], type=pa.float64())})
+            table = read_window(
+                files[0], start_time, end_time, tags=tags, columns=read_cols, memory_map=memory_map
+            )
+            if "time" in table.column_names and pa.types.is_timestamp(table.schema.field("time").type):
+                times = table.column("time")
+                if len(times) > 1 and not pc.all(pc.greater_equal(times[1:], times[:-1])).as_py():
+                    table = table.sort_by("time")
+        if has_deltas:
+            df = self.deltas.overlay(table_to_pandas(table), unit, start_time, end_time, tags=tags)
+            if columns:
+                df = df[[c for c in columns if c in df.columns]]
+            table = to_compact_table(df, float32=False)
+        return table
+
+    def get_unit_tag_arrow(
+        self,
+        unit: str,
+        tag: str,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+        *,
+        columns: Optional[List[str]] = None,
+        memory_map: Optional[bool] = None,
+    ) -> pa.Table:
+        """Arrow variant of :meth:`get_unit_tag_data`."""
+        return self.get_unit_data_arrow(
+            unit, start_time, end_time, tags=[tag], columns=columns, memory_map=memory_map
+        )
+
+    def get_unit_tag_arrays(
+        self,
+        unit: str,
+        tag: str,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return (time int64 ns, value float64) NumPy arrays for one tag.
+
+        For detectors that only need the series: no object columns are
+        materialised, and single-chunk columns are handed out as views of
+        the Arrow buffers (see ``parquet_io.time_value_arrays``).
+        """
+        table = self.get_unit_tag_arrow(unit, tag, start_time, end_time, columns=["time", "value"])
+        return time_value_arrays(table)
+
+    def get_unit_tags_window(
+        self,
+        unit: str,
+        tags: List[str],
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+    ) -> Dict[str, tuple[np.ndarray, np.ndarray]]:
+        """Read several tags of a unit in one pass.
+
+        One window read over the unit's data (row groups holding none of the
+        tags are skipped), then the rows are split per tag. Replaces a
+        ``get_unit_tag_data`` call per tag, each of which re-selects and
+        re-scans the same file.
+
+        Args:
+            unit: Unit identifier
+            tags: Tags to return
+            start_time: Optional start time filter
+            end_time: Optional end time filter
+
+        Returns:
+            Mapping tag -> (time int64 ns, value float64) arrays sorted by
+            time; tags without rows map to empty arrays
+        """
+        wanted = list(dict.fromkeys(tags))
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        out: Dict[str, tuple[np.ndarray, np.ndarray]] = {t: empty for t in wanted}
+        if not wanted:
+            return out
+        table = self.get_unit_data_arrow(unit, start_time, end_time, tags=wanted, columns=["time", "value", "tag"])
+        if table.num_rows == 0 or "tag" not in table.column_names:
+            return out
+
+        tag_col = table.column("tag")
+        if not pa.types.is_dictionary(tag_col.type):
+            tag_col = pc.dictionary_encode(tag_col)
+        tag_arr = tag_col.unify_dictionaries().combine_chunks()
+        codes = tag_arr.indices.to_numpy(zero_copy_only=False)
+        names = tag_arr.dictionary.to_pylist()
+
+        times, values = time_value_arrays(table)
+        # Stable sort keeps each tag's rows in time order
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+        for idx in np.split(order, bounds):
+            if len(idx) == 0:
+                continue
+            name = names[codes[idx[0]]]
+            if name in out:
+                out[name] = (times[idx], values[idx])
+        return out
+
+    def get_unit_feature_matrix(
+        self,
+        unit: str,
+        rule: str = 'h',
+        window: Any = None,
+        tags: Optional[List[str]] = None,
+        update: bool = True,
+    ) -> pd.DataFrame:
+        """Wide bucket-mean matrix for a unit (index 'time', one column per tag).
+
+        Served from the incrementally maintained feature store; only buckets
+        that closed since the last call are computed. With ``update=False``
+        the store is only read (never created or extended) and buckets it
+        lacks after its last one are computed live.
+
+        Args:
+            unit: Unit identifier
+            rule: Resample rule (e.g., 'h', '6min')
+            window: Lookback ('90D', Timedelta), (start, end) pair, or None
+            tags: Optional tag subset
+            update: Create/extend the store before reading
+
+        Returns:
+            DataFrame indexed by bucket start
+        """
+        return self.features.get_unit_feature_matrix(unit, rule, window, tags=tags, update=update)
+
+    def get_tag_rollup(
+        self,
+        unit: str,
+        tag: str,
+        start_time: datetime,
+        end_time: datetime | None = None,
+        max_points: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """Bucketed min/max/mean/count/last series of a tag for plotting.
+
+        Served from the rollup pyramid at the finest resolution (raw, 1h, 1d)
+        that keeps the series within ``max_points`` buckets.
+
+        Args:
+            unit: Unit identifier
+            tag: Tag name
+            start_time: Window start
+            end_time: Window end (default: newest data)
+            max_points: Point budget (None for raw rows)
+
+        Returns:
+            DataFrame with time/min/max/mean/count/last; attrs['level'] names the resolution
+        """
+        return self.rollups.query(unit, tag, start_time, end_time, max_points=max_points)
+
+    def get_tag_extremes(
+        self,
+        unit: str,
+        tag: str,
+        start_time: datetime,
+        end_time: datetime | None = None,
+    ) -> tuple[float, float]:
+        """Exact (min, max) of a tag over a window, read mostly from rollups."""
+        return self.rollups.extremes(unit, tag, start_time, end_time or datetime.now())
+
+    def _use_dataset_backend(self, unit: str) -> bool:
+        """Decide whether unit reads are served from the partitioned dataset.
+
+        PARQUET_READ_BACKEND selects the reader: 'files' (flat unit files),
+        'dataset' (partitioned dataset whenever it holds the unit) or 'auto'
+        (default: the dataset, but only if its newest partition is at least
+        as recent as the unit's flat file, so a stale dataset never shadows
+        hourly refreshes).
+        """
+        mode = os.getenv('PARQUET_READ_BACKEND', 'auto').strip().lower()
+        if mode == 'files':
+            return False
+        try:
+            if unit not in dataset_units(self.dataset_dir):
+                return False
+            if mode == 'dataset':
+                return True
+            flat_files = self._get_stable_parquet_files(unit=unit, dedup_preferred=False)
+            if not flat_files:
+                return True
+            newest = latest_partition_mtime(self.dataset_dir, unit)
+            return newest is not None and newest >= os.path.getmtime(flat_files[0])
+        except Exception as e:
+            logger.debug(f"Dataset backend check failed for {unit}: {e}")
+            return False
+
+    def _unit_base_files(self, unit: str, start_time: datetime = None) -> List[str]:
+        """Base Parquet file(s) that serve a unit read, for every read API.
+
+        With DuckDB the stable selection (dedup preferred, newest), otherwise
+        :meth:`_select_unit_file`. ``get_unit_data`` and the Arrow/NumPy
+        reads both go through here so they always see the same rows.
+        """
+        if self.conn is not None:
+            return self._get_stable_parquet_files(unit=unit, dedup_preferred=True)
+        target = self._select_unit_file(unit, start_time)
+        return [str(target)] if target else []
+
+    def _select_unit_file(self, unit: str, start_time: datetime = None) -> Optional[Path]:
+        """Pick the Parquet file that serves a unit read (non-DuckDB paths).
+
+        Args:
+            unit: Unit identifier
+            start_time: Optional start of the requested window; long lookbacks
+                prefer long-span master files over small 'updated' slices
+
+        Returns:
+            Path of the selected file, or None when the unit has no file
+        """
         import re as _re
         # Find Parquet files for this unit (try sanitized variants for filename safety)
-        unit_files = []
         variants = [
             unit,
             unit.replace('/', '-'),
@@ -461,19 +868,19 @@ class ParquetDatabase:
         # Include known alias filenames for ABF unit
         if unit == '07-MT01-K001':
             variants.extend(['FI-07001'])
-        seen = set()
-        patterns = []
-        for v in variants:
-            if v in seen:
-                continue
-            seen.add(v)
-            patterns.extend([f"*{v}*.parquet", f"**/*{v}*.parquet"])
-        for pattern in patterns:
-            unit_files.extend(list(self.processed_dir.glob(pattern)))
+        unit_files = [e.path for e in self.catalog.matching(variants)]
+        if not unit_files:
+            # Nothing at the top level: search subdirectories as before
+            seen = set()
+            for v in variants:
+                if v in seen:
+                    continue
+                seen.add(v)
+                unit_files.extend(list(self.processed_dir.glob(f"**/*{v}*.parquet")))
         
         if not unit_files:
             logger.warning(f"No Parquet files found for unit {unit}")
-            return pd.DataFrame()
+            return None
         
         # Prioritize files by completeness and freshness: updated > refreshed > dedup > regular
         # Exclude fallback and temporary files that may be corrupted
@@ -530,15 +937,40 @@ class ParquetDatabase:
         elif refreshed_files:
             # Only use refreshed files if nothing else exists (may lack 'tag' column)
             target_file = refreshed_files[0]
-        
-        if not target_file:
+
+        return target_file
+
+    def _read_unit_base(self, unit: str, start_time: datetime = None, end_time: datetime = None) -> pd.DataFrame:
+        """Read a unit's rows from its base Parquet file(s), without delta segments."""
+        # Same file choice as the Arrow reads (stable selection under DuckDB)
+        stable_files = self._unit_base_files(unit, start_time)
+        if not stable_files:
+            logger.warning(f"No stable parquet files found for unit {unit}")
             return pd.DataFrame()
-        
+
+        # Fast path: DuckDB over Parquet
+        if self.conn is not None:
+            try:
+                params = {"files": stable_files, "unit": unit}
+                if start_time is not None:
+                    params["start"] = start_time
+                if end_time is not None:
+                    params["end"] = end_time
+                q = _window_sql(False, start_time is not None, end_time is not None)
+                with self._cursor() as cur:
+                    df = cur.execute(q, params).fetchdf()
+                logger.info(f"Loaded {len(df)} records for unit {unit} via DuckDB (from {len(stable_files)} file(s))")
+                return df
+            except Exception as e:
+                logger.warning(f"DuckDB read failed for {unit}: {e}; falling back to pandas")
+
+        target_file = stable_files[0]  # one file per unit (newest stable / selected)
         logger.info(f"Loading data from: {target_file}")
         
         try:
-            # Load the Parquet file
-            df = pd.read_parquet(target_file)
+            # Load only the row groups overlapping the requested window
+            # (row-group min/max statistics on 'time'); exact filtering below
+            df = table_to_pandas(read_window(target_file, start_time, end_time))
             
             # Ensure time column exists and is datetime
             time_cols = ['time', 'timestamp', 'Time', 'Timestamp']
@@ -568,6 +1000,55 @@ class ParquetDatabase:
             logger.error(f"Error loading data from {target_file}: {e}")
             return pd.DataFrame()
     
+    def _unit_manifest(self, unit: str) -> Optional[TagManifest]:
+        """Return the per-tag manifest of the unit's newest stable file.
+
+        The sidecar written by the Parquet writers is used when its
+        fingerprint matches the file; otherwise the file's time/value/tag
+        columns are scanned once and the rebuilt manifest is persisted.
+        Manifests of pending delta segments are folded in; tags whose
+        delta rows overlap rows already counted are recounted from the
+        overlaid rows, so counts and value statistics stay exact before
+        compaction.
+
+        Args:
+            unit: Unit identifier
+
+        Returns:
+            TagManifest, or None when the unit has no long-format file
+        """
+        stable_files = self._get_stable_parquet_files(unit=unit, dedup_preferred=False)
+        base = stable_files[0] if stable_files else None
+        manifest = load_or_build(base) if base else None
+        overlap: set = set()
+        for delta_manifest in self.deltas.manifests(unit):
+            if manifest is not None:
+                overlap.update(manifest.overlapping(delta_manifest))
+            manifest = (manifest or TagManifest()).merge(delta_manifest)
+        if manifest is None or not manifest.tags:
+            return None
+        for tag, entry in (self._overlap_entries(unit, base, sorted(overlap)) if overlap else {}).items():
+            manifest.tags[tag] = {**entry, "last_write": manifest.tags[tag].get("last_write")}
+        return manifest
+
+    def _overlap_entries(self, unit: str, base: Optional[Path], tags: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Exact manifest entries of ``tags`` over base + deltas (last write wins).
+
+        Cached until the base file or the segment list changes.
+        """
+        signature = (str(base), file_fingerprint(base) if base else None,
+                     tuple(seg.name for seg in self.deltas.segments(unit)), tuple(tags))
+        cached = self._overlap_counts.get(unit)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        rows = pd.DataFrame(columns=["time", "value", "tag"])
+        if base is not None:
+            rows = table_to_pandas(read_window(base, tags=tags, columns=["time", "value", "tag"]))
+        exact = TagManifest().update(self.deltas.overlay(rows, unit, tags=tags))
+        entries = {t: v for t, v in exact.tags.items() if t in tags}
+        self._overlap_counts[unit] = (signature, entries)
+        return entries
+
     def get_latest_timestamp(self, unit: str, tag: str = None) -> Optional[datetime]:
         """Get latest timestamp for a unit/tag combination.
 
@@ -578,6 +1059,10 @@ class ParquetDatabase:
         Returns:
             Latest timestamp or None
         """
+        manifest = self._unit_manifest(unit)
+        if manifest is not None:
+            return manifest.latest(tag)
+
         df = self.get_unit_data(unit)
         if df.empty:
             return None
@@ -596,6 +1081,8 @@ class ParquetDatabase:
         tag: str,
         start_time: datetime | None = None,
         end_time: datetime | None = None,
+        *,
+        as_strings: bool = False,
     ) -> pd.DataFrame:
         """Return rows for a specific unit+tag within an optional time window.
 
@@ -603,7 +1090,39 @@ class ParquetDatabase:
         It prefers DuckDB for predicate pushdown; when DuckDB is disabled or
         unavailable, it falls back to a pyarrow.dataset scanner with filters,
         and finally to a streaming row-group reader as a last resort.
+        Pending delta segments are merged over the result. Results are
+        served from the query cache when a covering window is cached.
+        plant/unit/tag are categoricals unless ``as_strings`` is set.
         """
+        df = self._cached_read(unit, tag, start_time, end_time, self._read_unit_tag_uncached)
+        return decode_dictionary_columns(df) if as_strings else df
+
+    def _read_unit_tag_uncached(
+        self,
+        unit: str,
+        tag: str,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+    ) -> pd.DataFrame:
+        if self._use_dataset_backend(unit):
+            df = table_to_pandas(
+                read_dataset(self.dataset_dir, unit, tags=[tag], start=start_time, end=end_time)
+            )
+            logger.info(f"Loaded {len(df)} records for {unit}/{tag} from partitioned dataset")
+        else:
+            df = self._read_unit_tag_base(unit, tag, start_time, end_time)
+        if self.deltas.has_segments(unit):
+            df = self.deltas.overlay(df, unit, start_time, end_time, tags=[tag])
+        return df
+
+    def _read_unit_tag_base(
+        self,
+        unit: str,
+        tag: str,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+    ) -> pd.DataFrame:
+        """Read unit+tag rows from the base Parquet file(s), without delta segments."""
         # Fast path via DuckDB (handles predicate pushdown efficiently)
         if self.conn is not None:
             try:
@@ -613,27 +1132,14 @@ class ParquetDatabase:
                 if not stable_files:
                     return pd.DataFrame()
 
-                # Build file pattern for DuckDB
-                if len(stable_files) == 1:
-                    file_pattern = f"'{stable_files[0]}'"
-                else:
-                    file_list = ", ".join(f"'{f}'" for f in stable_files)
-                    file_pattern = f"[{file_list}]"
-
-                q = (
-                    "SELECT CAST(time AS TIMESTAMP) AS time, value, plant, unit, tag "
-                    f"FROM read_parquet({file_pattern}) "
-                    "WHERE unit = ? AND tag = ?"
-                )
-                params: list[object] = [unit, tag]
+                params: dict[str, object] = {"files": stable_files, "unit": unit, "tag": tag}
                 if start_time is not None:
-                    q += " AND time >= ?"
-                    params.append(start_time)
+                    params["start"] = start_time
                 if end_time is not None:
-                    q += " AND time <= ?"
-                    params.append(end_time)
-                q += " ORDER BY time"
-                df = self.conn.execute(q, params).fetchdf()
+                    params["end"] = end_time
+                q = _window_sql(True, start_time is not None, end_time is not None)
+                with self._cursor() as cur:
+                    df = cur.execute(q, params).fetchdf()
                 logger.info(
                     f"Loaded {len(df)} records for {unit}/{tag} via DuckDB (from {len(stable_files)} file(s))"
                 )
@@ -648,7 +1154,7 @@ class ParquetDatabase:
             import pyarrow.dataset as ds
             import pyarrow as pa  # noqa: F401 (ensures pyarrow present)
 
-            files = list(self.processed_dir.glob("*.parquet"))
+            files = self.catalog.files()
             if not files:
                 return pd.DataFrame()
 
@@ -667,7 +1173,7 @@ class ParquetDatabase:
 
             cols = [c for c in ["time", "value", "unit", "tag"] if c in schema_names]
             table = dataset.to_table(filter=filt, columns=cols)
-            df = table.to_pandas()
+            df = table_to_pandas(table)
             if "time" in df.columns:
                 df["time"] = pd.to_datetime(df["time"], errors="coerce")
                 df = df.dropna(subset=["time"]).sort_values("time")
@@ -686,27 +1192,22 @@ class ParquetDatabase:
             import pyarrow as pa
 
             # Prefer reading only files that likely contain this unit
-            unit_patterns = [
-                f"*{unit}*.parquet",
-                f"*{unit.replace('/', '-')}*.parquet",
-                f"*{unit.replace('/', '_')}*.parquet",
-                f"*{unit.replace('-', '_')}*.parquet",
+            candidate_files: list[Path] = [
+                e.path for e in self.catalog.matching(
+                    [unit, unit.replace('/', '-'), unit.replace('/', '_'), unit.replace('-', '_')]
+                )
             ]
-            candidate_files: list[Path] = []
-            for pat in unit_patterns:
-                candidate_files.extend(list(self.processed_dir.glob(pat)))
             # If nothing matched, fall back to dedup/*.parquet
             if not candidate_files:
-                candidate_files = list(self.processed_dir.glob("*dedup.parquet")) or list(
-                    self.processed_dir.glob("*.parquet")
-                )
+                all_files = self.catalog.files()
+                candidate_files = [p for p in all_files if p.name.endswith("dedup.parquet")] or all_files
             if not candidate_files:
                 return pd.DataFrame()
 
             batches: list[pd.DataFrame] = []
             for path in candidate_files:
                 try:
-                    pf = pq.ParquetFile(str(path))
+                    pf = open_parquet(path)
                 except Exception:
                     continue
                 # Only columns we need
@@ -714,7 +1215,10 @@ class ParquetDatabase:
                     c for c in ["time", "value", "plant", "unit", "tag"]
                     if c in pf.schema.names
                 ]
-                for rb in pf.iter_batches(columns=wanted_cols):
+                row_groups = select_row_groups(pf, start_time, end_time, [tag])
+                if not row_groups:
+                    continue
+                for rb in pf.iter_batches(columns=wanted_cols, row_groups=row_groups):
                     tbl = pa.Table.from_batches([rb])
                     df_part = tbl.to_pandas()
                     # Apply filters in pandas; batches keep memory bounded
@@ -759,6 +1263,10 @@ class ParquetDatabase:
             (is_fresh, fresh_tag_count, total_tag_count)
             is_fresh = True if >= 50% of tags have data within max_age_hours
         """
+        manifest = self._unit_manifest(unit)
+        if manifest is not None:
+            return self._tag_freshness(manifest.tag_latest(), max_age_hours)
+
         df = self.get_unit_data(unit)
         if df.empty:
             return (False, 0, 0)
@@ -786,11 +1294,16 @@ class ParquetDatabase:
             return (is_fresh, 1 if is_fresh else 0, 1)
 
         # Get latest timestamp per tag
+        tag_latest = df_with_tags.groupby('tag', observed=True)['time'].max()
+        return self._tag_freshness(tag_latest.to_dict(), max_age_hours)
+
+    @staticmethod
+    def _tag_freshness(tag_latest: Dict[str, datetime], max_age_hours: float) -> tuple[bool, int, int]:
+        """Apply the 50%-of-tags-fresh rule to a tag -> latest timestamp mapping."""
         cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
-        tag_latest = df_with_tags.groupby('tag')['time'].max()
 
         # Count how many tags are fresh
-        fresh_tags = (tag_latest > cutoff_time).sum()
+        fresh_tags = sum(1 for t in tag_latest.values() if t is not None and t > cutoff_time)
         total_tags = len(tag_latest)
 
         # Require at least 50% of tags to be fresh
@@ -808,6 +1321,20 @@ class ParquetDatabase:
         Returns:
             Dictionary mapping tag name to latest timestamp
         """
+        manifest = self._unit_manifest(unit)
+        if manifest is not None:
+            return manifest.tag_latest()
+
+        if self.conn is not None:
+            try:
+                stable_files = self._get_stable_parquet_files(unit=unit, dedup_preferred=False)
+                if stable_files:
+                    with self._cursor() as cur:
+                        rows = cur.execute(_TAG_LATEST_SQL, {"files": stable_files, "unit": unit}).fetchall()
+                    return {tag: latest for tag, latest in rows}
+            except Exception as e:
+                logger.warning(f"DuckDB per-tag latest failed for {unit}: {e}")
+
         df = self.get_unit_data(unit)
         if df.empty or 'tag' not in df.columns or 'time' not in df.columns:
             return {}
@@ -818,7 +1345,7 @@ class ParquetDatabase:
             return {}
 
         # Get latest timestamp per tag
-        tag_latest = df_with_tags.groupby('tag')['time'].max()
+        tag_latest = df_with_tags.groupby('tag', observed=True)['time'].max()
         return tag_latest.to_dict()
     
     def get_data_freshness_info(self, unit: str, tag: str = None) -> Dict[str, Any]:
@@ -831,6 +1358,11 @@ class ParquetDatabase:
         Returns:
             Dictionary with freshness information
         """
+        # Fastest path: per-tag manifest maintained by the Parquet writers
+        manifest = self._unit_manifest(unit)
+        if manifest is not None:
+            return self._freshness_info_from_manifest(unit, tag, manifest)
+
         # Fast path: try to compute aggregates directly in DuckDB to avoid
         # materialising tens of millions of rows into memory (can OOM on ABF).
         if self.conn is not None:
@@ -882,7 +1414,8 @@ class ParquetDatabase:
                     "       COUNT(DISTINCT tag) AS uniq "
                     "FROM src"
                 )
-                total, earliest, latest, uniq = self.conn.execute(q, [unit]).fetchone()
+                with self._cursor() as cur:
+                    total, earliest, latest, uniq = cur.execute(q, [unit]).fetchone()
                 # Prepare base structure
                 info = {
                     'unit': unit,
@@ -1026,6 +1559,48 @@ class ParquetDatabase:
         
         return info
 
+    def _freshness_info_from_manifest(self, unit: str, tag: Optional[str], manifest: TagManifest) -> Dict[str, Any]:
+        """Build the get_data_freshness_info() result from a tag manifest."""
+        try:
+            max_age_env = float(os.getenv('MAX_AGE_HOURS', '1.0'))
+        except Exception:
+            max_age_env = 1.0
+
+        info = {
+            'unit': unit,
+            'tag': tag,
+            'total_records': manifest.total_rows,
+            'latest_timestamp': manifest.latest(),
+            'earliest_timestamp': manifest.earliest(),
+            'data_age_hours': None,
+            'is_stale': True,
+            'unique_tags': sorted(manifest.tags),
+            'date_range_days': None,
+        }
+        if tag and tag in manifest.tags:
+            info['records_for_tag'] = int(manifest.tags[tag]['rows'])
+            info['unique_tags'] = [tag]
+            info['latest_timestamp'] = manifest.latest(tag)
+            info['earliest_timestamp'] = manifest.earliest(tag)
+
+        latest = info['latest_timestamp']
+        earliest = info['earliest_timestamp']
+        if latest is not None:
+            # Unit files store naive local timestamps
+            info['data_age_hours'] = (datetime.now() - latest).total_seconds() / 3600
+        if latest is not None and earliest is not None:
+            info['date_range_days'] = (latest - earliest).total_seconds() / (24 * 3600)
+
+        if tag:
+            info['is_stale'] = (info['data_age_hours'] is not None) and (info['data_age_hours'] > max_age_env)
+        else:
+            # Require at least 50% of tags to be fresh (prevents false positives)
+            is_fresh, fresh_count, total_count = self._tag_freshness(manifest.tag_latest(), max_age_env)
+            info['is_stale'] = not is_fresh
+            info['fresh_tag_count'] = fresh_count
+            info['total_tag_count'] = total_count
+        return info
+
     def get_all_units(self) -> List[str]:
         """Get list of all units with data or configuration.
 
@@ -1037,47 +1612,9 @@ class ParquetDatabase:
         - Top-level parquet files (data/processed/*.parquet)
         - Partitioned dataset directory (data/processed/dataset/plant=*/unit=*/...)
         """
-        units = set()
-
-        # Check partitioned dataset directory if it exists
-        dataset_dir = self.processed_dir / "dataset"
-        if dataset_dir.exists():
-            try:
-                # Scan for unit directories in partitioned structure
-                for plant_dir in dataset_dir.glob("plant=*"):
-                    for unit_dir in plant_dir.glob("unit=*"):
-                        unit_name = unit_dir.name.replace("unit=", "")
-                        # Filter out backup/temp unit names and plant-level names
-                        if unit_name and unit_name.lower() not in ('pcfs', 'pcmsb', 'abf') and not self._is_temp_unit(unit_name):
-                            units.add(unit_name)
-            except Exception as e:
-                logger.warning(f"Failed to scan partitioned dataset: {e}")
-
-        # Get units from stable top-level parquet files (excludes temp files)
-        if self.conn is not None:
-            try:
-                # Get stable files only
-                stable_files = self._get_stable_parquet_files(unit=None, dedup_preferred=False)
-                if stable_files:
-                    # Build file list for DuckDB
-                    file_list = ", ".join(f"'{f}'" for f in stable_files)
-                    q = f"SELECT DISTINCT unit FROM read_parquet([{file_list}]) WHERE unit IS NOT NULL"
-                    for (u,) in self.conn.execute(q).fetchall():
-                        unit_str = str(u)
-                        # Filter out unit names that look like temp/backup artifacts
-                        if not self._is_temp_unit(unit_str):
-                            units.add(unit_str)
-            except Exception as e:
-                logger.warning(f"Failed to get units from DuckDB: {e}")
-
-        # Units from file names as backup (exclude temp files and temp unit names)
-        for file_info in self.get_available_parquet_files():
-            filename = file_info.get('filename', '')
-            if not self._is_temp_file(filename):
-                unit_name = file_info.get('unit')
-                # Also check if the unit name itself looks like a temp/backup artifact
-                if unit_name and unit_name.lower() not in ('pcfs', 'pcmsb', 'abf') and not self._is_temp_unit(unit_name):
-                    units.add(unit_name)
+        # Units with data, from file/partition names via the data catalog
+        # (no Parquet file is opened)
+        units = set(self.data_catalog.unit_names())
 
         # Units from config
         for u in self._discover_config_units():
@@ -1121,30 +1658,44 @@ class ParquetDatabase:
     
     
     def get_database_status(self) -> Dict[str, Any]:
-        """Get comprehensive database status."""
-        files = self.get_available_parquet_files()
-        
-        total_size_mb = sum(f['size_mb'] for f in files)
-        total_files = len(files)
-        
+        """Get comprehensive database status.
+
+        Unit statistics come from the data catalog (manifests); no data file
+        is scanned.
+        """
+        entries = self.catalog.entries()
+        total_size_mb = sum(e.size for e in entries) / (1024 * 1024)
+        total_files = len(entries)
+
+        try:
+            max_age_env = float(os.getenv('MAX_AGE_HOURS', '1.0'))
+        except Exception:
+            max_age_env = 1.0
+        self.data_catalog.refresh()
+        catalog_units = {r['unit']: r for r in self.data_catalog.units().to_dict('records')}
+        tag_latest: Dict[str, Dict[str, datetime]] = {}
+        for r in self.data_catalog.tags().itertuples(index=False):
+            tag_latest.setdefault(r.unit, {})[r.tag] = r.max_time
+
         # Get units and their info
         units_info = []
+        now = datetime.now()
         for unit in self.get_all_units():
-            unit_files = [f for f in files if unit in f['filename']]
-            unit_size = sum(f['size_mb'] for f in unit_files)
-            
-            # Get freshness info
-            freshness = self.get_data_freshness_info(unit)
-            
+            unit_size = sum(e.size for e in entries if unit in e.name) / (1024 * 1024)
+            row = catalog_units.get(unit)
+            latest = row['max_time'] if row is not None and pd.notna(row['max_time']) else None
+            is_fresh, _, _ = self._tag_freshness(tag_latest.get(unit, {}), max_age_env)
+
             units_info.append({
                 'unit': unit,
-                'files': len(unit_files),
+                'files': sum(1 for e in entries if unit in e.name),
                 'size_mb': unit_size,
-                'records': freshness['total_records'],
-                'latest_data': freshness['latest_timestamp'],
-                'data_age_hours': freshness['data_age_hours'],
-                'unique_tags': len(freshness['unique_tags']),
-                'is_stale': freshness['is_stale']
+                'records': int(row['rows']) if row is not None else 0,
+                'latest_data': latest,
+                # Unit files store naive local timestamps
+                'data_age_hours': (now - latest).total_seconds() / 3600 if latest is not None else None,
+                'unique_tags': int(row['tag_count']) if row is not None else 0,
+                'is_stale': not is_fresh
             })
         
         # Sort by latest data
@@ -1159,14 +1710,16 @@ class ParquetDatabase:
             'units': units_info,
             'duckdb_available': self.conn is not None,
             'duckdb_path': str(self.duckdb_path) if self.duckdb_path.exists() else None,
+            'query_cache': self.cache_stats(),
             'status_timestamp': datetime.now().isoformat()
         }
     
-    def query_with_duckdb(self, query: str) -> pd.DataFrame:
+    def query_with_duckdb(self, query: str, params: Any = None) -> pd.DataFrame:
         """Execute SQL query using DuckDB if available.
         
         Args:
             query: SQL query string
+            params: Optional positional (list) or named (dict) parameters
             
         Returns:
             Query results as DataFrame
@@ -1175,7 +1728,8 @@ class ParquetDatabase:
             raise RuntimeError("DuckDB connection not available")
         
         try:
-            result = self.conn.execute(query).fetchdf()
+            with self._cursor() as cur:
+                result = cur.execute(query, params).fetchdf() if params is not None else cur.execute(query).fetchdf()
             return result
         except Exception as e:
             logger.error(f"DuckDB query failed: {e}")
@@ -1183,6 +1737,9 @@ class ParquetDatabase:
     
     def get_tag_summary(self, unit: str) -> pd.DataFrame:
         """Get summary statistics for all tags in a unit.
+
+        Served from the data catalog, which is maintained from the per-tag
+        manifests; the unit's data is not loaded.
         
         Args:
             unit: Unit identifier
@@ -1190,39 +1747,26 @@ class ParquetDatabase:
         Returns:
             DataFrame with tag statistics
         """
-        df = self.get_unit_data(unit)
-        
-        if df.empty or 'tag' not in df.columns:
+        cat = self.data_catalog.unit_tags(unit)
+        if cat.empty:
             return pd.DataFrame()
-        
-        # Calculate statistics per tag
-        summary = df.groupby('tag').agg({
-            'value': ['count', 'mean', 'std', 'min', 'max'],
-            'time': ['min', 'max']
-        }).round(3)
-        
-        # Flatten column names
-        summary.columns = ['_'.join(col).strip() for col in summary.columns]
-        summary = summary.reset_index()
-        
-        # Calculate data age for each tag
-        # Ensure datetime arithmetic is safe (handle tz-aware vs naive)
-        now_local = datetime.now().astimezone()
-        try:
-            # Normalize to local naive timestamps for subtraction
-            tmax = pd.to_datetime(summary['time_max'], errors='coerce')
-            if getattr(getattr(tmax, 'dt', None), 'tz', None) is not None:
-                tmax = tmax.dt.tz_convert(now_local.tzinfo).dt.tz_localize(None)
-            summary['hours_since_last'] = tmax.apply(
-                lambda x: (now_local.replace(tzinfo=None) - x).total_seconds() / 3600 if pd.notna(x) else None
-            )
-        except Exception:
-            # Fallback without tz handling
-            now = datetime.now()
-            summary['hours_since_last'] = summary['time_max'].apply(
-                lambda x: (now - x).total_seconds() / 3600 if pd.notna(x) else None
-            )
-        
+
+        summary = pd.DataFrame({
+            'tag': cat['tag'],
+            'value_count': cat['rows'] - cat['null_count'],
+            'value_mean': cat['value_mean'].round(3),
+            'value_std': cat['value_std'].round(3),
+            'value_min': cat['value_min'].round(3),
+            'value_max': cat['value_max'].round(3),
+            'time_min': cat['min_time'],
+            'time_max': cat['max_time'],
+        })
+
+        # Calculate data age for each tag (unit files store naive local timestamps)
+        now = datetime.now()
+        summary['hours_since_last'] = [
+            (now - t).total_seconds() / 3600 if pd.notna(t) else None for t in summary['time_max']
+        ]
         return summary
     
     def cleanup_old_files(self, days_to_keep: int = 30) -> int:
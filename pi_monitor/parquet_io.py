@@ -0,0 +1,322 @@
+"""
+Row-group aware Parquet reads and write layout for unit files.
+
+Unit files are written time-sorted with bounded row groups so that the
+per-row-group min/max statistics on ``time`` describe narrow, mostly
+disjoint ranges. Window reads then consult those statistics (and the
+``tag`` statistics, which are selective for per-tag row groups such as
+the ones ``build_unit_from_tags`` produces) and decode only the row
+groups that can overlap the request.
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# ~250k rows is ~2-4 MB per row group for (time, value, plant, unit, tag):
+# large enough for efficient decoding, small enough that a 90-day window
+# of a 1-year unit file skips most of the file.
+ROW_GROUP_ROWS = int(os.getenv("PARQUET_ROW_GROUP_ROWS", "250000"))
+
+# Low-cardinality identifier columns stored dictionary-encoded and read
+# back as pandas categoricals instead of one Python string per row.
+DICTIONARY_COLUMNS = ("plant", "unit", "tag")
+DICTIONARY_TYPE = pa.dictionary(pa.int32(), pa.string())
+
+
+def value_float32() -> bool:
+    """Whether writers should store ``value`` as float32 (PARQUET_VALUE_FLOAT32=1)."""
+    return os.getenv("PARQUET_VALUE_FLOAT32", "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def to_compact_table(data: pd.DataFrame | pa.Table, *, float32: Optional[bool] = None) -> pa.Table:
+    """Return an Arrow table with plant/unit/tag dictionary-encoded (int32 indices).
+
+    ``value`` is cast to float32 when ``float32`` (default: PARQUET_VALUE_FLOAT32)
+    is set. The fixed index width keeps schemas identical across the
+    batches of a streaming ParquetWriter.
+    """
+    table = data if isinstance(data, pa.Table) else pa.Table.from_pandas(data, preserve_index=False)
+    if float32 is None:
+        float32 = value_float32()
+    for name in DICTIONARY_COLUMNS:
+        if name not in table.column_names:
+            continue
+        i = table.column_names.index(name)
+        col = table.column(i)
+        if pa.types.is_dictionary(col.type):
+            if col.type != DICTIONARY_TYPE:
+                col = pc.cast(col, DICTIONARY_TYPE)
+        else:
+            if not pa.types.is_string(col.type):
+                col = pc.cast(col, pa.string())
+            col = pc.cast(col.dictionary_encode(), DICTIONARY_TYPE)
+        table = table.set_column(i, pa.field(name, DICTIONARY_TYPE), col)
+    if "value" in table.column_names:
+        i = table.column_names.index("value")
+        target = pa.float32() if float32 else pa.float64()
+        col = table.column(i)
+        if col.type != target and (pa.types.is_floating(col.type) or pa.types.is_integer(col.type)):
+            table = table.set_column(i, pa.field("value", target), pc.cast(col, target))
+    return table
+
+
+def compact_frame(df: pd.DataFrame, *, float32: Optional[bool] = None) -> pd.DataFrame:
+    """Pandas counterpart of :func:`to_compact_table` (categoricals + optional float32)."""
+    if float32 is None:
+        float32 = value_float32()
+    out = df.copy()
+    for name in DICTIONARY_COLUMNS:
+        if name in out.columns and not isinstance(out[name].dtype, pd.CategoricalDtype):
+            out[name] = out[name].astype("category")
+    if float32 and "value" in out.columns and pd.api.types.is_numeric_dtype(out["value"]):
+        out["value"] = out["value"].astype("float32")
+    return out
+
+
+def table_to_pandas(table: pa.Table) -> pd.DataFrame:
+    """Convert to pandas keeping dictionary columns as categoricals.
+
+    Categories not present in the (filtered) rows are dropped so grouping
+    by tag only yields observed tags, and the rest are sorted so sorting
+    by them orders rows like the plain strings would.
+    """
+    return drop_unused_categories(table.to_pandas())
+
+
+def drop_unused_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """Keep only the observed plant/unit/tag categories, in sorted order (in place)."""
+    for name in DICTIONARY_COLUMNS:
+        if name in df.columns and isinstance(df[name].dtype, pd.CategoricalDtype):
+            col = df[name].cat.remove_unused_categories()
+            cats = list(col.cat.categories)
+            if cats != sorted(cats):
+                col = col.cat.reorder_categories(sorted(cats))
+            df[name] = col
+    return df
+
+
+def decode_dictionary_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Turn plant/unit/tag categoricals back into plain string columns (in place).
+
+    Costs one Python string per row; for callers that ask for it
+    (``as_strings=True`` on the pandas read API).
+    """
+    for name in DICTIONARY_COLUMNS:
+        if name in df.columns and isinstance(df[name].dtype, pd.CategoricalDtype):
+            df[name] = df[name].astype(df[name].cat.categories.dtype)
+    return df
+
+
+def memory_map_default() -> bool:
+    """Whether reads memory-map local files (PARQUET_MEMORY_MAP=1).
+
+    Off by default: on Windows a mapped file cannot be replaced until every
+    table referencing the mapping is released, which would block writers.
+    """
+    return os.getenv("PARQUET_MEMORY_MAP", "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def open_parquet(path: Path | str, *, memory_map: Optional[bool] = None) -> pq.ParquetFile:
+    """Open a Parquet file reading plant/unit/tag as dictionary arrays.
+
+    With ``memory_map`` (default: PARQUET_MEMORY_MAP) uncompressed pages
+    are served straight from the OS page cache instead of a read buffer.
+    """
+    path = str(path)
+    if memory_map is None:
+        memory_map = memory_map_default()
+    names = pq.read_schema(path, memory_map=memory_map).names
+    return pq.ParquetFile(
+        path,
+        read_dictionary=[c for c in DICTIONARY_COLUMNS if c in names],
+        memory_map=memory_map,
+    )
+
+
+def sort_for_write(df: pd.DataFrame, time_col: str = "time") -> pd.DataFrame:
+    """Return ``df`` ordered by time (stable) so row-group time ranges stay narrow."""
+    if time_col not in df.columns or df.empty:
+        return df
+    t = df[time_col]
+    if t.is_monotonic_increasing:
+        return df
+    return df.sort_values(time_col, kind="stable").reset_index(drop=True)
+
+
+def _as_comparable(ts: Any, tz: Optional[str]) -> Optional[pd.Timestamp]:
+    """Coerce ``ts`` to a Timestamp matching the tz-awareness of the column."""
+    if ts is None:
+        return None
+    t = pd.Timestamp(ts)
+    local_tz = datetime.now().astimezone().tzinfo
+    if tz and t.tzinfo is None:
+        t = t.tz_localize(local_tz).tz_convert(tz)
+    elif not tz and t.tzinfo is not None:
+        t = t.tz_convert(local_tz).tz_localize(None)
+    return t
+
+
+def _column_index(pf: pq.ParquetFile, name: str) -> Optional[int]:
+    schema = pf.schema
+    for i in range(len(schema)):
+        if schema.column(i).path == name:
+            return i
+    return None
+
+
+def select_row_groups(
+    pf: pq.ParquetFile,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    tags: Optional[Iterable[str]] = None,
+) -> List[int]:
+    """Return indices of row groups whose statistics may overlap the request.
+
+    Row groups without usable statistics are always kept.
+    """
+    meta = pf.metadata
+    time_idx = _column_index(pf, "time")
+    tag_idx = _column_index(pf, "tag") if tags is not None else None
+    tag_set = sorted(set(tags)) if tags is not None else None
+
+    time_tz = None
+    if time_idx is not None:
+        field_type = pf.schema_arrow.field("time").type
+        if not pa.types.is_timestamp(field_type):
+            time_idx = None  # string/legacy time columns carry no usable ordering
+        else:
+            time_tz = field_type.tz
+    lo = _as_comparable(start, time_tz) if time_idx is not None else None
+    hi = _as_comparable(end, time_tz) if time_idx is not None else None
+
+    keep: List[int] = []
+    for i in range(meta.num_row_groups):
+        rg = meta.row_group(i)
+        if time_idx is not None and (lo is not None or hi is not None):
+            st = rg.column(time_idx).statistics
+            if st is not None and st.has_min_max:
+                rg_min, rg_max = pd.Timestamp(st.min), pd.Timestamp(st.max)
+                if lo is not None and rg_max < lo:
+                    continue
+                if hi is not None and rg_min > hi:
+                    continue
+        if tag_idx is not None and tag_set:
+            st = rg.column(tag_idx).statistics
+            if st is not None and st.has_min_max:
+                if not any(st.min <= t <= st.max for t in tag_set):
+                    continue
+        keep.append(i)
+    return keep
+
+
+def row_group_bytes(pf: pq.ParquetFile, row_groups: Sequence[int], columns: Optional[Sequence[str]] = None) -> int:
+    """Compressed bytes of the selected row groups/columns (what a read must fetch)."""
+    meta = pf.metadata
+    wanted = set(columns) if columns else None
+    total = 0
+    for i in row_groups:
+        rg = meta.row_group(i)
+        for j in range(rg.num_columns):
+            col = rg.column(j)
+            if wanted is None or col.path_in_schema in wanted:
+                total += int(col.total_compressed_size)
+    return total
+
+
+def read_window(
+    path: Path | str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    *,
+    tags: Optional[Iterable[str]] = None,
+    columns: Optional[Sequence[str]] = None,
+    stats: Optional[Dict[str, Any]] = None,
+    memory_map: Optional[bool] = None,
+) -> pa.Table:
+    """Read the rows of ``path`` inside [start, end] (and ``tags``) as an Arrow table.
+
+    Only row groups whose statistics overlap the window are decoded; rows
+    are then filtered exactly. plant/unit/tag come back dictionary-encoded.
+    If ``stats`` is given it receives ``row_groups_total``,
+    ``row_groups_read`` and ``bytes_read``.
+    """
+    pf = open_parquet(path, memory_map=memory_map)
+    tags = list(tags) if tags is not None else None
+    names = pf.schema_arrow.names
+    cols = [c for c in columns if c in names] if columns else None
+    groups = select_row_groups(pf, start, end, tags)
+
+    if stats is not None:
+        stats["row_groups_total"] = pf.metadata.num_row_groups
+        stats["row_groups_read"] = len(groups)
+        stats["bytes_read"] = row_group_bytes(pf, groups, cols)
+
+    # Filter columns must be decoded even if the caller did not ask for them
+    read_cols = cols
+    if cols is not None:
+        extra = [c for c in ("time", "tag") if c in names and c not in cols]
+        read_cols = cols + extra
+    if not groups:
+        table = pf.schema_arrow.empty_table()
+        return table.select(cols) if cols else table
+    table = pf.read_row_groups(groups, columns=read_cols)
+
+    mask = None
+    if "time" in table.column_names and pa.types.is_timestamp(table.schema.field("time").type):
+        ttype = table.schema.field("time").type
+        lo = _as_comparable(start, ttype.tz)
+        hi = _as_comparable(end, ttype.tz)
+        if lo is not None:
+            mask = pc.greater_equal(table["time"], pa.scalar(lo, type=ttype))
+        if hi is not None:
+            m = pc.less_equal(table["time"], pa.scalar(hi, type=ttype))
+            mask = m if mask is None else pc.and_(mask, m)
+    if tags is not None and "tag" in table.column_names:
+        m = pc.is_in(pc.cast(table["tag"], pa.string()), value_set=pa.array(tags, type=pa.string()))
+        mask = m if mask is None else pc.and_(mask, m)
+    if mask is not None:
+        table = table.filter(mask)
+    if cols is not None and read_cols != cols:
+        table = table.select(cols)
+    return table
+
+
+def time_value_arrays(table: pa.Table) -> tuple[np.ndarray, np.ndarray]:
+    """Return ``time`` (int64 epoch ns) and ``value`` (float64) as NumPy arrays.
+
+    Single-chunk columns without nulls are returned as read-only views of
+    the Arrow buffers; otherwise one copy is made (nulls become NaT/NaN).
+    Times are the stored epoch values (naive wall time for the unit files,
+    UTC for tz-aware columns) normalised to nanoseconds.
+    """
+    if table.num_rows == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    time_col = table.column("time")
+    ttype = time_col.type
+    if not pa.types.is_timestamp(ttype):
+        time_col = pc.cast(time_col, pa.timestamp("ns"))
+    elif ttype.unit != "ns":
+        time_col = pc.cast(time_col, pa.timestamp("ns", tz=ttype.tz))
+    time_arr = time_col.combine_chunks() if time_col.num_chunks != 1 else time_col.chunk(0)
+    if time_arr.null_count:
+        times = time_arr.to_numpy(zero_copy_only=False).astype("datetime64[ns]").view(np.int64)
+    else:
+        times = time_arr.view(pa.int64()).to_numpy()
+
+    value_col = table.column("value")
+    if value_col.type != pa.float64():
+        value_col = pc.cast(value_col, pa.float64())
+    value_arr = value_col.combine_chunks() if value_col.num_chunks != 1 else value_col.chunk(0)
+    values = value_arr.to_numpy(zero_copy_only=False)
+    return times, values
@@ -217,7 +217,7 @@ class PolarsOptimizer:
             if df.empty or 'tag' not in df.columns or 'value' not in df.columns:
                 return pd.DataFrame()
             
-            summary = df.groupby('tag').agg({
+            summary = df.groupby('tag', observed=True).agg({
                 'value': ['count', 'mean', 'std', 'min', 'max'],
                 'time': ['min', 'max']
             }).round(3)
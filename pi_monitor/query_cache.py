@@ -0,0 +1,212 @@
+"""
+Byte-bounded LRU cache of unit / unit+tag window reads.
+
+One Option [1] -> Option [2] cycle reads the same unit windows several
+times (scanner, enhanced detection, tag-state dashboard, speed-aware
+analysis, plotter). With a shared :class:`ParquetDatabase` those reads go
+through this cache.
+
+Entries are keyed on the *source* of a read -- the (path, size, mtime) of
+the file(s) it touches plus the unit's delta segments -- together with the
+unit, the tag (None for whole-unit reads) and the window. A changed file
+gives a new key, so stale entries are never served; they simply age out.
+
+Reads are widened to whole PARQUET_QUERY_CACHE_BUCKET buckets (start
+floored, end open when it reaches the present) so that "the last 90 days"
+asked a few seconds apart maps to the same entry, and a request is served
+from any cached entry of the same source whose window covers it, slicing
+rows by time (and by tag when a whole-unit entry answers a tag request).
+
+Total size is bounded by PARQUET_QUERY_CACHE_MB (0 disables the cache);
+least recently used entries are evicted first. :meth:`QueryCache.stats`
+exposes hit/miss/eviction counters for tuning the budget.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import pandas as pd
+
+from .parquet_io import drop_unused_categories
+
+
+def _budget_bytes() -> int:
+    try:
+        return int(float(os.getenv("PARQUET_QUERY_CACHE_MB", "512")) * 1024 * 1024)
+    except ValueError:
+        return 512 * 1024 * 1024
+
+
+def _bucket() -> str:
+    return os.getenv("PARQUET_QUERY_CACHE_BUCKET", "h").strip() or "h"
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    """Approximate in-memory size of ``df`` (object columns estimated from a sample)."""
+    total = int(df.memory_usage(index=True, deep=False).sum())
+    for name in df.columns:
+        col = df[name]
+        if col.dtype == object and len(col):
+            sample = col.iloc[: min(len(col), 64)]
+            per = sum(len(str(v)) + 49 for v in sample) / len(sample)
+            total += int(per * len(col))
+    return total
+
+
+@dataclass
+class _Entry:
+    frame: pd.DataFrame
+    start: Optional[pd.Timestamp]  # None = unbounded
+    end: Optional[pd.Timestamp]  # None = unbounded
+    nbytes: int
+
+    def covers(self, start: Optional[datetime], end: Optional[datetime]) -> bool:
+        if self.start is not None and (start is None or pd.Timestamp(start) < self.start):
+            return False
+        if self.end is not None and (end is None or pd.Timestamp(end) > self.end):
+            return False
+        return True
+
+
+class QueryCache:
+    """LRU of window-read DataFrames bounded by total bytes."""
+
+    def __init__(self, max_bytes: Optional[int] = None, bucket: Optional[str] = None):
+        self.max_bytes = _budget_bytes() if max_bytes is None else int(max_bytes)
+        self.bucket = bucket or _bucket()
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.slice_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    # ------------------------------------------------------------- windows
+    def widen(self, start: Optional[datetime], end: Optional[datetime]) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """Bucket-aligned read window covering [start, end] (open end if it reaches now)."""
+        s = pd.Timestamp(start).floor(self.bucket).to_pydatetime() if start is not None else None
+        if end is None:
+            e = None
+        else:
+            ts = pd.Timestamp(end)
+            now = pd.Timestamp.now(tz=ts.tz) if ts.tz is not None else pd.Timestamp.now()
+            e = None if ts >= now else ts.ceil(self.bucket).to_pydatetime()
+        return s, e
+
+    @staticmethod
+    def slice(frame: pd.DataFrame, start: Optional[datetime], end: Optional[datetime],
+              tag: Optional[str] = None) -> pd.DataFrame:
+        """Rows of ``frame`` inside [start, end] (and ``tag``), as a new frame."""
+        mask = None
+        if "time" in frame.columns:
+            times = frame["time"]
+            if start is not None:
+                mask = times >= pd.Timestamp(start)
+            if end is not None:
+                m = times <= pd.Timestamp(end)
+                mask = m if mask is None else mask & m
+        if tag is not None and "tag" in frame.columns:
+            m = frame["tag"] == tag
+            mask = m if mask is None else mask & m
+        out = frame[mask] if mask is not None else frame.copy()
+        return drop_unused_categories(out.reset_index(drop=True))
+
+    # --------------------------------------------------------------- cache
+    def get(self, source: Hashable, unit: str, tag: Optional[str],
+            start: Optional[datetime], end: Optional[datetime]) -> Optional[pd.DataFrame]:
+        """Cached rows for the request, or None (counted as a miss)."""
+        if not self.enabled:
+            return None
+        candidates = [(source, unit, tag)]
+        if tag is not None:
+            # A whole-unit read of the same source also answers a tag request
+            candidates.append((source, unit, None))
+        with self._lock:
+            for prefix in candidates:
+                for key in reversed(self._entries):
+                    if key[:3] != prefix:
+                        continue
+                    entry = self._entries[key]
+                    if not entry.covers(start, end):
+                        continue
+                    self._entries.move_to_end(key)
+                    exact = prefix[2] == tag and key[3:] == (start, end)
+                    if exact:
+                        self.hits += 1
+                    else:
+                        self.slice_hits += 1
+                    frame = entry.frame
+                    break
+                else:
+                    continue
+                break
+            else:
+                self.misses += 1
+                return None
+        return self.slice(frame, start, end, tag if prefix[2] is None else None)
+
+    def put(self, source: Hashable, unit: str, tag: Optional[str],
+            start: Optional[datetime], end: Optional[datetime], frame: pd.DataFrame) -> bool:
+        """Cache ``frame`` as the rows of the request; returns False if not cached."""
+        if not self.enabled or frame is None or "time" not in frame.columns:
+            return False
+        nbytes = frame_bytes(frame)
+        # A single entry may not take more than half the budget
+        if nbytes > self.max_bytes // 2:
+            with self._lock:
+                self.rejected += 1
+            return False
+        key = (source, unit, tag, start, end)
+        entry = _Entry(
+            frame=frame,
+            start=pd.Timestamp(start) if start is not None else None,
+            end=pd.Timestamp(end) if end is not None else None,
+            nbytes=nbytes,
+        )
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old.nbytes
+            # Entries of the same unit/tag from older file versions are dead weight
+            for k in [k for k in self._entries if k[1:3] == (unit, tag) and k[0] != source]:
+                self.bytes -= self._entries.pop(k).nbytes
+                self.evictions += 1
+            self._entries[key] = entry
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes and self._entries:
+                _, victim = self._entries.popitem(last=False)
+                self.bytes -= victim.nbytes
+                self.evictions += 1
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.slice_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "slice_hits": self.slice_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "rejected": self.rejected,
+                "hit_rate": (self.hits + self.slice_hits) / lookups if lookups else 0.0,
+            }
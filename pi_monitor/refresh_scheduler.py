@@ -0,0 +1,388 @@
+"""
+Concurrent multi-unit refresh scheduler.
+
+``smart_incremental_refresh`` refreshed stale units one after another, so
+one slow ABF fetch held up every PCFS compressor behind it, although the
+plants talk to different PI servers and Excel workbooks.
+:class:`RefreshScheduler` runs unit refresh jobs concurrently:
+
+- per-source caps: a job's ``source`` (PI server / workbook, by default
+  the plant family PCFS, PCMSB or ABF) runs at most
+  REFRESH_SOURCE_CONCURRENCY jobs at once (default 1: units of a plant
+  share its workbook); REFRESH_SOURCE_LIMITS="PCFS=2,ABF=1" overrides per
+  source. Queued jobs of a busy source are skipped, not waited on.
+- at most REFRESH_MAX_WORKERS jobs overall (default 4),
+- memory-aware admission: a job starts only while the memory reserved by
+  running jobs plus its estimate stays within REFRESH_MEMORY_BUDGET_MB
+  (default 60% of RAM) and the machine keeps REFRESH_MIN_FREE_MB free;
+  with nothing running the next job is always admitted,
+- per-job timeouts (REFRESH_JOB_TIMEOUT_S, default 1 hour).
+
+Jobs run in spawned worker processes by default (``isolation="process"``):
+a timed-out job is terminated, Excel COM state stays per process and each
+job's output goes to ``logs/refresh/<plant>_<unit>.log`` instead of
+interleaving on the console. ``isolation="thread"`` runs jobs in threads
+of this process (timed-out threads are abandoned, their source stays busy
+until they return).
+
+Every job yields a :class:`JobResult` (status, rows added, tags, timings,
+error), whatever happened to the others.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+try:  # optional dependency
+    import psutil
+except ImportError:  # pragma: no cover - exercised where psutil is missing
+    psutil = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+OK = "ok"
+FAILED = "failed"  # the job reported success=False
+ERROR = "error"  # the job raised
+TIMEOUT = "timeout"
+CRASHED = "crashed"  # the worker process died without a result
+
+DEFAULT_LOG_DIR = Path(__file__).parent.parent / "logs" / "refresh"
+
+
+def refresh_parallel_enabled() -> bool:
+    return os.getenv("REFRESH_PARALLEL", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def source_for(plant: str) -> str:
+    """Concurrency group of a plant's units: REFRESH_SOURCE_<PLANT> or the plant family."""
+    override = os.getenv(f"REFRESH_SOURCE_{re.sub(r'[^A-Z0-9]', '_', plant.upper())}")
+    if override:
+        return override.strip()
+    p = plant.upper()
+    for family in ("PCFS", "PCMSB", "ABF"):
+        if p.startswith(family):
+            return family
+    return "PCMSB" if p.startswith("PCM") else p
+
+
+def _source_limits() -> Dict[str, int]:
+    limits: Dict[str, int] = {}
+    for part in (os.getenv("REFRESH_SOURCE_LIMITS") or "").split(","):
+        name, _, n = part.partition("=")
+        if name.strip() and n.strip().isdigit():
+            limits[name.strip()] = max(1, int(n))
+    return limits
+
+
+def memory_mb() -> Tuple[Optional[float], Optional[float]]:
+    """(total, available) system memory in MB, (None, None) when unknown."""
+    if psutil is not None:
+        vm = psutil.virtual_memory()
+        return vm.total / 2**20, vm.available / 2**20
+    try:
+        info = {}
+        with open("/proc/meminfo", encoding="ascii") as fh:
+            for line in fh:
+                key, _, rest = line.partition(":")
+                info[key] = float(rest.split()[0]) / 1024  # kB -> MB
+        return info.get("MemTotal"), info.get("MemAvailable")
+    except (OSError, ValueError, IndexError):
+        pass
+    if sys.platform == "win32":
+        try:
+            import ctypes
+
+            class _MemoryStatus(ctypes.Structure):
+                _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                            ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                            ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                            ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                            ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+            st = _MemoryStatus()
+            st.dwLength = ctypes.sizeof(_MemoryStatus)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(st)):
+                return st.ullTotalPhys / 2**20, st.ullAvailPhys / 2**20
+        except Exception:
+            pass
+    return None, None
+
+
+def estimate_unit_memory_mb(processed_dir: Path, unit: str) -> float:
+    """Working-set estimate of refreshing ``unit``: REFRESH_JOB_MEMORY_MB or ~6x its Parquet size."""
+    fixed = os.getenv("REFRESH_JOB_MEMORY_MB")
+    if fixed:
+        return float(fixed)
+    size = 0
+    for p in Path(processed_dir).glob(f"{unit}_*.parquet"):
+        try:
+            size = max(size, p.stat().st_size)
+        except OSError:
+            continue
+    return max(512.0, 6.0 * size / 2**20)
+
+
+@dataclass
+class RefreshJob:
+    plant: str
+    unit: str
+    target: Callable[..., Any]  # module-level callable for process isolation; returns a result dict
+    args: Tuple[Any, ...] = ()
+    source: Optional[str] = None  # None: source_for(plant)
+    timeout_s: Optional[float] = None  # None: REFRESH_JOB_TIMEOUT_S
+    memory_mb: Optional[float] = None  # None: REFRESH_JOB_MEMORY_MB or 1024
+
+    @property
+    def key(self) -> str:
+        return f"{self.plant}/{self.unit}"
+
+
+@dataclass
+class JobResult:
+    plant: str
+    unit: str
+    source: str
+    status: str
+    success: bool
+    rows_added: int = 0
+    total_tags: int = 0
+    active_tags: int = 0
+    queued_s: float = 0.0
+    duration_s: float = 0.0
+    started: Optional[str] = None
+    error: Optional[str] = None
+    log_path: Optional[str] = None
+    detail: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Result dict with the keys of ``simple_refresh_unit`` plus scheduling fields."""
+        return asdict(self)
+
+
+def _run_in_child(conn: Any, target: Callable[..., Any], args: Tuple[Any, ...], log_path: Optional[str]) -> None:
+    """Worker process entry point: run ``target`` and send (status, payload) back."""
+    if log_path:
+        log = open(log_path, "a", encoding="utf-8", buffering=1)
+        sys.stdout = sys.stderr = log
+    try:
+        conn.send((OK, target(*args)))
+    except BaseException as e:  # report everything, including SystemExit
+        traceback.print_exc()
+        conn.send((ERROR, f"{type(e).__name__}: {e}"))
+    finally:
+        try:
+            sys.stdout.flush()
+        except Exception:
+            pass
+        conn.close()
+
+
+class _Running:
+    """A started job: its worker, deadline and reserved memory."""
+
+    def __init__(self, job: RefreshJob, source: str, timeout_s: float, memory: float, queued_s: float) -> None:
+        self.job = job
+        self.source = source
+        self.memory = memory
+        self.queued_s = queued_s
+        self.started = time.monotonic()
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.deadline = self.started + timeout_s if timeout_s > 0 else None
+        self.reported = False  # thread jobs past their timeout keep running unreported
+        self.log_path: Optional[str] = None
+        self._outcome: Optional[Tuple[str, Any]] = None
+        self._proc: Any = None
+        self._conn: Any = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start_process(self, ctx: Any, log_path: Path) -> None:
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        self.log_path = str(log_path)
+        parent, child = ctx.Pipe(duplex=False)
+        self._proc = ctx.Process(target=_run_in_child, args=(child, self.job.target, self.job.args, self.log_path),
+                                 name=f"refresh-{self.job.unit}", daemon=True)
+        self._proc.start()
+        child.close()
+        self._conn = parent
+
+    def start_thread(self) -> None:
+        def run() -> None:
+            try:
+                self._outcome = (OK, self.job.target(*self.job.args))
+            except BaseException as e:
+                logger.debug("Refresh job %s raised", self.job.key, exc_info=True)
+                self._outcome = (ERROR, f"{type(e).__name__}: {e}")
+
+        self._thread = threading.Thread(target=run, name=f"refresh-{self.job.unit}", daemon=True)
+        self._thread.start()
+
+    def poll(self) -> Optional[Tuple[str, Any]]:
+        """(status, payload) once the job has finished, else None."""
+        if self._thread is not None:
+            return None if self._thread.is_alive() else self._outcome or (CRASHED, "no result")
+        try:
+            if self._conn.poll():
+                outcome = self._conn.recv()
+                self._proc.join(5)
+                return outcome
+        except (EOFError, OSError):
+            pass
+        if not self._proc.is_alive():
+            return CRASHED, f"worker exited with code {self._proc.exitcode}"
+        return None
+
+    def alive(self) -> bool:
+        if self._thread is not None:
+            return self._thread.is_alive()
+        return self._proc is not None and self._proc.is_alive()
+
+    def kill(self) -> None:
+        if self._proc is not None and self._proc.is_alive():
+            self._proc.terminate()
+            self._proc.join(5)
+            if self._proc.is_alive():
+                self._proc.kill()
+                self._proc.join(5)
+
+
+class RefreshScheduler:
+    """Runs :class:`RefreshJob` s with per-source caps, memory admission and timeouts."""
+
+    def __init__(
+        self,
+        *,
+        max_workers: Optional[int] = None,
+        source_limits: Optional[Dict[str, int]] = None,
+        default_source_limit: Optional[int] = None,
+        memory_budget_mb: Optional[float] = None,
+        min_free_mb: Optional[float] = None,
+        job_timeout_s: Optional[float] = None,
+        isolation: str = "process",
+        log_dir: Optional[Path] = None,
+        poll_s: float = 0.2,
+    ) -> None:
+        if isolation not in ("process", "thread"):
+            raise ValueError(f"isolation must be 'process' or 'thread', not {isolation!r}")
+        self.max_workers = max(1, max_workers or int(os.getenv("REFRESH_MAX_WORKERS", "4")))
+        self.source_limits = {**_source_limits(), **(source_limits or {})}
+        self.default_source_limit = max(
+            1, default_source_limit or int(os.getenv("REFRESH_SOURCE_CONCURRENCY", "1")))
+        total, _ = memory_mb()
+        budget = memory_budget_mb if memory_budget_mb is not None else float(
+            os.getenv("REFRESH_MEMORY_BUDGET_MB", "0") or 0) or (0.6 * total if total else 0.0)
+        self.memory_budget_mb = budget or None
+        self.min_free_mb = float(os.getenv("REFRESH_MIN_FREE_MB", "1024")) if min_free_mb is None else min_free_mb
+        self.job_timeout_s = float(os.getenv("REFRESH_JOB_TIMEOUT_S", "3600")) if job_timeout_s is None else job_timeout_s
+        self.default_job_memory_mb = float(os.getenv("REFRESH_JOB_MEMORY_MB", "1024"))
+        self.isolation = isolation
+        self.log_dir = Path(log_dir) if log_dir is not None else DEFAULT_LOG_DIR
+        self.poll_s = poll_s
+        self._ctx = multiprocessing.get_context("spawn") if isolation == "process" else None
+
+    # ------------------------------------------------------------- admission
+    def limit_for(self, source: str) -> int:
+        return self.source_limits.get(source, self.default_source_limit)
+
+    def _admissible(self, memory: float, running: List[_Running]) -> bool:
+        if not running:
+            return True  # never stall: one job always runs
+        if self.memory_budget_mb and sum(r.memory for r in running) + memory > self.memory_budget_mb:
+            return False
+        _, available = memory_mb()
+        return available is None or available - memory >= self.min_free_mb
+
+    def _start(self, job: RefreshJob, source: str, queued_s: float) -> _Running:
+        timeout = job.timeout_s if job.timeout_s is not None else self.job_timeout_s
+        memory = job.memory_mb if job.memory_mb is not None else self.default_job_memory_mb
+        r = _Running(job, source, timeout, memory, queued_s)
+        if self.isolation == "process":
+            slug = re.sub(r"[^A-Za-z0-9._-]", "_", f"{job.plant}_{job.unit}")
+            r.start_process(self._ctx, self.log_dir / f"{slug}.log")
+        else:
+            r.start_thread()
+        return r
+
+    # ------------------------------------------------------------------- run
+    def run(self, jobs: Iterable[RefreshJob],
+            on_event: Optional[Callable[[str], None]] = None) -> Dict[str, JobResult]:
+        """Run ``jobs``; returns ``plant/unit`` -> :class:`JobResult` in submission order."""
+        jobs = list(jobs)
+        emit = on_event or (lambda msg: logger.info(msg))
+        began = time.monotonic()
+        pending: Deque[RefreshJob] = deque(jobs)
+        running: List[_Running] = []
+        results: Dict[str, JobResult] = {}
+
+        while pending or any(not r.reported for r in running):
+            now = time.monotonic()
+            for r in list(running):
+                outcome = r.poll()
+                if outcome is None and not r.reported and r.deadline is not None and now > r.deadline:
+                    r.kill()
+                    timeout = r.deadline - r.started
+                    outcome = (TIMEOUT, f"no result after {timeout:.0f}s"
+                               + ("" if self.isolation == "process" else " (thread abandoned)"))
+                if outcome is None:
+                    continue
+                if not r.reported:
+                    res = self._result(r, *outcome)
+                    results[r.job.key] = res
+                    r.reported = True
+                    emit(f"[refresh] {res.status.upper():7s} {r.job.key} ({res.duration_s:.1f}s, "
+                         f"{res.rows_added:,} rows){' - ' + res.error if res.error else ''}")
+                if not r.alive():  # an abandoned thread keeps its slot until it returns
+                    running.remove(r)
+
+            busy: Dict[str, int] = {}
+            for r in running:
+                busy[r.source] = busy.get(r.source, 0) + 1
+            for job in list(pending):
+                if len(running) >= self.max_workers:
+                    break
+                source = job.source or source_for(job.plant)
+                if busy.get(source, 0) >= self.limit_for(source):
+                    continue  # a slow source does not hold up the others
+                memory = job.memory_mb if job.memory_mb is not None else self.default_job_memory_mb
+                if not self._admissible(memory, running):
+                    break  # keep submission order for memory; retry next round
+                pending.remove(job)
+                running.append(self._start(job, source, time.monotonic() - began))
+                busy[source] = busy.get(source, 0) + 1
+                emit(f"[refresh] START   {job.key} (source {source}, {busy[source]}/{self.limit_for(source)}, "
+                     f"{len(running)} running)")
+            if pending or any(not r.reported for r in running):
+                time.sleep(self.poll_s)
+
+        return {j.key: results[j.key] for j in jobs if j.key in results}
+
+    def _result(self, r: _Running, status: str, payload: Any) -> JobResult:
+        res = JobResult(plant=r.job.plant, unit=r.job.unit, source=r.source, status=status, success=False,
+                        queued_s=round(r.queued_s, 3), duration_s=round(time.monotonic() - r.started, 3),
+                        started=r.started_at, log_path=r.log_path)
+        if status != OK:
+            res.error = str(payload)
+            return res
+        detail = payload if isinstance(payload, dict) else {"success": bool(payload)}
+        res.detail = detail
+        res.success = bool(detail.get("success"))
+        res.status = OK if res.success else FAILED
+        for k in ("rows_added", "total_tags", "active_tags"):
+            try:
+                setattr(res, k, int(detail.get(k) or 0))
+            except (TypeError, ValueError):
+                pass
+        if not res.success:
+            res.error = detail.get("error")
+        return res
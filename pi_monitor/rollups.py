@@ -0,0 +1,641 @@
+"""
+Multi-resolution per-tag rollups (1h, 1d) for plotting and extremes.
+
+Plots of long windows and one-year MIN/MAX lookups used to scan raw
+6-minute rows. The rollup store keeps, per unit and level, one row per
+(tag, bucket) with ``min``, ``max``, ``mean``, ``count`` and ``last``:
+
+    data/processed/rollups/<unit>/1h/<YYYY-MM>.parquet
+    data/processed/rollups/<unit>/1d/<YYYY>.parquet
+    data/processed/rollups/<unit>/state.json
+
+Partition files are sorted by (tag, time) in small row groups, so a single
+tag's window decodes a few row groups through :func:`parquet_io.read_window`.
+``state.json`` records per level the span of closed buckets that are stored
+(``from`` .. ``through``, end exclusive).
+
+:meth:`RollupStore.update` adds buckets that closed since the last update:
+hourly buckets from the new raw rows, daily buckets from the hourly level.
+Only the partitions that received buckets are rewritten. The bucket that is
+still open is never stored; queries compute it live from raw rows. Rows
+written into hours that are already stored (lagging tags, delta overwrites,
+backfills) are reported through ``changed_from`` or the
+:func:`note_rows_written` hook (a ``changed`` marker in the unit directory);
+the next update re-aggregates those hours and the days above them, and reads
+take the marked span from raw rows until then.
+
+:meth:`RollupStore.ingest_hourly` stores server-side hourly summaries
+(``fetch_tags_via_webapi(mode="summary")``) as the 1h level directly, so
+long backfills do not fetch and aggregate raw rows.
+
+:meth:`RollupStore.query` picks the coarsest resolution that still fits a
+point budget (raw rows when the window is short enough), and
+:meth:`RollupStore.extremes` answers exact MIN/MAX by covering the window with
+whole daily buckets, then whole hourly buckets, then raw rows at the edges.
+Reads never build or update the store (``update=False`` by default); the
+unit refresh hook does, so a plot loop does not wait for a 400-day build.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .feature_store import _clear_mark, _earliest_naive, _merge_mark, _read_mark
+from .parquet_io import read_window
+from .tag_manifest import _naive_local
+
+logger = logging.getLogger(__name__)
+
+ROLLUPS_DIRNAME = "rollups"
+CHANGED_FILE = "changed"
+STATE_VERSION = 1
+
+# (level name, bucket rule, partition period); finest first
+LEVELS: Tuple[Tuple[str, str, str], ...] = (
+    ("1h", "h", "M"),
+    ("1d", "D", "Y"),
+)
+ROLLUP_COLUMNS = ["time", "tag", "min", "max", "mean", "count", "last"]
+
+
+def _history_days() -> int:
+    return int(os.getenv("ROLLUP_HISTORY_DAYS", "400"))
+
+
+def _build_chunk_days() -> int:
+    return max(1, int(os.getenv("ROLLUP_BUILD_CHUNK_DAYS", "31")))
+
+
+def _row_group_rows() -> int:
+    return max(1024, int(os.getenv("ROLLUP_ROW_GROUP_ROWS", "8192")))
+
+
+def raw_interval() -> pd.Timedelta:
+    """Nominal spacing of raw rows, used to estimate raw point counts (ROLLUP_RAW_INTERVAL_MIN)."""
+    return pd.Timedelta(minutes=float(os.getenv("ROLLUP_RAW_INTERVAL_MIN", "6")))
+
+
+def _rule_delta(rule: str) -> pd.Timedelta:
+    return pd.to_timedelta(rule if rule[0].isdigit() else f"1{rule}")
+
+
+def _unit_token(unit: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", unit)
+
+
+def _empty_rollup() -> pd.DataFrame:
+    return pd.DataFrame({
+        "time": pd.Series([], dtype="datetime64[ns]"),
+        "tag": pd.Series([], dtype=object),
+        "min": pd.Series([], dtype="float64"),
+        "max": pd.Series([], dtype="float64"),
+        "mean": pd.Series([], dtype="float64"),
+        "count": pd.Series([], dtype="int64"),
+        "last": pd.Series([], dtype="float64"),
+    })
+
+
+def rollup_long(df: pd.DataFrame, rule: str) -> pd.DataFrame:
+    """Per (tag, bucket) min/max/mean/count/last of long rows (time, tag, value).
+
+    ``last`` is the last non-null value of the bucket in time order; buckets
+    whose values are all null have ``count`` 0 and NaN statistics.
+    """
+    if df is None or df.empty or not {"time", "tag", "value"}.issubset(df.columns):
+        return _empty_rollup()
+    times = pd.to_datetime(df["time"], errors="coerce")
+    tag = df["tag"]
+    if isinstance(tag.dtype, pd.CategoricalDtype):
+        tag = tag.astype(str)
+    frame = pd.DataFrame({
+        "ts": times.to_numpy(),
+        "tag": tag.to_numpy(),
+        "value": pd.to_numeric(df["value"], errors="coerce").to_numpy(),
+    }).dropna(subset=["ts", "tag"])
+    if frame.empty:
+        return _empty_rollup()
+    frame = frame.sort_values("ts", kind="stable")
+    frame["time"] = frame["ts"].dt.floor(rule)
+    out = frame.groupby(["tag", "time"], sort=True)["value"].agg(["min", "max", "mean", "count", "last"])
+    out = out.reset_index()
+    out["count"] = out["count"].astype("int64")
+    return out[ROLLUP_COLUMNS]
+
+
+def combine_rollups(rollup: pd.DataFrame, rule: str) -> pd.DataFrame:
+    """Coarsen finer rollup rows to ``rule`` buckets (count-weighted mean)."""
+    if rollup is None or rollup.empty:
+        return _empty_rollup()
+    frame = rollup.sort_values(["tag", "time"], kind="stable").copy()
+    frame["tag"] = frame["tag"].astype(str)
+    frame["bucket"] = pd.to_datetime(frame["time"]).dt.floor(rule)
+    frame["wsum"] = frame["mean"].fillna(0.0) * frame["count"]
+    g = frame.groupby(["tag", "bucket"], sort=True)
+    out = pd.DataFrame({
+        "min": g["min"].min(),
+        "max": g["max"].max(),
+        "wsum": g["wsum"].sum(),
+        "count": g["count"].sum().astype("int64"),
+        "last": g["last"].last(),
+    })
+    out["mean"] = np.where(out["count"] > 0, out["wsum"] / out["count"].where(out["count"] > 0, 1), np.nan)
+    out = out.reset_index().rename(columns={"bucket": "time"})
+    return out[ROLLUP_COLUMNS]
+
+
+def summary_as_rollup(df: pd.DataFrame) -> pd.DataFrame:
+    """Hourly rollup rows of a summary fetch (time, value=mean, min, max, tag).
+
+    Times become naive local like the rest of the store; ``count`` is the
+    number of raw intervals in the hour (time-weighted summaries have no
+    event count) and ``last`` is unknown (NaN).
+    """
+    if df is None or df.empty or not {"time", "tag", "value", "min", "max"}.issubset(df.columns):
+        return _empty_rollup()
+    mean = pd.to_numeric(df["value"], errors="coerce").astype("float64")
+    out = pd.DataFrame({
+        "time": _naive_local(df["time"]).dt.floor("h").to_numpy(),
+        "tag": df["tag"].astype(str).to_numpy(),
+        "min": pd.to_numeric(df["min"], errors="coerce").astype("float64").to_numpy(),
+        "max": pd.to_numeric(df["max"], errors="coerce").astype("float64").to_numpy(),
+        "mean": mean.to_numpy(),
+        "count": np.where(mean.notna(), int(pd.Timedelta(hours=1) / raw_interval()), 0).astype("int64"),
+        "last": np.nan,
+    })
+    out = out.dropna(subset=["time"]).drop_duplicates(subset=["tag", "time"], keep="last")
+    return out.sort_values(["tag", "time"], kind="stable").reset_index(drop=True)[ROLLUP_COLUMNS]
+
+
+def _raw_as_rollup(df: pd.DataFrame) -> pd.DataFrame:
+    """Raw rows in rollup shape (one point per row, count 1)."""
+    if df is None or df.empty:
+        return _empty_rollup()
+    v = pd.to_numeric(df["value"], errors="coerce").astype("float64")
+    out = pd.DataFrame({
+        "time": pd.to_datetime(df["time"]).to_numpy(),
+        "tag": df["tag"].astype(str).to_numpy() if "tag" in df.columns else "",
+        "min": v.to_numpy(),
+        "max": v.to_numpy(),
+        "mean": v.to_numpy(),
+        "count": v.notna().astype("int64").to_numpy(),
+        "last": v.to_numpy(),
+    })
+    return out.sort_values("time", kind="stable").reset_index(drop=True)
+
+
+def note_rows_written(processed_dir: Path | str, unit: Optional[str], earliest: Any) -> None:
+    """Writer hook: mark the rollups of ``unit`` stale from ``earliest`` on.
+
+    Only acts when ``unit`` already has rollups. Cheap (no data is read) and
+    best-effort: failures are logged, never raised.
+    """
+    try:
+        if not unit or earliest is None:
+            return
+        unit_dir = Path(processed_dir) / ROLLUPS_DIRNAME / _unit_token(unit)
+        if not (unit_dir / "state.json").exists():
+            return
+        ts = _earliest_naive(earliest)
+        if ts is not None:
+            _merge_mark(unit_dir / CHANGED_FILE, ts)
+    except Exception as e:
+        logger.debug(f"Rollup marker failed for {unit} in {processed_dir}: {e}")
+
+
+class RollupStore:
+    """Per-unit rollup pyramid backed by partitioned Parquet files."""
+
+    def __init__(self, db: Any):
+        # db: ParquetDatabase (kept untyped to avoid an import cycle)
+        self.db = db
+        self.root = Path(db.processed_dir) / ROLLUPS_DIRNAME
+
+    # ---------------------------------------------------------------- paths
+    def unit_dir(self, unit: str) -> Path:
+        return self.root / _unit_token(unit)
+
+    def _state_path(self, unit: str) -> Path:
+        return self.unit_dir(unit) / "state.json"
+
+    @staticmethod
+    def _partition_key(ts: pd.Timestamp, period: str) -> str:
+        return f"{ts.year:04d}-{ts.month:02d}" if period == "M" else f"{ts.year:04d}"
+
+    @staticmethod
+    def _partition_bounds(key: str, period: str) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        start = pd.Timestamp(f"{key}-01") if period == "M" else pd.Timestamp(f"{key}-01-01")
+        end = start + (pd.DateOffset(months=1) if period == "M" else pd.DateOffset(years=1))
+        return start, end
+
+    def _partition_path(self, unit: str, level: str, key: str) -> Path:
+        return self.unit_dir(unit) / level / f"{key}.parquet"
+
+    def _partitions(self, unit: str, level: str, period: str,
+                    start: Optional[pd.Timestamp], end: Optional[pd.Timestamp]) -> List[Path]:
+        level_dir = self.unit_dir(unit) / level
+        if not level_dir.exists():
+            return []
+        out = []
+        for p in sorted(level_dir.glob("*.parquet")):
+            try:
+                lo, hi = self._partition_bounds(p.stem, period)
+            except Exception:
+                continue
+            if (end is None or lo <= end) and (start is None or hi > start):
+                out.append(p)
+        return out
+
+    # ---------------------------------------------------------------- state
+    def _load_state(self, unit: str) -> Dict[str, Dict[str, pd.Timestamp]]:
+        path = self._state_path(unit)
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if raw.get("version") != STATE_VERSION:
+            return {}
+        levels = {}
+        for name, info in (raw.get("levels") or {}).items():
+            try:
+                levels[name] = {"from": pd.Timestamp(info["from"]), "through": pd.Timestamp(info["through"])}
+            except Exception:
+                continue
+        return levels
+
+    def _save_state(self, unit: str, levels: Dict[str, Dict[str, pd.Timestamp]]) -> None:
+        path = self._state_path(unit)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": STATE_VERSION,
+            "updated": datetime.now().isoformat(),
+            "levels": {
+                name: {"from": info["from"].isoformat(), "through": info["through"].isoformat()}
+                for name, info in levels.items()
+            },
+        }
+        tmp = path.with_name(path.name + f".tmp-{os.getpid()}")
+        tmp.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def has_unit(self, unit: str) -> bool:
+        return bool(self._load_state(unit))
+
+    def pending_change(self, unit: str) -> Optional[pd.Timestamp]:
+        """Earliest time written since the rollups of ``unit`` were last updated, if any."""
+        return _read_mark(self.unit_dir(unit) / CHANGED_FILE)
+
+    # --------------------------------------------------------------- writes
+    def _write_partition(self, path: Path, frame: pd.DataFrame) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        frame = frame.sort_values(["tag", "time"], kind="stable").reset_index(drop=True)
+        frame["tag"] = frame["tag"].astype("category")
+        table = pa.Table.from_pandas(frame[ROLLUP_COLUMNS], preserve_index=False)
+        tmp = path.with_name(path.name + f".tmp-{os.getpid()}")
+        pq.write_table(table, tmp, compression="zstd", row_group_size=_row_group_rows())
+        os.replace(tmp, path)
+
+    def _merge(self, unit: str, level: str, period: str, new: pd.DataFrame) -> None:
+        """Fold ``new`` buckets into the partitions they belong to (new rows win)."""
+        if new.empty:
+            return
+        keys = new["time"].map(lambda t: self._partition_key(t, period))
+        for key, part in new.groupby(keys, sort=True):
+            path = self._partition_path(unit, level, key)
+            if path.exists():
+                old = pd.read_parquet(path)
+                old["tag"] = old["tag"].astype(str)
+                part = pd.concat([old, part], ignore_index=True)
+                part = part.drop_duplicates(subset=["tag", "time"], keep="last")
+            self._write_partition(path, part)
+
+    def _trim(self, unit: str, level: str, period: str, keep_from: pd.Timestamp) -> Optional[pd.Timestamp]:
+        """Drop partitions that end before ``keep_from``; return the new coverage floor."""
+        floor = None
+        for p in self._partitions(unit, level, period, None, None):
+            lo, hi = self._partition_bounds(p.stem, period)
+            if hi <= keep_from:
+                p.unlink(missing_ok=True)
+                floor = hi if floor is None else max(floor, hi)
+        return floor
+
+    def _read_level(self, unit: str, level: str, period: str, tag: Optional[str],
+                    start: Optional[pd.Timestamp], end: Optional[pd.Timestamp]) -> pd.DataFrame:
+        """Stored buckets of ``level`` with bucket start in [start, end)."""
+        parts = []
+        tags = [tag] if tag is not None else None
+        for path in self._partitions(unit, level, period, start, end):
+            table = read_window(path, start, end, tags=tags, columns=ROLLUP_COLUMNS)
+            if table.num_rows:
+                parts.append(table.to_pandas())
+        if not parts:
+            return _empty_rollup()
+        df = pd.concat(parts, ignore_index=True)
+        df["tag"] = df["tag"].astype(str)
+        if end is not None:
+            df = df[df["time"] < end]
+        return df.sort_values(["tag", "time"], kind="stable").reset_index(drop=True)
+
+    # --------------------------------------------------------------- update
+    def update(self, unit: str, *, changed_from: Optional[datetime] = None) -> Dict[str, int]:
+        """Add the buckets of ``unit`` that closed since the last update.
+
+        The first call builds ROLLUP_HISTORY_DAYS of history, reading raw rows
+        in ROLLUP_BUILD_CHUNK_DAYS chunks. Stored hours from ``changed_from``
+        (or a pending :func:`note_rows_written` marker, whichever is earlier)
+        on are re-aggregated, and the coarser buckets above them rebuilt.
+        Returns buckets written per level.
+        """
+        added = {name: 0 for name, _, _ in LEVELS}
+        mark_path = self.unit_dir(unit) / CHANGED_FILE
+        marked = _read_mark(mark_path)
+        dirty = [t for t in (marked, _earliest_naive(changed_from) if changed_from is not None else None)
+                 if t is not None]
+        latest = self.db.get_latest_timestamp(unit)
+        if latest is None or pd.isna(latest):
+            return added
+        latest = pd.Timestamp(latest)
+        state = self._load_state(unit)
+        keep_days = pd.Timedelta(days=_history_days())
+
+        # Hourly level from raw rows
+        h_name, h_rule, h_period = LEVELS[0]
+        h_closed = latest.floor(h_rule)
+        h_info = state.get(h_name)
+        # A fresh build starts on a day boundary so the daily level is complete
+        h_start = h_info["through"] if h_info else (latest - keep_days).floor("D")
+        redo = None
+        if h_info and dirty and min(dirty).floor(h_rule) < h_start:
+            # Rows landed in stored hours; re-aggregate them
+            h_start = redo = max(min(dirty).floor(h_rule), h_info["from"])
+        new_parts = []
+        chunk = pd.Timedelta(days=_build_chunk_days())
+        lo = h_start
+        while lo < h_closed:
+            hi = min(lo + chunk, h_closed)
+            raw = self.db.get_unit_data(unit, start_time=lo.to_pydatetime(), end_time=hi.to_pydatetime())
+            if raw is not None and not raw.empty:
+                raw = raw[pd.to_datetime(raw["time"]) < hi]
+                part = rollup_long(raw, h_rule)
+                if not part.empty:
+                    new_parts.append(part)
+            lo = hi
+        if h_start < h_closed:
+            new_h = pd.concat(new_parts, ignore_index=True) if new_parts else _empty_rollup()
+            self._merge(unit, h_name, h_period, new_h)
+            h_from = h_info["from"] if h_info else h_start
+            floor = self._trim(unit, h_name, h_period, h_closed - keep_days)
+            state[h_name] = {"from": max(h_from, floor) if floor is not None else h_from, "through": h_closed}
+            added[h_name] = len(new_h)
+
+        # Coarser levels from the level below
+        for (f_name, _, f_period), (name, rule, period) in zip(LEVELS, LEVELS[1:]):
+            f_info = state.get(f_name)
+            if not f_info:
+                break
+            closed = f_info["through"].floor(rule)
+            info = state.get(name)
+            start = info["through"] if info else f_info["from"].ceil(rule)
+            if info and redo is not None:
+                start = redo = min(start, max(redo.floor(rule), info["from"]))
+            if start >= closed:
+                continue
+            finer = self._read_level(unit, f_name, f_period, None, start, closed)
+            new = combine_rollups(finer, rule)
+            self._merge(unit, name, period, new)
+            c_from = info["from"] if info else start
+            floor = self._trim(unit, name, period, closed - keep_days)
+            state[name] = {"from": max(c_from, floor) if floor is not None else c_from, "through": closed}
+            added[name] = len(new)
+
+        if any(added.values()) or state != self._load_state(unit):
+            self._save_state(unit, state)
+            logger.info(f"Rollups {unit}: " + ", ".join(f"+{n} {k}" for k, n in added.items()))
+        _clear_mark(mark_path, marked)
+        return added
+
+    def ingest_hourly(self, unit: str, summaries: pd.DataFrame, start: Any = None, end: Any = None) -> Dict[str, int]:
+        """Store server-side hourly summaries of ``unit`` as its 1h level.
+
+        ``summaries`` is the frame of ``fetch_tags_via_webapi(mode="summary")``
+        over [start, end) (defaults: the span of its buckets). The span must
+        overlap or touch the stored hourly span, so coverage stays
+        contiguous; daily buckets inside it are rebuilt from the hourly level.
+        Returns buckets written per level.
+        """
+        added = {name: 0 for name, _, _ in LEVELS}
+        new = summary_as_rollup(summaries)
+        h_name, h_rule, h_period = LEVELS[0]
+
+        def bound(t: Any) -> pd.Timestamp:
+            return _naive_local(pd.Series([pd.Timestamp(t)])).iloc[0]
+
+        lo = bound(start).ceil(h_rule) if start is not None else (new["time"].min() if not new.empty else None)
+        hi = bound(end).floor(h_rule) if end is not None else (
+            new["time"].max() + _rule_delta(h_rule) if not new.empty else None)
+        if lo is None or hi is None or lo >= hi:
+            return added
+        state = self._load_state(unit)
+        h_info = state.get(h_name)
+        if h_info and (hi < h_info["from"] or lo > h_info["through"]):
+            raise ValueError(f"Hourly summaries {lo}..{hi} of {unit} would leave a gap to the stored "
+                             f"{h_info['from']}..{h_info['through']}")
+        new = new[(new["time"] >= lo) & (new["time"] < hi)]
+        self._merge(unit, h_name, h_period, new)
+        state[h_name] = {"from": min(lo, h_info["from"]) if h_info else lo,
+                         "through": max(hi, h_info["through"]) if h_info else hi}
+        added[h_name] = len(new)
+
+        # Whole coarser buckets inside the new span, joined to the stored ones
+        for (f_name, _, f_period), (name, rule, period) in zip(LEVELS, LEVELS[1:]):
+            f_info = state[f_name]
+            a = max(lo.floor(rule), f_info["from"].ceil(rule))
+            b = min(hi.ceil(rule), f_info["through"].floor(rule))
+            info = state.get(name)
+            if info:
+                a, b = min(a, info["through"]), max(b, info["from"])
+            if a >= b:
+                continue
+            coarse = combine_rollups(self._read_level(unit, f_name, f_period, None, a, b), rule)
+            self._merge(unit, name, period, coarse)
+            state[name] = {"from": min(a, info["from"]) if info else a,
+                           "through": max(b, info["through"]) if info else b}
+            added[name] = len(coarse)
+            lo, hi = a, b
+
+        self._save_state(unit, state)
+        logger.info(f"Rollups {unit}: ingested summaries " + ", ".join(f"+{n} {k}" for k, n in added.items()))
+        return added
+
+    def update_existing(self, unit: str, changed_from: Optional[datetime] = None) -> int:
+        """Bring the rollups of ``unit`` up to date if they exist (refresh hook)."""
+        if not self.has_unit(unit):
+            return 0
+        try:
+            return sum(self.update(unit, changed_from=changed_from).values())
+        except Exception as e:
+            logger.warning(f"Rollup update failed for {unit}: {e}")
+            return 0
+
+    def _ensure(self, unit: str, update: bool) -> Dict[str, Dict[str, pd.Timestamp]]:
+        """Stored spans usable by reads; a pending change cuts them short."""
+        if update:
+            try:
+                self.update(unit)
+            except Exception as e:
+                logger.warning(f"Rollup update failed for {unit}: {e}")
+        state = self._load_state(unit)
+        stale = self.pending_change(unit)
+        if stale is not None:
+            for name, rule, _ in LEVELS:
+                info = state.get(name)
+                if info and stale < info["through"]:
+                    info["through"] = max(info["from"], stale.floor(rule))
+        return state
+
+    # ---------------------------------------------------------------- reads
+    @staticmethod
+    def level_for(start: pd.Timestamp, end: pd.Timestamp, max_points: Optional[int]) -> str:
+        """Finest resolution ('raw', '1h', '1d') whose point count fits ``max_points``."""
+        if not max_points:
+            return "raw"
+        span = pd.Timestamp(end) - pd.Timestamp(start)
+        if span / raw_interval() <= max_points:
+            return "raw"
+        for name, rule, _ in LEVELS:
+            if span / _rule_delta(rule) <= max_points:
+                return name
+        return LEVELS[-1][0]
+
+    def query(
+        self,
+        unit: str,
+        tag: str,
+        start: Any,
+        end: Any = None,
+        *,
+        max_points: Optional[int] = None,
+        level: Optional[str] = None,
+        update: bool = False,
+    ) -> pd.DataFrame:
+        """Bucketed series of ``tag`` over [start, end] in rollup columns.
+
+        The resolution is ``level`` if given, otherwise the finest one that
+        yields at most ``max_points`` buckets. Spans not covered by stored
+        buckets (the open bucket, history before the store) are computed from
+        raw rows. ``df.attrs['level']`` names the resolution used.
+        """
+        state = self._ensure(unit, update)
+        if end is None:
+            latest = self.db.get_latest_timestamp(unit)
+            end = latest if latest is not None else datetime.now()
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        level = level or self.level_for(start, end, max_points)
+
+        def raw_rollup(lo: pd.Timestamp, hi: pd.Timestamp, rule: Optional[str]) -> pd.DataFrame:
+            raw = self.db.get_unit_tag_data(unit, tag, start_time=lo.to_pydatetime(), end_time=hi.to_pydatetime())
+            if raw is None or raw.empty:
+                return _empty_rollup()
+            if "tag" not in raw.columns:
+                raw = raw.assign(tag=tag)
+            return rollup_long(raw, rule) if rule else _raw_as_rollup(raw)
+
+        if level == "raw":
+            out = raw_rollup(start, end, None)
+        else:
+            name, rule, period = next(lv for lv in LEVELS if lv[0] == level)
+            info = state.get(name)
+            b_start = start.floor(rule)
+            one_ns = pd.Timedelta(1, "ns")
+            parts = []
+            if info is None:
+                parts.append(raw_rollup(b_start, end, rule))
+            else:
+                if b_start < info["from"]:
+                    parts.append(raw_rollup(b_start, min(end, info["from"] - one_ns), rule))
+                parts.append(self._read_level(unit, name, period, tag, max(b_start, info["from"]),
+                                              min(end + one_ns, info["through"])))
+                if end >= info["through"]:
+                    parts.append(raw_rollup(max(b_start, info["through"]), end, rule))
+            parts = [p for p in parts if not p.empty]
+            out = pd.concat(parts, ignore_index=True) if parts else _empty_rollup()
+            out = out.drop_duplicates(subset=["tag", "time"], keep="first").sort_values("time", kind="stable")
+        out = out.drop(columns=["tag"]).reset_index(drop=True)
+        out.attrs["level"] = level
+        return out
+
+    def extremes(self, unit: str, tag: str, start: Any, end: Any, *, update: bool = False) -> Tuple[float, float]:
+        """Exact (min, max) of ``tag`` over [start, end].
+
+        Whole daily buckets come from the 1d level, the remaining whole hours
+        from the 1h level and only the partial hours at the edges (and the
+        open bucket) from raw rows.
+        """
+        state = self._ensure(unit, update)
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        segments = [(start, end)]
+        lows: List[float] = []
+        highs: List[float] = []
+        for name, rule, period in reversed(LEVELS):
+            info = state.get(name)
+            if not info:
+                continue
+            remaining = []
+            for s, e in segments:
+                # Buckets [a, b) lie entirely inside [s, e] and are stored
+                a = max(s.ceil(rule), info["from"])
+                b = min(e.floor(rule), info["through"])
+                if a >= b:
+                    remaining.append((s, e))
+                    continue
+                df = self._read_level(unit, name, period, tag, a, b)
+                if not df.empty:
+                    lows.append(df["min"].min())
+                    highs.append(df["max"].max())
+                if s < a:
+                    remaining.append((s, a))
+                if b < e:
+                    remaining.append((b, e))
+            segments = remaining
+        for s, e in segments:
+            raw = self.db.get_unit_tag_data(unit, tag, start_time=s.to_pydatetime(), end_time=e.to_pydatetime())
+            if raw is not None and not raw.empty:
+                v = pd.to_numeric(raw["value"], errors="coerce")
+                lows.append(v.min())
+                highs.append(v.max())
+        lows = [x for x in lows if pd.notna(x)]
+        highs = [x for x in highs if pd.notna(x)]
+        return (float(min(lows)) if lows else float("nan"), float(max(highs)) if highs else float("nan"))
+
+
+def envelope_points(rollup: pd.DataFrame, rule: Optional[str] = None) -> pd.DataFrame:
+    """(time, value) points tracing the min/max envelope of rollup buckets.
+
+    Each bucket contributes its min and its max (at the bucket start and
+    mid-bucket), so a line drawn through the points covers the same band as
+    the raw series at plot resolution. Raw-level frames pass through as-is.
+    """
+    if rollup is None or rollup.empty:
+        return pd.DataFrame({"time": pd.Series([], dtype="datetime64[ns]"), "value": pd.Series([], dtype="float64")})
+    if rollup.attrs.get("level", "raw") == "raw":
+        return pd.DataFrame({"time": rollup["time"].to_numpy(), "value": rollup["mean"].to_numpy()})
+    rule = rule or next(r for n, r, _ in LEVELS if n == rollup.attrs["level"])
+    half = _rule_delta(rule).value // 2
+    t = pd.to_datetime(rollup["time"]).to_numpy()
+    times = np.empty(2 * len(t), dtype="datetime64[ns]")
+    values = np.empty(2 * len(t), dtype="float64")
+    times[0::2] = t
+    times[1::2] = t + np.timedelta64(half, "ns")
+    values[0::2] = rollup["min"].to_numpy(dtype="float64")
+    values[1::2] = rollup["max"].to_numpy(dtype="float64")
+    return pd.DataFrame({"time": times, "value": values})
@@ -316,7 +316,7 @@ def _sigma_only_detection(df: pd.DataFrame, unit: str, *, z_thresh: float = 2.5,
     # Sigma baseline and recency gate: use 90 days for baseline, last 24h for actionability
     cutoff = datetime.now() - timedelta(hours=24)
     by_tag: Dict[str, Any] = {}
-    for tag, g in d.groupby('tag'):
+    for tag, g in d.groupby('tag', observed=True):
         gg = g.sort_values('time')
         try:
             ts = gg.set_index('time')['value']
@@ -33,7 +33,7 @@ class SpeedAwareInterface:
         self.config = config or Config()
         self.compensator = SpeedAwareCompensator()
         self.anomaly_detector = SpeedAwareAnomalyDetector(self.compensator)
-        self.db = ParquetDatabase()
+        self.db = ParquetDatabase.shared()
 
         logger.info("Speed-aware interface initialized")
 
@@ -46,9 +46,10 @@ class StaleDataDetector:
         if df.empty or 'tag' not in df.columns or 'time' not in df.columns:
             return {'error': 'Invalid dataframe structure'}
 
-        # Ensure time column is datetime
-        df = df.copy()
-        df['time'] = pd.to_datetime(df['time'])
+        # Ensure time column is datetime (converted once, without copying the frame)
+        times = df['time']
+        if not pd.api.types.is_datetime64_any_dtype(times):
+            times = pd.to_datetime(times)
 
         results = {
             'analysis_time': current_time,
@@ -61,20 +62,21 @@ class StaleDataDetector:
         }
 
         try:
-            # Group by tag and analyze each
-            for tag, tag_data in df.groupby('tag'):
-                if tag_data.empty:
+            # Per-tag first/last/count in one grouped pass over the time column
+            per_tag = times.groupby(df['tag'], observed=True, sort=True).agg(['min', 'max', 'size'])
+            for tag, row in per_tag.iterrows():
+                if row['size'] == 0:
                     continue
 
                 results['tags_analyzed'] += 1
 
                 # Get latest timestamp for this tag
-                latest_time = tag_data['time'].max()
+                latest_time = row['max']
                 age_delta = current_time - latest_time.replace(tzinfo=None)
                 age_hours = age_delta.total_seconds() / 3600
 
                 # Calculate data statistics
-                data_span = tag_data['time'].max() - tag_data['time'].min()
+                data_span = row['max'] - row['min']
                 data_span_days = data_span.total_seconds() / 86400
 
                 tag_info = {
@@ -83,9 +85,9 @@ class StaleDataDetector:
                     'age_hours': age_hours,
                     'age_days': age_hours / 24,
                     'is_stale': age_hours > self.max_age_hours,
-                    'record_count': len(tag_data),
+                    'record_count': int(row['size']),
                     'data_span_days': data_span_days,
-                    'earliest_time': tag_data['time'].min(),
+                    'earliest_time': row['min'],
                     'staleness_level': self._get_staleness_level(age_hours)
                 }
 
@@ -0,0 +1,387 @@
+"""
+Per-tag watermark manifest for unit Parquet files.
+
+Every unit file in ``data/processed`` can carry a small JSON sidecar
+(``<file>.manifest.json``) with, per tag, the first/last timestamp, row
+count, null count, value min/max/mean/variance, last value and last write
+time. The sidecar also records the
+size/mtime fingerprint of the Parquet file it describes so readers can
+tell when a file was rewritten by a writer that did not update it.
+
+Writers call :func:`record_write` (full rewrite) or :func:`record_append`
+(rows appended to an existing file). Readers call :func:`load_or_build`,
+which answers from the sidecar when it matches the file and otherwise
+rebuilds it with a streaming scan of the ``time``/``value``/``tag`` columns.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_SUFFIX = ".manifest.json"
+# v2 added nulls / value min, max, mean, m2 (v1 sidecars are rebuilt by scan)
+MANIFEST_VERSION = 2
+
+
+def manifest_path_for(parquet_path: Path | str) -> Path:
+    """Return the sidecar manifest path for a Parquet file."""
+    p = Path(parquet_path)
+    return p.with_name(p.name + MANIFEST_SUFFIX)
+
+
+def file_fingerprint(parquet_path: Path | str) -> Optional[Dict[str, int]]:
+    """Return the (size, mtime_ns) fingerprint of a file, or None if missing."""
+    try:
+        st = Path(parquet_path).stat()
+    except OSError:
+        return None
+    return {"size": int(st.st_size), "mtime_ns": int(st.st_mtime_ns)}
+
+
+def _naive_local(ts: pd.Series) -> pd.Series:
+    """Normalise timestamps to naive local time (the convention of unit files)."""
+    ts = pd.to_datetime(ts, errors="coerce")
+    if getattr(ts.dt, "tz", None) is not None:
+        local_tz = datetime.now().astimezone().tzinfo
+        ts = ts.dt.tz_convert(local_tz).dt.tz_localize(None)
+    return ts
+
+
+def _merge_moments(cur: Dict[str, Any], n: int, mean: Optional[float], m2: Optional[float]) -> None:
+    """Fold (count, mean, M2) of further values into ``cur`` (Chan et al. update)."""
+    if not n:
+        return
+    na = int(cur.get("vcount") or 0)
+    if not na or cur.get("vmean") is None:
+        cur["vcount"], cur["vmean"], cur["vm2"] = int(n), mean, m2
+        return
+    total = na + n
+    delta = mean - cur["vmean"]
+    cur["vmean"] = cur["vmean"] + delta * n / total
+    cur["vm2"] = (cur.get("vm2") or 0.0) + (m2 or 0.0) + delta * delta * na * n / total
+    cur["vcount"] = total
+
+
+def _min(a: Any, b: Any) -> Any:
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _max(a: Any, b: Any) -> Any:
+    return b if a is None else a if b is None else max(a, b)
+
+
+def _opt_float(x: Any) -> Optional[float]:
+    return None if x is None or pd.isna(x) else float(x)
+
+
+class TagManifest:
+    """Per-tag first/last timestamp, row/null counts, value stats and last value for one file."""
+
+    def __init__(self, tags: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.tags: Dict[str, Dict[str, Any]] = tags or {}
+        self.fingerprint: Optional[Dict[str, int]] = None
+
+    # ------------------------------------------------------------------ stats
+    def update(self, df: pd.DataFrame, *, write_time: Optional[datetime] = None) -> "TagManifest":
+        """Fold the rows of ``df`` (long format: time, value, tag) into the manifest."""
+        if df is None or df.empty or "tag" not in df.columns or "time" not in df.columns:
+            return self
+
+        frame = pd.DataFrame({
+            "tag": df["tag"].to_numpy(),
+            "time": _naive_local(df["time"]).to_numpy(),
+            "value": pd.to_numeric(df["value"], errors="coerce").to_numpy() if "value" in df.columns else float("nan"),
+        })
+        frame = frame[frame["tag"].notna() & frame["time"].notna()]
+        if frame.empty:
+            return self
+        frame["tag"] = frame["tag"].astype(str)
+
+        grouped = frame.groupby("tag", sort=False)
+        agg = grouped["time"].agg(["min", "max", "count"])
+        vals = grouped["value"].agg(["count", "min", "max", "mean", "var"])
+        last_values = frame.loc[grouped["time"].idxmax(), ["tag", "value"]].set_index("tag")["value"]
+
+        written = pd.Timestamp(write_time or datetime.now())
+        for tag, row in agg.iterrows():
+            first, last, rows = row["min"], row["max"], int(row["count"])
+            v = vals.loc[tag]
+            n = int(v["count"])
+            mean = _opt_float(v["mean"])
+            m2 = (_opt_float(v["var"]) or 0.0) * (n - 1) if n else None
+            last_value = _opt_float(last_values.get(tag))
+            cur = self.tags.get(tag)
+            if cur is None:
+                self.tags[tag] = {
+                    "first": first,
+                    "last": last,
+                    "rows": rows,
+                    "nulls": rows - n,
+                    "vmin": _opt_float(v["min"]),
+                    "vmax": _opt_float(v["max"]),
+                    "vcount": n,
+                    "vmean": mean,
+                    "vm2": m2,
+                    "last_value": last_value,
+                    "last_write": written,
+                }
+                continue
+            cur["first"] = min(cur["first"], first)
+            if last >= cur["last"]:
+                cur["last"] = last
+                cur["last_value"] = last_value
+            cur["rows"] = int(cur["rows"]) + rows
+            cur["nulls"] = int(cur.get("nulls") or 0) + rows - n
+            cur["vmin"] = _min(cur.get("vmin"), _opt_float(v["min"]))
+            cur["vmax"] = _max(cur.get("vmax"), _opt_float(v["max"]))
+            _merge_moments(cur, n, mean, m2)
+            cur["last_write"] = written
+        return self
+
+    def merge(self, other: "TagManifest") -> "TagManifest":
+        """Fold another manifest (e.g. of a later delta segment) into this one.
+
+        Rows, nulls and value moments add up, so rows of ``other`` that
+        overwrite (tag, time) keys already counted here are counted twice;
+        callers recount the tags reported by :meth:`overlapping` (see
+        ``ParquetDatabase._unit_manifest``). first/last/min/max stay exact
+        bounds either way.
+        """
+        for tag, v in other.tags.items():
+            cur = self.tags.get(tag)
+            if cur is None:
+                self.tags[tag] = dict(v)
+                continue
+            cur["first"] = min(cur["first"], v["first"])
+            if v["last"] >= cur["last"]:
+                cur["last"] = v["last"]
+                cur["last_value"] = v.get("last_value")
+            cur["rows"] = int(cur["rows"]) + int(v["rows"])
+            cur["nulls"] = int(cur.get("nulls") or 0) + int(v.get("nulls") or 0)
+            cur["vmin"] = _min(cur.get("vmin"), v.get("vmin"))
+            cur["vmax"] = _max(cur.get("vmax"), v.get("vmax"))
+            _merge_moments(cur, int(v.get("vcount") or 0), v.get("vmean"), v.get("vm2"))
+            if v.get("last_write") is not None and (cur.get("last_write") is None or v["last_write"] > cur["last_write"]):
+                cur["last_write"] = v["last_write"]
+        return self
+
+    def overlapping(self, other: "TagManifest") -> List[str]:
+        """Tags whose time range in ``other`` overlaps the one here (keys may be overwritten)."""
+        return [t for t, v in other.tags.items() if t in self.tags and v["first"] <= self.tags[t]["last"]]
+
+    # ---------------------------------------------------------------- queries
+    @property
+    def total_rows(self) -> int:
+        return int(sum(int(v["rows"]) for v in self.tags.values()))
+
+    def latest(self, tag: Optional[str] = None) -> Optional[pd.Timestamp]:
+        """Latest timestamp across all tags, or for one tag."""
+        if tag is not None:
+            entry = self.tags.get(tag)
+            return entry["last"] if entry else None
+        if not self.tags:
+            return None
+        return max(v["last"] for v in self.tags.values())
+
+    def earliest(self, tag: Optional[str] = None) -> Optional[pd.Timestamp]:
+        """Earliest timestamp across all tags, or for one tag."""
+        if tag is not None:
+            entry = self.tags.get(tag)
+            return entry["first"] if entry else None
+        if not self.tags:
+            return None
+        return min(v["first"] for v in self.tags.values())
+
+    def tag_latest(self) -> Dict[str, pd.Timestamp]:
+        """Mapping tag -> latest timestamp."""
+        return {t: v["last"] for t, v in self.tags.items()}
+
+    def tag_stats(self, tag: str) -> Dict[str, Any]:
+        """Row/null counts and value count/min/max/mean/std of one tag."""
+        v = self.tags.get(tag) or {}
+        n = int(v.get("vcount") or 0)
+        m2 = v.get("vm2")
+        return {
+            "rows": int(v.get("rows", 0)),
+            "nulls": int(v.get("nulls") or 0),
+            "count": n,
+            "min": v.get("vmin"),
+            "max": v.get("vmax"),
+            "mean": v.get("vmean") if n else None,
+            # Sample standard deviation, as pandas' Series.std()
+            "std": (max(m2, 0.0) / (n - 1)) ** 0.5 if n > 1 and m2 is not None else None,
+        }
+
+    # ----------------------------------------------------------- persistence
+    def to_dict(self) -> Dict[str, Any]:
+        def _iso(x: Any) -> Optional[str]:
+            return None if x is None or pd.isna(x) else pd.Timestamp(x).isoformat()
+
+        return {
+            "version": MANIFEST_VERSION,
+            "fingerprint": self.fingerprint,
+            "updated": datetime.now().isoformat(),
+            "tags": {
+                t: {
+                    "first": _iso(v["first"]),
+                    "last": _iso(v["last"]),
+                    "rows": int(v["rows"]),
+                    "nulls": int(v.get("nulls") or 0),
+                    "vmin": v.get("vmin"),
+                    "vmax": v.get("vmax"),
+                    "vcount": int(v.get("vcount") or 0),
+                    "vmean": v.get("vmean"),
+                    "vm2": v.get("vm2"),
+                    "last_value": v.get("last_value"),
+                    "last_write": _iso(v.get("last_write")),
+                }
+                for t, v in self.tags.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TagManifest":
+        tags: Dict[str, Dict[str, Any]] = {}
+        for t, v in (data.get("tags") or {}).items():
+            tags[t] = {
+                "first": pd.Timestamp(v["first"]),
+                "last": pd.Timestamp(v["last"]),
+                "rows": int(v.get("rows", 0)),
+                "nulls": int(v.get("nulls") or 0),
+                "vmin": v.get("vmin"),
+                "vmax": v.get("vmax"),
+                "vcount": int(v.get("vcount") or 0),
+                "vmean": v.get("vmean"),
+                "vm2": v.get("vm2"),
+                "last_value": v.get("last_value"),
+                "last_write": pd.Timestamp(v["last_write"]) if v.get("last_write") else None,
+            }
+        m = cls(tags)
+        m.fingerprint = data.get("fingerprint")
+        return m
+
+    def save(self, parquet_path: Path | str) -> Path:
+        """Write the manifest next to ``parquet_path``, stamped with its current fingerprint."""
+        target = manifest_path_for(parquet_path)
+        self.fingerprint = file_fingerprint(parquet_path)
+        tmp = target.with_name(target.name + f".tmp-{os.getpid()}")
+        tmp.write_text(json.dumps(self.to_dict(), indent=1), encoding="utf-8")
+        os.replace(tmp, target)
+        return target
+
+    @classmethod
+    def load(cls, parquet_path: Path | str, *, validate: bool = True) -> Optional["TagManifest"]:
+        """Load the sidecar for ``parquet_path``.
+
+        Returns None when the sidecar is missing, unreadable, or (with
+        ``validate``) its fingerprint no longer matches the Parquet file.
+        """
+        path = manifest_path_for(parquet_path)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        if validate and data.get("fingerprint") != file_fingerprint(parquet_path):
+            return None
+        try:
+            return cls.from_dict(data)
+        except Exception:
+            return None
+
+    @classmethod
+    def build_from_file(cls, parquet_path: Path | str, *, batch_size: int = 1_000_000) -> Optional["TagManifest"]:
+        """Scan ``time``/``value``/``tag`` columns of a file in batches to build a manifest.
+
+        Returns None when the file is not in long (tag-bearing) format.
+        """
+        import pyarrow.parquet as pq
+
+        pf = pq.ParquetFile(str(parquet_path))
+        names = set(pf.schema_arrow.names)
+        if not {"time", "tag"}.issubset(names):
+            return None
+        cols = [c for c in ("time", "value", "tag") if c in names]
+        written = datetime.fromtimestamp(Path(parquet_path).stat().st_mtime)
+        m = cls()
+        for batch in pf.iter_batches(columns=cols, batch_size=batch_size):
+            m.update(batch.to_pandas(), write_time=written)
+        return m
+
+
+def load_or_build(parquet_path: Path | str, *, persist: bool = True) -> Optional[TagManifest]:
+    """Return a manifest valid for ``parquet_path``, rebuilding it by scan if stale."""
+    m = TagManifest.load(parquet_path)
+    if m is not None:
+        return m
+    try:
+        m = TagManifest.build_from_file(parquet_path)
+    except Exception as e:
+        logger.warning(f"Manifest scan failed for {parquet_path}: {e}")
+        return None
+    if m is not None and persist:
+        try:
+            m.save(parquet_path)
+        except Exception as e:
+            logger.debug(f"Could not persist manifest for {parquet_path}: {e}")
+    return m
+
+
+def _notify_catalog(parquet_path: Path | str) -> None:
+    from .data_catalog import note_write
+
+    note_write(parquet_path)
+
+
+def record_write(parquet_path: Path | str, df: Optional[pd.DataFrame] = None) -> Optional[TagManifest]:
+    """Refresh the manifest after ``parquet_path`` was (re)written.
+
+    When the written frame is at hand it is summarised directly; otherwise
+    the file is scanned. The data catalog (if any) is updated from the new
+    manifest. Best-effort: failures are logged, never raised.
+    """
+    try:
+        if df is not None:
+            m = TagManifest().update(df)
+            if not m.tags:
+                return None
+            m.save(parquet_path)
+        else:
+            m = load_or_build(parquet_path)
+    except Exception as e:
+        logger.debug(f"Manifest update failed for {parquet_path}: {e}")
+        return None
+    _notify_catalog(parquet_path)
+    return m
+
+
+def record_append(
+    parquet_path: Path | str,
+    df: pd.DataFrame,
+    previous: Optional[TagManifest],
+) -> Optional[TagManifest]:
+    """Fold appended rows into the manifest captured before the append.
+
+    ``previous`` must have been loaded (and validated) before the file was
+    modified; if it was unavailable the file is rescanned instead.
+    """
+    try:
+        if previous is None:
+            return record_write(parquet_path)
+        previous.update(df)
+        previous.save(parquet_path)
+    except Exception as e:
+        logger.debug(f"Manifest append failed for {parquet_path}: {e}")
+        return None
+    _notify_catalog(parquet_path)
+    return previous
@@ -17,7 +17,7 @@ class TagStateDashboard:
     """Comprehensive tag state monitoring and dashboard"""
 
     def __init__(self):
-        self.db = ParquetDatabase()
+        self.db = ParquetDatabase.shared()
 
     def get_comprehensive_tag_states(self, unit: str, hours_back: int = 24) -> Dict[str, Any]:
         """Get comprehensive state information for all tags in a unit
@@ -0,0 +1,201 @@
+"""
+Per-tag watermark planning for incremental unit refreshes.
+
+The incremental refresh used to take one unit-level latest timestamp and
+fetch ``gap * 1.10`` for every tag, so a tag days behind the others kept
+its gap (or every tag was re-fetched for days). :func:`plan_fetch` starts
+each tag at its own stored watermark (``ParquetDatabase.get_tag_latest_timestamps``,
+answered from the tag manifests) and groups tags whose starts lie within
+INCREMENTAL_GROUP_TOLERANCE (default 1h) of each other into one
+:class:`FetchBatch`, at most INCREMENTAL_MAX_BATCHES (default 4) per unit
+(the closest batches are merged first). :func:`trim_to_watermarks` then
+drops rows at or before each tag's own watermark, so the grouping costs a
+little over-fetch but never a duplicate.
+
+Tags without a watermark (new to the tag list) start
+INCREMENTAL_NEW_TAG_LOOKBACK (default 1d) back. Tags are never clamped to
+a maximum lookback: the appended rows move a tag's watermark to now, so a
+clamped start would leave a hole no later run sees. A fetcher limited to a
+shorter span fetches a window from the real start instead
+(:meth:`FetchBatch.relative_end`) and catches up over later runs. Batch
+starts are handed to PI as relative times ("-5400s"), like the previous
+"-{hours}h", so the naive-local watermarks never meet the server's time zone.
+
+:func:`fetch_batches_to_parquet` fetches the batches over the PI Web API
+through ``webapi.fetch_tags_to_parquet`` (``/batch`` + ``/streamsets`` per
+batch, per-tag requests only for what bulk mode could not serve; one file
+per batch, one row group per tag, rows already trimmed to the watermarks),
+so the refresh never holds or sorts a unit-wide frame of the fetch.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import pandas as pd
+
+from .tag_manifest import _naive_local
+
+
+def stored_tag_names(tag: str) -> List[str]:
+    """Names a PI tag is stored under in unit files (Web API and Excel DataLink spellings)."""
+    s = str(tag).strip()
+    webapi = s.replace(".", "_")
+    excel = re.sub(r"[^A-Za-z0-9_\-]", "_", re.sub(r"\s+", "_", s))
+    return [webapi] if excel == webapi else [webapi, excel]
+
+
+def _naive(ts: object) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(datetime.now().astimezone().tzinfo).tz_localize(None)
+    return ts
+
+
+def _duration(env: str, default: str) -> pd.Timedelta:
+    from .backfill import parse_duration
+
+    return parse_duration((os.getenv(env) or default).strip())
+
+
+@dataclass
+class FetchBatch:
+    """Tags fetched together from ``start`` (the earliest of their own starts)."""
+
+    start: pd.Timestamp  # naive local
+    tags: List[str] = field(default_factory=list)
+    since: Dict[str, Optional[pd.Timestamp]] = field(default_factory=dict)  # tag -> watermark (None: new tag)
+
+    def relative_start(self, now: Optional[pd.Timestamp] = None) -> str:
+        """``start`` as a PI relative time, rounded out to the whole second."""
+        now = now if now is not None else pd.Timestamp.now()
+        return f"-{max(1, math.ceil((now - self.start).total_seconds()))}s"
+
+    def relative_end(self, span: Optional[pd.Timedelta], now: Optional[pd.Timestamp] = None) -> str:
+        """End of a window of at most ``span`` from ``start`` as a PI relative time ('*' up to now).
+
+        Fetchers with a span limit (e.g. the Excel fetch limit of a plant)
+        page through a gap from the real start instead of skipping ahead, so
+        the watermark only moves as far as was fetched.
+        """
+        now = now if now is not None else pd.Timestamp.now()
+        if span is None or self.start + span >= now:
+            return "*"
+        return f"-{max(1, math.floor((now - self.start - span).total_seconds()))}s"
+
+
+def plan_fetch(
+    tags: Iterable[str],
+    watermarks: Mapping[str, pd.Timestamp],
+    *,
+    now: Optional[pd.Timestamp] = None,
+    step: str = "-0.1h",
+    tolerance: Optional[pd.Timedelta] = None,
+    max_batches: Optional[int] = None,
+    new_tag_lookback: Optional[pd.Timedelta] = None,
+) -> List[FetchBatch]:
+    """Fetch batches for ``tags`` given stored per-tag ``watermarks`` (keyed by stored tag name).
+
+    A tag starts one ``step`` after its watermark; tags already up to date
+    are left out. Batches are ordered oldest start first.
+    """
+    from .backfill import parse_duration
+
+    now = now if now is not None else pd.Timestamp.now()
+    tolerance = _duration("INCREMENTAL_GROUP_TOLERANCE", "1h") if tolerance is None else tolerance
+    max_batches = max(1, max_batches or int(os.getenv("INCREMENTAL_MAX_BATCHES", "4")))
+    new_tag_lookback = _duration("INCREMENTAL_NEW_TAG_LOOKBACK", "1d") if new_tag_lookback is None else new_tag_lookback
+    step_td = parse_duration(step.lstrip("-"))
+
+    starts: List[tuple] = []
+    for tag in dict.fromkeys(t.strip() for t in tags if t and t.strip() and not t.strip().startswith("#")):
+        marks = [watermarks[n] for n in stored_tag_names(tag) if watermarks.get(n) is not None]
+        mark = max(_naive(m) for m in marks) if marks else None
+        start = mark + step_td if mark is not None else now - new_tag_lookback
+        if start > now:
+            continue  # nothing newer can exist yet
+        starts.append((start, tag, mark))
+    starts.sort(key=lambda s: s[0])
+
+    batches: List[FetchBatch] = []
+    for start, tag, mark in starts:
+        # A batch spans at most ``tolerance`` of over-fetch
+        if not batches or start - batches[-1].start > tolerance:
+            batches.append(FetchBatch(start=start))
+        batches[-1].tags.append(tag)
+        batches[-1].since[tag] = mark
+    while len(batches) > max_batches:
+        # Merge the adjacent pair whose starts are closest
+        i = min(range(len(batches) - 1), key=lambda k: batches[k + 1].start - batches[k].start)
+        batches[i].tags += batches[i + 1].tags
+        batches[i].since.update(batches.pop(i + 1).since)
+    return batches
+
+
+def trim_to_watermarks(df: pd.DataFrame, since: Mapping[str, Optional[pd.Timestamp]]) -> pd.DataFrame:
+    """Drop rows of each tag at or before its watermark (``since`` keyed by PI tag name)."""
+    if df is None or df.empty or "tag" not in df.columns or "time" not in df.columns:
+        return df
+    cutoff: Dict[str, pd.Timestamp] = {}
+    for tag, mark in since.items():
+        if mark is not None:
+            for name in stored_tag_names(tag):
+                cutoff[name] = _naive(mark)
+    if not cutoff:
+        return df
+    marks = df["tag"].astype(str).map(cutoff)
+    keep = marks.isna() | (_naive_local(df["time"]) > pd.to_datetime(marks))
+    return df.loc[keep.to_numpy()].reset_index(drop=True)
+
+
+def describe(batches: List[FetchBatch], now: Optional[pd.Timestamp] = None) -> List[str]:
+    """One progress line per batch."""
+    now = now if now is not None else pd.Timestamp.now()
+    return [f"batch {i}: {len(b.tags)} tag(s) from {b.start:%Y-%m-%d %H:%M:%S} "
+            f"({(now - b.start).total_seconds() / 3600:.1f}h)" for i, b in enumerate(batches, 1)]
+
+
+def fetch_batches_to_parquet(
+    batches: List[FetchBatch],
+    out_dir: Path | str,
+    *,
+    plant: str,
+    unit: str,
+    server: str,
+    end: str = "*",
+    step: str = "-0.1h",
+    client: Optional[Any] = None,
+) -> Tuple[List[Path], List[FetchBatch]]:
+    """Fetch each batch over the PI Web API into ``out_dir/<unit>_batch_<i>.parquet``.
+
+    Rows at or before each tag's watermark are dropped before they are
+    written. Returns the written files and the batches that produced no
+    file (failed or empty), which the caller can retry elsewhere.
+    """
+    from .webapi import client_from_env, fetch_tags_to_parquet
+
+    out_dir = Path(out_dir)
+    client = client or client_from_env(server)
+    files: List[Path] = []
+    pending: List[FetchBatch] = []
+    for i, batch in enumerate(batches):
+        out = out_dir / f"{unit}_batch_{i}.parquet"
+        try:
+            stats = fetch_tags_to_parquet(batch.tags, out, plant=plant, unit=unit, server=server,
+                                          start=batch.relative_start(), end=end, step=step,
+                                          client=client, since=batch.since)
+        except Exception as e:
+            print(f"   [WARNING] Web API fetch of {len(batch.tags)} tag(s) failed: {e}")
+            pending.append(batch)
+            continue
+        if stats["written"] and out.exists():
+            files.append(out)
+        else:
+            pending.append(batch)
+    return files, pending
@@ -1,16 +1,48 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Iterable, Optional, Dict, Any, Tuple, List
+from dataclasses import dataclass, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Dict, Any, Mapping, Tuple, List
 import os
 import urllib.parse
 import requests
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import threading
 import time
 import random
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from .parquet_io import DICTIONARY_TYPE, value_float32
+from .adaptive_concurrency import (
+    AdaptiveConcurrency,
+    adaptive_enabled,
+    controller_for,
+    outcome_for_status,
+    response_items,
+)
+from .webapi_decode import CHUNK_BYTES, ItemBuffers, decode_items, expected_items, stream_decode_enabled
+from .webapi_modes import (
+    INTERPOLATED,
+    RECORDED,
+    SUMMARY,
+    absolute_range,
+    fetch_mode,
+    grid_times,
+    interpolate_to_grid,
+    recorded_max_count,
+    recorded_params,
+    summary_frame,
+    summary_params,
+)
+from .webid_cache import WebIdCache, default_cache
+
+# /points statuses meaning "no such tag" (negative-cached, never retried)
+_NOT_FOUND = (400, 404)
+
 
 def _bool_env(name: str, default: bool = False) -> bool:
     v = os.getenv(name)
@@ -39,9 +71,14 @@ class PIWebAPIClient:
     password: Optional[str] = None
     verify_ssl: bool = True
     timeout: float = 30.0
+    webid_cache: Optional[WebIdCache] = None  # None: shared PI_WEBID_CACHE store
+    controller: Optional[AdaptiveConcurrency] = None  # bounds requests in flight (see adaptive_concurrency)
+    limiter: Optional["_RateLimiter"] = None  # fixed pacing when there is no controller (PI_WEBAPI_ADAPTIVE=0)
 
     def __post_init__(self) -> None:
         self.base_url = self.base_url.rstrip("/")
+        if self.webid_cache is None:
+            self.webid_cache = default_cache()
         # Thread-local session to keep requests safe across threads
         self._local = threading.local()
 
@@ -70,12 +107,32 @@ class PIWebAPIClient:
             self._local.session = sess
         return sess
 
-    def _get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def _request(self, method: str, path: str, decode: Any = None, **kwargs: Any) -> Any:
+        """Send a request; ``decode(response)`` (default: ``.json()``) runs on the streamed body."""
         url = f"{self.base_url}{path}"
         sess = self._get_session()
-        r = sess.get(url, params=params or {}, timeout=self.timeout, verify=self.verify_ssl)
-        r.raise_for_status()
-        return r.json()
+        stream = decode is not None
+        decode = decode or (lambda r: r.json())
+        if self.controller is None:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            r = sess.request(method, url, timeout=self.timeout, verify=self.verify_ssl, stream=stream, **kwargs)
+            r.raise_for_status()
+            return decode(r)
+        # The slot covers reading the body, so latency includes transfer time (normalised by item count)
+        with self.controller.slot() as slot:
+            r = sess.request(method, url, timeout=self.timeout, verify=self.verify_ssl, stream=stream, **kwargs)
+            slot.outcome = outcome_for_status(r.status_code)
+            r.raise_for_status()
+            out = decode(r)
+            slot.items = response_items(out)
+            return out
+
+    def _get(self, path: str, params: Any = None) -> Dict[str, Any]:
+        return self._request("GET", path, params=params or {})
+
+    def _post(self, path: str, body: Any) -> Dict[str, Any]:
+        return self._request("POST", path, json=body)
 
     def health_check(self) -> Tuple[bool, str]:
         """Quickly probe the Web API endpoint.
@@ -95,44 +152,395 @@ class PIWebAPIClient:
             return False, f"{type(e).__name__}: {e}"
 
     def resolve_point_webid(self, server: str, tag: str) -> Optional[str]:
-        # Path format: \\Server\TagName must be URL-encoded
-        path = f"\\\\{server.strip('\\')}\\{tag}"
+        """WebId of ``tag``, or None when the server does not know it (cached either way)."""
+        cache = self.webid_cache
+        if cache is not None:
+            cached, webid = cache.get(server, tag)
+            if cached:
+                return webid
+        path = _point_path(server, tag)
         # Newer PI Web API uses /points?path=, older may need /points?path= too; keep default
-        data = self._get("/points", params={"path": path})
-        # Expected: { "WebId": "...", ... }
-        if isinstance(data, dict) and data.get("WebId"):
-            return data["WebId"]
-        # Some servers return Items array
-        items = data.get("Items") if isinstance(data, dict) else None
-        if isinstance(items, list) and items:
-            w = items[0].get("WebId")
-            if w:
-                return w
-        return None
+        try:
+            webid = _webid_from_points(self._get("/points", params={"path": path}))
+        except requests.HTTPError as he:
+            if getattr(he.response, "status_code", None) not in _NOT_FOUND:
+                raise
+            webid = None
+        if cache is not None:
+            cache.put(server, tag, webid)
+        return webid
+
+    def forget_webid(self, server: str, tag: str) -> None:
+        """Drop a cached WebId the server no longer accepts."""
+        if self.webid_cache is not None:
+            self.webid_cache.forget(server, [tag])
+
+    def resolve_point_webids(
+        self, server: str, tags: Iterable[str], *, batch_size: Optional[int] = None, retries: int = 2
+    ) -> Tuple[Dict[str, str], List[str]]:
+        """Resolve many tags through ``/batch`` (one HTTP call per batch).
+
+        Returns (tag -> WebId for resolved tags, tags whose lookup failed
+        transiently and should be retried another way). Tags the server
+        reports as not found are in neither. Cached tags (see
+        ``webid_cache``) are not sent; new results are cached.
+        """
+        size = max(1, batch_size or int(os.getenv("PI_WEBAPI_BATCH_SIZE", "100")))
+        pending = list(dict.fromkeys(tags))
+        resolved: Dict[str, str] = {}
+        if self.webid_cache is not None:
+            hit = self.webid_cache.lookup(server, pending)
+            resolved = {t: w for t, w in hit.items() if w}
+            pending = [t for t in pending if t not in hit]
+        fresh: Dict[str, str] = {}
+        missing: List[str] = []
+        retry: List[str] = []
+        i = 0
+        while i < len(pending):
+            chunk = pending[i:i + size]
+            body = {
+                str(k): {
+                    "Method": "GET",
+                    "Resource": f"{self.base_url}/points?" + urllib.parse.urlencode({"path": _point_path(server, t)}),
+                }
+                for k, t in enumerate(chunk)
+            }
+            try:
+                resp = _with_retries(lambda: self._post("/batch", body), retries)
+            except requests.HTTPError as he:
+                if size > 1 and _too_large(he):
+                    # Request too large for the server: halve and retry the same tags
+                    size = max(1, size // 2)
+                    continue
+                raise
+            for k, t in enumerate(chunk):
+                sub = resp.get(str(k)) if isinstance(resp, dict) else None
+                status = int((sub or {}).get("Status") or 0)
+                if 200 <= status < 300:
+                    webid = _webid_from_points(sub.get("Content"))
+                    if webid:
+                        fresh[t] = webid
+                    else:
+                        missing.append(t)
+                elif status in _NOT_FOUND:
+                    missing.append(t)
+                else:
+                    retry.append(t)
+            i += len(chunk)
+        if self.webid_cache is not None:
+            self.webid_cache.put_many(server, fresh, missing)
+        resolved.update(fresh)
+        return resolved, retry
 
     def fetch_interpolated(self, webid: str, start: str, end: str, interval: str) -> pd.DataFrame:
-        params = {
-            "startTime": _to_webapi_time(start),
-            "endTime": _to_webapi_time(end),
-            "interval": interval.replace("-", "").replace("h", "h").replace("m", "m"),
-        }
-        data = self._get(f"/streams/{urllib.parse.quote(webid)}/interpolated", params=params)
-        items = data.get("Items", []) if isinstance(data, dict) else []
-        times = []
-        values = []
-        for it in items:
-            ts = it.get("Timestamp")
-            val = it.get("Value")
-            # PI Web API may wrap errors as {"Value":{"Name":"Bad Input"}, ...}
-            if isinstance(val, dict):
+        return self.fetch_interpolated_buffers(webid, start, end, interval).frame()
+
+    def fetch_interpolated_buffers(self, webid: str, start: str, end: str, interval: str) -> ItemBuffers:
+        """Interpolated values as int64/float64 buffers, decoded while the body streams in."""
+        params = _interpolated_params(start, end, interval)
+        path = f"/streams/{urllib.parse.quote(webid)}/interpolated"
+        if not stream_decode_enabled():
+            return ItemBuffers.from_frame(_items_frame(self._get(path, params=params)))
+        capacity = expected_items(start, end, interval)
+        return self._request(
+            "GET", path, params=params,
+            decode=lambda r: decode_items(r.iter_content(CHUNK_BYTES), capacity),
+        )
+
+    def fetch_recorded(self, webid: str, start: str, end: str) -> pd.DataFrame:
+        """Recorded (archived) events bracketing [start, end] as a (time, value) frame.
+
+        Ranges with more than PI_WEBAPI_RECORDED_MAX_COUNT events are paged.
+        """
+        path = f"/streams/{urllib.parse.quote(webid)}/recorded"
+        max_count = recorded_max_count()
+        frames: List[pd.DataFrame] = []
+        page_start = start
+        while True:
+            params = recorded_params(page_start, end, max_count)
+            if stream_decode_enabled():
+                buffers = self._request(
+                    "GET", path, params=params, decode=lambda r: decode_items(r.iter_content(CHUNK_BYTES)),
+                )
+                page, items = buffers.frame(), buffers.n
+            else:
+                data = self._get(path, params=params)
+                page, items = _items_frame(data), len(data.get("Items") or []) if isinstance(data, dict) else 0
+            frames.append(page)
+            if items < max_count or page.empty:
+                break
+            last = page["time"].iloc[-1]
+            if frames[:-1] and last <= frames[-2]["time"].iloc[-1]:
+                break  # no progress (many events at one instant)
+            page_start = last.isoformat()
+        out = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        return out.drop_duplicates(subset=["time"], keep="last").reset_index(drop=True)
+
+    def fetch_summary(self, webid: str, start: str, end: str, duration: Optional[str] = None) -> pd.DataFrame:
+        """Time-weighted (time, value=mean, min, max) buckets of ``duration`` (default 1h)."""
+        path = f"/streams/{urllib.parse.quote(webid)}/summary"
+        return summary_frame(self._get(path, params=summary_params(start, end, duration)))
+
+    def fetch_values(self, webid: str, start: str, end: str, interval: str, mode: str = INTERPOLATED) -> pd.DataFrame:
+        """Values of one stream in ``mode`` (see ``webapi_modes``)."""
+        if mode == RECORDED:
+            start, end = absolute_range(start, end)
+            return interpolate_to_grid(self.fetch_recorded(webid, start, end), grid_times(start, end, interval))
+        if mode == SUMMARY:
+            return self.fetch_summary(webid, start, end)
+        return self.fetch_interpolated(webid, start, end, interval)
+
+    def fetch_interpolated_streamset(
+        self, webids: Dict[str, str], start: str, end: str, interval: str, *, retries: int = 2
+    ) -> Tuple[pd.DataFrame, List[str]]:
+        """``fetch_streamset`` of interpolated values."""
+        return self.fetch_streamset(webids, start, end, interval, mode=INTERPOLATED, retries=retries)
+
+    def fetch_streamset(
+        self, webids: Dict[str, str], start: str, end: str, interval: str, *,
+        mode: str = INTERPOLATED, retries: int = 2,
+    ) -> Tuple[pd.DataFrame, List[str]]:
+        """Values of many tags via ``/streamsets/{interpolated,recorded,summary}``.
+
+        ``webids`` maps tag -> WebId. Tags are requested in chunks whose size
+        adapts to the observed items per tag (see :class:`_BulkSizer`); a
+        chunk the server rejects is halved and retried. Returns the long
+        (time, value, tag) frame and the tags that could not be fetched
+        (in recorded mode also those that hit the per-stream maxCount, so
+        the per-tag path pages them).
+        """
+        failed: List[str] = []
+        frames: List[pd.DataFrame] = []
+        for t, df in self.iter_streamset(webids, start, end, interval, mode=mode, retries=retries, failed=failed):
+            if not df.empty:
+                df["tag"] = t.replace(".", "_")
+                frames.append(df)
+        out = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["time", "value", "tag"])
+        return out, failed
+
+    def iter_streamset(
+        self, webids: Dict[str, str], start: str, end: str, interval: str, *,
+        mode: str = INTERPOLATED, retries: int = 2, failed: Optional[List[str]] = None,
+    ) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """Streaming form of :meth:`fetch_streamset`: yields (tag, frame) as each chunk arrives.
+
+        Frames have no tag column and may be empty. Tags that could not be
+        fetched are appended to ``failed``.
+        """
+        failed = failed if failed is not None else []
+        grid = None
+        if mode == RECORDED:
+            start, end = absolute_range(start, end)
+            grid = grid_times(start, end, interval)
+            params = list(recorded_params(start, end).items())
+        elif mode == SUMMARY:
+            params = summary_params(start, end)
+        else:
+            params = list(_interpolated_params(start, end, interval).items())
+        endpoint = f"/streamsets/{mode}"
+        base_len = len(f"{self.base_url}{endpoint}?") + len(urllib.parse.urlencode(params))
+        sizer = _BulkSizer()
+        tags = list(webids)
+        i = 0
+        while i < len(tags):
+            n = sizer.size_for([webids[t] for t in tags[i:]], base_len)
+            chunk = tags[i:i + n]
+            query = [("webId", webids[t]) for t in chunk] + params
+            try:
+                data = _with_retries(lambda: self._get(endpoint, params=query), retries)
+            except Exception as e:
+                if isinstance(e, requests.HTTPError) and not _too_large(e):
+                    # Endpoint unavailable: leave the rest to per-tag requests
+                    failed.extend(tags[i:])
+                    break
+                if n > 1:
+                    sizer.shrink(n)
+                    continue
+                failed.append(chunk[0])
+                i += 1
                 continue
-            times.append(ts)
-            values.append(val)
-        if not times:
-            return pd.DataFrame(columns=["time", "value"])  # empty
-        df = pd.DataFrame({"time": pd.to_datetime(times, errors="coerce"), "value": pd.to_numeric(values, errors="coerce")})
-        df = df.dropna(subset=["time", "value"]).reset_index(drop=True)
-        return df
+            streams = data.get("Items", []) if isinstance(data, dict) else []
+            by_webid = {st.get("WebId"): st for st in streams if isinstance(st, dict)}
+            items = 0
+            for pos, t in enumerate(chunk):
+                st = by_webid.get(webids[t])
+                if st is None and not by_webid.get(None) and len(streams) == len(chunk):
+                    st = streams[pos]  # servers that omit WebId keep request order
+                if st is None:
+                    failed.append(t)
+                    continue
+                n_items = len(st.get("Items") or [])
+                items += n_items
+                if mode == RECORDED:
+                    if n_items >= recorded_max_count():
+                        failed.append(t)
+                        continue
+                    df = interpolate_to_grid(_items_frame(st), grid)
+                elif mode == SUMMARY:
+                    df = summary_frame(st)
+                else:
+                    df = _items_frame(st)
+                yield t, df
+            del data, streams, by_webid
+            sizer.observe(len(chunk), items)
+            i += n
+
+
+def _interpolated_params(start: str, end: str, interval: str) -> Dict[str, Any]:
+    return {
+        "startTime": _to_webapi_time(start),
+        "endTime": _to_webapi_time(end),
+        "interval": interval.replace("-", ""),
+    }
+
+
+def _point_path(server: str, tag: str) -> str:
+    # Path format: \\Server\TagName (URL-encoded by the HTTP client)
+    server_name = server.strip('\\')
+    return f"\\\\{server_name}\\{tag}"
+
+
+def _webid_from_points(data: Any) -> Optional[str]:
+    """WebId from a /points?path= response."""
+    # Expected: { "WebId": "...", ... }
+    if isinstance(data, dict) and data.get("WebId"):
+        return data["WebId"]
+    # Some servers return Items array
+    items = data.get("Items") if isinstance(data, dict) else None
+    if isinstance(items, list) and items:
+        w = items[0].get("WebId")
+        if w:
+            return w
+    return None
+
+
+def _items_frame(data: Any) -> pd.DataFrame:
+    """(time, value) frame from a stream values response."""
+    items = data.get("Items", []) if isinstance(data, dict) else []
+    times = []
+    values = []
+    for it in items:
+        ts = it.get("Timestamp")
+        val = it.get("Value")
+        # PI Web API may wrap errors as {"Value":{"Name":"Bad Input"}, ...}
+        if isinstance(val, dict):
+            continue
+        times.append(ts)
+        values.append(val)
+    if not times:
+        return pd.DataFrame(columns=["time", "value"])  # empty
+    df = pd.DataFrame({
+        "time": pd.to_datetime(times, errors="coerce", utc=True, format="ISO8601").as_unit("ns"),
+        "value": pd.to_numeric(values, errors="coerce"),
+    })
+    df = df.dropna(subset=["time", "value"]).reset_index(drop=True)
+    return df
+
+
+def _interval_from_step(step: str) -> str:
+    """Normalize a PI step like "-0.1h" to a Web API interval ("6m")."""
+    step = step.strip()
+    interval = "6m"
+    if step.startswith("-"):
+        try:
+            if step.endswith("h"):
+                hours = float(step[1:-1])
+                interval = f"{int(round(hours * 60))}m"
+            elif step.endswith("m"):
+                minutes = float(step[1:-1])
+                interval = f"{int(round(minutes))}m"
+        except Exception:
+            interval = "6m"
+    return interval
+
+
+def _too_large(he: requests.HTTPError) -> bool:
+    """Whether an HTTP error may go away with a smaller bulk request."""
+    return getattr(he.response, 'status_code', None) in (400, 413, 414, 500, 502, 504)
+
+
+def _with_retries(fn, retries: int, jitter: Tuple[float, float] = (0.01, 0.07)):
+    """Call ``fn`` with the 429/503 backoff of ``_fetch_one_tag``.
+
+    Other HTTP errors are raised at once (callers shrink the request);
+    connection errors are retried after a short pause.
+    """
+    backoff = 0.5
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except requests.HTTPError as he:
+            code = getattr(he.response, 'status_code', None)
+            if code not in (429, 503) or attempt == retries:
+                raise
+            time.sleep(backoff + random.uniform(*jitter))
+            backoff = min(backoff * 2.0, 8.0)
+        except requests.RequestException:
+            if attempt == retries:
+                raise
+            time.sleep(0.2 + random.uniform(*jitter))
+
+
+class _BulkSizer:
+    """Number of WebIds per ``/streamsets`` request, adapted to response size.
+
+    After each response the size is set so that the next one carries about
+    PI_WEBAPI_BULK_TARGET_ITEMS values, bounded by PI_WEBAPI_BULK_MAX_WEBIDS
+    and by PI_WEBAPI_BULK_MAX_URL characters of request URL.
+    """
+
+    def __init__(self) -> None:
+        self.target_items = int(os.getenv("PI_WEBAPI_BULK_TARGET_ITEMS", "100000"))
+        self.max_webids = max(1, int(os.getenv("PI_WEBAPI_BULK_MAX_WEBIDS", "200")))
+        self.max_url = int(os.getenv("PI_WEBAPI_BULK_MAX_URL", "8000"))
+        self.size = min(self.max_webids, max(1, int(os.getenv("PI_WEBAPI_BULK_INITIAL", "25"))))
+
+    def size_for(self, webids: List[str], base_len: int) -> int:
+        n, length = 0, base_len
+        for w in webids[:self.size]:
+            length += len("&webId=") + len(urllib.parse.quote(w, safe=""))
+            if n and length > self.max_url:
+                break
+            n += 1
+        return max(1, n)
+
+    def observe(self, tags: int, items: int) -> None:
+        per_tag = items / tags if tags else 0
+        if per_tag > 0:
+            self.size = min(self.max_webids, max(1, int(self.target_items / per_tag)))
+
+    def shrink(self, attempted: int) -> None:
+        self.size = max(1, attempted // 2)
+
+
+def fetch_tags_bulk(
+    client: PIWebAPIClient,
+    tags: Iterable[str],
+    server: str,
+    start: str,
+    end: str,
+    interval: str,
+    *,
+    retries: int = 2,
+    mode: str = INTERPOLATED,
+) -> Tuple[pd.DataFrame, List[str]]:
+    """Bulk fetch: ``/batch`` WebId lookups, then ``/streamsets/<mode>``.
+
+    A 300-tag unit costs a few batch calls plus a handful of streamset
+    calls instead of 600 requests. Returns the long (time, value, tag)
+    frame and the tags to retry with per-tag requests.
+    """
+    webids, retry = client.resolve_point_webids(server, tags, retries=retries)
+    frame, failed = client.fetch_streamset(webids, start, end, interval, mode=mode, retries=retries)
+    return frame, retry + failed
+
+
+def _combine(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    frames = [f for f in frames if f is not None and not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=["time", "value", "tag"])  # empty
+    out = pd.concat(frames, ignore_index=True)
+    return out.sort_values(["time"]).reset_index(drop=True)
 
 
 class _RateLimiter:
@@ -154,6 +562,12 @@ class _RateLimiter:
             time.sleep(sleep_s)
 
 
+def _qps_limiter(qps: Optional[float] = None) -> Optional[_RateLimiter]:
+    """Fixed pacing of PI_WEBAPI_QPS requests per second (default 3; 0 disables)."""
+    qps = float(os.getenv("PI_WEBAPI_QPS", str(qps or 3.0)))
+    return _RateLimiter(qps) if qps > 0 else None
+
+
 def _fetch_one_tag(
     client: PIWebAPIClient,
     tag: str,
@@ -164,6 +578,7 @@ def _fetch_one_tag(
     limiter: Optional[_RateLimiter],
     retries: int,
     jitter: Tuple[float, float],
+    mode: str = INTERPOLATED,
 ) -> Optional[pd.DataFrame]:
     tag = tag.strip()
     if not tag or tag.startswith('#'):
@@ -179,7 +594,7 @@ def _fetch_one_tag(
                 return None
             if limiter:
                 limiter.acquire()
-            df = client.fetch_interpolated(webid, start, end, interval)
+            df = client.fetch_values(webid, start, end, interval, mode)
             if df.empty:
                 return None
             df["tag"] = tag.replace(".", "_")
@@ -188,6 +603,9 @@ def _fetch_one_tag(
             last_exc = he
             # Respect 429/503 with backoff
             code = getattr(he.response, 'status_code', None)
+            if code in _NOT_FOUND:
+                # Stale cached WebId (point recreated): resolve it again next attempt
+                client.forget_webid(server, tag)
             if code in (429, 503):
                 time.sleep(backoff + random.uniform(*jitter))
                 backoff = min(backoff * 2.0, 8.0)
@@ -217,7 +635,27 @@ def fetch_tags_via_webapi(
     max_workers: Optional[int] = None,
     qps: Optional[float] = None,
     retries: Optional[int] = None,
+    bulk: Optional[bool] = None,
+    mode: Optional[str] = None,
 ) -> pd.DataFrame:
+    """Fetch values of ``tags`` as a long (time, value, tag) frame.
+
+    ``mode`` (default PI_WEBAPI_MODE, else 'interpolated') is one of
+    'interpolated', 'recorded' (archived events interpolated locally to the
+    ``step`` grid) or 'summary' (hourly time-weighted mean as ``value``
+    plus ``min``/``max`` columns); see ``webapi_modes``.
+
+    With bulk mode (``bulk`` or PI_WEBAPI_BULK, on by default) tags are
+    resolved through ``/batch`` and fetched through ``/streamsets``; tags
+    that bulk mode could not serve, or all tags if the server rejects bulk
+    requests, go through per-tag requests (asyncio client when usable, see
+    ``webapi_async``, else the thread pool).
+
+    Requests in flight are governed per PI server by the AIMD controller of
+    ``adaptive_concurrency`` (PI_WEBAPI_ADAPTIVE, on by default);
+    ``max_workers``/``qps`` and PI_WEBAPI_MAX_WORKERS/PI_WEBAPI_QPS only
+    apply with PI_WEBAPI_ADAPTIVE=0.
+    """
     # Load defaults from environment
     base_url = base_url or os.getenv("PI_WEBAPI_URL")
     if not base_url:
@@ -228,10 +666,20 @@ def fetch_tags_via_webapi(
     verify_ssl = _bool_env("PI_WEBAPI_VERIFY_SSL", True) if verify_ssl is None else verify_ssl
     timeout = float(os.getenv("PI_WEBAPI_TIMEOUT", "30").strip()) if timeout is None else timeout
 
-    # Polite, conservative defaults
-    max_workers = int(os.getenv("PI_WEBAPI_MAX_WORKERS", str(max_workers or 4)))
-    qps = float(os.getenv("PI_WEBAPI_QPS", str(qps or 3.0)))  # requests per second globally
     retries = int(os.getenv("PI_WEBAPI_RETRIES", str(retries or 2)))
+    bulk = _bool_env("PI_WEBAPI_BULK", True) if bulk is None else bulk
+    mode = fetch_mode(mode)
+
+    tasks: List[str] = []
+    for tag in tags:
+        s = str(tag).strip()
+        if s and not s.startswith('#'):
+            tasks.append(s)
+    if not tasks:
+        return pd.DataFrame(columns=["time", "value", "tag"])  # empty
+
+    # Normalize step like "-0.1h" to Web API interval "6m"
+    interval = _interval_from_step(step)
 
     client = PIWebAPIClient(
         base_url=base_url,
@@ -240,6 +688,8 @@ def fetch_tags_via_webapi(
         password=password,
         verify_ssl=verify_ssl,
         timeout=timeout,
+        # Requests in flight follow the server's responses instead of fixed QPS/worker settings
+        controller=controller_for(server) if adaptive_enabled() else None,
     )
 
     # Fast preflight: if unreachable, emit a clear warning and return empty
@@ -255,38 +705,48 @@ def fetch_tags_via_webapi(
         except Exception:
             pass
 
-    # Normalize step like "-0.1h" to Web API interval "6m"
-    step = step.strip()
-    interval = "6m"
-    if step.startswith("-"):
-        try:
-            if step.endswith("h"):
-                hours = float(step[1:-1])
-                interval = f"{int(round(hours * 60))}m"
-            elif step.endswith("m"):
-                minutes = float(step[1:-1])
-                interval = f"{int(round(minutes))}m"
-        except Exception:
-            interval = "6m"
-
-    limiter = _RateLimiter(qps) if qps and qps > 0 else None
     frames: List[pd.DataFrame] = []
-    tasks: List[Tuple[str]] = []
-    for tag in tags:
-        s = str(tag).strip()
-        if s and not s.startswith('#'):
-            tasks.append((s,))
+    if bulk and len(tasks) > 1:
+        try:
+            bulk_frame, tasks = fetch_tags_bulk(client, tasks, server, start, end, interval, retries=retries,
+                                                mode=mode)
+            frames.append(bulk_frame)
+        except Exception as e:
+            print(f"[warn] PI Web API bulk fetch failed ({type(e).__name__}: {e}); using per-tag requests")
+        if not tasks:
+            return _combine(frames)
 
-    if not tasks:
-        return pd.DataFrame(columns=["time", "value", "tag"])  # empty
+    # asyncio client: one keep-alive pool, bounded concurrency (see webapi_async)
+    from .webapi_async import AsyncAuthRejected, async_fetch_enabled, fetch_tags_via_webapi_async
+    if async_fetch_enabled(auth_mode, base_url):
+        explicit_qps = os.getenv("PI_WEBAPI_QPS")
+        try:
+            frames.append(fetch_tags_via_webapi_async(
+                tasks, server, start, end, step,
+                base_url=base_url, auth_mode=auth_mode, username=username, password=password,
+                verify_ssl=verify_ssl, timeout=timeout, controller=client.controller,
+                qps=None if client.controller else (float(explicit_qps) if explicit_qps else qps), retries=retries,
+                mode=mode,
+            ))
+            return _combine(frames)
+        except AsyncAuthRejected as e:
+            print(f"[warn] {e}; using threaded requests")
 
+    if client.controller is not None:
+        # The controller bounds requests in flight; the pool only has to supply enough demand
+        max_workers = client.controller.max_limit
+        limiter = None
+    else:
+        # PI_WEBAPI_ADAPTIVE=0: polite, conservative fixed defaults
+        max_workers = int(os.getenv("PI_WEBAPI_MAX_WORKERS", str(max_workers or 4)))
+        limiter = _qps_limiter(qps)  # requests per second globally
     jitter = (0.01, 0.07)  # small randomized delay to avoid sync bursts
     with ThreadPoolExecutor(max_workers=max_workers or 4) as ex:
         futs = [
             ex.submit(
                 _fetch_one_tag,
                 client,
-                t[0],
+                t,
                 server,
                 start,
                 end,
@@ -294,6 +754,7 @@ def fetch_tags_via_webapi(
                 limiter,
                 retries or 2,
                 jitter,
+                mode,
             )
             for t in tasks
         ]
@@ -302,8 +763,227 @@ def fetch_tags_via_webapi(
             if df is not None and not df.empty:
                 frames.append(df)
 
-    if not frames:
-        return pd.DataFrame(columns=["time", "value", "tag"])  # empty
-    out = pd.concat(frames, ignore_index=True)
-    out = out.sort_values(["time"]).reset_index(drop=True)
-    return out
+    return _combine(frames)
+
+
+def client_from_env(server: str, **overrides: Any) -> PIWebAPIClient:
+    """PIWebAPIClient configured from PI_WEBAPI_* (``overrides`` win), adaptive per ``server``.
+
+    With PI_WEBAPI_ADAPTIVE=0 requests are paced at PI_WEBAPI_QPS instead.
+    """
+    base_url = overrides.pop("base_url", None) or os.getenv("PI_WEBAPI_URL")
+    if not base_url:
+        raise RuntimeError("PI_WEBAPI_URL is not set; cannot use PI Web API fetch.")
+    settings = dict(
+        auth_mode=(os.getenv("PI_WEBAPI_AUTH") or "windows").strip().lower(),
+        username=os.getenv("PI_WEBAPI_USER"),
+        password=os.getenv("PI_WEBAPI_PASS"),
+        verify_ssl=_bool_env("PI_WEBAPI_VERIFY_SSL", True),
+        timeout=float(os.getenv("PI_WEBAPI_TIMEOUT", "30").strip()),
+    )
+    if adaptive_enabled():
+        settings["controller"] = controller_for(server)
+    else:
+        settings["limiter"] = _qps_limiter()
+    settings.update({k: v for k, v in overrides.items() if v is not None})
+    return PIWebAPIClient(base_url=base_url, **settings)
+
+
+def _fetch_tag_buffers(
+    client: PIWebAPIClient, tag: str, server: str, start: str, end: str, interval: str, retries: int,
+    mode: str = INTERPOLATED,
+) -> Optional[ItemBuffers]:
+    webid = _with_retries(lambda: client.resolve_point_webid(server, tag), retries)
+    if not webid:
+        return None
+    try:
+        if mode == INTERPOLATED:
+            return _with_retries(lambda: client.fetch_interpolated_buffers(webid, start, end, interval), retries)
+        return ItemBuffers.from_frame(
+            _with_retries(lambda: client.fetch_values(webid, start, end, interval, mode), retries)
+        )
+    except requests.HTTPError as he:
+        if getattr(he.response, "status_code", None) in _NOT_FOUND:
+            client.forget_webid(server, tag)
+        raise
+
+
+def fetch_tags_to_parquet(
+    tags: Iterable[str],
+    out_parquet: Path | str,
+    *,
+    plant: str,
+    unit: str,
+    server: str,
+    start: str,
+    end: str,
+    step: str,
+    client: Optional[PIWebAPIClient] = None,
+    retries: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    since: Optional[Mapping[str, Optional[pd.Timestamp]]] = None,
+    bulk: Optional[bool] = None,
+    mode: Optional[str] = None,
+) -> Dict[str, int]:
+    """Fetch ``tags`` into one Parquet file, one row group per tag, without a unit-wide frame.
+
+    Tags go the way of ``fetch_tags_via_webapi``: ``/batch`` WebId lookups
+    and ``/streamsets`` chunks first (``bulk``/PI_WEBAPI_BULK), then the
+    asyncio client when ``async_fetch_enabled``, then per-tag requests on a
+    thread pool; ``mode`` as there. Each tag's values are written to a
+    ``ParquetWriter`` as soon as they arrive (per-tag responses are decoded
+    straight into int64/float64 buffers, see ``webapi_decode``), so peak
+    memory is one streamset chunk or the tags in flight rather than the
+    whole unit, and there is no concatenate/sort step. Without an adaptive
+    controller requests are paced by PI_WEBAPI_QPS and the pool has
+    PI_WEBAPI_MAX_WORKERS threads.
+
+    Rows are (time naive local, value, plant, unit, tag) like the other
+    unit files; the tag manifest and file catalog are updated when the file
+    is done. ``since`` (PI tag -> naive local watermark, see
+    ``tag_watermarks``) drops each tag's rows at or before its watermark
+    before they are written. Returns tags/written/empty/failed/rows counts.
+    """
+    from .file_catalog import refresh as refresh_catalog
+    from .tag_manifest import TagManifest, _notify_catalog
+    from .webapi_async import AsyncAuthRejected, async_fetch_enabled, fetch_tags_via_webapi_async
+
+    out_parquet = Path(out_parquet)
+    out_parquet.parent.mkdir(parents=True, exist_ok=True)
+    client = client or client_from_env(server)
+    if client.controller is None and client.limiter is None:
+        client = replace(client, limiter=_qps_limiter())
+    retries = int(os.getenv("PI_WEBAPI_RETRIES", "2")) if retries is None else retries
+    bulk = _bool_env("PI_WEBAPI_BULK", True) if bulk is None else bulk
+    mode = fetch_mode(mode)
+    interval = _interval_from_step(step)
+    wanted = list(dict.fromkeys(s for s in (str(t).strip() for t in tags) if s and not s.startswith('#')))
+    if client.controller is not None:
+        workers = max_workers or client.controller.max_limit
+    else:
+        workers = int(os.getenv("PI_WEBAPI_MAX_WORKERS", str(max_workers or 4)))
+
+    value_type = pa.float32() if value_float32() else pa.float64()
+    schema = pa.schema([
+        ("time", pa.timestamp("ns")),
+        ("value", value_type),
+        ("plant", DICTIONARY_TYPE),
+        ("unit", DICTIONARY_TYPE),
+        ("tag", DICTIONARY_TYPE),
+    ])
+    local_tz = datetime.now().astimezone().tzinfo
+
+    def constant(value: str, n: int) -> pa.DictionaryArray:
+        return pa.DictionaryArray.from_arrays(pa.array(np.zeros(n, dtype=np.int32)), pa.array([value]))
+
+    stats = {"tags": len(wanted), "written": 0, "empty": 0, "failed": 0, "rows": 0}
+    manifest = TagManifest()
+    done: set = set()
+    tmp = out_parquet.with_suffix(out_parquet.suffix + f".tmp-{int(time.time() * 1000)}")
+    writer = pq.ParquetWriter(str(tmp), schema, compression="zstd")
+
+    def write(tag: str, buffers: Optional[ItemBuffers]) -> None:
+        done.add(tag)
+        t, v = buffers.arrays() if buffers is not None else (np.empty(0, np.int64), np.empty(0))
+        if not len(t):
+            stats["empty"] += 1
+            return
+        local = (pd.DatetimeIndex(t.view("datetime64[ns]")).tz_localize("UTC")
+                 .tz_convert(local_tz).tz_localize(None))
+        mark = (since or {}).get(tag)
+        if mark is not None:
+            keep = local > pd.Timestamp(mark)
+            local, v = local[keep], v[keep]
+            if not len(local):
+                stats["empty"] += 1
+                return
+        order = np.argsort(local.asi8, kind="stable")
+        n = len(local)
+        name = tag.replace(".", "_")
+        table = pa.Table.from_arrays([
+            pa.array(local.asi8[order].view("datetime64[ns]"), type=pa.timestamp("ns")),
+            pa.array(v[order], type=value_type),
+            constant(plant, n),
+            constant(unit, n),
+            constant(name, n),
+        ], schema=schema)
+        writer.write_table(table, row_group_size=max(n, 1))
+        manifest.update(pd.DataFrame({"time": local[order], "value": v[order], "tag": name}))
+        stats["written"] += 1
+        stats["rows"] += n
+
+    try:
+        remaining = wanted
+        if bulk and len(wanted) > 1:
+            try:
+                webids, retry = client.resolve_point_webids(server, wanted, retries=retries)
+                failed: List[str] = []
+                for tag, df in client.iter_streamset(webids, start, end, interval, mode=mode, retries=retries,
+                                                     failed=failed):
+                    write(tag, ItemBuffers.from_frame(df))
+                remaining = [t for t in wanted if t not in done and (t in retry or t in failed)]
+            except Exception as e:
+                print(f"[warn] PI Web API bulk fetch failed ({type(e).__name__}: {e}); using per-tag requests")
+                remaining = [t for t in wanted if t not in done]
+
+        if remaining and async_fetch_enabled(client.auth_mode, client.base_url):
+            try:
+                frame = fetch_tags_via_webapi_async(
+                    remaining, server, start, end, step,
+                    base_url=client.base_url, auth_mode=client.auth_mode, username=client.username,
+                    password=client.password, verify_ssl=client.verify_ssl, timeout=client.timeout,
+                    controller=client.controller,
+                    qps=client.limiter.qps if client.controller is None and client.limiter else None,
+                    retries=retries, mode=mode,
+                )
+                groups = {name: g for name, g in frame.groupby("tag", sort=False)} if not frame.empty else {}
+                for tag in remaining:
+                    g = groups.pop(tag.replace(".", "_"), None)
+                    write(tag, ItemBuffers.from_frame(g) if g is not None else None)
+                del frame, groups
+                remaining = []
+            except AsyncAuthRejected as e:
+                print(f"[warn] {e}; using threaded requests")
+
+        if remaining:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+                pending = iter(remaining)
+                running: Dict[Any, str] = {}
+
+                def submit_next() -> None:
+                    t = next(pending, None)
+                    if t is not None:
+                        running[ex.submit(_fetch_tag_buffers, client, t, server, start, end, interval,
+                                          retries, mode)] = t
+
+                # At most ``workers`` finished-but-unwritten tags exist at any time
+                for _ in range(workers):
+                    submit_next()
+                while running:
+                    fut = next(as_completed(list(running)))
+                    tag = running.pop(fut)
+                    submit_next()
+                    try:
+                        buffers = fut.result()
+                    except Exception as e:
+                        stats["failed"] += 1
+                        print(f"[warn] Web API fetch failed for {tag}: {type(e).__name__}: {e}")
+                        continue
+                    write(tag, buffers)
+        writer.close()
+        writer = None
+        if not stats["written"]:
+            tmp.unlink(missing_ok=True)
+            return stats
+        os.replace(tmp, out_parquet)
+    finally:
+        if writer is not None:
+            writer.close()
+            tmp.unlink(missing_ok=True)
+    try:
+        manifest.save(out_parquet)
+    except Exception:
+        pass
+    _notify_catalog(out_parquet)
+    refresh_catalog(out_parquet)
+    return stats
@@ -0,0 +1,513 @@
+"""
+asyncio PI Web API client.
+
+The threaded fetch in ``webapi.fetch_tags_via_webapi`` runs
+PI_WEBAPI_MAX_WORKERS threads (4 by default), each with its own
+``requests.Session``. Every tag costs two blocking round-trips (WebId lookup,
+interpolated values), so large units spend most of their time waiting on
+the network. :class:`AsyncPIWebAPIClient` runs all requests of a fetch on
+one event loop:
+
+- one shared keep-alive connection pool (PI_WEBAPI_CONNECTIONS),
+- at most PI_WEBAPI_CONCURRENCY requests in flight (semaphore), within
+  which the per-server AIMD controller of ``adaptive_concurrency`` sets
+  the actual limit (or fixed PI_WEBAPI_QPS pacing with PI_WEBAPI_ADAPTIVE=0),
+- the retry/backoff of ``_fetch_one_tag``: 429/503 back off 0.5s doubling
+  up to 8s (plus jitter), other errors pause briefly, PI_WEBAPI_RETRIES
+  retries per tag,
+- the shared WebId cache (``webid_cache``): cached tags skip the
+  ``/points`` lookup, new resolutions are stored when the fetch ends.
+
+:func:`fetch_tags_async` is the async API; :func:`fetch_tags_via_webapi_async`
+wraps it for synchronous callers and returns the same long (time, value,
+tag) frame as ``fetch_tags_via_webapi``.
+
+``fetch_tags_via_webapi`` and ``fetch_tags_to_parquet`` (the unit refresh,
+for tags bulk streamsets did not serve) switch to this client according to
+PI_WEBAPI_ASYNC: 'auto' (default) uses it when aiohttp is installed and the
+auth mode is 'basic' or 'none', or 'windows' with pywin32's ``sspi``
+available (single-leg Negotiate/Kerberos); '1' forces it and '0' keeps the
+threaded requests path. A server that answers Negotiate with NTLM rejects
+every single-leg request: the 401 (normally at the health-check preflight)
+raises :class:`AsyncAuthRejected`, the caller retries the fetch on the
+threaded client instead of returning an empty unit, and 'auto' keeps that
+server on the threaded client for the rest of the process.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import logging
+import os
+import random
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from .webapi import (
+    _NOT_FOUND,
+    _bool_env,
+    _interpolated_params,
+    _interval_from_step,
+    _items_frame,
+    _point_path,
+    _webid_from_points,
+)
+from .adaptive_concurrency import (
+    ERROR,
+    AdaptiveConcurrency,
+    adaptive_enabled,
+    controller_for,
+    outcome_for_status,
+    response_items,
+)
+from .webapi_decode import CHUNK_BYTES, StreamDecoder, expected_items, stream_decode_enabled
+from .webapi_modes import (
+    INTERPOLATED,
+    RECORDED,
+    SUMMARY,
+    absolute_range,
+    grid_times,
+    interpolate_to_grid,
+    recorded_max_count,
+    recorded_params,
+    summary_frame,
+    summary_params,
+)
+from .webid_cache import WebIdCache, default_cache
+
+try:  # optional dependency
+    import aiohttp
+except ImportError:  # pragma: no cover - depends on environment
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+
+def _concurrency() -> int:
+    return max(1, int(os.getenv("PI_WEBAPI_CONCURRENCY", "32")))
+
+
+# Base URLs that answered single-leg Negotiate with 401 (NTLM-only servers)
+_NEGOTIATE_REJECTED: set = set()
+
+
+def _negotiate_available() -> bool:
+    try:
+        import sspi  # noqa: F401 (pywin32)
+    except ImportError:
+        return False
+    return True
+
+
+def _negotiate_header(host: str) -> Optional[str]:
+    """Single-leg Negotiate (Kerberos) Authorization header for ``host``, if possible."""
+    try:
+        import sspi
+
+        ca = sspi.ClientAuth("Negotiate", targetspn=f"HTTP/{host}")
+        _, buf = ca.authorize(None)
+        return "Negotiate " + base64.b64encode(buf[0].Buffer).decode("ascii")
+    except Exception as e:
+        logger.debug(f"Negotiate token unavailable for {host}: {e}")
+        return None
+
+
+class AsyncAuthRejected(RuntimeError):
+    """The server answered 401 to the asyncio client (e.g. Negotiate fell back to NTLM)."""
+
+
+def async_fetch_enabled(auth_mode: str, base_url: Optional[str] = None) -> bool:
+    """Whether ``fetch_tags_via_webapi`` should use the asyncio client (PI_WEBAPI_ASYNC).
+
+    Under 'auto' windows auth qualifies when pywin32 can build Negotiate
+    tokens, unless ``base_url`` already rejected them in this process.
+    """
+    mode = os.getenv("PI_WEBAPI_ASYNC", "auto").strip().lower()
+    if mode in ("0", "false", "no", "off"):
+        return False
+    if aiohttp is None:
+        if mode in ("1", "true", "yes", "on"):
+            logger.warning("PI_WEBAPI_ASYNC=1 but aiohttp is not installed; using threaded fetch")
+        return False
+    if mode in ("1", "true", "yes", "on"):
+        if auth_mode == "windows" and not _negotiate_available():
+            logger.warning("PI_WEBAPI_ASYNC=1 with windows auth needs pywin32 (sspi); using threaded fetch")
+            return False
+        return True
+    if auth_mode == "windows":
+        return _negotiate_available() and (base_url or "").rstrip("/") not in _NEGOTIATE_REJECTED
+    return auth_mode in ("basic", "none")
+
+
+class _AsyncRateLimiter:
+    """Global request pacing on one event loop (same schedule as ``_RateLimiter``)."""
+
+    def __init__(self, qps: float) -> None:
+        self.min_interval = 1.0 / max(0.1, float(qps))
+        self._next = 0.0
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        if self._next <= now:
+            self._next = now + self.min_interval
+            return
+        sleep_s = self._next - now
+        self._next += self.min_interval
+        await asyncio.sleep(sleep_s)
+
+
+class AsyncPIWebAPIClient:
+    """PI Web API client over one aiohttp keep-alive pool with bounded concurrency.
+
+    Use as ``async with AsyncPIWebAPIClient(...) as client:``.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        auth_mode: str = "windows",
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        verify_ssl: bool = True,
+        timeout: float = 30.0,
+        *,
+        concurrency: Optional[int] = None,
+        connections: Optional[int] = None,
+        qps: Optional[float] = None,
+        retries: int = 2,
+        jitter: Tuple[float, float] = (0.01, 0.07),
+        webid_cache: Optional[WebIdCache] = None,
+        controller: Optional[AdaptiveConcurrency] = None,
+    ) -> None:
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is not installed; use PIWebAPIClient instead")
+        self.base_url = base_url.rstrip("/")
+        self.auth_mode = auth_mode
+        self.username = username
+        self.password = password
+        self.verify_ssl = verify_ssl
+        self.timeout = timeout
+        self.concurrency = concurrency or _concurrency()
+        self.connections = connections or int(os.getenv("PI_WEBAPI_CONNECTIONS", str(self.concurrency)))
+        self.retries = retries
+        self.jitter = jitter
+        self._limiter = _AsyncRateLimiter(qps) if qps and qps > 0 else None
+        self.controller = controller
+        self._host = urllib.parse.urlsplit(self.base_url).hostname or ""
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self.webid_cache = webid_cache if webid_cache is not None else default_cache()
+        # (server, tag) -> WebId/None: cache entries loaded up front plus this run's resolutions
+        self._webids: Dict[Tuple[str, str], Optional[str]] = {}
+        self._resolved: Dict[str, Dict[str, Optional[str]]] = {}
+        self.stats: Dict[str, int] = {"requests": 0, "retries": 0, "failed_tags": 0}
+
+    async def __aenter__(self) -> "AsyncPIWebAPIClient":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        auth = None
+        if self.auth_mode == "basic" and self.username:
+            auth = aiohttp.BasicAuth(self.username or "", self.password or "")
+        connector = aiohttp.TCPConnector(
+            limit=self.connections,
+            ssl=None if self.verify_ssl else False,
+            keepalive_timeout=60,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            auth=auth,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"Accept": "application/json"},
+        )
+        self._sem = asyncio.Semaphore(self.concurrency)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _headers(self) -> Optional[Dict[str, str]]:
+        if self.auth_mode == "windows":
+            token = _negotiate_header(self._host)
+            if token:
+                return {"Authorization": token}
+        return None
+
+    async def _get(self, path: str, params: Any = None, decoder: Any = None) -> Any:
+        assert self._session is not None and self._sem is not None, "client is not open"
+        async with self._sem:
+            if self._limiter:
+                await self._limiter.acquire()
+            token = await self.controller.acquire_async() if self.controller else None
+            outcome: Optional[str] = None
+            items = 0
+            try:
+                self.stats["requests"] += 1
+                async with self._session.get(
+                    f"{self.base_url}{path}", params=params or {}, headers=self._headers()
+                ) as r:
+                    outcome = outcome_for_status(r.status)
+                    r.raise_for_status()
+                    if decoder is None:
+                        out = await r.json(content_type=None)
+                    else:
+                        async for chunk in r.content.iter_chunked(CHUNK_BYTES):
+                            decoder.feed(chunk)
+                        out = decoder.buffers
+                    items = response_items(out)
+                    return out
+            finally:
+                if token is not None:
+                    self.controller.release(token, outcome or ERROR, items)
+
+    async def health_check(self) -> Tuple[bool, str]:
+        """Probe ``/system``; returns (ok, info) like ``PIWebAPIClient.health_check``."""
+        try:
+            assert self._session is not None
+            async with self._session.get(
+                f"{self.base_url}/system",
+                headers=self._headers(),
+                timeout=aiohttp.ClientTimeout(total=min(10.0, self.timeout or 10.0)),
+            ) as r:
+                if 200 <= r.status < 300:
+                    return True, "OK"
+                return False, f"HTTP {r.status}"
+        except Exception as e:
+            return False, f"{type(e).__name__}: {e}"
+
+    async def resolve_point_webid(self, server: str, tag: str) -> Optional[str]:
+        """WebId of ``tag``, or None when the server does not know it."""
+        if (server, tag) in self._webids:
+            return self._webids[(server, tag)]
+        try:
+            webid = _webid_from_points(await self._get("/points", params={"path": _point_path(server, tag)}))
+        except aiohttp.ClientResponseError as he:
+            if he.status not in _NOT_FOUND:
+                raise
+            webid = None
+        self._webids[(server, tag)] = webid
+        self._resolved.setdefault(server, {})[tag] = webid
+        return webid
+
+    def preload_webids(self, server: str, tags: Iterable[str]) -> None:
+        """Load cached WebIds of ``tags`` (one SQLite query instead of one per tag)."""
+        if self.webid_cache is None:
+            return
+        for tag, webid in self.webid_cache.lookup(server, tags).items():
+            self._webids[(server, tag)] = webid
+
+    def flush_webids(self) -> None:
+        """Store this client's new resolutions in the shared cache."""
+        if self.webid_cache is not None:
+            for server, found in self._resolved.items():
+                self.webid_cache.put_many(
+                    server, {t: w for t, w in found.items() if w}, [t for t, w in found.items() if not w]
+                )
+        self._resolved.clear()
+
+    def forget_webid(self, server: str, tag: str) -> None:
+        self._webids.pop((server, tag), None)
+        self._resolved.get(server, {}).pop(tag, None)
+        if self.webid_cache is not None:
+            self.webid_cache.forget(server, [tag])
+
+    async def fetch_interpolated(self, webid: str, start: str, end: str, interval: str) -> pd.DataFrame:
+        path = f"/streams/{urllib.parse.quote(webid)}/interpolated"
+        params = _interpolated_params(start, end, interval)
+        if not stream_decode_enabled():
+            return _items_frame(await self._get(path, params=params))
+        # Decoded chunk by chunk into preallocated buffers (see webapi_decode)
+        buffers = await self._get(path, params=params, decoder=StreamDecoder(expected_items(start, end, interval)))
+        return buffers.frame()
+
+    async def fetch_recorded(self, webid: str, start: str, end: str) -> pd.DataFrame:
+        """Recorded events bracketing [start, end], paged like ``PIWebAPIClient.fetch_recorded``."""
+        path = f"/streams/{urllib.parse.quote(webid)}/recorded"
+        max_count = recorded_max_count()
+        frames: List[pd.DataFrame] = []
+        page_start = start
+        while True:
+            params = recorded_params(page_start, end, max_count)
+            if stream_decode_enabled():
+                buffers = await self._get(path, params=params, decoder=StreamDecoder())
+                page, items = buffers.frame(), buffers.n
+            else:
+                data = await self._get(path, params=params)
+                page, items = _items_frame(data), len(data.get("Items") or []) if isinstance(data, dict) else 0
+            frames.append(page)
+            if items < max_count or page.empty:
+                break
+            last = page["time"].iloc[-1]
+            if frames[:-1] and last <= frames[-2]["time"].iloc[-1]:
+                break  # no progress (many events at one instant)
+            page_start = last.isoformat()
+        out = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        return out.drop_duplicates(subset=["time"], keep="last").reset_index(drop=True)
+
+    async def fetch_values(self, webid: str, start: str, end: str, interval: str,
+                           mode: str = INTERPOLATED) -> pd.DataFrame:
+        """Values of one stream in ``mode`` (see ``webapi_modes``)."""
+        if mode == RECORDED:
+            start, end = absolute_range(start, end)
+            return interpolate_to_grid(await self.fetch_recorded(webid, start, end), grid_times(start, end, interval))
+        if mode == SUMMARY:
+            path = f"/streams/{urllib.parse.quote(webid)}/summary"
+            return summary_frame(await self._get(path, params=summary_params(start, end)))
+        return await self.fetch_interpolated(webid, start, end, interval)
+
+    async def fetch_tag(self, tag: str, server: str, start: str, end: str, interval: str,
+                        mode: str = INTERPOLATED) -> Optional[pd.DataFrame]:
+        """Resolve and fetch one tag with the retry/backoff of ``_fetch_one_tag``."""
+        tag = tag.strip()
+        if not tag or tag.startswith('#'):
+            return None
+        backoff = 0.5
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+            try:
+                webid = await self.resolve_point_webid(server, tag)
+                if not webid:
+                    return None
+                df = await self.fetch_values(webid, start, end, interval, mode)
+                if df.empty:
+                    return None
+                df["tag"] = tag.replace(".", "_")
+                return df
+            except aiohttp.ClientResponseError as he:
+                if he.status == 401:
+                    raise AsyncAuthRejected(f"PI Web API rejected {self.auth_mode} auth (401)") from he
+                if he.status in _NOT_FOUND:
+                    # Stale cached WebId (point recreated): resolve it again next attempt
+                    self.forget_webid(server, tag)
+                # Respect 429/503 with backoff
+                if he.status in (429, 503):
+                    await asyncio.sleep(backoff + random.uniform(*self.jitter))
+                    backoff = min(backoff * 2.0, 8.0)
+                    continue
+                # Other HTTP errors: don't hammer
+                await asyncio.sleep(0.2 + random.uniform(*self.jitter))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                await asyncio.sleep(0.2 + random.uniform(*self.jitter))
+        # Exhausted retries
+        self.stats["failed_tags"] += 1
+        return None
+
+    async def fetch_tags(self, tags: Iterable[str], server: str, start: str, end: str, interval: str,
+                         mode: str = INTERPOLATED) -> pd.DataFrame:
+        """Fetch all ``tags`` concurrently; long (time, value, tag) frame sorted by time."""
+        wanted = [s for s in (str(t).strip() for t in tags) if s and not s.startswith('#')]
+        self.preload_webids(server, wanted)
+        try:
+            results = await asyncio.gather(*(self.fetch_tag(t, server, start, end, interval, mode) for t in wanted))
+        finally:
+            self.flush_webids()
+        frames: List[pd.DataFrame] = [df for df in results if df is not None and not df.empty]
+        if not frames:
+            return pd.DataFrame(columns=["time", "value", "tag"])  # empty
+        out = pd.concat(frames, ignore_index=True)
+        return out.sort_values(["time"]).reset_index(drop=True)
+
+
+async def fetch_tags_async(
+    tags: Iterable[str],
+    server: str,
+    start: str,
+    end: str,
+    step: str,
+    *,
+    base_url: Optional[str] = None,
+    auth_mode: Optional[str] = None,
+    username: Optional[str] = None,
+    password: Optional[str] = None,
+    verify_ssl: Optional[bool] = None,
+    timeout: Optional[float] = None,
+    concurrency: Optional[int] = None,
+    connections: Optional[int] = None,
+    qps: Optional[float] = None,
+    retries: Optional[int] = None,
+    controller: Optional[AdaptiveConcurrency] = None,
+    mode: str = INTERPOLATED,
+) -> pd.DataFrame:
+    """Async counterpart of ``fetch_tags_via_webapi`` (same arguments and result).
+
+    ``controller`` defaults to the server's shared AIMD controller unless
+    PI_WEBAPI_ADAPTIVE=0.
+    """
+    base_url = base_url or os.getenv("PI_WEBAPI_URL")
+    if not base_url:
+        raise RuntimeError("PI_WEBAPI_URL is not set; cannot use PI Web API fetch.")
+    auth_mode = (auth_mode or os.getenv("PI_WEBAPI_AUTH") or "windows").strip().lower()
+    username = username or os.getenv("PI_WEBAPI_USER")
+    password = password or os.getenv("PI_WEBAPI_PASS")
+    verify_ssl = _bool_env("PI_WEBAPI_VERIFY_SSL", True) if verify_ssl is None else verify_ssl
+    timeout = float(os.getenv("PI_WEBAPI_TIMEOUT", "30").strip()) if timeout is None else timeout
+    retries = int(os.getenv("PI_WEBAPI_RETRIES", "2")) if retries is None else retries
+
+    try:
+        async with AsyncPIWebAPIClient(
+            base_url,
+            auth_mode=auth_mode,
+            username=username,
+            password=password,
+            verify_ssl=verify_ssl,
+            timeout=timeout,
+            concurrency=concurrency,
+            connections=connections,
+            qps=qps,
+            retries=retries,
+            controller=controller or (controller_for(server) if adaptive_enabled() else None),
+        ) as client:
+            # Fast preflight: if unreachable, emit a clear warning and return empty
+            ok, info = await client.health_check()
+            if info == "HTTP 401":
+                raise AsyncAuthRejected(f"PI Web API rejected {auth_mode} auth (401)")
+            if not ok:
+                print(f"[warn] PI Web API unreachable at {client.base_url}: {info}")
+                return pd.DataFrame(columns=["time", "value", "tag"])  # empty
+            started = time.perf_counter()
+            out = await client.fetch_tags(tags, server, start, end, _interval_from_step(step), mode)
+            logger.info(
+                f"Async Web API fetch: {out['tag'].nunique() if not out.empty else 0} tag(s), "
+                f"{client.stats['requests']} request(s), {client.stats['retries']} retries "
+                f"in {time.perf_counter() - started:.2f}s (concurrency "
+                f"{client.controller.snapshot()['limit'] if client.controller else client.concurrency})"
+            )
+            return out
+    except AsyncAuthRejected:
+        if auth_mode == "windows":
+            # Stop trying single-leg Negotiate on this server for the process
+            _NEGOTIATE_REJECTED.add(base_url.rstrip("/"))
+        raise
+
+
+def fetch_tags_via_webapi_async(tags: Iterable[str], server: str, start: str, end: str, step: str,
+                                **kwargs: Any) -> pd.DataFrame:
+    """Synchronous wrapper around :func:`fetch_tags_async`.
+
+    Runs its own event loop; when called from inside a running loop the
+    fetch runs on a helper thread instead.
+    """
+    tags = list(tags)
+
+    def _run() -> pd.DataFrame:
+        return asyncio.run(fetch_tags_async(tags, server, start, end, step, **kwargs))
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return _run()
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        return ex.submit(_run).result()
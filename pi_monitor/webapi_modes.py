@@ -0,0 +1,165 @@
+"""
+Value modes of the PI Web API fetch: interpolated, recorded and summary.
+
+``interpolated`` (default) asks the server for a value every ``interval``
+(6 minutes for the -0.1h unit files). For slow or flat tags most of those
+are repeats, and long ranges cost the server one interpolation per point.
+
+``recorded`` asks ``/streams/{id}/recorded`` for the archived (compressed)
+events instead, with ``boundaryType=Outside`` so the range is bracketed,
+and :func:`interpolate_to_grid` puts them on the same grid the server
+would have used, in one vectorised ``np.interp`` per tag. Grid points
+before the first event are dropped; after the last event the last value
+holds (as the server's interpolation of the snapshot does).
+
+``summary`` asks ``/streams/{id}/summary`` for time-weighted hourly
+(PI_WEBAPI_SUMMARY_DURATION) Average/Minimum/Maximum. The result is a
+long (time, value, tag) frame with ``value`` the mean plus ``min``/``max``
+columns; :meth:`~pi_monitor.rollups.RollupStore.ingest_hourly` stores it
+as the 1h rollup level without fetching raw rows.
+
+PI_WEBAPI_MODE selects ``interpolated`` or ``recorded`` for callers that
+do not pass ``mode`` (summary changes the row shape, so it is opt-in per
+call only).
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+INTERPOLATED = "interpolated"
+RECORDED = "recorded"
+SUMMARY = "summary"
+MODES = (INTERPOLATED, RECORDED, SUMMARY)
+
+# summaryType -> output column
+SUMMARY_TYPES = {"Average": "value", "Minimum": "min", "Maximum": "max"}
+
+
+def fetch_mode(mode: Optional[str] = None) -> str:
+    """Validated fetch mode: ``mode`` or PI_WEBAPI_MODE (interpolated/recorded)."""
+    if mode is None:
+        mode = (os.getenv("PI_WEBAPI_MODE") or INTERPOLATED).strip().lower()
+        if mode not in (INTERPOLATED, RECORDED):
+            raise ValueError(f"PI_WEBAPI_MODE must be '{INTERPOLATED}' or '{RECORDED}', not {mode!r}")
+        return mode
+    mode = str(mode).strip().lower()
+    if mode not in MODES:
+        raise ValueError(f"Unknown PI Web API fetch mode {mode!r}; expected one of {', '.join(MODES)}")
+    return mode
+
+
+def summary_duration() -> str:
+    return (os.getenv("PI_WEBAPI_SUMMARY_DURATION") or "1h").strip()
+
+
+def recorded_max_count() -> int:
+    """Events per /recorded call (PI's MaxReturnedItemsPerCall); longer ranges are paged."""
+    return max(1000, int(os.getenv("PI_WEBAPI_RECORDED_MAX_COUNT", "150000")))
+
+
+def _resolve_range(start: str, end: str) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    from .backfill import resolve_time
+    from .webapi import _to_webapi_time
+
+    now = pd.Timestamp.now(tz="UTC")
+    return resolve_time(_to_webapi_time(start), now), resolve_time(_to_webapi_time(end), now)
+
+
+def grid_times(start: str, end: str, interval: str) -> pd.DatetimeIndex:
+    """UTC grid an interpolated request for [start, end] every ``interval`` returns."""
+    from .backfill import parse_duration
+
+    t0, t1 = _resolve_range(start, end)
+    step = parse_duration(interval.replace("-", "")).value
+    if step <= 0 or t1 < t0:
+        return pd.DatetimeIndex([], tz="UTC")
+    n = (t1.value - t0.value) // step + 1
+    return pd.DatetimeIndex((t0.value + step * np.arange(n, dtype=np.int64)).view("datetime64[ns]")).tz_localize("UTC")
+
+
+def absolute_range(start: str, end: str) -> Tuple[str, str]:
+    """``start``/``end`` as absolute ISO times, so a request and its local grid agree on "*"."""
+    t0, t1 = _resolve_range(start, end)
+    return t0.isoformat(), t1.isoformat()
+
+
+def recorded_params(start: str, end: str, max_count: Optional[int] = None) -> Dict[str, Any]:
+    return {
+        "startTime": start,
+        "endTime": end,
+        "boundaryType": "Outside",
+        "maxCount": max_count or recorded_max_count(),
+    }
+
+
+def summary_params(start: str, end: str, duration: Optional[str] = None) -> List[Tuple[str, Any]]:
+    """Query of an hourly (``duration``) summary over [start, end), aligned to whole buckets."""
+    from .backfill import parse_duration
+
+    t0, t1 = _resolve_range(start, end)
+    step = parse_duration(duration or summary_duration())
+    t0, t1 = t0.floor(step), t1.floor(step)
+    params: List[Tuple[str, Any]] = [("summaryType", t) for t in SUMMARY_TYPES]
+    params += [
+        ("startTime", t0.isoformat()),
+        ("endTime", t1.isoformat()),
+        ("summaryDuration", duration or summary_duration()),
+        ("calculationBasis", "TimeWeighted"),
+        ("timeType", "EarliestTime"),  # bucket start, also for Minimum/Maximum
+    ]
+    return params
+
+
+def interpolate_to_grid(events: pd.DataFrame, grid: pd.DatetimeIndex) -> pd.DataFrame:
+    """Linear interpolation of recorded (time, value) events onto ``grid``.
+
+    Grid points before the first event are dropped; later ones hold the
+    last event's value. Returns a (time, value) frame like ``_items_frame``.
+    """
+    if events is None or events.empty or not len(grid):
+        return pd.DataFrame(columns=["time", "value"])  # empty
+    t = pd.DatetimeIndex(events["time"]).as_unit("ns").asi8
+    v = events["value"].to_numpy(np.float64)
+    if len(t) > 1 and (np.diff(t) < 0).any():
+        order = np.argsort(t, kind="stable")
+        t, v = t[order], v[order]
+    g = grid.as_unit("ns").asi8
+    g = g[g >= t[0]]
+    if not len(g):
+        return pd.DataFrame(columns=["time", "value"])  # empty
+    # Events of the same instant: np.interp takes the last one
+    values = np.interp(g.astype(np.float64), t.astype(np.float64), v)
+    return pd.DataFrame({"time": pd.DatetimeIndex(g.view("datetime64[ns]")).tz_localize("UTC"), "value": values})
+
+
+def summary_frame(data: Any) -> pd.DataFrame:
+    """(time, value, min, max) frame of a ``/summary`` response; ``value`` is the mean."""
+    items = data.get("Items", []) if isinstance(data, dict) else []
+    times: List[Any] = []
+    kinds: List[str] = []
+    values: List[Any] = []
+    for it in items:
+        col = SUMMARY_TYPES.get(it.get("Type"))
+        val = it.get("Value") or {}
+        if col is None or not isinstance(val, dict) or isinstance(val.get("Value"), dict):
+            continue  # unknown type or an error value ("Calc Failed", ...)
+        times.append(val.get("Timestamp"))
+        kinds.append(col)
+        values.append(val.get("Value"))
+    if not times:
+        return pd.DataFrame(columns=["time", "value", "min", "max"])  # empty
+    long = pd.DataFrame({
+        "time": pd.to_datetime(times, errors="coerce", utc=True, format="ISO8601").as_unit("ns"),
+        "kind": kinds,
+        "v": pd.to_numeric(values, errors="coerce"),
+    }).dropna(subset=["time"])
+    wide = long.pivot_table(index="time", columns="kind", values="v", aggfunc="last")
+    wide = wide.reindex(columns=list(SUMMARY_TYPES.values()))
+    wide = wide.dropna(subset=["value"]).reset_index()
+    wide.columns.name = None
+    return wide
@@ -0,0 +1,573 @@
+"""
+Local PI Web API simulator for load and regression tests of the fetch layer.
+
+Serves the subset of the PI Web API used by :mod:`pi_monitor.webapi` and
+:mod:`pi_monitor.webapi_async`:
+
+- ``GET /system``
+- ``GET /points?path=\\\\SERVER\\TAG``           (404 for unknown tags)
+- ``GET /streams/{webId}/{interpolated,recorded,summary}``
+- ``GET /streamsets/{interpolated,recorded,summary}?webId=...``
+- ``POST /batch``                               (GET sub-requests of the above)
+
+Values are deterministic functions of (seed, tag, timestamp), so the same
+instant always has the same value whatever range or endpoint asked for
+it. Recorded events are the samples of a ``recorded_step_s`` grid that
+moved by more than ``compression_dev`` noise levels (plus hourly
+events), so flat stretches compress like a PI archive; summaries are
+computed from one-minute samples. Tags are classified by their instrument code (``12SI-401B.PV`` ->
+speed, ``TI`` temperature, ``VI``/``XI``/``ZI`` vibration, ``PI``
+pressure, ``FI`` flow, ``LI`` level) and carry daily load swings, noise, compressor
+trips, injected anomalies (spikes/steps) and flatlines on a per-tag-day
+schedule, plus occasional ``"Bad Input"`` values.
+
+Latency is log-normal around ``latency_ms`` (plus a per-item cost), and
+429/503 responses, hung requests (timeouts), a concurrency ``capacity``
+(429 above it) and PI's MaxReturnedItemsPerCall (400) can be injected.
+
+In tests use the ``webapi_sim`` fixture from ``conftest.py``; standalone::
+
+    python -m pi_monitor.webapi_sim --port 8765 --latency-ms 50 --rate-429 0.02
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+import zlib
+from collections import Counter
+from dataclasses import dataclass, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .backfill import parse_duration, resolve_time
+
+_DAY_S = 86400
+_KIND = re.compile(r"(?:^|[.\-_\d])([A-Z]{1,6})-?\d")
+
+
+@dataclass
+class SimConfig:
+    seed: int = 0
+    tags: Optional[List[str]] = None  # None: every tag in config/tags_*.txt; [] accepts any tag
+    now: Optional[str] = None  # fixed "*" for reproducible relative ranges; None: wall clock
+    # Latency: log-normal with median latency_ms, plus latency_per_kitem_ms per 1000 returned items
+    latency_ms: float = 20.0
+    latency_sigma: float = 0.5
+    latency_per_kitem_ms: float = 0.0
+    # Faults (per request, /system excluded)
+    rate_429: float = 0.0
+    rate_503: float = 0.0
+    rate_timeout: float = 0.0
+    timeout_s: float = 30.0  # how long a "timed out" request hangs before the connection is dropped
+    capacity: int = 0  # > 0: 429 while more requests than this are in flight
+    max_items: int = 150_000  # PI MaxReturnedItemsPerCall: larger responses are a 400
+    # Recorded events: samples every recorded_step_s kept when they move > compression_dev x noise
+    recorded_step_s: int = 120
+    compression_dev: float = 2.5
+    # Signal features (per tag and day)
+    anomaly_rate: float = 0.05
+    flatline_rate: float = 0.02
+    trip_rate: float = 0.01
+    bad_rate: float = 0.001
+
+
+# --------------------------------------------------------------------- signals
+def _mix(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finaliser: well-spread uint64 hash of uint64 input."""
+    with np.errstate(over="ignore"):
+        z = x + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def _uniform(key: int, x: np.ndarray, salt: int = 0) -> np.ndarray:
+    """Deterministic U[0, 1) per element of the integer array ``x``."""
+    with np.errstate(over="ignore"):
+        k = np.uint64((key * 0x100000001B3 + salt * 0x9E37) & 0xFFFFFFFFFFFFFFFF)
+        h = _mix(x.astype(np.int64).view(np.uint64) ^ k)
+    return (h >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def tag_kind(tag: str) -> str:
+    """Signal family from the instrument code of a tag name."""
+    name = tag.rsplit("\\", 1)[-1]
+    for code in _KIND.findall(name.upper()):
+        c = code[0]
+        if c == "S":
+            return "speed"
+        if c == "T":
+            return "temperature"
+        if c in "VXZ":
+            return "vibration"
+        if c == "P":
+            return "pressure"
+        if c == "F":
+            return "flow"
+        if c == "L":
+            return "level"
+    return "generic"
+
+
+_PROFILES = {
+    # kind: (base, daily swing, noise, anomaly size) in engineering units
+    "speed": (9000.0, 400.0, 15.0, 1500.0),
+    "temperature": (85.0, 6.0, 0.4, 25.0),
+    "vibration": (22.0, 2.0, 1.2, 30.0),
+    "pressure": (35.0, 1.5, 0.15, 8.0),
+    "flow": (1200.0, 90.0, 12.0, 400.0),
+    "level": (50.0, 8.0, 0.8, 25.0),
+    "generic": (50.0, 5.0, 0.5, 20.0),
+}
+
+
+def signal(tag: str, seconds: np.ndarray, cfg: Optional[SimConfig] = None) -> np.ndarray:
+    """Synthetic value of ``tag`` at ``seconds`` since the epoch (float64, NaN = "Bad Input")."""
+    cfg = cfg or SimConfig()
+    key = zlib.crc32(tag.encode("utf-8")) ^ (cfg.seed * 0x61C88647)
+    kind = tag_kind(tag)
+    base, swing, noise, jump = _PROFILES[kind]
+    base *= 0.8 + 0.4 * _uniform(key, np.zeros(1, np.int64), 1)[0]
+    t = np.asarray(seconds, dtype=np.float64)
+    sec = np.floor(t).astype(np.int64)
+    day = sec // _DAY_S
+    phase = 2 * np.pi * (t % _DAY_S) / _DAY_S
+
+    # Daily load profile, a weekly drift and hash noise (sum of two uniforms ~ triangular)
+    v = base + swing * np.sin(phase + (key % 360) * np.pi / 180) + 0.5 * swing * np.sin(2 * np.pi * t / (7 * _DAY_S))
+    v += noise * (_uniform(key, sec, 2) + _uniform(key, sec, 3) - 1.0) * 2.0
+
+    # Compressor trips: one window per affected day, speed to 0 and other signals sag
+    tripped = _window(key, day, t, cfg.trip_rate, 4, 1800, 4 * 3600)
+    if tripped.any():
+        v = np.where(tripped, 0.0 if kind == "speed" else v * 0.6, v)
+
+    # Anomalies: spikes (short) or steps (long) of +/- ``jump``
+    anom = _window(key, day, t, cfg.anomaly_rate, 5, 600, 3 * 3600)
+    if anom.any():
+        sign = np.where(_uniform(key, day, 6) < 0.5, -1.0, 1.0) if kind != "vibration" else 1.0
+        v = np.where(anom, v + sign * jump * (0.6 + 0.8 * _uniform(key, day, 7)), v)
+
+    # Flatlines: the value freezes at the window start
+    flat, start = _window(key, day, t, cfg.flatline_rate, 8, 2 * 3600, 12 * 3600, with_start=True)
+    if flat.any():
+        frozen = signal(tag, start[flat], SimConfig(**{**cfg.__dict__, "flatline_rate": 0.0, "bad_rate": 0.0}))
+        v[flat] = frozen
+
+    # Isolated "Bad Input" samples
+    if cfg.bad_rate:
+        v = np.where(_uniform(key, sec, 9) < cfg.bad_rate, np.nan, v)
+    return np.round(v, 4)
+
+
+def _window(key, day, t, rate, salt, min_len, max_len, with_start=False):
+    """Mask of ``t`` inside the (at most one) event window of its day."""
+    if not rate:
+        mask = np.zeros(t.shape, dtype=bool)
+        return (mask, t) if with_start else mask
+    hit = _uniform(key, day, salt) < rate
+    start = day * _DAY_S + _uniform(key, day, salt + 100) * (_DAY_S - max_len)
+    length = min_len + _uniform(key, day, salt + 200) * (max_len - min_len)
+    mask = hit & (t >= start) & (t < start + length)
+    return (mask, start) if with_start else mask
+
+
+# ----------------------------------------------------------------------- webids
+def webid_for(tag: str) -> str:
+    return "SIM" + base64.urlsafe_b64encode(tag.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def tag_for(webid: str) -> Optional[str]:
+    if not webid.startswith("SIM"):
+        return None
+    raw = webid[3:]
+    try:
+        return base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)).decode("utf-8")
+    except Exception:
+        return None
+
+
+def default_tags() -> List[str]:
+    from .webid_cache import default_tag_files, read_tag_files
+
+    return read_tag_files(default_tag_files())
+
+
+# ---------------------------------------------------------------------- server
+class _Reply(Exception):
+    def __init__(self, status: int, body: Any) -> None:
+        self.status = status
+        self.body = body
+
+
+class WebAPISimulator:
+    """Threaded HTTP/1.1 PI Web API simulator; ``start()`` returns its base URL."""
+
+    def __init__(self, config: Optional[SimConfig] = None, **overrides: Any) -> None:
+        self.config = config or SimConfig()
+        for k, v in overrides.items():
+            setattr(self.config, k, v)
+        tags = self.config.tags if self.config.tags is not None else default_tags()
+        self.tags = set(tags)
+        self.calls: Counter = Counter()  # endpoint -> requests
+        self.statuses: Counter = Counter()  # status -> responses
+        self.items: Counter = Counter()  # interpolated/recorded/summary -> items served
+        self.inflight = 0
+        self.peak_inflight = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.config.seed)
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.url: Optional[str] = None
+
+    # ------------------------------------------------------------- lifecycle
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._server = ThreadingHTTPServer((host, port), _handler(self))
+        self._server.daemon_threads = True
+        self._server.handle_error = lambda *a: None  # clients dropping keep-alive connections
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.url = f"http://{host}:{self._server.server_address[1]}/piwebapi"
+        return self.url
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "WebAPISimulator":
+        self.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"calls": dict(self.calls), "statuses": dict(self.statuses), "items": dict(self.items),
+                    "peak_inflight": self.peak_inflight}
+
+    # ---------------------------------------------------------------- values
+    def now(self) -> pd.Timestamp:
+        return resolve_time(self.config.now) if self.config.now else pd.Timestamp.now(tz="UTC")
+
+    def _times(self, start: str, end: str, interval: str) -> Tuple[pd.Timestamp, pd.Timestamp, int]:
+        now = self.now()
+        try:
+            return resolve_time(start, now), resolve_time(end, now), parse_duration(interval).value
+        except Exception:
+            raise _Reply(400, {"Errors": [f"Invalid time range or interval: {start!r}, {end!r}, {interval!r}"]})
+
+    def _check_items(self, n: int) -> None:
+        if n > self.config.max_items:
+            raise _Reply(400, {"Errors": [f"The maximum number of items ({self.config.max_items}) was exceeded"]})
+
+    def values(self, tag: str, start: str, end: str, interval: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Interpolated (datetime64[ns] UTC, float64) samples of ``tag`` on [start, end]."""
+        t0, t1, step = self._times(start, end, interval)
+        if step <= 0 or t1 < t0:
+            return np.empty(0, "datetime64[ns]"), np.empty(0)
+        n = (t1.value - t0.value) // step + 1
+        self._check_items(n)
+        ns = t0.value + step * np.arange(n, dtype=np.int64)
+        return ns.view("datetime64[ns]"), signal(tag, ns / 1e9, self.config)
+
+    def recorded(self, tag: str, start: str, end: str, max_count: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """Archived events of ``tag`` on [start, end] plus one event outside each end."""
+        step = max(1, int(self.config.recorded_step_s))
+        t0, t1, _ = self._times(start, end, f"{step}s")
+        if t1 < t0:
+            return np.empty(0, "datetime64[ns]"), np.empty(0)
+        first = -(-t0.value // 10**9) // step * step  # last grid second <= start
+        first -= step if first * 10**9 > t0.value else 0
+        last = -(-t1.value // 10**9 // step) * step
+        secs = np.arange(first, last + step, step, dtype=np.int64)
+        v = signal(tag, secs.astype(np.float64), self.config)
+        keep = np.ones(len(v), dtype=bool)
+        if len(v) > 2:
+            dev = self.config.compression_dev * _PROFILES[tag_kind(tag)][2]
+            moved = np.abs(np.diff(v)) > dev  # moved[i]: v[i + 1] vs v[i]
+            moved |= np.isnan(v[1:]) | np.isnan(v[:-1])
+            # Keep both ends of a move (the archive has the value before a change)
+            keep[1:] = moved | (secs[1:] % 3600 == 0)
+            keep[:-1] |= moved
+            keep[-1] = True
+        secs, v = secs[keep], v[keep]
+        limit = max_count or self.config.max_items
+        if len(v) > limit:
+            secs, v = secs[:limit], v[:limit]
+        return (secs * 10**9).view("datetime64[ns]"), v
+
+    def summary(self, tag: str, start: str, end: str, duration: str, types: List[str]) -> bytes:
+        """``Items`` of a summary: per type, one time-weighted value per ``duration`` bucket."""
+        t0, t1, d = self._times(start, end, duration)
+        if d <= 0 or t1 <= t0:
+            return b""
+        nb = -(-(t1.value - t0.value) // d)
+        self._check_items(nb * len(types))
+        per = max(1, d // 60_000_000_000)
+        grid = t0.value + d * np.arange(nb, dtype=np.int64)[:, None] + (d // per) * np.arange(per, dtype=np.int64)
+        v = signal(tag, (grid / 1e9).ravel(), self.config).reshape(grid.shape)
+        ok = ~np.isnan(v).all(axis=1)
+        stats = {}
+        with np.errstate(all="ignore"):
+            stats["Average"] = np.nanmean(np.where(ok[:, None], v, 0.0), axis=1)
+            stats["Minimum"] = np.nanmin(np.where(ok[:, None], v, 0.0), axis=1)
+            stats["Maximum"] = np.nanmax(np.where(ok[:, None], v, 0.0), axis=1)
+            stats["Count"] = (~np.isnan(v)).sum(axis=1).astype(np.float64)
+        stamps = np.datetime_as_string(grid[:, 0].view("datetime64[ns]"), unit="s").tolist()
+        out = []
+        for typ in types:
+            vals = stats.get(typ)
+            if vals is None:
+                raise _Reply(400, {"Errors": [f"Unsupported summaryType {typ!r}"]})
+            for ts, good, val in zip(stamps, ok.tolist(), np.round(vals, 4).tolist()):
+                value = repr(val) if good else '{"Name":"Calc Failed","Value":246,"IsSystem":true}'
+                out.append(f'{{"Type":"{typ}","Value":{{"Timestamp":"{ts}Z","Value":{value},'
+                           f'"UnitsAbbreviation":"","Good":{"true" if good else "false"}}}}}')
+        return ",".join(out).encode("ascii")
+
+    # --------------------------------------------------------------- routing
+    def route(self, method: str, path: str, query: Dict[str, List[str]], body: Any = None) -> Tuple[int, Any]:
+        """(status, JSON body or bytes) of one request; also serves /batch sub-requests."""
+        path = path.rstrip("/")
+        try:
+            if method == "GET" and path.endswith("/system"):
+                return 200, {"ProductTitle": "PI Web API (simulator)", "ProductVersion": "sim"}
+            if method == "GET" and path.endswith("/points"):
+                return 200, self._point(query)
+            m = re.search(r"/streamsets/(interpolated|recorded|summary)$", path)
+            if method == "GET" and m:
+                return 200, self._streamset(m.group(1), query)
+            m = re.search(r"/streams/([^/]+)/(interpolated|recorded|summary)$", path)
+            if method == "GET" and m:
+                return 200, self._stream(m.group(2), urllib.parse.unquote(m.group(1)), query)
+            if method == "POST" and path.endswith("/batch"):
+                return 200, self._batch(body)
+            return 404, {"Errors": [f"No route for {method} {path}"]}
+        except _Reply as r:
+            return r.status, r.body
+
+    def _tag_known(self, tag: str) -> bool:
+        return not self.tags or tag in self.tags
+
+    def _point(self, query: Dict[str, List[str]]) -> Dict[str, Any]:
+        path = (query.get("path") or [""])[0]
+        tag = path.rsplit("\\", 1)[-1]
+        if not tag or not self._tag_known(tag):
+            raise _Reply(404, {"Errors": [f"PI Point not found '{path}'."]})
+        return {"WebId": webid_for(tag), "Name": tag, "Path": path, "PointType": "Float32"}
+
+    def _stream_tag(self, webid: str) -> str:
+        tag = tag_for(webid)
+        if tag is None or not self._tag_known(tag):
+            raise _Reply(404, {"Errors": [f"Unknown or invalid WebId '{webid}'."]})
+        return tag
+
+    def _items(self, kind: str, tag: str, query: Dict[str, List[str]]) -> Tuple[bytes, int]:
+        """JSON ``Items`` entries and their count for one stream of a ``kind`` request."""
+        q = {k: v[0] for k, v in query.items() if v}
+        start, end = q.get("startTime", "*-1d"), q.get("endTime", "*")
+        if kind == "summary":
+            types = query.get("summaryType") or ["Total"]
+            body = self.summary(tag, start, end, q.get("summaryDuration", "1h"), types)
+            n = body.count(b'"Type"')
+        else:
+            if kind == "recorded":
+                times, values = self.recorded(tag, start, end, int(q.get("maxCount", 0) or 0))
+            else:
+                times, values = self.values(tag, start, end, q.get("interval", "1h"))
+            body, n = _items_json(times, values), len(values)
+        with self._lock:
+            self.items[kind] += n
+        return body, n
+
+    def _stream(self, kind: str, webid: str, query: Dict[str, List[str]]) -> bytes:
+        items, n = self._items(kind, self._stream_tag(webid), query)
+        self._charge(n)
+        return b'{"Links":{},"Items":[' + items + b'],"UnitsAbbreviation":""}'
+
+    def _streamset(self, kind: str, query: Dict[str, List[str]]) -> bytes:
+        parts = []
+        total = 0
+        for webid in query.get("webId", []):
+            tag = self._stream_tag(webid)
+            items, n = self._items(kind, tag, query)
+            total += n
+            self._check_items(total)
+            parts.append(b'{"WebId":"' + webid.encode() + b'","Name":' + json.dumps(tag).encode()
+                         + b',"Items":[' + items + b"]}")
+        self._charge(total)
+        return b'{"Links":{},"Items":[' + b",".join(parts) + b"]}"
+
+    def _batch(self, body: Any) -> Dict[str, Any]:
+        if not isinstance(body, dict):
+            raise _Reply(400, {"Errors": ["Batch request body must be an object"]})
+        out = {}
+        for key, sub in body.items():
+            url = urllib.parse.urlsplit(str(sub.get("Resource", "")))
+            status, content = self.route(str(sub.get("Method", "GET")).upper(), url.path,
+                                         urllib.parse.parse_qs(url.query))
+            if isinstance(content, bytes):
+                content = json.loads(content)
+            out[key] = {"Status": status, "Headers": {}, "Content": content}
+        return out
+
+    # ---------------------------------------------------------- faults/latency
+    def _charge(self, items: int) -> None:
+        if self.config.latency_per_kitem_ms and items:
+            time.sleep(self.config.latency_per_kitem_ms * items / 1e6)
+
+    def _latency(self) -> float:
+        c = self.config
+        if c.latency_ms <= 0:
+            return 0.0
+        with self._lock:
+            return c.latency_ms / 1000.0 * self._rng.lognormvariate(0.0, c.latency_sigma)
+
+    def _fault(self, inflight: int) -> Optional[str]:
+        """'429', '503', 'timeout' or None for a request arriving with ``inflight`` others running."""
+        c = self.config
+        if c.capacity and inflight > c.capacity:
+            return "429"
+        with self._lock:
+            u = self._rng.random()
+        for name, rate in (("timeout", c.rate_timeout), ("429", c.rate_429), ("503", c.rate_503)):
+            if u < rate:
+                return name
+            u -= rate
+        return None
+
+
+def _items_json(times: np.ndarray, values: np.ndarray) -> bytes:
+    """JSON ``Items`` entries; NaN becomes PI's "Bad Input" system digital state."""
+    stamps = np.datetime_as_string(times, unit="ms")
+    out = []
+    for ts, v in zip(stamps.tolist(), values.tolist()):
+        if v != v:
+            val = '{"Name":"Bad Input","Value":307,"IsSystem":true}'
+            good = "false"
+        else:
+            val = repr(v)
+            good = "true"
+        out.append(f'{{"Timestamp":"{ts}Z","Value":{val},"UnitsAbbreviation":"","Good":{good},'
+                   f'"Questionable":false,"Substituted":false,"Annotated":false}}')
+    return ",".join(out).encode("ascii")
+
+
+def _handler(sim: WebAPISimulator):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        server_version = "PIWebAPISim/1.0"
+
+        def log_message(self, *args):  # quiet
+            pass
+
+        def _send(self, status: int, body: Any) -> None:
+            payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            if status in (429, 503):
+                self.send_header("Retry-After", "1")
+            self.end_headers()
+            self.wfile.write(payload)
+            with sim._lock:
+                sim.statuses[status] += 1
+
+        def _handle(self, method: str) -> None:
+            url = urllib.parse.urlsplit(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            endpoint = _endpoint(url.path)
+            with sim._lock:
+                sim.calls[endpoint] += 1
+                sim.inflight += 1
+                sim.peak_inflight = max(sim.peak_inflight, sim.inflight)
+                inflight = sim.inflight
+            try:
+                time.sleep(sim._latency())
+                fault = None if endpoint == "system" else sim._fault(inflight)
+                if fault == "timeout":
+                    time.sleep(sim.config.timeout_s)
+                    self.close_connection = True  # no response: the client times out
+                    return
+                if fault == "429":
+                    return self._send(429, {"Errors": ["Too many requests"]})
+                if fault == "503":
+                    return self._send(503, {"Errors": ["Service unavailable"]})
+                try:
+                    body = json.loads(raw) if raw else None
+                except ValueError:
+                    return self._send(400, {"Errors": ["Malformed JSON body"]})
+                status, out = sim.route(method, url.path, urllib.parse.parse_qs(url.query), body)
+                self._send(status, out)
+            finally:
+                with sim._lock:
+                    sim.inflight -= 1
+
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_POST(self):
+            self._handle("POST")
+
+    return Handler
+
+
+def _endpoint(path: str) -> str:
+    path = path.rstrip("/")
+    if "/streamsets/" in path:
+        return "streamsets"
+    if "/streams/" in path:
+        return "streams"
+    return path.rsplit("/", 1)[-1] or "root"
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Local PI Web API simulator (synthetic compressor tags)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--tags", type=Path, nargs="*", help="Tag list files (default config/tags_*.txt)")
+    ap.add_argument("--any-tag", action="store_true", help="Serve any tag name instead of 404 for unknown ones")
+    for f in fields(SimConfig):
+        if f.name in ("tags",):
+            continue
+        flag = "--" + f.name.replace("_", "-")
+        ap.add_argument(flag, type=type(f.default) if f.default is not None else str, default=f.default)
+    args = ap.parse_args(list(argv) if argv is not None else None)
+
+    cfg = SimConfig(**{f.name: getattr(args, f.name) for f in fields(SimConfig) if f.name != "tags"})
+    if args.any_tag:
+        cfg.tags = []
+    elif args.tags:
+        from .webid_cache import read_tag_files
+
+        cfg.tags = read_tag_files(args.tags)
+    sim = WebAPISimulator(cfg)
+    url = sim.start(args.host, args.port)
+    print(f"PI Web API simulator at {url} ({len(sim.tags) or 'any'} tags, {cfg.latency_ms:.0f} ms median latency, "
+          f"429 {cfg.rate_429:.1%}, 503 {cfg.rate_503:.1%}, timeouts {cfg.rate_timeout:.1%}); Ctrl-C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim.stop()
+        print(f"[sim] {sim.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,252 @@
+"""
+Persistent tag -> WebId cache for the PI Web API clients.
+
+Every Web API fetch resolves each tag through ``/points?path=`` before it
+can request values, and ``_fetch_one_tag`` repeated the lookup on every
+retry. Tag-to-WebId mappings practically never change, so resolutions are
+kept in a small SQLite database keyed by (server, tag):
+
+- resolved WebIds live for PI_WEBID_CACHE_TTL_H hours (default 720, 30 days),
+- tags the server reports as not found are remembered for
+  PI_WEBID_NEGATIVE_TTL_H hours (default 6) so they are not re-probed on
+  every hourly refresh,
+- the database (PI_WEBID_CACHE, default ``data/cache/webids.sqlite``) uses
+  WAL mode and per-operation connections, so concurrent refresh processes
+  and containers sharing the data volume read and fill the same cache.
+  Set PI_WEBID_CACHE=0 to disable it.
+
+:func:`prewarm` resolves all tags of the ``config/tags_*.txt`` lists in a
+few ``/batch`` calls (see ``scripts/prewarm_webids.py``).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS webids (
+    server TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    webid TEXT,
+    resolved_at REAL NOT NULL,
+    PRIMARY KEY (server, tag)
+)
+"""
+
+_DISABLED = {"0", "off", "false", "no", "none"}
+
+
+def _default_path() -> Path:
+    return Path(__file__).parent.parent / "data" / "cache" / "webids.sqlite"
+
+
+def _server_key(server: str) -> str:
+    # "\\PTSG-1MMPDPdb01" (Excel/PI SDK style) and "PTSG-1MMPDPdb01" are the same server
+    return str(server or "").strip().lstrip("\\").lower()
+
+
+class WebIdCache:
+    """SQLite-backed (server, tag) -> WebId cache with a negative-entry TTL.
+
+    ``lookup`` returns cached entries only: a WebId for resolved tags and
+    ``None`` for tags known to be missing; tags absent from the result must
+    be resolved against the server.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        *,
+        ttl_s: Optional[float] = None,
+        negative_ttl_s: Optional[float] = None,
+    ) -> None:
+        self.path = Path(path) if path is not None else _default_path()
+        self.ttl_s = ttl_s if ttl_s is not None else float(os.getenv("PI_WEBID_CACHE_TTL_H", "720")) * 3600.0
+        self.negative_ttl_s = (
+            negative_ttl_s if negative_ttl_s is not None
+            else float(os.getenv("PI_WEBID_NEGATIVE_TTL_H", "6")) * 3600.0
+        )
+        self._lock = threading.Lock()
+        self._ready = False
+        self.stats: Dict[str, int] = {"hits": 0, "negative_hits": 0, "misses": 0, "writes": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=30.0)
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(_SCHEMA)
+                    conn.commit()
+                    self._ready = True
+        return conn
+
+    def lookup(self, server: str, tags: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Unexpired entries for ``tags``: tag -> WebId, or None when known missing."""
+        wanted = list(dict.fromkeys(tags))
+        if not wanted:
+            return {}
+        now = time.time()
+        out: Dict[str, Optional[str]] = {}
+        try:
+            with closing(self._connect()) as conn:
+                key = _server_key(server)
+                for i in range(0, len(wanted), 500):
+                    chunk = wanted[i:i + 500]
+                    rows = conn.execute(
+                        f"SELECT tag, webid, resolved_at FROM webids WHERE server = ? "
+                        f"AND tag IN ({','.join('?' * len(chunk))})",
+                        [key, *chunk],
+                    ).fetchall()
+                    for tag, webid, resolved_at in rows:
+                        ttl = self.ttl_s if webid else self.negative_ttl_s
+                        if now - resolved_at < ttl:
+                            out[tag] = webid or None
+        except sqlite3.Error as e:
+            logger.warning(f"WebId cache lookup failed ({self.path}): {e}")
+            return {}
+        with self._lock:
+            self.stats["hits"] += sum(1 for w in out.values() if w)
+            self.stats["negative_hits"] += sum(1 for w in out.values() if not w)
+            self.stats["misses"] += len(wanted) - len(out)
+        return out
+
+    def get(self, server: str, tag: str) -> Tuple[bool, Optional[str]]:
+        """(cached, WebId) for one tag; (True, None) means known missing."""
+        hit = self.lookup(server, [tag])
+        return (tag in hit), hit.get(tag)
+
+    def put_many(self, server: str, resolved: Dict[str, str], missing: Iterable[str] = ()) -> None:
+        """Store resolved WebIds and negative entries for tags that were not found."""
+        now = time.time()
+        key = _server_key(server)
+        rows = [(key, t, w, now) for t, w in resolved.items() if w]
+        rows += [(key, t, None, now) for t in missing]
+        if not rows:
+            return
+        try:
+            with closing(self._connect()) as conn:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO webids (server, tag, webid, resolved_at) VALUES (?, ?, ?, ?)", rows
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"WebId cache write failed ({self.path}): {e}")
+            return
+        with self._lock:
+            self.stats["writes"] += len(rows)
+
+    def put(self, server: str, tag: str, webid: Optional[str]) -> None:
+        if webid:
+            self.put_many(server, {tag: webid})
+        else:
+            self.put_many(server, {}, [tag])
+
+    def forget(self, server: str, tags: Iterable[str]) -> None:
+        """Drop entries, e.g. after a cached WebId was rejected by the server."""
+        key = _server_key(server)
+        rows = [(key, t) for t in tags]
+        if not rows:
+            return
+        try:
+            with closing(self._connect()) as conn:
+                with conn:
+                    conn.executemany("DELETE FROM webids WHERE server = ? AND tag = ?", rows)
+        except sqlite3.Error as e:
+            logger.warning(f"WebId cache delete failed ({self.path}): {e}")
+
+    def purge_expired(self) -> int:
+        """Delete expired entries; returns the number of rows removed."""
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn:
+                with conn:
+                    cur = conn.execute(
+                        "DELETE FROM webids WHERE (webid IS NOT NULL AND resolved_at < ?) "
+                        "OR (webid IS NULL AND resolved_at < ?)",
+                        (now - self.ttl_s, now - self.negative_ttl_s),
+                    )
+                    return cur.rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"WebId cache purge failed ({self.path}): {e}")
+            return 0
+
+    def counts(self) -> Dict[str, int]:
+        """Number of stored resolved and negative entries (expired included)."""
+        try:
+            with closing(self._connect()) as conn:
+                resolved, missing = conn.execute(
+                    "SELECT COUNT(webid), COUNT(*) - COUNT(webid) FROM webids"
+                ).fetchone()
+                return {"resolved": int(resolved or 0), "missing": int(missing or 0)}
+        except sqlite3.Error:
+            return {"resolved": 0, "missing": 0}
+
+
+_caches: Dict[str, WebIdCache] = {}
+_caches_lock = threading.Lock()
+
+
+def default_cache() -> Optional[WebIdCache]:
+    """Process-wide cache for PI_WEBID_CACHE, or None when disabled or unusable."""
+    setting = os.getenv("PI_WEBID_CACHE", "").strip()
+    if setting.lower() in _DISABLED:
+        return None
+    path = Path(setting) if setting else _default_path()
+    with _caches_lock:
+        cache = _caches.get(str(path))
+        if cache is None:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                logger.warning(f"WebId cache disabled, cannot create {path.parent}: {e}")
+                return None
+            cache = _caches[str(path)] = WebIdCache(path)
+        return cache
+
+
+def read_tag_files(paths: Iterable[Path]) -> List[str]:
+    """Unique tags of the given tag list files (blank lines and # comments skipped)."""
+    tags: List[str] = []
+    for p in paths:
+        try:
+            lines = Path(p).read_text(encoding="utf-8", errors="ignore").splitlines()
+        except OSError as e:
+            logger.warning(f"Cannot read tag file {p}: {e}")
+            continue
+        tags.extend(s for s in (line.strip() for line in lines) if s and not s.startswith("#"))
+    return list(dict.fromkeys(tags))
+
+
+def default_tag_files() -> List[Path]:
+    return sorted((Path(__file__).parent.parent / "config").glob("tags_*.txt"))
+
+
+def prewarm(client, server: str, tags: Optional[Iterable[str]] = None, *, retries: int = 2) -> Dict[str, int]:
+    """Resolve every tag not yet cached through ``client.resolve_point_webids``.
+
+    ``tags`` defaults to the union of ``config/tags_*.txt``. The client's
+    bulk resolver stores results (and not-found tags) in its cache.
+    Returns counts of cached, resolved, missing and failed tags.
+    """
+    cache = getattr(client, "webid_cache", None)
+    wanted = list(dict.fromkeys(tags if tags is not None else read_tag_files(default_tag_files())))
+    cached = cache.lookup(server, wanted) if cache is not None else {}
+    todo = [t for t in wanted if t not in cached]
+    resolved, failed = client.resolve_point_webids(server, todo, retries=retries) if todo else ({}, [])
+    return {
+        "tags": len(wanted),
+        "cached": len(cached),
+        "resolved": len(resolved),
+        "missing": len(todo) - len(resolved) - len(failed),
+        "failed": len(failed),
+    }
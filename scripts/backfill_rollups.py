@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Backfill a unit's hourly/daily rollups from PI Web API server-side summaries.
+
+Fetches time-weighted hourly Average/Minimum/Maximum per tag
+(``fetch_tags_via_webapi(mode="summary")``) and stores them as the 1h
+rollup level (daily buckets are derived), instead of fetching a year of
+6-minute values and aggregating them locally. The range must reach the
+unit's stored rollups (or the unit has none yet).
+
+Usage:
+  python scripts/backfill_rollups.py --unit K-12-01 --tags config/tags_k12_01.txt
+  python scripts/backfill_rollups.py --unit K-12-01 --tags config/tags_k12_01.txt --start -90d --end -30d
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from pi_monitor.parquet_database import ParquetDatabase  # noqa: E402
+from pi_monitor.webapi import fetch_tags_via_webapi  # noqa: E402
+from pi_monitor.webapi_modes import absolute_range  # noqa: E402
+from pi_monitor.webid_cache import read_tag_files  # noqa: E402
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Hourly rollups of one unit from PI Web API summaries")
+    ap.add_argument("--unit", required=True)
+    ap.add_argument("--tags", type=Path, required=True, help="Tag list file")
+    ap.add_argument("--server", default=os.getenv("PI_SERVER_NAME") or "PTSG-1MMPDPdb01")
+    ap.add_argument("--start", default="-1y")
+    ap.add_argument("--end", default="*")
+    args = ap.parse_args()
+
+    tags = read_tag_files([args.tags])
+    if not tags:
+        print(f"No tags in {args.tags}")
+        return 1
+    # One resolved range for the requests and the stored span
+    start, end = absolute_range(args.start, args.end)
+    print(f"[rollups] {args.unit}: hourly summaries of {len(tags)} tag(s) {start} -> {end}")
+    hourly = fetch_tags_via_webapi(tags, args.server, start, end, "-1h", mode="summary")
+    if hourly.empty:
+        print("[rollups] no summaries returned")
+        return 2
+    db = ParquetDatabase()
+    added = db.rollups.ingest_hourly(args.unit, hourly, start, end)
+    print(f"[rollups] {hourly['tag'].nunique()} tag(s): +{added['1h']:,} hourly, +{added['1d']:,} daily bucket(s) "
+          f"in {db.rollups.unit_dir(args.unit)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Resumable full-history backfill of one unit over the PI Web API.
+
+Splits every tag's range into time shards, fetches them concurrently and
+writes each shard to Parquet as it completes (see pi_monitor.backfill).
+Interrupted or partly failed runs are resumed by running the same
+command again; only missing shards are fetched. Once every shard is in,
+the shards are merged into data/processed/<unit>_1y_0p1h.parquet.
+
+Usage:
+  python scripts/backfill_unit.py --plant PCFS --unit K-12-01 --tags config/tags_k12_01.txt
+  python scripts/backfill_unit.py --plant ABF --unit 21-K002 --tags config/tags_abf_21k002.txt --shard 7d
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from pi_monitor.backfill import BackfillJob  # noqa: E402
+from pi_monitor.delta_store import default_master_path  # noqa: E402
+from pi_monitor.webid_cache import read_tag_files  # noqa: E402
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Sharded, resumable PI Web API backfill of one unit")
+    ap.add_argument("--plant", required=True)
+    ap.add_argument("--unit", required=True)
+    ap.add_argument("--tags", type=Path, required=True, help="Tag list file")
+    ap.add_argument("--server", default=os.getenv("PI_SERVER_NAME") or "PTSG-1MMPDPdb01")
+    ap.add_argument("--start", default="-1y")
+    ap.add_argument("--end", default="*")
+    ap.add_argument("--step", default="-0.1h")
+    ap.add_argument("--shard", default=None, help="Shard length (default BACKFILL_SHARD or 30d)")
+    ap.add_argument("--workers", type=int, default=None, help="Fetch threads (default: adaptive limit)")
+    ap.add_argument("--out", type=Path, default=None, help="Master Parquet (default data/processed/<unit>_1y_0p1h.parquet)")
+    ap.add_argument("--restart", action="store_true", help="Ignore the saved plan and re-resolve the time range")
+    ap.add_argument("--no-finalize", action="store_true", help="Only fetch shards")
+    args = ap.parse_args()
+
+    tags = read_tag_files([args.tags])
+    if not tags:
+        print(f"No tags in {args.tags}")
+        return 1
+    job = BackfillJob(tags, plant=args.plant, unit=args.unit, server=args.server, start=args.start,
+                      end=args.end, step=args.step, shard=args.shard, resume=not args.restart)
+    stats = job.run(max_workers=args.workers)
+    print(f"[backfill] fetched {stats['fetched']}, skipped {stats['skipped']} (checkpointed), "
+          f"failed {stats['failed']}, {stats['rows']:,} rows; work dir {job.work_dir}")
+    if not job.is_complete():
+        print(f"[backfill] {len(job.pending())} shard(s) still missing; run the same command again to resume")
+        return 2
+    if args.no_finalize:
+        return 0
+    out = args.out or default_master_path(PROJECT_ROOT / "data" / "processed", args.unit)
+    job.finalize(out)
+    print(f"[backfill] wrote {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
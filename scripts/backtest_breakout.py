@@ -56,7 +56,7 @@ def backtest_unit(unit: str, chunk_days: int = 30) -> dict:
     # Build speed-only resample (memory light) to pick speed column and auto window
     speed_series = (
         df[df['tag'].str.contains('SI-|KI-|SPEED|RPM', regex=True, na=False)]
-        .pivot_table(index='time', columns='tag', values='value')
+        .pivot_table(index='time', columns='tag', values='value', observed=True)
         .resample('10min').mean().ffill()
     )
     if speed_series.empty:
@@ -69,7 +69,7 @@ def backtest_unit(unit: str, chunk_days: int = 30) -> dict:
     if speed_col is None:
         head_times = df['time'].sort_values().unique()[:2000]
         small = df[df['time'].isin(head_times)]
-        small_pivot = small.pivot_table(index='time', columns='tag', values='value').resample('10min').mean().ffill()
+        small_pivot = small.pivot_table(index='time', columns='tag', values='value', observed=True).resample('10min').mean().ffill()
         cand = [c for c in small_pivot.columns if any(k in str(c) for k in ('SI-','KI-','SPEED','RPM'))]
         speed_col = cand[0] if cand else (small_pivot.columns[0] if len(small_pivot.columns) else None)
 
@@ -95,7 +95,7 @@ def backtest_unit(unit: str, chunk_days: int = 30) -> dict:
         chunk = df[(df['time'] >= current) & (df['time'] < chunk_end)]
         if not chunk.empty:
             # Pivot this chunk only
-            pivot = chunk.pivot_table(index='time', columns='tag', values='value').resample('10min').mean().ffill().reset_index()
+            pivot = chunk.pivot_table(index='time', columns='tag', values='value', observed=True).resample('10min').mean().ffill().reset_index()
             tags = [c for c in pivot.columns if c not in ('time', speed_col) and isinstance(c, str)]
             if len(tags) > 0:
                 recent_mask = (pivot['time'] >= (chunk_end - pd.Timedelta(days=chunk_days)))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark the threaded, asyncio and bulk PI Web API fetch paths against the local simulator.
+
+The simulator (pi_monitor.webapi_sim) serves /system, /points?path=,
+/batch, /streams/{webid}/interpolated and /streamsets/interpolated
+(6-minute synthetic values) over HTTP/1.1 keep-alive, with a fixed (or
+log-normal, --latency-sigma) per-request latency and optional shares of
+429/503 responses and hung requests.
+
+Usage:
+  python scripts/bench_webapi_fetch.py                      # 300 tags, 50 ms latency
+  python scripts/bench_webapi_fetch.py --tags 1000 --latency-ms 80 --rate-429 0.02
+  python scripts/bench_webapi_fetch.py --latency-sigma 0.8 --rate-503 0.01 --rate-timeout 0.005
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from pi_monitor.adaptive_concurrency import metrics  # noqa: E402
+from pi_monitor.webapi import fetch_tags_via_webapi  # noqa: E402
+from pi_monitor.webapi_async import aiohttp, fetch_tags_via_webapi_async  # noqa: E402
+from pi_monitor.webapi_sim import WebAPISimulator  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Threaded vs asyncio vs bulk Web API fetch against the local simulator")
+    ap.add_argument("--tags", type=int, default=300)
+    ap.add_argument("--latency-ms", type=float, default=50.0)
+    ap.add_argument("--latency-sigma", type=float, default=0.0, help="Log-normal latency spread (0: fixed)")
+    ap.add_argument("--rate-429", type=float, default=0.0)
+    ap.add_argument("--rate-503", type=float, default=0.0)
+    ap.add_argument("--rate-timeout", type=float, default=0.0, help="Share of requests that hang past the timeout")
+    ap.add_argument("--points", type=int, default=10, help="Interpolated items per tag")
+    ap.add_argument("--workers", type=int, default=4, help="Threads for the threaded path")
+    ap.add_argument("--concurrency", type=int, default=32, help="In-flight requests for the async path")
+    args = ap.parse_args()
+
+    sim = WebAPISimulator(tags=[], latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+                          rate_429=args.rate_429, rate_503=args.rate_503, rate_timeout=args.rate_timeout,
+                          timeout_s=5.0)
+    url = sim.start()
+    tags = [f"PCFS.K-99-01.{i:04d}TI-1.PV" for i in range(args.tags)]
+    start = f"-{(args.points - 1) * 6}m"
+    common = dict(base_url=url, auth_mode="none", retries=3, timeout=2.0)
+    print(f"Simulated PI Web API at {url}: {args.tags} tags, {args.latency_ms:.0f} ms latency, "
+          f"{args.rate_429:.1%} 429s, {args.rate_503:.1%} 503s, {args.rate_timeout:.1%} timeouts")
+
+    # Force the threaded path (PI_WEBAPI_ASYNC=auto would pick asyncio)
+    os.environ["PI_WEBAPI_ASYNC"] = "0"
+    # Each path starts with a cold WebId cache of its own
+    cache_dir = tempfile.mkdtemp(prefix="bench_webids_")
+    os.environ["PI_WEBID_CACHE"] = os.path.join(cache_dir, "threaded.sqlite")
+    # Fixed worker count baseline (PI_WEBAPI_ADAPTIVE=0)
+    os.environ["PI_WEBAPI_ADAPTIVE"] = "0"
+    t0 = time.perf_counter()
+    threaded = fetch_tags_via_webapi(tags, "MOCK", start, "*", "-0.1h", max_workers=args.workers, bulk=False,
+                                     qps=1e6, **common)
+    t_threaded = time.perf_counter() - t0
+    print(f"threaded ({args.workers} workers): {t_threaded:6.2f}s  {threaded['tag'].nunique()} tags, {len(threaded):,} rows")
+
+    os.environ["PI_WEBAPI_ADAPTIVE"] = "1"
+    os.environ["PI_WEBID_CACHE"] = os.path.join(cache_dir, "adaptive.sqlite")
+    t0 = time.perf_counter()
+    adaptive = fetch_tags_via_webapi(tags, "MOCK", start, "*", "-0.1h", bulk=False, **common)
+    t_adaptive = time.perf_counter() - t0
+    limit = metrics()["mock"]
+    print(f"threaded (adaptive, limit now {limit['limit']}, {limit['throttled']} throttled): {t_adaptive:6.2f}s  "
+          f"{adaptive['tag'].nunique()} tags  ({t_threaded / t_adaptive:.1f}x)")
+
+    if aiohttp is None:
+        print("aiohttp is not installed; skipping the asyncio path")
+    else:
+        os.environ["PI_WEBID_CACHE"] = os.path.join(cache_dir, "async.sqlite")
+        t0 = time.perf_counter()
+        asynced = fetch_tags_via_webapi_async(tags, "MOCK", start, "*", "-0.1h",
+                                              concurrency=args.concurrency, **common)
+        t_async = time.perf_counter() - t0
+        print(f"asyncio ({args.concurrency} in flight): {t_async:6.2f}s  {asynced['tag'].nunique()} tags, "
+              f"{len(asynced):,} rows  ({t_threaded / t_async:.1f}x)")
+
+    os.environ["PI_WEBID_CACHE"] = os.path.join(cache_dir, "bulk.sqlite")
+    t0 = time.perf_counter()
+    bulk = fetch_tags_via_webapi(tags, "MOCK", start, "*", "-0.1h", bulk=True, **common)
+    t_bulk = time.perf_counter() - t0
+    print(f"bulk (/batch + /streamsets): {t_bulk:6.2f}s  {bulk['tag'].nunique()} tags, {len(bulk):,} rows  "
+          f"({t_threaded / t_bulk:.1f}x)")
+
+    # Warm cache: WebId lookups are skipped entirely
+    t0 = time.perf_counter()
+    warm = fetch_tags_via_webapi(tags, "MOCK", start, "*", "-0.1h", bulk=True, **common)
+    t_warm = time.perf_counter() - t0
+    print(f"bulk, warm WebId cache: {t_warm:6.2f}s  {warm['tag'].nunique()} tags  ({t_threaded / t_warm:.1f}x)")
+    print(f"simulator: {sim.stats()}")
+    sim.stop()
+
+
+if __name__ == "__main__":
+    main()
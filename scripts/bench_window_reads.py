@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark row-group pruned window reads against full-file reads.
+
+For each window length it reports the row groups and compressed bytes a
+pruned read touches versus the whole file, plus wall time of both.
+
+Usage:
+  python scripts/bench_window_reads.py                       # synthetic 1y/120-tag unit
+  python scripts/bench_window_reads.py --file data/processed/K-31-01_1y_0p1h.dedup.parquet
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from pi_monitor.ingest import write_parquet  # noqa: E402
+from pi_monitor.parquet_io import read_window  # noqa: E402
+
+
+def _synthetic_unit(path: Path, tags: int, days: int) -> Path:
+    times = pd.date_range(end=pd.Timestamp.now().floor("6min"), periods=days * 240, freq="6min")
+    rng = np.random.default_rng(7)
+    frames = []
+    for i in range(tags):
+        frames.append(pd.DataFrame({
+            "time": times,
+            "value": rng.normal(100 + i, 5, len(times)),
+            "plant": "PCFS",
+            "unit": "K-99-01",
+            "tag": f"PCFS_K-99-01_TAG{i:03d}_PV",
+        }))
+    write_parquet(pd.concat(frames, ignore_index=True), path)
+    return path
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Bytes read vs window length for pruned Parquet reads")
+    ap.add_argument("--file", type=Path, help="Existing unit Parquet file (default: synthetic)")
+    ap.add_argument("--tags", type=int, default=120, help="Synthetic tag count")
+    ap.add_argument("--days", type=int, default=365, help="Synthetic history length")
+    ap.add_argument("--windows", type=str, default="1,7,30,90,180,365", help="Window lengths in days")
+    args = ap.parse_args()
+
+    tmpdir = None
+    path = args.file
+    if path is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        path = Path(tmpdir.name) / "K-99-01_1y_0p1h.parquet"
+        print(f"Generating synthetic unit: {args.tags} tags x {args.days} days ...")
+        _synthetic_unit(path, args.tags, args.days)
+
+    pf = pq.ParquetFile(str(path))
+    file_bytes = path.stat().st_size
+    t0 = time.perf_counter()
+    full = pd.read_parquet(path)
+    full_s = time.perf_counter() - t0
+    end = pd.to_datetime(full["time"]).max()
+    print(f"File: {path} ({file_bytes / 1e6:.1f} MB, {pf.metadata.num_row_groups} row groups, {len(full):,} rows)")
+    print(f"Full read: {full_s:.2f}s")
+    del full
+
+    print(f"\n{'window':>8} {'groups':>10} {'MB read':>9} {'% file':>7} {'rows':>12} {'seconds':>8}")
+    for days in [int(d) for d in args.windows.split(",") if d.strip()]:
+        stats: dict = {}
+        t0 = time.perf_counter()
+        table = read_window(path, end - timedelta(days=days), end, stats=stats)
+        df = table.to_pandas()
+        elapsed = time.perf_counter() - t0
+        print(
+            f"{days:>7}d {stats['row_groups_read']:>4}/{stats['row_groups_total']:<5} "
+            f"{stats['bytes_read'] / 1e6:>9.1f} {100 * stats['bytes_read'] / file_bytes:>6.1f}% "
+            f"{len(df):>12,} {elapsed:>8.2f}"
+        )
+
+    if tmpdir is not None:
+        tmpdir.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,59 +1,32 @@
 from pathlib import Path
 import argparse
-import duckdb
+import shutil
+import sys
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from pi_monitor.parquet_database import ParquetDatabase  # noqa: E402
 
-def main():
-    ap = argparse.ArgumentParser(description="Build catalog summaries from partitioned dataset")
-    ap.add_argument("--dataset", type=Path, default=Path("data/processed/dataset"))
-    ap.add_argument("--out-dir", type=Path, default=Path("data/processed"))
-    args = ap.parse_args()
 
-    args.out_dir.mkdir(parents=True, exist_ok=True)
-    con = duckdb.connect()
-    pattern = str(args.dataset / "**/*.parquet")
-
-    con.execute(
-        """
-        CREATE OR REPLACE VIEW v AS SELECT * FROM read_parquet(?);
-        """,
-        [pattern],
+def main():
+    ap = argparse.ArgumentParser(
+        description="Bring the per-tag data catalog (processed/_catalog) up to date. "
+                    "Writers keep it current; use this after bulk copies or with --rebuild."
     )
+    ap.add_argument("--data-dir", type=Path, default=Path("data"))
+    ap.add_argument("--rebuild", action="store_true", help="Drop the persisted catalog and rebuild every unit")
+    args = ap.parse_args()
 
-    tags = con.execute(
-        """
-        SELECT plant, unit, tag,
-               MIN(time) AS min_time,
-               MAX(time) AS max_time,
-               COUNT(*)  AS rows
-        FROM v
-        GROUP BY 1,2,3
-        ORDER BY 1,2,3
-        """
-    ).fetch_df()
-    tags_path = args.out_dir / "catalog_tags.parquet"
-    tags.to_parquet(tags_path, index=False)
-
-    units = con.execute(
-        """
-        SELECT plant, unit,
-               COUNT(DISTINCT tag) AS tag_count,
-               MIN(time) AS min_time,
-               MAX(time) AS max_time,
-               COUNT(*)  AS rows
-        FROM v
-        GROUP BY 1,2
-        ORDER BY 1,2
-        """
-    ).fetch_df()
-    units_path = args.out_dir / "catalog_units.parquet"
-    units.to_parquet(units_path, index=False)
+    db = ParquetDatabase(args.data_dir)
+    catalog = db.data_catalog
+    if args.rebuild and catalog.root.exists():
+        shutil.rmtree(catalog.root)
+    changed = catalog.refresh(force=True)
 
-    con.close()
-    print(f"Wrote: {tags_path}")
-    print(f"Wrote: {units_path}")
+    units = catalog.units()
+    print(f"Updated {len(changed)} unit(s); catalog holds {len(units)} unit(s), "
+          f"{int(units['tag_count'].sum()) if not units.empty else 0} tag(s)")
+    print(f"Wrote: {catalog.root}")
 
 
 if __name__ == "__main__":
     main()
-
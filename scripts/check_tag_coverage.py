@@ -3,8 +3,12 @@ from __future__ import annotations
 
 import argparse
 from pathlib import Path
-import pandas as pd
 import re
+import sys
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from pi_monitor.parquet_database import ParquetDatabase  # noqa: E402
+from pi_monitor.tag_manifest import load_or_build  # noqa: E402
 
 
 def slug(s: str) -> str:
@@ -14,21 +18,27 @@ def slug(s: str) -> str:
 
 
 def main():
-    ap = argparse.ArgumentParser(description="Check which PI tags are present in a unit Parquet")
-    ap.add_argument('--parquet', required=True, type=Path)
+    ap = argparse.ArgumentParser(description="Check which PI tags are present for a unit (from the data catalog)")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument('--unit', help="Unit id; tags are looked up in the data catalog")
+    src.add_argument('--parquet', type=Path, help="Unit Parquet file; tags come from its manifest sidecar")
+    ap.add_argument('--data-dir', type=Path, default=None)
     ap.add_argument('--tags-file', required=True, type=Path)
     args = ap.parse_args()
 
     tags = [t.strip() for t in args.tags_file.read_text(encoding='utf-8').splitlines() if t.strip() and not t.startswith('#')]
     slugs = [slug(t) for t in tags]
 
-    df = pd.read_parquet(args.parquet, columns=['tag']).dropna()
-    present = set(df['tag'].unique().tolist())
+    if args.unit:
+        present = set(ParquetDatabase.shared(args.data_dir).data_catalog.unit_tags(args.unit)['tag'])
+    else:
+        manifest = load_or_build(args.parquet)
+        present = set(manifest.tags) if manifest is not None else set()
 
     found = [t for t, s in zip(tags, slugs) if s in present]
     missing = [t for t, s in zip(tags, slugs) if s not in present]
 
-    print(f"Total in file: {len(present)} unique tags")
+    print(f"Total in catalog: {len(present)} unique tags")
     print(f"Requested: {len(tags)} | Found: {len(found)} | Missing: {len(missing)}")
     if missing:
         print("\nMissing tags:")
@@ -39,4 +49,3 @@ def main():
 
 if __name__ == '__main__':
     raise SystemExit(main())
-
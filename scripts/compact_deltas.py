@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+import argparse
+
+# Ensure project root on path
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from pi_monitor.delta_store import DeltaStore, default_master_path  # noqa: E402
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Fold per-unit delta segments into the unit master files")
+    ap.add_argument("--processed", type=Path, default=PROJECT_ROOT / "data" / "processed",
+                    help="Processed directory (default: data/processed)")
+    ap.add_argument("--unit", action="append", help="Unit to compact (repeatable; default: all with deltas)")
+    ap.add_argument("--force", action="store_true", help="Compact even if below the size/count thresholds")
+    args = ap.parse_args()
+
+    store = DeltaStore(args.processed)
+    units = args.unit
+    if not units:
+        units = sorted(p.name for p in store.root.glob("*") if p.is_dir()) if store.root.exists() else []
+
+    compacted = 0
+    for unit in units:
+        segs = store.segments(unit)
+        if not segs:
+            continue
+        out = store.compact(unit, default_master_path(args.processed, unit), force=args.force)
+        if out is not None:
+            compacted += 1
+            print(f"{unit}: folded {len(segs)} segment(s) into {out.name}")
+        else:
+            print(f"{unit}: {len(segs)} segment(s) below threshold (use --force)")
+    print(f"Compacted {compacted} unit(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -16,7 +16,8 @@ import logging
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from pi_monitor.parquet_auto_scan import ParquetAutoScanner
+from pi_monitor.freshness import FreshnessSnapshot
+from pi_monitor.parquet_database import ParquetDatabase
 
 
 class ZeroToleranceFreshnessMonitor:
@@ -32,7 +33,7 @@ class ZeroToleranceFreshnessMonitor:
         """
         self.max_age_hours = max_age_minutes / 60.0
         self.critical_age_hours = critical_age_minutes / 60.0
-        self.scanner = ParquetAutoScanner()
+        self.db = ParquetDatabase.shared()
         
         # Create monitoring directory
         self.monitor_dir = project_root / 'monitoring'
@@ -45,8 +46,8 @@ class ZeroToleranceFreshnessMonitor:
         """Perform comprehensive freshness check with zero tolerance"""
         check_time = datetime.now()
         
-        # Scan all units
-        results = self.scanner.scan_all_units(max_age_hours=self.max_age_hours)
+        # One parallel freshness pass over all units (manifest sidecars)
+        snapshot = FreshnessSnapshot.current(self.db, max_age_hours=self.max_age_hours)
         
         status = {
             'timestamp': check_time.isoformat(),
@@ -65,11 +66,11 @@ class ZeroToleranceFreshnessMonitor:
         }
         
         # Analyze each unit
-        for unit_info in results['units_scanned']:
-            unit = unit_info['unit']
-            age_hours = unit_info['data_age_hours'] or 0
-            latest_time = unit_info['latest_timestamp']
-            records = unit_info['total_records']
+        for unit_info in snapshot:
+            unit = unit_info.unit
+            age_hours = unit_info.data_age_hours or 0
+            latest_time = unit_info.latest
+            records = unit_info.total_records
             
             # Determine unit status
             if age_hours > self.max_age_hours:
@@ -102,6 +103,7 @@ class ZeroToleranceFreshnessMonitor:
                 'status': unit_status,
                 'latest_timestamp': latest_time.isoformat() if latest_time else None,
                 'records': records,
+                'fresh_tag_ratio': round(unit_info.fresh_ratio, 4),
                 'is_anomaly_ready': unit_status == 'FRESH'
             }
             
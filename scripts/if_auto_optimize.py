@@ -32,11 +32,8 @@ class IFParams:
     n_estimators: int
 
 
-def _prep_matrix(df: pd.DataFrame, resample: str = 'h', max_features: int = 25) -> Tuple[pd.DataFrame, List[str]]:
-    df = df.copy()
-    df['time'] = pd.to_datetime(df['time'])
-    X = df.set_index('time').groupby('tag').resample(resample)['value'].mean().unstack(level=0)
-    X.columns.name = None
+def _prep_matrix(X: pd.DataFrame, max_features: int = 25) -> Tuple[pd.DataFrame, List[str]]:
+    """Fill and trim a wide feature matrix (index time, one column per tag)."""
     X = X.ffill().dropna()
     tags = [c for c in X.columns]
     if len(tags) > max_features:
@@ -91,19 +88,13 @@ def main():
     ap.add_argument('--out', type=Path, default=None)
     args = ap.parse_args()
 
-    db = ParquetDatabase()
-    df = db.get_unit_data(args.unit)
-    if df.empty:
+    db = ParquetDatabase.shared()
+    # Hourly matrix from the unit feature store (only newly closed buckets are computed)
+    wide = db.get_unit_feature_matrix(args.unit, 'h', window=f"{args.days}D")
+    if wide.empty:
         print('ERROR: No data available')
         return 1
-    if 'time' in df.columns:
-        df['time'] = pd.to_datetime(df['time'])
-        cutoff = df['time'].max() - pd.Timedelta(days=args.days)
-        df = df[df['time'] >= cutoff].copy()
-        if df.empty:
-            print('ERROR: No data in window')
-            return 1
-    X, tags = _prep_matrix(df, 'h', 25)
+    X, tags = _prep_matrix(wide, 25)
     if X.empty:
         print('ERROR: matrix empty')
         return 1
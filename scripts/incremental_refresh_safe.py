@@ -15,9 +15,9 @@ from pi_monitor.batch import build_unit_from_tags
 from pi_monitor.excel_refresh import refresh_excel_with_pi_coordination
 from pi_monitor.ingest import load_latest_frame
 try:
-    from pi_monitor.webapi import fetch_tags_via_webapi, PIWebAPIClient
+    from pi_monitor.webapi import fetch_tags_to_parquet, PIWebAPIClient
 except Exception:
-    fetch_tags_via_webapi = None  # type: ignore
+    fetch_tags_to_parquet = None  # type: ignore
     PIWebAPIClient = None  # type: ignore
 
 
@@ -123,7 +123,7 @@ def incremental_refresh_unit(
         # 1) Primary path: PI Web API (if configured)
         webapi_url = os.getenv('PI_WEBAPI_URL', '').strip()
         used_webapi = False
-        if webapi_url and fetch_tags_via_webapi is not None:
+        if webapi_url and fetch_tags_to_parquet is not None:
             try:
                 # Preflight Web API to avoid long per-tag retries when unreachable
                 try:
@@ -137,21 +137,19 @@ def incremental_refresh_unit(
                     # Surface to outer try so Excel fallback is used
                     raise
                 print(f"[info] Trying PI Web API at {webapi_url} for {unit}â€¦")
-                # Web API expects relative start as "*-Nh"
-                df_api = fetch_tags_via_webapi(
-                    tags=tags,
+                # Streamed per tag straight into the temp file (no unit-wide frame)
+                stats = fetch_tags_to_parquet(
+                    tags,
+                    temp_file,
+                    plant=plant,
+                    unit=unit,
                     server=server,
                     start=start_time,
                     end='*',
                     step='-0.1h',
                 )
-                if df_api is not None and not df_api.empty:
-                    df_api['plant'] = plant
-                    df_api['unit'] = unit
-                    # Standardize columns
-                    df_api = df_api[['time', 'value', 'plant', 'unit', 'tag']]
-                    df_api.to_parquet(temp_file, index=False, engine='pyarrow')
-                    print(f"[OK] PI Web API fetched {len(df_api):,} records for {unit}")
+                if stats['written']:
+                    print(f"[OK] PI Web API fetched {stats['rows']:,} records for {unit}")
                     used_webapi = True
                 else:
                     print("[warn] PI Web API returned no data; will try Excel fallback")
@@ -238,9 +236,10 @@ def incremental_refresh_unit(
         print(f"Saving to {parquet_file.name}...")
         df_combined.to_parquet(parquet_file, index=False, compression='snappy')
 
-        # Cleanup
+        # Cleanup (and the manifest sidecar of a Web API temp file)
         if temp_file.exists():
             temp_file.unlink()
+        temp_file.with_name(temp_file.name + '.manifest.json').unlink(missing_ok=True)
 
         print(f"\n[OK] Incremental refresh completed!")
         return True
@@ -263,11 +262,17 @@ def main() -> int:
         _server_host = DEFAULT_SERVER.lstrip('\\') if isinstance(DEFAULT_SERVER, str) else 'PTSG-1MMPDPdb01'
         if not os.getenv('PI_WEBAPI_URL'):
             os.environ['PI_WEBAPI_URL'] = f"https://{_server_host}/piwebapi"
+        # Concurrency adapts per server (PI_WEBAPI_ADAPTIVE); the fixed limits only apply when it is off
         os.environ.setdefault('PI_WEBAPI_MAX_WORKERS', '4')
         os.environ.setdefault('PI_WEBAPI_QPS', '3')
         os.environ.setdefault('PI_WEBAPI_RETRIES', '2')
         os.environ.setdefault('PI_WEBAPI_VERIFY_SSL', 'true')
-        print(f"[info] PI Web API primary enabled: {os.getenv('PI_WEBAPI_URL')} (workers={os.getenv('PI_WEBAPI_MAX_WORKERS')}, qps={os.getenv('PI_WEBAPI_QPS')})")
+        from pi_monitor.adaptive_concurrency import adaptive_enabled
+        if adaptive_enabled():
+            print(f"[info] PI Web API primary enabled: {os.getenv('PI_WEBAPI_URL')} (adaptive concurrency, "
+                  f"max={os.getenv('PI_WEBAPI_MAX_CONCURRENCY', '32')})")
+        else:
+            print(f"[info] PI Web API primary enabled: {os.getenv('PI_WEBAPI_URL')} (workers={os.getenv('PI_WEBAPI_MAX_WORKERS')}, qps={os.getenv('PI_WEBAPI_QPS')})")
     except Exception:
         pass
 
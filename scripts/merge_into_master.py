@@ -6,11 +6,33 @@ from pathlib import Path
 import sys
 import pandas as pd
 
-
-def merge_and_dedup(master_path: Path, new_path: Path, keys=None, *, cleanup: bool = True) -> Path:
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from pi_monitor.delta_store import DeltaStore, storage_mode  # noqa: E402
+from pi_monitor.parquet_io import ROW_GROUP_ROWS  # noqa: E402
+from pi_monitor.file_catalog import refresh as refresh_catalog  # noqa: E402
+from pi_monitor.parquet_database import ParquetDatabase  # noqa: E402
+from pi_monitor.tag_manifest import record_write  # noqa: E402
+
+
+def merge_and_dedup(
+    master_path: Path,
+    new_path: Path,
+    keys=None,
+    *,
+    cleanup: bool = True,
+    mode: str | None = None,
+    unit: str | None = None,
+) -> Path:
+    """Merge ``new_path`` into the unit master.
+
+    mode='rewrite' (default) rewrites master and ``*.dedup.parquet``.
+    mode='delta' (or MASTER_STORAGE_MODE=delta) appends the new rows as an
+    immutable delta segment and compacts only when a threshold is reached.
+    """
     keys = keys or ["plant", "unit", "tag", "time"]
     master_path = Path(master_path)
     new_path = Path(new_path)
+    mode = (mode or storage_mode()).strip().lower()
 
     if not new_path.exists():
         raise FileNotFoundError(f"New parquet not found: {new_path}")
@@ -19,6 +41,20 @@ def merge_and_dedup(master_path: Path, new_path: Path, keys=None, *, cleanup: bo
     if "time" in new_df.columns:
         new_df["time"] = pd.to_datetime(new_df["time"])  # normalize
 
+    if mode == "delta":
+        if not unit:
+            # Only a recognised unit id from the master name; never a tag-prefixed token
+            token = master_path.name.split("_")[0] if "_" in master_path.name else master_path.stem
+            unit = ParquetDatabase._normalize_unit_from_token(token)
+            if not unit:
+                raise ValueError(f"Cannot infer the unit from {master_path.name}; pass unit= (--unit) in delta mode")
+        store = DeltaStore(master_path.parent)
+        store.append(unit, new_df)
+        if store.compact(unit, master_path, keys=keys) is not None:
+            print(f"Compacted delta segments into {master_path.name}")
+        _cleanup_new(new_path, cleanup)
+        return master_path
+
     if master_path.exists():
         base_df = pd.read_parquet(master_path)
         if "time" in base_df.columns:
@@ -36,16 +72,25 @@ def merge_and_dedup(master_path: Path, new_path: Path, keys=None, *, cleanup: bo
     # Deduplicate and sort
     combined = combined.drop_duplicates(subset=keys, keep="last")
     if "time" in combined.columns:
-        combined = combined.sort_values("time")
+        combined = combined.sort_values("time", kind="stable")
 
     # Write master
-    combined.to_parquet(master_path, index=False)
+    combined.to_parquet(master_path, index=False, row_group_size=ROW_GROUP_ROWS)
+    record_write(master_path, combined)
+    refresh_catalog(master_path)
 
     # Also write a dedup variant (explicitly named)
     dedup_path = master_path.with_suffix("")
     dedup_path = master_path.parent / (master_path.stem + ".dedup.parquet")
-    combined.to_parquet(dedup_path, index=False)
+    combined.to_parquet(dedup_path, index=False, row_group_size=ROW_GROUP_ROWS)
+    record_write(dedup_path, combined)
+    refresh_catalog(dedup_path)
+
+    _cleanup_new(new_path, cleanup)
+    return master_path
 
+
+def _cleanup_new(new_path: Path, cleanup: bool) -> None:
     # Optional cleanup: remove temporary artifact (e.g., *.updated.parquet)
     try:
         if cleanup:
@@ -56,8 +101,6 @@ def merge_and_dedup(master_path: Path, new_path: Path, keys=None, *, cleanup: bo
     except Exception as e:
         print(f"Warning: could not remove temporary file {new_path}: {e}")
 
-    return master_path
-
 
 def main():
     ap = argparse.ArgumentParser(description="Merge a new unit parquet into master and deduplicate")
@@ -66,9 +109,12 @@ def main():
     ap.add_argument("--master", dest="master_path", required=True, type=Path)
     ap.add_argument("--no-cleanup", action="store_true",
                     help="Do not remove the new parquet after merge (keeps updated/refreshed artifacts)")
+    ap.add_argument("--mode", choices=["rewrite", "delta"], default=None,
+                    help="Storage mode (default: MASTER_STORAGE_MODE env or 'rewrite')")
     args = ap.parse_args()
 
-    out = merge_and_dedup(args.master_path, args.new_path, cleanup=(not args.no_cleanup))
+    out = merge_and_dedup(args.master_path, args.new_path, cleanup=(not args.no_cleanup),
+                          mode=args.mode, unit=args.unit)
     print(f"Merged into master: {out}")
     return 0
 
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Migrate unit Parquet files in data/processed to the compact schema:
+plant/unit/tag dictionary-encoded (read back as pandas categoricals) and,
+optionally, value stored as float32.
+
+For each file it reports pandas memory per million rows before (object
+strings, float64) and after (categoricals, float32 if requested).
+Files are rewritten row group by row group through a temp file and
+swapped in atomically; the tag manifest sidecar is refreshed.
+
+Usage:
+  python scripts/migrate_compact_schema.py --dry-run
+  python scripts/migrate_compact_schema.py --float32
+  python scripts/migrate_compact_schema.py --file data/processed/K-31-01_1y_0p1h.dedup.parquet
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from pi_monitor.parquet_database import ParquetDatabase  # noqa: E402
+from pi_monitor.parquet_io import DICTIONARY_COLUMNS, ROW_GROUP_ROWS, to_compact_table  # noqa: E402
+from pi_monitor.file_catalog import refresh as refresh_catalog  # noqa: E402
+from pi_monitor.tag_manifest import record_write  # noqa: E402
+
+
+def _memory_bytes(table: pa.Table) -> int:
+    return int(table.to_pandas().memory_usage(deep=True).sum())
+
+
+def _plain(table: pa.Table) -> pa.Table:
+    """Legacy in-memory representation: strings as objects, value float64."""
+    cols = []
+    for field, col in zip(table.schema, table.columns):
+        if pa.types.is_dictionary(field.type):
+            col = col.cast(pa.string())
+        elif field.name == "value" and pa.types.is_floating(field.type):
+            col = col.cast(pa.float64())
+        cols.append(col)
+    return pa.table(cols, names=table.column_names)
+
+
+def migrate_file(path: Path, *, float32: bool, dry_run: bool) -> dict:
+    pf = pq.ParquetFile(str(path))
+    names = pf.schema_arrow.names
+    if not any(c in names for c in DICTIONARY_COLUMNS):
+        return {"file": path.name, "skipped": "no plant/unit/tag columns"}
+
+    rows = 0
+    before = 0
+    after = 0
+    writer = None
+    tmp = path.with_name(path.name + f".tmp-migrate-{os.getpid()}")
+    try:
+        for i in range(pf.metadata.num_row_groups):
+            rg = pf.read_row_group(i)
+            compact = to_compact_table(rg, float32=float32)
+            rows += rg.num_rows
+            before += _memory_bytes(_plain(rg))
+            after += _memory_bytes(compact)
+            if dry_run:
+                continue
+            if writer is None:
+                writer = pq.ParquetWriter(str(tmp), compact.schema, compression="zstd")
+            writer.write_table(compact, row_group_size=ROW_GROUP_ROWS)
+        if writer is not None:
+            writer.close()
+            writer = None
+            os.replace(tmp, path)
+            record_write(path)
+            refresh_catalog(path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if tmp.exists():
+            tmp.unlink()
+
+    per_m = 1_000_000 / rows if rows else 0.0
+    return {
+        "file": path.name,
+        "rows": rows,
+        "before_mb_per_m": before * per_m / 1e6,
+        "after_mb_per_m": after * per_m / 1e6,
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Rewrite unit Parquet files with the compact columnar schema")
+    ap.add_argument("--processed", type=Path, default=PROJECT_ROOT / "data" / "processed")
+    ap.add_argument("--file", type=Path, action="append", help="Specific file(s) to migrate")
+    ap.add_argument("--float32", action="store_true", help="Store value as float32")
+    ap.add_argument("--dry-run", action="store_true", help="Only report memory before/after")
+    args = ap.parse_args()
+
+    if args.file:
+        files = [Path(f) for f in args.file]
+    else:
+        db = ParquetDatabase(data_dir=args.processed.parent)
+        files = [Path(f) for f in sorted(db._get_stable_parquet_files(unit=None, dedup_preferred=False))]
+    if not files:
+        print(f"No Parquet files found in {args.processed}")
+        return 1
+
+    print(f"{'file':<48} {'rows':>12} {'MB/1M before':>13} {'MB/1M after':>12} {'saving':>7}")
+    for path in files:
+        try:
+            r = migrate_file(path, float32=args.float32, dry_run=args.dry_run)
+        except Exception as e:
+            print(f"{path.name:<48} ERROR: {e}")
+            continue
+        if "skipped" in r:
+            print(f"{r['file']:<48} skipped ({r['skipped']})")
+            continue
+        saving = 1 - r["after_mb_per_m"] / r["before_mb_per_m"] if r["before_mb_per_m"] else 0.0
+        print(f"{r['file']:<48} {r['rows']:>12,} {r['before_mb_per_m']:>13.1f} {r['after_mb_per_m']:>12.1f} {saving:>6.0%}")
+    if args.dry_run:
+        print("\nDry run: no files were rewritten.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -34,6 +34,7 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 from pi_monitor.parquet_database import ParquetDatabase
+from pi_monitor.feature_store import pivot_mean
 
 
 @dataclass
@@ -47,11 +48,8 @@ class MTDParams:
 
 def _build_feature_matrix(df: pd.DataFrame, resample: str, max_features: int) -> Tuple[pd.DataFrame, List[str]]:
     # Build pivoted, resampled matrix; speed tag + features limited
-    df = df.copy()
-    df['time'] = pd.to_datetime(df['time'])
-    df_time_indexed = df.set_index('time')
-    pivot_df = df_time_indexed.groupby(['tag']).resample(resample)['value'].mean().unstack(level=0).reset_index()
-    pivot_df.columns.name = None
+    # Injected copies differ per trial, so this pivots the long rows directly
+    pivot_df = pivot_mean(df, resample).reset_index()
 
     # Identify speed tag heuristically
     tags = [c for c in pivot_df.columns if c != 'time']
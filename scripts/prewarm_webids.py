@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Resolve the WebIds of all configured tags into the shared WebId cache.
+
+Reads config/tags_*.txt (or --tags-file), skips tags already cached and
+resolves the rest through PI Web API /batch calls, so the next refresh
+starts with no per-tag /points lookups. Tags the server does not know are
+negative-cached for PI_WEBID_NEGATIVE_TTL_H hours.
+
+Usage:
+  python scripts/prewarm_webids.py --server PTSG-1MMPDPdb01
+  python scripts/prewarm_webids.py --tags-file config/tags_k12_01.txt --purge
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from pi_monitor.webapi import PIWebAPIClient, _bool_env  # noqa: E402
+from pi_monitor.webid_cache import default_cache, default_tag_files, prewarm, read_tag_files  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Prewarm the PI Web API WebId cache from tag lists")
+    ap.add_argument("--server", default=os.getenv("PI_SERVER_NAME") or "PTSG-1MMPDPdb01")
+    ap.add_argument("--base-url", default=os.getenv("PI_WEBAPI_URL"))
+    ap.add_argument("--auth", default=os.getenv("PI_WEBAPI_AUTH") or "windows")
+    ap.add_argument("--tags-file", type=Path, action="append", help="Tag list(s); default config/tags_*.txt")
+    ap.add_argument("--purge", action="store_true", help="Delete expired cache entries first")
+    args = ap.parse_args()
+
+    if not args.base_url:
+        sys.exit("PI_WEBAPI_URL is not set; pass --base-url")
+    cache = default_cache()
+    if cache is None:
+        sys.exit("WebId cache is disabled (PI_WEBID_CACHE)")
+    if args.purge:
+        print(f"Purged {cache.purge_expired()} expired entr(ies)")
+
+    files = args.tags_file or default_tag_files()
+    tags = read_tag_files(files)
+    print(f"{len(tags)} unique tag(s) from {len(files)} file(s); cache: {cache.path}")
+
+    client = PIWebAPIClient(
+        base_url=args.base_url,
+        auth_mode=args.auth.strip().lower(),
+        username=os.getenv("PI_WEBAPI_USER"),
+        password=os.getenv("PI_WEBAPI_PASS"),
+        verify_ssl=_bool_env("PI_WEBAPI_VERIFY_SSL", True),
+        webid_cache=cache,
+    )
+    ok, info = client.health_check()
+    if not ok:
+        sys.exit(f"PI Web API unreachable at {client.base_url}: {info}")
+
+    result = prewarm(client, args.server, tags)
+    print(f"cached {result['cached']}, resolved {result['resolved']}, "
+          f"not found {result['missing']}, failed {result['failed']}")
+    counts = cache.counts()
+    print(f"Cache now holds {counts['resolved']} WebId(s) and {counts['missing']} negative entr(ies)")
+
+
+if __name__ == "__main__":
+    main()
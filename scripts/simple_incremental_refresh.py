@@ -107,7 +107,7 @@ def check_tag_freshness(
             return (is_fresh, 1 if is_fresh else 0, 1)
 
         # Get latest timestamp per tag
-        tag_latest = df_with_tags.groupby('tag')['time'].max()
+        tag_latest = df_with_tags.groupby('tag', observed=True)['time'].max()
 
         # Count how many tags are fresh
         if allowed_tags is not None:
@@ -410,7 +410,7 @@ def simple_refresh_unit(unit: str, plant: str) -> dict:
         if 'tag' in df_existing.columns and 'time' in df_existing.columns:
             df_with_tags = df_existing[df_existing['tag'].notna()]
             if len(df_with_tags) > 0:
-                tag_latest = df_with_tags.groupby('tag')['time'].max()
+                tag_latest = df_with_tags.groupby('tag', observed=True)['time'].max()
                 tag_latest_times = tag_latest.to_dict()
                 print(f"  Loaded timestamps for {len(tag_latest_times)} tags")
 
@@ -3,7 +3,7 @@ from pathlib import Path
 import sys
 sys.path.insert(0, str(Path(__file__).parent))
 
-from simple_incremental_refresh import simple_refresh_unit, get_latest_timestamp, count_tags_in_parquet, check_tag_freshness, PROJECT_ROOT
+from simple_incremental_refresh import simple_refresh_unit, PROJECT_ROOT
 from datetime import datetime, timedelta
 
 # Try to use colorama for colors, fallback to plain text
@@ -20,32 +20,81 @@ except ImportError:
     class Back:
         BLACK = ""
 
+def _freshness_snapshot(max_age_hours: float):
+    """Shared fleet freshness snapshot (one parallel pass, reused across units)."""
+    if str(PROJECT_ROOT) not in sys.path:
+        sys.path.insert(0, str(PROJECT_ROOT))
+    from pi_monitor.freshness import FreshnessSnapshot
+    from pi_monitor.parquet_database import ParquetDatabase
+
+    return FreshnessSnapshot.current(ParquetDatabase.shared(PROJECT_ROOT / "data"), max_age_hours=max_age_hours)
+
+
+def _refresh_units(units: list[tuple[str, str]]) -> dict[str, dict]:
+    """Refresh ``(plant, unit)`` pairs; concurrently across PI sources unless REFRESH_PARALLEL=0."""
+    if str(PROJECT_ROOT) not in sys.path:
+        sys.path.insert(0, str(PROJECT_ROOT))
+    from pi_monitor.refresh_scheduler import (
+        RefreshJob,
+        RefreshScheduler,
+        estimate_unit_memory_mb,
+        refresh_parallel_enabled,
+    )
+
+    if not refresh_parallel_enabled():
+        results: dict[str, dict] = {}
+        for plant, unit in units:
+            print()
+            results[f"{plant}/{unit}"] = simple_refresh_unit(unit, plant)
+        return results
+
+    processed_dir = PROJECT_ROOT / "data" / "processed"
+    jobs = [
+        RefreshJob(plant, unit, simple_refresh_unit, (unit, plant),
+                   memory_mb=estimate_unit_memory_mb(processed_dir, unit))
+        for plant, unit in units
+    ]
+    scheduler = RefreshScheduler()
+    print(f"\n[refresh] {len(jobs)} unit(s), up to {scheduler.max_workers} at once, "
+          f"{scheduler.default_source_limit} per PI source; logs in {scheduler.log_dir}")
+    outcomes = scheduler.run(jobs, on_event=print)
+    for key, res in outcomes.items():
+        if not res.success and res.log_path:
+            print(f"{Fore.RED}[refresh] {key}: {res.status} - see {res.log_path}{Style.RESET_ALL}")
+    return {key: res.to_dict() for key, res in outcomes.items()}
+
+
 def check_if_stale(unit: str, plant: str, max_age_hours: float = 1.0) -> tuple[bool, datetime | None, timedelta | None, int, int]:
     """Check if a unit's data is stale using PER-TAG freshness validation.
 
     NEW: Requires at least 50% of tags to have fresh data (< max_age_hours).
     This prevents false positives where only 1 tag is fresh but others are stale.
 
+    Answered from the shared FreshnessSnapshot (manifest sidecars, no full
+    file reads); checking every unit costs one snapshot.
+
+    ``active_tags`` counts tags with data in the last 90 days for every
+    unit. Before the snapshot, units served from the partitioned dataset
+    reported ``active_tags == total_tags`` (tag directories were counted,
+    not read), so their ACTIVE column can now be lower than before.
+
     Returns:
         (is_stale, latest_time, age, total_tags, active_tags)
     """
-    parquet_file = PROJECT_ROOT / "data" / "processed" / f"{unit}_1y_0p1h.dedup.parquet"
-
-    if not parquet_file.exists():
-        return (False, None, None, 0, 0)  # No file = skip
-
-    latest_time = get_latest_timestamp(parquet_file)
-    if not latest_time:
-        return (False, None, None, 0, 0)
+    unit_info = _freshness_snapshot(max_age_hours).get(unit)
+    if unit_info is None or unit_info.latest is None:
+        return (False, None, None, 0, 0)  # No data = skip
 
-    age = datetime.now() - latest_time.replace(tzinfo=None)
+    latest_time = unit_info.latest.to_pydatetime().replace(tzinfo=None)
+    age = unit_info.taken_at - latest_time
 
     # Check if unit is stale based on overall latest timestamp
     # Use simple age-based check: data > max_age_hours is stale
     is_stale = age.total_seconds() / 3600 > max_age_hours
 
-    # Count tags (check partitioned dataset first, then flat file)
-    total_tags, active_tags = count_tags_in_parquet(parquet_file, unit=unit, plant=plant)
+    # Active = tags with data in the last 90 days (also for dataset-backed units)
+    total_tags = unit_info.tag_count
+    active_tags = unit_info.active_tag_count(days=90)
 
     return (is_stale, latest_time, age, total_tags, active_tags)
 
@@ -189,11 +238,7 @@ def run_smart_incremental_refresh(
     print(f"{Style.BRIGHT}>>> REFRESHING {len(stale_units)} STALE UNITS <<<{Style.RESET_ALL}")
     print(f"{Fore.MAGENTA}{'='*80}{Style.RESET_ALL}")
 
-    results: dict[str, dict] = {}
-    for plant, unit, age, latest_time, total_tags, active_tags in stale_units:
-        print()
-        result = simple_refresh_unit(unit, plant)
-        results[f"{plant}/{unit}"] = result
+    results = _refresh_units([(plant, unit) for plant, unit, *_ in stale_units])
 
     # Summary table
     print(f"\n{Fore.CYAN}{'=' * 80}")
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Tests for the AIMD Web API concurrency controller (pi_monitor.adaptive_concurrency).
+"""
+
+import json
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor import adaptive_concurrency
+from pi_monitor.adaptive_concurrency import ERROR, THROTTLED, AdaptiveConcurrency, response_items
+from pi_monitor.webapi import fetch_tags_via_webapi
+
+
+def _round(ctl, latency_s=0.01, outcome="ok"):
+    tokens = [ctl.acquire() for _ in range(int(ctl.limit))]
+    for t in tokens:
+        ctl.release(t - latency_s, outcome)
+
+
+def test_aimd_increases_when_healthy_and_cuts_on_congestion():
+    ctl = AdaptiveConcurrency("t", min_limit=1, max_limit=8, initial=2, target_p95_s=1.0, min_window=4)
+    for _ in range(12):
+        _round(ctl)
+    assert int(ctl.limit) == 8 and ctl.counters["increases"] == 6
+
+    # Latency over the target: multiplicative decrease, then a cool-down
+    _round(ctl, latency_s=1.2)
+    assert int(ctl.limit) == 5
+    snap = ctl.snapshot()
+    assert snap["last_decision"]["action"] == "decrease" and "p95" in snap["last_decision"]["reason"]
+    _round(ctl, latency_s=1.2)
+    assert int(ctl.limit) == 5
+
+    time.sleep(1.25)  # cool-down: max(0.5 s, last p95)
+    t = ctl.acquire()
+    ctl.release(t, THROTTLED)
+    assert int(ctl.limit) == 2 and ctl.counters["throttled"] == 1
+    t = ctl.acquire()
+    ctl.release(t, THROTTLED)  # same burst: no second cut
+    assert int(ctl.limit) == 2
+
+    time.sleep(1.25)  # cool-down: max(0.5 s, last p95)
+    _round(ctl, outcome=ERROR)
+    _round(ctl, outcome=ERROR)
+    assert int(ctl.limit) == 1 and snap["server"] == "t"
+
+    # An unsaturated window does not raise the limit
+    for _ in range(10):
+        t = ctl.acquire()
+        ctl.release(t)
+    assert ctl.snapshot()["inflight"] == 0
+
+
+class _Overloaded(BaseHTTPRequestHandler):
+    """Answers 429 while more than ``capacity`` requests are in flight."""
+
+    protocol_version = "HTTP/1.1"
+    capacity = 6
+    inflight = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code, body):
+        payload = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path.endswith("/system"):
+            return self._send(200, {})
+        cls = type(self)
+        with cls.lock:
+            cls.inflight += 1
+            cls.peak = max(cls.peak, cls.inflight)
+            over = cls.inflight > cls.capacity
+        try:
+            time.sleep(0.02)
+            if over:
+                return self._send(429, {})
+            if url.path.endswith("/points"):
+                tag = urllib.parse.parse_qs(url.query)["path"][0].rsplit("\\", 1)[-1]
+                return self._send(200, {"WebId": "W" + tag})
+            return self._send(200, {"Items": [{"Timestamp": "2025-01-01T00:00:00Z", "Value": 1.0}]})
+        finally:
+            with cls.lock:
+                cls.inflight -= 1
+
+
+@pytest.fixture
+def overloaded_url(monkeypatch, tmp_path):
+    monkeypatch.setenv("PI_WEBAPI_ASYNC", "0")
+    monkeypatch.setenv("PI_WEBID_CACHE", str(tmp_path / "webids.sqlite"))
+    monkeypatch.setenv("PI_WEBAPI_MAX_CONCURRENCY", "16")
+    adaptive_concurrency.reset()
+    _Overloaded.peak = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Overloaded)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/piwebapi"
+    server.shutdown()
+    adaptive_concurrency.reset()
+
+
+def test_threaded_fetch_adapts_to_server_capacity(overloaded_url):
+    tags = [f"T_{i}" for i in range(150)]
+    out = fetch_tags_via_webapi(tags, "PCFS-SRV", "-1h", "*", "-0.1h", base_url=overloaded_url,
+                                auth_mode="none", retries=6, bulk=False)
+    assert out["tag"].nunique() == 150
+
+    m = adaptive_concurrency.metrics()["pcfs-srv"]
+    assert m["requests"] >= 300 and m["increases"] >= 2
+    # Probing past the server's capacity is answered by 429s and cuts
+    assert m["throttled"] >= 1 and m["decreases"] >= 1
+    assert m["limit"] <= 12 and _Overloaded.peak <= 16
+    assert m["decisions"][-1] == m["last_decision"]
+    # Servers keep separate state
+    assert set(adaptive_concurrency.metrics()) == {"pcfs-srv"}
+
+
+def test_large_responses_count_latency_per_item():
+    ctl = AdaptiveConcurrency("t", min_limit=1, max_limit=8, initial=4, target_p95_s=1.0, latency_items=10000,
+                              min_window=4)
+    # 3 s for 100k values is healthy: it counts as 0.3 s for 10k
+    for _ in range(3):
+        tokens = [ctl.acquire() for _ in range(int(ctl.limit))]
+        for t in tokens:
+            ctl.release(t - 3.0, items=100_000)
+    assert int(ctl.limit) == 7 and ctl.counters["decreases"] == 0
+    # Small responses are not scaled up
+    _round(ctl, latency_s=1.5)
+    assert int(ctl.limit) == 4
+    assert response_items({"Items": [{"Items": [1, 2]}, {"Items": [3]}]}) == 3
+    assert response_items({"Items": [{"Value": 1}]}) == 1 and response_items({"WebId": "x"}) == 0
+
+
+QUIET = {"tags": [], "anomaly_rate": 0.0, "flatline_rate": 0.0, "trip_rate": 0.0, "bad_rate": 0.0}
+
+
+@pytest.mark.parametrize("webapi_sim", [{**QUIET, "latency_per_kitem_ms": 100.0}], indirect=True)
+@pytest.mark.parametrize("latency_items, cut", [("300", False), ("0", True)])
+def test_long_fetches_do_not_collapse_the_limit(webapi_sim, monkeypatch, latency_items, cut):
+    # 5 days at 6 minutes: 1200 values, ~120 ms per request (~30 ms per 300) against a 60 ms target
+    monkeypatch.setenv("PI_WEBAPI_ASYNC", "0")
+    monkeypatch.setenv("PI_WEBAPI_TARGET_P95_MS", "60")
+    monkeypatch.setenv("PI_WEBAPI_LATENCY_ITEMS", latency_items)
+    adaptive_concurrency.reset()
+    tags = [f"PCFS.K-01-01.T_{i}" for i in range(40)]
+    out = fetch_tags_via_webapi(tags, "SIM", "-5d", "*", "-0.1h", base_url=webapi_sim.url, auth_mode="none",
+                                bulk=False)
+    assert out["tag"].nunique() == 40
+
+    m = adaptive_concurrency.metrics()["sim"]
+    over = [d for d in m["decisions"] if "over target" in d["reason"]]
+    if cut:
+        # Whole-transfer latency: every window is over the target
+        assert over and m["limit"] < 4
+    else:
+        assert not over and m["limit"] >= 4
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Tests for the sharded, resumable Web API backfill (pi_monitor.backfill).
+"""
+
+import json
+import sys
+import threading
+import urllib.parse
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.backfill import BackfillJob, plan_shards, resolve_time
+from pi_monitor.ingest import write_parquet
+from pi_monitor.webapi import PIWebAPIClient
+from pi_monitor.webid_cache import WebIdCache
+
+
+class _Archive(BaseHTTPRequestHandler):
+    """Interpolated 6-minute values: value = tag number * 1e6 + minutes since 2025-01-01."""
+
+    protocol_version = "HTTP/1.1"
+    calls: Counter = Counter()
+    failing: set = set()  # tags whose stream requests fail with 500
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code, body):
+        payload = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    @staticmethod
+    def _items(tag, start, end):
+        times = pd.date_range(start.ceil("6min"), end, freq="6min")
+        base = pd.Timestamp("2025-01-01", tz="UTC")
+        n = int(tag.rsplit("_", 1)[-1])
+        return [{"Timestamp": t.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                 "Value": n * 1e6 + (t - base).total_seconds() / 60} for t in times]
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        q = urllib.parse.parse_qs(url.query)
+        if url.path.endswith("/points"):
+            tag = q["path"][0].rsplit("\\", 1)[-1]
+            return self._send(200, {"WebId": "W" + tag})
+        start, end = pd.Timestamp(q.get("startTime", ["*"])[0]), pd.Timestamp(q.get("endTime", ["*"])[0])
+        if url.path.endswith("/streamsets/interpolated"):
+            self.calls["streamsets"] += 1
+            tags = [w[1:] for w in q["webId"]]
+            if self.failing & set(tags):
+                return self._send(500, {})
+            return self._send(200, {"Items": [{"WebId": "W" + t, "Items": self._items(t, start, end)} for t in tags]})
+        if url.path.endswith("/interpolated"):
+            tag = url.path.split("/")[-2][1:]
+            self.calls[tag] += 1
+            if tag in self.failing:
+                return self._send(500, {})
+            return self._send(200, {"Items": self._items(tag, start, end)})
+        return self._send(404, {})
+
+    def do_POST(self):
+        self.calls["batch"] += 1
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        out = {}
+        for key, sub in body.items():
+            tag = urllib.parse.parse_qs(urllib.parse.urlsplit(sub["Resource"]).query)["path"][0].rsplit("\\", 1)[-1]
+            out[key] = {"Status": 200, "Content": {"WebId": "W" + tag}}
+        return self._send(200, out)
+
+
+@pytest.fixture
+def client(tmp_path):
+    _Archive.calls = Counter()
+    _Archive.failing = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Archive)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield PIWebAPIClient(base_url=f"http://127.0.0.1:{server.server_address[1]}/piwebapi", auth_mode="none",
+                         webid_cache=WebIdCache(tmp_path / "webids.sqlite"))
+    server.shutdown()
+
+
+def test_plan_shards_on_aligned_grid():
+    now = pd.Timestamp("2025-03-15 10:00", tz="UTC")
+    assert resolve_time("-2d", now) == now - pd.Timedelta(days=2) and resolve_time("*", now) == now
+    shards = plan_shards(["A", "B"], resolve_time("-20d", now), now, pd.Timedelta(days=7))
+    assert [s.tag for s in shards[:4]] == ["A", "B", "A", "B"]
+    a = [s for s in shards if s.tag == "A"]
+    assert a[0].start == now - pd.Timedelta(days=20) and a[-1].end == now and a[-1].last
+    assert all(x.end == y.start for x, y in zip(a, a[1:]))
+    assert all(s.start.value % pd.Timedelta(days=7).value == 0 for s in a[1:])
+
+
+def test_backfill_resumes_failed_shards_and_merges(client, tmp_path):
+    tags = ["PCFS.K-01-01.T_1", "PCFS.K-01-01.T_2", "PCFS.K-01-01.T_3"]
+    kwargs = dict(plant="PCFS", unit="K-01-01", server="SRV", start="2025-01-01T00:00:00Z",
+                  end="2025-01-10T00:00:00Z", shard="2d", work_dir=tmp_path / "bf", client=client, retries=0)
+
+    _Archive.failing = {"PCFS.K-01-01.T_2"}
+    job = BackfillJob(tags, **kwargs)
+    stats = job.run(max_workers=4, progress=False)
+    # 9 days on a 2-day grid -> 5 shards per tag (first/last partial)
+    assert len(job.shards()) == 15 and stats["fetched"] == 10 and stats["failed"] == 5
+    # The failing tag's shards fell back to per-tag requests, the others came through /streamsets
+    assert _Archive.calls["PCFS.K-01-01.T_2"] == 5 and _Archive.calls["PCFS.K-01-01.T_1"] == 0
+    with pytest.raises(RuntimeError):
+        job.finalize(tmp_path / "K-01-01_1y_0p1h.parquet")
+
+    # A new run (new process) only fetches the missing shards
+    _Archive.failing = set()
+    _Archive.calls = Counter()
+    job = BackfillJob(tags, **kwargs)
+    assert len(job.pending()) == 5
+    assert job.run(max_workers=4, progress=False) == {"fetched": 5, "skipped": 10, "failed": 0, "rows": 9 * 240 + 1}
+    assert dict(_Archive.calls) == {"PCFS.K-01-01.T_2": 5}
+
+    out = job.finalize(tmp_path / "K-01-01_1y_0p1h.parquet")
+    df = pd.read_parquet(out)
+    bulk = BackfillJob(tags, **{**kwargs, "work_dir": tmp_path / "bulk"})
+    _Archive.calls = Counter()
+    assert bulk.run(progress=False) == {"fetched": 15, "skipped": 0, "failed": 0, "rows": 3 * (9 * 240 + 1)}
+    # One /streamsets request per shard window, no per-tag requests
+    assert _Archive.calls["streamsets"] == 5 and set(_Archive.calls) <= {"streamsets", "batch"}
+    bulk_df = pd.read_parquet(bulk.finalize(tmp_path / "bulk.parquet"))
+    pd.testing.assert_frame_equal(bulk_df, df)
+    assert df["tag"].nunique() == 3 and len(df) == 3 * (9 * 240 + 1)
+    t2 = df[df["tag"] == "PCFS_K-01-01_T_2"].sort_values("time")
+    assert t2["time"].is_unique and t2["value"].diff().dropna().eq(6).all()
+    assert t2["value"].iloc[0] == 2e6 and t2["value"].iloc[-1] == 2e6 + 9 * 1440
+
+    # Nothing left to do
+    assert BackfillJob(tags, **kwargs).run(progress=False)["fetched"] == 0
+
+
+def test_finalize_streams_per_tag_and_keeps_existing_rows(client, tmp_path):
+    tags = ["PCFS.K-01-01.T_1", "PCFS.K-01-01.T_2"]
+    job = BackfillJob(tags, plant="PCFS", unit="K-01-01", server="SRV", start="2025-01-01T00:00:00Z",
+                      end="2025-01-02T00:00:00Z", shard="12h", work_dir=tmp_path / "bf", client=client, retries=0)
+    job.run(progress=False)
+    local = job.start.tz_convert(datetime.now().astimezone().tzinfo).tz_localize(None)
+    # Existing master: T_1 before the backfill range and at its first step, plus a tag outside it
+    existing = pd.DataFrame({
+        "time": [local - pd.Timedelta(hours=1), local, local],
+        "value": [-1.0, -2.0, 7.0],
+        "plant": "PCFS", "unit": "K-01-01",
+        "tag": ["PCFS_K-01-01_T_1", "PCFS_K-01-01_T_1", "PCFS_K-01-01_OTHER"],
+    })
+    out = write_parquet(existing, tmp_path / "K-01-01_1y_0p1h.parquet")
+    job.finalize(out)
+
+    pf = pq.ParquetFile(out)
+    assert pf.metadata.num_row_groups == 3  # one per tag
+    df = pd.read_parquet(out)
+    assert df.groupby("tag", observed=True).size().to_dict() == {
+        "PCFS_K-01-01_OTHER": 1, "PCFS_K-01-01_T_1": 241 + 1, "PCFS_K-01-01_T_2": 241}
+    t1 = df[df["tag"] == "PCFS_K-01-01_T_1"].set_index("time")["value"]
+    assert t1[local - pd.Timedelta(hours=1)] == -1.0  # kept: no backfill value there
+    assert t1[local] == 1e6  # the backfill wins on the same (tag, time)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests for the incrementally maintained data catalog (pi_monitor.data_catalog).
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.data_catalog import CATALOG_DIRNAME, DIRTY_DIRNAME, LOCK_FILE, TAGS_FILE
+from pi_monitor.ingest import write_parquet
+from pi_monitor.parquet_database import ParquetDatabase
+from pi_monitor.tag_manifest import TagManifest
+
+
+def _rows(unit, start, periods, tags=("A", "B")):
+    rng = np.random.default_rng(3)
+    times = pd.date_range(start, periods=periods, freq="6min")
+    frames = []
+    for i, t in enumerate(tags):
+        values = rng.normal(10.0 * (i + 1), 2.0, periods)
+        values[::10] = np.nan
+        frames.append(pd.DataFrame({"time": times, "value": values, "plant": "PCFS", "unit": unit, "tag": t}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_manifest_value_stats_merge_like_a_single_pass():
+    df = _rows("K-01-01", "2025-01-01", 500)
+    whole = TagManifest().update(df)
+    parts = TagManifest().update(df.iloc[:300]).merge(TagManifest().update(df.iloc[300:]))
+    for tag in ("A", "B"):
+        expected = df[df["tag"] == tag]["value"]
+        for m in (whole, parts):
+            st = m.tag_stats(tag)
+            assert st["nulls"] == expected.isna().sum() and st["count"] == expected.count()
+            assert np.isclose(st["mean"], expected.mean()) and np.isclose(st["std"], expected.std())
+            assert (st["min"], st["max"]) == (expected.min(), expected.max())
+
+
+def test_catalog_serves_summary_and_follows_writes(tmp_path):
+    processed = tmp_path / "processed"
+    write_parquet(_rows("K-01-01", "2025-01-01", 200), processed / "K-01-01_1y_0p1h.parquet")
+    write_parquet(_rows("K-02-01", "2025-01-01", 100, tags=("C",)), processed / "K-02-01_1y_0p1h.parquet")
+    db = ParquetDatabase.shared(tmp_path)
+
+    assert db.data_catalog.refresh(force=True) == ["K-01-01", "K-02-01"]
+    assert (processed / CATALOG_DIRNAME / TAGS_FILE).exists()
+    assert db.data_catalog.refresh(force=True) == []
+    assert {"K-01-01", "K-02-01"} <= set(db.get_all_units())
+
+    summary = db.get_tag_summary("K-01-01").set_index("tag")
+    a = _rows("K-01-01", "2025-01-01", 200).query("tag == 'A'")["value"]
+    assert summary.loc["A", "value_count"] == a.count()
+    assert summary.loc["A", "value_mean"] == round(a.mean(), 3)
+    assert summary.loc["A", "time_max"] == pd.Timestamp("2025-01-01") + pd.Timedelta(minutes=6 * 199)
+
+    # A writer rewrite only marks the unit dirty; the next reader folds it into the persisted catalog
+    write_parquet(_rows("K-02-01", "2025-01-01", 300, tags=("C", "D")), processed / "K-02-01_1y_0p1h.parquet")
+    assert [p.name for p in (processed / CATALOG_DIRNAME / DIRTY_DIRNAME).iterdir()] == ["K-02-01"]
+    assert db.data_catalog.refresh() == ["K-02-01"]
+    assert not any((processed / CATALOG_DIRNAME / DIRTY_DIRNAME).iterdir())
+    persisted = pd.read_parquet(processed / CATALOG_DIRNAME / TAGS_FILE)
+    k2 = persisted[persisted["unit"] == "K-02-01"].set_index("tag")
+    assert list(k2.index) == ["C", "D"] and k2.loc["D", "rows"] == 300
+
+    status = db.get_database_status()
+    k2_status = next(u for u in status["units"] if u["unit"] == "K-02-01")
+    assert k2_status["records"] == 600 and k2_status["unique_tags"] == 2 and k2_status["is_stale"]
+
+    # A fresh database instance loads the persisted catalog instead of rebuilding it
+    other = ParquetDatabase(tmp_path)
+    assert other.data_catalog.refresh(force=True) == []
+
+
+def test_concurrent_catalogs_keep_each_others_units(tmp_path, monkeypatch):
+    processed = tmp_path / "processed"
+    for unit in ("K-01-01", "K-02-01"):
+        write_parquet(_rows(unit, "2025-01-01", 100), processed / f"{unit}_1y_0p1h.parquet")
+    # Two scheduler processes, each with its own in-memory catalog
+    first, second = ParquetDatabase(tmp_path).data_catalog, ParquetDatabase(tmp_path).data_catalog
+    assert first.refresh(force=True) == ["K-01-01", "K-02-01"]
+    assert second.refresh(force=True) == []
+
+    write_parquet(_rows("K-01-01", "2025-01-01", 200), processed / "K-01-01_1y_0p1h.parquet")
+    assert first.unit_tags("K-01-01")["rows"].tolist() == [200, 200]
+    write_parquet(_rows("K-02-01", "2025-01-01", 300), processed / "K-02-01_1y_0p1h.parquet")
+    # The stale second catalog starts from the tables on disk: K-01-01 is kept, not recomputed
+    assert second.refresh(["K-02-01"]) == ["K-02-01"]
+    persisted = pd.read_parquet(processed / CATALOG_DIRNAME / TAGS_FILE).groupby("unit")["rows"].max()
+    assert persisted.to_dict() == {"K-01-01": 200, "K-02-01": 300}
+
+    # While another process holds the lock, updates stay in memory and the marker is kept
+    monkeypatch.setenv("DATA_CATALOG_LOCK_WAIT_S", "0")
+    (processed / CATALOG_DIRNAME / LOCK_FILE).touch()
+    write_parquet(_rows("K-01-01", "2025-01-01", 50), processed / "K-01-01_1y_0p1h.parquet")
+    assert first.refresh() == ["K-01-01"]
+    assert pd.read_parquet(processed / CATALOG_DIRNAME / TAGS_FILE).groupby("unit")["rows"].max()["K-01-01"] == 200
+    (processed / CATALOG_DIRNAME / LOCK_FILE).unlink()
+    assert second.refresh() == ["K-01-01"]
+    assert pd.read_parquet(processed / CATALOG_DIRNAME / TAGS_FILE).groupby("unit")["rows"].max()["K-01-01"] == 50
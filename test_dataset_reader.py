@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for the partitioned dataset read path (pi_monitor.dataset).
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor import dataset
+from pi_monitor.dataset import dataset_units, list_partition_files, write_dataset
+from pi_monitor.ingest import write_parquet
+from pi_monitor.parquet_database import ParquetDatabase
+
+UNIT = "07-MT01/K001"
+
+
+def _frame():
+    times = pd.date_range("2025-01-01", "2025-03-31 23:00", freq="1h")
+    return pd.concat(
+        [pd.DataFrame({"time": times, "value": float(i), "plant": "PCFS", "unit": UNIT, "tag": f"T{i}"})
+         for i in range(3)],
+        ignore_index=True,
+    )
+
+
+def test_partition_listing_prunes_by_unit_tag_and_month(tmp_path):
+    root = tmp_path / "processed" / "dataset"
+    write_dataset(_frame(), root)
+
+    assert list(dataset_units(root)) == [UNIT]
+    files = list_partition_files(
+        root, UNIT, tags=["T1"], start=pd.Timestamp("2025-02-10"), end=pd.Timestamp("2025-02-20")
+    )
+    assert files
+    assert {(v["tag"], v["month"]) for v, _ in files} == {("T1", "2")}
+
+
+def test_database_reads_from_dataset_when_fresh(tmp_path, monkeypatch):
+    df = _frame()
+    processed = tmp_path / "processed"
+    write_dataset(df, processed / "dataset")
+
+    db = ParquetDatabase(tmp_path)
+    start, end = pd.Timestamp("2025-02-10"), pd.Timestamp("2025-02-20")
+    out = db.get_unit_tag_data(UNIT, "T1", start_time=start, end_time=end)
+    expected = df[(df["tag"] == "T1") & (df["time"] >= start) & (df["time"] <= end)]
+    assert len(out) == len(expected)
+    assert out["time"].is_monotonic_increasing
+    assert set(out["tag"].astype(str)) == {"T1"}
+    assert "07-MT01-K001" in db.get_all_units()  # URL-decoded, then legacy alias
+
+    # A newer flat unit file wins over a stale dataset in 'auto' mode
+    flat = processed / "07-MT01_K001_1y_0p1h.parquet"
+    write_parquet(df[df["time"] >= start].assign(value=9.0), flat)
+    future = flat.stat().st_mtime + 60
+    os.utime(flat, (future, future))
+    monkeypatch.setattr(db, "_get_stable_parquet_files", lambda unit=None, dedup_preferred=True: [flat])
+    assert not db._use_dataset_backend(UNIT)
+
+    monkeypatch.setenv("PARQUET_READ_BACKEND", "dataset")
+    assert db._use_dataset_backend(UNIT)
+
+
+def test_partition_walk_is_cached_per_generation(tmp_path, monkeypatch):
+    root = tmp_path / "processed" / "dataset"
+    write_dataset(_frame(), root)
+    db = ParquetDatabase(tmp_path)
+    scans = []
+    real = dataset._scan_latest_partition_mtime
+    monkeypatch.setattr(dataset, "_scan_latest_partition_mtime", lambda dirs: scans.append(1) or real(dirs))
+
+    for _ in range(3):
+        assert db._use_dataset_backend(UNIT)
+        assert db._read_source(UNIT, None)[0][0] == "dataset"
+    assert len(scans) == 1
+    first = dataset.latest_partition_mtime(root, UNIT)
+
+    # An in-process write invalidates; a new tag bumps the unit directory
+    later = _frame().assign(time=lambda d: d["time"] + pd.Timedelta(days=120))
+    write_dataset(later, root)
+    assert dataset.latest_partition_mtime(root, UNIT) >= first and len(scans) == 2
+    (next(root.glob("plant=*/unit=*")) / "tag=T9").mkdir()
+    dataset.latest_partition_mtime(root, UNIT)
+    assert len(scans) == 3
+    # Writes of other processes inside existing partitions: picked up once the TTL expires
+    monkeypatch.setenv("DATASET_INDEX_TTL_S", "0")
+    dataset.latest_partition_mtime(root, UNIT)
+    assert len(scans) == 4
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded-memory external-sort dedup fallback (pi_monitor.clean).
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.clean import external_sort_dedup
+
+
+def test_external_sort_dedup_matches_drop_duplicates(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 200_000
+    df = pd.DataFrame({
+        "plant": "PCFS",
+        "unit": "K-99-01",
+        "tag": rng.choice(["T1", "T2", "T3", None], n),
+        "time": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 40_000, n) * 360, unit="s"),
+        "value": rng.random(n),
+    })
+    src = tmp_path / "K-99-01_1y_0p1h.parquet"
+    df.to_parquet(src, index=False, row_group_size=5_000)
+
+    messages = []
+    out = external_sort_dedup(
+        src, tmp_path / "out.parquet", memory_limit_bytes=1024 * 1024, progress=messages.append
+    )
+    result = pd.read_parquet(out)
+    expected = df.drop_duplicates(["plant", "unit", "tag", "time"], keep="first")
+
+    assert sum("spilled run" in m for m in messages) > 1
+    assert len(result) == len(expected)
+    assert result["time"].is_monotonic_increasing
+    keys = ["tag", "time"]
+    merged = expected.assign(tag=expected["tag"].astype(object)).merge(
+        result.assign(tag=result["tag"].astype(object)), on=keys, suffixes=("_in", "_out")
+    )
+    assert len(merged) == len(expected)
+    assert (merged["value_in"] == merged["value_out"]).all()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for append-only delta segments and compaction (pi_monitor.delta_store).
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.delta_store import DeltaStore
+from pi_monitor.ingest import write_parquet
+from pi_monitor.parquet_database import ParquetDatabase
+
+
+def _rows(times, value, tag="T1"):
+    return pd.DataFrame({"time": times, "value": value, "plant": "PCFS", "unit": "K-99-01", "tag": tag})
+
+
+def test_readers_merge_deltas_last_write_wins_and_compaction_folds(tmp_path):
+    processed = tmp_path / "processed"
+    base_times = pd.date_range("2025-01-01", periods=10, freq="6min")
+    master = processed / "K-99-01_1y_0p1h.parquet"
+    write_parquet(_rows(base_times, 1.0), master)
+
+    db = ParquetDatabase(tmp_path)
+    # Overwrite the last base point and add two new points
+    db.deltas.append("K-99-01", _rows(pd.date_range(base_times[-1], periods=3, freq="6min"), 2.0))
+    # A later segment wins over the earlier one on the same key
+    db.deltas.append("K-99-01", _rows([base_times[-1] + pd.Timedelta(minutes=12)], 3.0))
+
+    df = db.get_unit_data("K-99-01")
+    assert len(df) == 12
+    assert df.set_index("time")["value"].iloc[-3:].tolist() == [2.0, 2.0, 3.0]
+    assert db.get_latest_timestamp("K-99-01") == base_times[-1] + pd.Timedelta(minutes=12)
+
+    tag_df = db.get_unit_tag_data("K-99-01", "T1", start_time=base_times[-1])
+    assert tag_df["value"].tolist() == [2.0, 2.0, 3.0]
+
+    store = DeltaStore(processed)
+    assert store.compact("K-99-01", master) is None  # below thresholds
+    assert store.compact("K-99-01", master, force=True) == master
+    assert store.segments("K-99-01") == []
+
+    compacted = pd.read_parquet(master)
+    assert len(compacted) == 12
+    assert compacted["value"].iloc[-1] == 3.0
+    assert (processed / "K-99-01_1y_0p1h.dedup.parquet").exists()
+
+
+def test_compaction_threshold_by_segment_count(tmp_path, monkeypatch):
+    monkeypatch.setenv("DELTA_COMPACT_MAX_SEGMENTS", "2")
+    store = DeltaStore(tmp_path)
+    store.append("K-99-01", _rows(pd.date_range("2025-01-01", periods=2, freq="6min"), 1.0))
+    assert not store.needs_compaction("K-99-01")
+    store.append("K-99-01", _rows(pd.date_range("2025-01-02", periods=2, freq="6min"), 1.0))
+    assert store.needs_compaction("K-99-01")
+
+
+def test_merge_into_master_delta_mode_needs_a_recognised_unit(tmp_path):
+    sys.path.insert(0, str(Path(__file__).parent / "scripts"))
+    from merge_into_master import merge_and_dedup
+
+    processed = tmp_path / "processed"
+    new = processed / "new.parquet"
+    write_parquet(_rows(pd.date_range("2025-01-01", periods=3, freq="6min"), 1.0), new)
+    merge_and_dedup(processed / "K-99-01_1y_0p1h.parquet", new, mode="delta", cleanup=False)
+    assert DeltaStore(processed).segments("K-99-01")
+    # A tag-prefixed file name is not taken for a unit
+    with pytest.raises(ValueError):
+        merge_and_dedup(processed / "FI-07001_1y_0p1h.parquet", new, mode="delta", cleanup=False)
+
+
+def test_manifest_counts_stay_exact_when_deltas_overwrite(tmp_path):
+    processed = tmp_path / "processed"
+    base_times = pd.date_range("2025-01-01", periods=10, freq="6min")
+    write_parquet(pd.concat([_rows(base_times, 1.0), _rows(base_times, 5.0, tag="T2")], ignore_index=True),
+                  processed / "K-99-01_1y_0p1h.parquet")
+    db = ParquetDatabase(tmp_path)
+    # T1: overwrite the last 2 base points and add one; T2: strictly newer rows only
+    db.deltas.append("K-99-01", pd.concat([
+        _rows(pd.date_range(base_times[-2], periods=3, freq="6min"), 4.0),
+        _rows([base_times[-1] + pd.Timedelta(minutes=6)], 5.0, tag="T2"),
+    ], ignore_index=True))
+
+    manifest = db._unit_manifest("K-99-01")
+    expected = db.get_unit_data("K-99-01").groupby("tag", observed=True)["value"]
+    for tag in ("T1", "T2"):
+        stats = manifest.tag_stats(tag)
+        assert stats["rows"] == expected.size()[tag] == 11, tag
+        assert stats["mean"] == pytest.approx(expected.mean()[tag])
+        assert stats["std"] == pytest.approx(expected.std()[tag])
+    assert manifest.total_rows == 22
+    # Cached until the segments change
+    assert db._unit_manifest("K-99-01").tag_stats("T1") == manifest.tag_stats("T1")
+    db.deltas.append("K-99-01", _rows([base_times[0]], 9.0))
+    assert db._unit_manifest("K-99-01").tag_stats("T1")["max"] == 9.0
+    assert db._unit_manifest("K-99-01").tag_stats("T1")["rows"] == 11
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tests for the incrementally maintained wide feature store (pi_monitor.feature_store).
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.feature_store import pivot_mean
+from pi_monitor.ingest import write_parquet
+from pi_monitor.parquet_database import ParquetDatabase
+
+
+def _rows(times, tags=("T1", "T2", "T3"), seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.concat(
+        [pd.DataFrame({"time": times, "value": rng.normal(i, 1.0, len(times)),
+                       "plant": "PCFS", "unit": "K-99-01", "tag": t}) for i, t in enumerate(tags)],
+        ignore_index=True,
+    )
+
+
+def _reference(df, rule):
+    ref = df.set_index("time").groupby("tag").resample(rule)["value"].mean().unstack(level=0)
+    ref.columns.name = None
+    return ref
+
+
+def test_pivot_mean_matches_groupby_resample():
+    df = _rows(pd.date_range("2025-01-01", periods=500, freq="6min"))
+    df = df.drop(index=df.index[50:120])  # gap in T1
+    wide = pivot_mean(df, "h")
+    ref = _reference(df, "h")
+    pd.testing.assert_frame_equal(wide, ref.reindex(wide.index)[wide.columns], check_freq=False, check_names=False)
+
+
+def test_feature_store_appends_only_newly_closed_buckets(tmp_path):
+    processed = tmp_path / "processed"
+    master = processed / "K-99-01_1y_0p1h.parquet"
+    first = _rows(pd.date_range("2025-01-01", "2025-01-03 00:30", freq="6min"))
+    write_parquet(first, master)
+
+    db = ParquetDatabase(tmp_path)
+    wide = db.get_unit_feature_matrix("K-99-01", "h", window="2D")
+    store = db.features.path_for("K-99-01", "h")
+    stored = pd.read_parquet(store)
+    # The open 00:00 bucket of Jan 3 is served live, not stored
+    assert stored["time"].max() == pd.Timestamp("2025-01-02 23:00")
+    assert wide.index.max() == pd.Timestamp("2025-01-03 00:00")
+
+    # New data arrives: only the buckets that closed since are added
+    more = _rows(pd.date_range("2025-01-03 00:36", "2025-01-03 05:30", freq="6min"), seed=1)
+    write_parquet(pd.concat([first, more], ignore_index=True), master)
+    assert db.features.update_existing("K-99-01") == 5
+    stored = pd.read_parquet(store).set_index("time")
+    assert stored.index.max() == pd.Timestamp("2025-01-03 04:00")
+
+    full = pd.concat([first, more], ignore_index=True)
+    ref = _reference(full, "h").loc[stored.index.min():stored.index.max()]
+    np.testing.assert_allclose(stored[ref.columns].to_numpy(), ref.to_numpy())
+
+
+def test_read_without_update_persists_nothing(tmp_path):
+    processed = tmp_path / "processed"
+    df = _rows(pd.date_range("2025-01-01", "2025-01-02 12:00", freq="6min"))
+    write_parquet(df, processed / "K-99-01_1y_0p1h.parquet")
+
+    db = ParquetDatabase(tmp_path)
+    wide = db.get_unit_feature_matrix("K-99-01", "h", window=(df["time"].min(), df["time"].max()), update=False)
+    # Computed live from the unit data, no store written
+    assert not db.features.path_for("K-99-01", "h").exists()
+    assert db.features.existing_rules("K-99-01") == []
+    ref = _reference(df, "h")
+    np.testing.assert_allclose(wide[ref.columns].to_numpy(), ref.loc[wide.index].to_numpy())
+
+
+def test_late_rows_recompute_stored_buckets(tmp_path):
+    processed = tmp_path / "processed"
+    master = processed / "K-99-01_1y_0p1h.parquet"
+    times = pd.date_range("2025-01-01", "2025-01-02 06:00", freq="6min")
+    first = _rows(times, tags=("T1", "T2"))
+    write_parquet(first, master)
+
+    db = ParquetDatabase(tmp_path)
+    db.get_unit_feature_matrix("K-99-01", "h", window="1D")
+    store = db.features.path_for("K-99-01", "h")
+    assert "T3" not in pd.read_parquet(store).columns
+
+    # A lagging tag catches up inside buckets that are already stored
+    late = _rows(times[times >= "2025-01-02 01:00"], tags=("T3",), seed=2)
+    full = pd.concat([first, late], ignore_index=True)
+    write_parquet(full, master)
+    db.features.update_existing("K-99-01", changed_from=late["time"].min())
+    stored = pd.read_parquet(store).set_index("time")
+    ref = _reference(full, "h").loc["2025-01-02 01:00":stored.index.max()]
+    np.testing.assert_allclose(stored.loc[ref.index, ref.columns].to_numpy(), ref.to_numpy())
+
+    # The writer hook marks the store stale until the next update folds it in
+    from pi_monitor.feature_store import note_rows_written
+
+    edited = full.copy()
+    edited.loc[(edited["tag"] == "T1") & (edited["time"] < "2025-01-02 03:00"), "value"] += 100.0
+    write_parquet(edited, master)
+    note_rows_written(processed, "K-99-01", pd.Timestamp("2025-01-01 12:00"))
+    assert db.features.pending_change("K-99-01", "h") == pd.Timestamp("2025-01-01 12:00")
+    db.features.update_existing("K-99-01")
+    assert db.features.pending_change("K-99-01", "h") is None
+    stored = pd.read_parquet(store).set_index("time")
+    ref = _reference(edited, "h").loc["2025-01-01 12:00":stored.index.max()]
+    np.testing.assert_allclose(stored.loc[ref.index, ref.columns].to_numpy(), ref.to_numpy())
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for the cached processed-directory file catalog (pi_monitor.file_catalog).
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.file_catalog import FileCatalog, catalog_for, refresh
+from pi_monitor.parquet_database import ParquetDatabase
+
+
+def _touch(path: Path, payload: bytes = b"x") -> Path:
+    path.write_bytes(payload)
+    return path
+
+
+def test_catalog_scans_once_per_directory_generation(tmp_path):
+    _touch(tmp_path / "K-99-01_1y_0p1h.parquet")
+    _touch(tmp_path / "K-99-01_1y_0p1h.dedup.parquet")
+    _touch(tmp_path / "K-99-02_1y_0p1h.parquet")
+    _touch(tmp_path / "notes.txt")
+
+    cat = FileCatalog(tmp_path)
+    assert [e.name for e in cat.unit_entries("K-99-01")] == [
+        "K-99-01_1y_0p1h.dedup.parquet",
+        "K-99-01_1y_0p1h.parquet",
+    ]
+    assert len(cat.entries()) == 3
+    cat.unit_entries("K-99-02")
+    assert cat.scans == 1
+
+    # A new file changes the directory and triggers exactly one rescan
+    _touch(tmp_path / "K-99-03_1y_0p1h.parquet")
+    st = tmp_path.stat()
+    os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert len(cat.unit_entries("K-99-03")) == 1
+    cat.entries()
+    assert cat.scans == 2
+
+
+def test_refresh_hook_picks_up_in_place_rewrite(tmp_path):
+    processed = tmp_path / "processed"
+    processed.mkdir()
+    master = processed / "K-99-01_1y_0p1h.parquet"
+    dedup = processed / "K-99-01_1y_0p1h.dedup.parquet"
+    df = pd.DataFrame({"time": pd.date_range("2025-01-01", periods=3, freq="6min"),
+                       "value": 1.0, "plant": "PCFS", "unit": "K-99-01", "tag": "T1"})
+    df.to_parquet(master, index=False)
+    df.to_parquet(dedup, index=False)
+
+    db = ParquetDatabase(tmp_path)
+    assert db.catalog is catalog_for(processed)
+    assert db._get_stable_parquet_files("K-99-01") == [str(dedup)]
+    assert db._get_stable_parquet_files("K-99-01", dedup_preferred=False) == [str(dedup)]
+
+    # Rewrite the master in place without changing the directory listing
+    df.to_parquet(master, index=False)
+    future = dedup.stat().st_mtime + 60
+    os.utime(master, (future, future))
+    refresh(master)
+    assert db._get_stable_parquet_files("K-99-01", dedup_preferred=False) == [str(master)]
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for the fleet freshness snapshot (pi_monitor.freshness).
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.freshness import FreshnessSnapshot
+from pi_monitor.ingest import write_parquet
+from pi_monitor.parquet_database import ParquetDatabase
+
+
+def _rows(unit, end, tags):
+    times = pd.date_range(end=end, periods=50, freq="6min")
+    return pd.concat(
+        [pd.DataFrame({"time": times, "value": 1.0, "plant": "PCFS", "unit": unit, "tag": t}) for t in tags],
+        ignore_index=True,
+    )
+
+
+def test_snapshot_covers_all_units_and_applies_tag_ratio(tmp_path):
+    processed = tmp_path / "processed"
+    now = pd.Timestamp.now().floor("min")
+    write_parquet(_rows("K-01-01", now, ["A", "B"]), processed / "K-01-01_1y_0p1h.parquet")
+    # One fresh tag out of three -> stale under the 50% rule
+    stale = pd.concat([_rows("K-02-01", now, ["A"]), _rows("K-02-01", now - pd.Timedelta(days=2), ["B", "C"])])
+    write_parquet(stale, processed / "K-02-01_1y_0p1h.parquet")
+    # File without a manifest sidecar is scanned instead
+    _rows("K-03-01", now - pd.Timedelta(days=1), ["A"]).to_parquet(processed / "K-03-01_1y_0p1h.parquet", index=False)
+
+    db = ParquetDatabase(tmp_path)
+    snap = FreshnessSnapshot.build(db, ["K-01-01", "K-02-01", "K-03-01", "K-04-01"], max_age_hours=1.0, workers=4)
+
+    assert snap.fresh_units() == ["K-01-01"]
+    assert sorted(snap.stale_units()) == ["K-02-01", "K-03-01"]
+    assert snap.empty_units() == ["K-04-01"]
+
+    k2 = snap.get("K-02-01")
+    assert (k2.tag_count, k2.fresh_tag_count, k2.total_records) == (3, 1, 150)
+    assert k2.latest == now
+    k3 = snap.get("K-03-01")
+    assert k3.source in ("manifest", "scan") and k3.tag_count == 1
+    assert 23.9 < k3.data_age_hours < 24.1
+    assert snap.get("K-01-01").to_dict()["fresh"] is True
+
+
+def test_current_snapshot_is_reused_until_files_change(tmp_path):
+    processed = tmp_path / "processed"
+    now = pd.Timestamp.now().floor("min")
+    write_parquet(_rows("K-01-01", now, ["A"]), processed / "K-01-01_1y_0p1h.parquet")
+    db = ParquetDatabase(tmp_path)
+
+    first = FreshnessSnapshot.current(db, max_age_hours=1.0)
+    assert FreshnessSnapshot.current(db, max_age_hours=1.0) is first
+
+    write_parquet(_rows("K-05-01", now, ["A"]), processed / "K-05-01_1y_0p1h.parquet")
+    second = FreshnessSnapshot.current(db, max_age_hours=1.0)
+    assert second is not first
+    assert "K-05-01" in second
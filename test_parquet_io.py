@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Tests for row-group pruned window reads (pi_monitor.parquet_io).
+"""
+
+import os
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.parquet_database import ParquetDatabase
+from pi_monitor.parquet_io import read_window
+from pi_monitor.tag_manifest import TagManifest
+
+
+def _write_unit(path: Path, rows_per_group: int = 1000) -> pd.DataFrame:
+    times = pd.date_range(end=pd.Timestamp.now().floor("6min"), periods=5000, freq="6min")
+    df = pd.concat(
+        [pd.DataFrame({"time": times, "value": float(i), "plant": "PCFS", "unit": "K-99-01", "tag": f"T{i}"})
+         for i in range(3)],
+        ignore_index=True,
+    ).sample(frac=1.0, random_state=1)
+    # Time-sorted with small row groups, as the writers now produce
+    df.sort_values("time").to_parquet(path, index=False, row_group_size=rows_per_group)
+    return df
+
+
+def test_read_window_prunes_row_groups_and_filters_exactly(tmp_path):
+    path = tmp_path / "K-99-01_1y_0p1h.parquet"
+    df = _write_unit(path)
+    end = df["time"].max()
+    start = end - timedelta(days=2)
+
+    stats = {}
+    out = read_window(path, start, end, stats=stats).to_pandas()
+    expected = df[(df["time"] >= start) & (df["time"] <= end)]
+
+    assert stats["row_groups_read"] < stats["row_groups_total"]
+    assert len(out) == len(expected)
+    assert out["time"].min() >= start
+
+    only_t1 = read_window(path, start, end, tags=["T1"], columns=["time", "value"]).to_pandas()
+    assert list(only_t1.columns) == ["time", "value"]
+    assert len(only_t1) == len(expected[expected["tag"] == "T1"])
+
+
+def test_get_unit_data_window_uses_pruned_read(tmp_path):
+    processed = tmp_path / "processed"
+    processed.mkdir()
+    df = _write_unit(processed / "K-99-01_1y_0p1h.parquet")
+    start = df["time"].max() - timedelta(days=1)
+
+    db = ParquetDatabase(tmp_path)
+    out = db.get_unit_data("K-99-01", start_time=start)
+    assert len(out) == int((df["time"] >= start).sum())
+    assert out["time"].is_monotonic_increasing
+
+
+def test_writers_store_dictionary_columns_and_optional_float32(tmp_path, monkeypatch):
+    from pi_monitor.ingest import write_parquet
+
+    processed = tmp_path / "processed"
+    times = pd.date_range("2025-01-01", periods=100, freq="6min")
+    df = pd.DataFrame({"time": times, "value": 1.25, "plant": "PCFS", "unit": "K-99-01", "tag": "T1"})
+
+    monkeypatch.setenv("PARQUET_VALUE_FLOAT32", "1")
+    write_parquet(df, processed / "K-99-01_1y_0p1h.parquet")
+
+    db = ParquetDatabase(tmp_path)
+    arrow = db.get_unit_data_arrow("K-99-01", start_time=times[50])
+    assert pa.types.is_dictionary(arrow.schema.field("tag").type)
+    assert arrow.schema.field("value").type == pa.float32()
+    out = db.get_unit_data("K-99-01", start_time=times[50])
+    assert isinstance(out["tag"].dtype, pd.CategoricalDtype)
+    assert list(out["tag"].cat.categories) == ["T1"]
+    assert out["value"].dtype == "float32"
+    assert len(out) == 50
+    # Plain strings only on request
+    tag_rows = db.get_unit_tag_data("K-99-01", "T1", start_time=times[50], as_strings=True)
+    assert not any(isinstance(tag_rows[c].dtype, pd.CategoricalDtype) for c in ("unit", "tag"))
+    assert tag_rows["tag"].tolist() == ["T1"] * 50
+
+
+def test_cached_slices_keep_observed_sorted_categories(tmp_path):
+    from pi_monitor.ingest import write_parquet
+
+    times = pd.date_range("2025-01-01", periods=100, freq="6min")
+    df = pd.concat([pd.DataFrame({"time": times[:50] if t == "B" else times, "value": 1.0, "plant": "PCFS",
+                                  "unit": "K-99-01", "tag": t}) for t in ("C", "B", "A")], ignore_index=True)
+    write_parquet(df, tmp_path / "processed" / "K-99-01_1y_0p1h.parquet")
+    db = ParquetDatabase(tmp_path)
+    assert list(db.get_unit_data("K-99-01")["tag"].cat.categories) == ["A", "B", "C"]
+    # Served from the cached whole-unit read: tag B has no rows in this window
+    late = db.get_unit_data("K-99-01", start_time=times[60])
+    assert db.cache_stats()["slice_hits"] >= 1
+    assert list(late["tag"].cat.categories) == ["A", "C"]
+    assert late["tag"].value_counts().to_dict() == {"A": 40, "C": 40}
+
+
+def test_append_parquet_round_trips_into_compact_files(tmp_path, monkeypatch):
+    pytest.importorskip("fastparquet")
+    from pi_monitor.ingest import append_parquet, write_parquet
+
+    path = tmp_path / "processed" / "K-99-01_1y_0p1h.parquet"
+    times = pd.date_range("2025-01-01", periods=100, freq="6min")
+    df = pd.DataFrame({"time": times, "value": 1.25, "plant": "PCFS", "unit": "K-99-01", "tag": "T1"})
+    monkeypatch.setenv("PARQUET_VALUE_FLOAT32", "1")
+    write_parquet(df, path)
+
+    # Appended rows arrive as plain strings / float64, including a new tag
+    more = pd.DataFrame({"time": times + pd.Timedelta(days=1), "value": 2.5, "plant": "PCFS",
+                         "unit": "K-99-01", "tag": ["T1", "T2"] * 50})
+    append_parquet(more, path)
+
+    back = pq.read_table(path)
+    assert back.num_rows == 200
+    assert pa.types.is_dictionary(back.schema.field("tag").type)
+    out = ParquetDatabase(tmp_path).get_unit_data("K-99-01")
+    assert len(out) == 200
+    assert out.groupby("tag").size().to_dict() == {"T1": 150, "T2": 50}
+    assert out.loc[out["time"] >= times[0] + pd.Timedelta(days=1), "value"].eq(2.5).all()
+    assert TagManifest.load(path).tags["T2"]["rows"] == 50
+
+
+def test_arrow_api_returns_tables_and_numpy_views(tmp_path, monkeypatch):
+    import pyarrow as pa
+    from pi_monitor import parquet_io
+
+    processed = tmp_path / "processed"
+    processed.mkdir()
+    df = _write_unit(processed / "K-99-01_1y_0p1h.parquet")
+    start = df["time"].max() - timedelta(days=1)
+
+    db = ParquetDatabase(tmp_path)
+    table = db.get_unit_data_arrow("K-99-01", start_time=start)
+    assert isinstance(table, pa.Table)
+    assert table.num_rows == int((df["time"] >= start).sum())
+    assert pa.types.is_dictionary(table.schema.field("tag").type)
+    # Not memory-mapped unless PARQUET_MEMORY_MAP asks for it (a mapping blocks os.replace on Windows)
+    opened = []
+    real_open = parquet_io.open_parquet
+    monkeypatch.setattr(parquet_io, "open_parquet", lambda p, **kw: opened.append(kw) or real_open(p, **kw))
+    db.get_unit_tag_arrow("K-99-01", "T2", start_time=start)
+    assert opened and opened[-1]["memory_map"] is None and not parquet_io.memory_map_default()
+
+    times, values = db.get_unit_tag_arrays("K-99-01", "T2", start_time=start)
+    expected = df[(df["tag"] == "T2") & (df["time"] >= start)].sort_values("time")
+    assert times.dtype == "int64" and values.dtype == "float64"
+    assert (times == expected["time"].to_numpy().astype("datetime64[ns]").astype("int64")).all()
+    assert (values == 2.0).all()
+
+
+@pytest.mark.parametrize("duckdb_off", ["1", "0"])
+def test_arrow_and_pandas_reads_pick_the_same_file(tmp_path, monkeypatch, duckdb_off):
+    if duckdb_off == "0":
+        pytest.importorskip("duckdb")
+    monkeypatch.setenv("DISABLE_DUCKDB", duckdb_off)
+    processed = tmp_path / "processed"
+    processed.mkdir()
+    # An older long-span dedup file sits next to the newest one
+    older = processed / "K-99-01_1p5y_0p1h.dedup.parquet"
+    _write_unit(older).assign(value=-1.0).sort_values("time").to_parquet(older, index=False)
+    os.utime(older, (1_600_000_000, 1_600_000_000))
+    df = _write_unit(processed / "K-99-01_1y_0p1h.dedup.parquet")
+    start = df["time"].max() - timedelta(days=1)
+
+    db = ParquetDatabase(tmp_path)
+    frame = db.get_unit_data("K-99-01", start_time=start)
+    table = db.get_unit_data_arrow("K-99-01", start_time=start)
+    assert len(frame) == table.num_rows == int((df["time"] >= start).sum())
+    assert sorted(frame["value"].astype(float)) == sorted(table.column("value").to_pylist())
+    _, values = db.get_unit_tag_arrays("K-99-01", "T1", start_time=start)
+    assert set(values) == set(frame.loc[frame["tag"] == "T1", "value"].astype(float))
+
+
+def test_get_unit_tags_window_splits_one_read_per_tag(tmp_path):
+    processed = tmp_path / "processed"
+    processed.mkdir()
+    df = _write_unit(processed / "K-99-01_1y_0p1h.parquet")
+    start = df["time"].max() - timedelta(days=3)
+
+    db = ParquetDatabase(tmp_path)
+    out = db.get_unit_tags_window("K-99-01", ["T2", "T0", "missing"], start_time=start)
+    assert list(out) == ["T2", "T0", "missing"]
+    for tag, value in (("T0", 0.0), ("T2", 2.0)):
+        times, values = out[tag]
+        expected = df[(df["tag"] == tag) & (df["time"] >= start)].sort_values("time")
+        assert (times == expected["time"].to_numpy().astype("datetime64[ns]").astype("int64")).all()
+        assert (values == value).all()
+    assert len(out["missing"][0]) == 0
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for the byte-bounded query-result cache (pi_monitor.query_cache).
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.ingest import write_parquet
+from pi_monitor.parquet_database import ParquetDatabase
+from pi_monitor.query_cache import QueryCache
+
+
+def _rows(unit, end, tags=("A", "B"), value=1.0):
+    times = pd.date_range(end=end, periods=24 * 10, freq="h")
+    return pd.concat(
+        [pd.DataFrame({"time": times, "value": value, "plant": "PCFS", "unit": unit, "tag": t}) for t in tags],
+        ignore_index=True,
+    )
+
+
+def test_narrower_windows_are_sliced_from_cached_reads(tmp_path, monkeypatch):
+    monkeypatch.setenv("PARQUET_READ_BACKEND", "files")
+    processed = tmp_path / "processed"
+    now = pd.Timestamp.now().floor("h")
+    path = processed / "K-01-01_1y_0p1h.parquet"
+    write_parquet(_rows("K-01-01", now), path)
+    db = ParquetDatabase(tmp_path)
+
+    start = (now - pd.Timedelta(days=5)).to_pydatetime()
+    first = db.get_unit_data("K-01-01", start_time=start)
+    assert db.cache_stats()["misses"] == 1
+    assert first["time"].min() >= start and len(first) == 2 * (5 * 24 + 1)
+
+    narrow = db.get_unit_data("K-01-01", start_time=start + pd.Timedelta(days=2),
+                              end_time=start + pd.Timedelta(days=3))
+    assert len(narrow) == 2 * 25
+    assert db.cache_stats()["slice_hits"] == 1
+
+    # Mutating a returned frame must not leak into the cache
+    narrow["value"] = -1.0
+    again = db.get_unit_data("K-01-01", start_time=start)
+    assert (again["value"] == 1.0).all() and len(again) == len(first)
+    assert db.cache_stats()["misses"] == 1
+
+    # Rewriting the file changes the fingerprint: no stale rows are served
+    write_parquet(_rows("K-01-01", now, value=2.0), path)
+    fresh = db.get_unit_data("K-01-01", start_time=start)
+    assert (fresh["value"] == 2.0).all()
+    assert db.cache_stats()["misses"] == 2
+
+    tag = db.get_unit_tag_data("K-01-01", "B", start_time=start)
+    assert set(tag["tag"]) == {"B"} and len(tag) == 5 * 24 + 1
+    assert len(db.get_unit_tag_data("K-01-01", "B", start_time=start + pd.Timedelta(hours=1))) == 5 * 24
+
+
+def test_lru_eviction_respects_byte_budget():
+    frame = pd.DataFrame({"time": pd.date_range("2025-01-01", periods=1000, freq="min"), "value": 0.0})
+    cache = QueryCache(max_bytes=40_000, bucket="h")
+    assert cache.put("src", "U1", None, None, None, frame)
+    assert cache.put("src", "U2", None, None, None, frame)
+    cache.get("src", "U1", None, None, None)  # U1 becomes most recently used
+    assert cache.put("src", "U3", None, None, None, frame)
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["bytes"] <= 40_000
+    assert cache.get("src", "U2", None, None, None) is None
+    assert cache.get("src", "U1", None, None, None) is not None
+
+    # Entries over half the budget are not cached at all
+    big = pd.concat([frame] * 2, ignore_index=True)
+    assert not cache.put("src", "U4", None, None, None, big)
+    assert cache.stats()["rejected"] == 1
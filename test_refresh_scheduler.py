@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for the concurrent multi-unit refresh scheduler (pi_monitor.refresh_scheduler).
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.refresh_scheduler import RefreshJob, RefreshScheduler, source_for
+
+
+def fake_refresh(unit, plant, seconds=0.2, rows=100, fail=False):
+    """Stand-in for simple_refresh_unit (module level, so spawned workers can import it)."""
+    time.sleep(seconds)
+    if fail == "raise":
+        raise RuntimeError(f"PI server for {plant} unreachable")
+    return {"success": not fail, "unit": unit, "plant": plant,
+            "rows_added": 0 if fail else rows, "total_tags": 10, "active_tags": 0 if fail else 10}
+
+
+def _scheduler(**kw):
+    opts = dict(max_workers=8, default_source_limit=1, memory_budget_mb=0, min_free_mb=0,
+                job_timeout_s=30, isolation="thread", poll_s=0.01)
+    opts.update(kw)
+    return RefreshScheduler(**opts)
+
+
+def test_source_for_groups_plants():
+    assert source_for("PCFS") == "PCFS"
+    assert source_for("ABFSB") == source_for("ABF") == "ABF"
+    assert source_for("PCMSB") == "PCMSB"
+
+
+def test_per_source_cap_and_cross_source_parallelism():
+    jobs = [RefreshJob("PCFS", f"K-{i}", fake_refresh, (f"K-{i}", "PCFS", 0.2)) for i in range(4)]
+    jobs += [RefreshJob("PCMSB", f"C-{i}", fake_refresh, (f"C-{i}", "PCMSB", 0.2)) for i in range(2)]
+    events = []
+    t0 = time.monotonic()
+    results = _scheduler(source_limits={"PCFS": 2}).run(jobs, on_event=events.append)
+    elapsed = time.monotonic() - t0
+
+    assert list(results) == [j.key for j in jobs]
+    assert all(r.status == "ok" and r.rows_added == 100 and r.active_tags == 10 for r in results.values())
+    # PCFS: 4 jobs, 2 at a time; PCMSB: 2 jobs, 1 at a time -> ~0.4s, not the serial 1.2s
+    assert elapsed < 0.9
+    pcfs = sorted(r.queued_s for k, r in results.items() if k.startswith("PCFS"))
+    assert pcfs[1] < 0.1 < pcfs[2]
+    assert len(events) == 12
+
+
+def test_slow_source_times_out_without_holding_up_others(tmp_path):
+    jobs = [RefreshJob("ABFSB", "07-MT01-K001", fake_refresh, ("07-MT01-K001", "ABFSB", 5.0), timeout_s=0.3)]
+    jobs += [RefreshJob("PCFS", f"K-{i}", fake_refresh, (f"K-{i}", "PCFS", 0.05)) for i in range(4)]
+    jobs += [RefreshJob("PCMSB", "C-02001", fake_refresh, ("C-02001", "PCMSB", 0.05, 0, True)),
+             RefreshJob("PCMSB", "C-104", fake_refresh, ("C-104", "PCMSB", 0.05, 0, "raise"))]
+    t0 = time.monotonic()
+    results = _scheduler(isolation="process", log_dir=tmp_path).run(jobs)
+    elapsed = time.monotonic() - t0
+
+    abf = results["ABFSB/07-MT01-K001"]
+    assert abf.status == "timeout" and not abf.success and abf.source == "ABF"
+    assert elapsed < 4.0  # the worker was terminated, not waited for
+    assert all(results[f"PCFS/K-{i}"].success for i in range(4))
+    assert results["PCMSB/C-02001"].status == "failed"
+    err = results["PCMSB/C-104"]
+    assert err.status == "error" and "unreachable" in err.error
+    assert "unreachable" in Path(err.log_path).read_text()
+    d = results["PCFS/K-0"].to_dict()
+    assert {"success", "rows_added", "total_tags", "active_tags", "status", "duration_s"} <= set(d)
+
+
+def test_memory_admission_serialises_but_never_stalls():
+    jobs = [RefreshJob(p, "U", fake_refresh, ("U", p, 0.15), memory_mb=800) for p in ("PCFS", "PCMSB", "ABF")]
+    t0 = time.monotonic()
+    results = _scheduler(memory_budget_mb=1000).run(jobs)
+    # Each job alone fits the budget, two do not: one at a time
+    assert time.monotonic() - t0 >= 0.45
+    assert all(r.success for r in results.values())
+    # A job larger than the whole budget still runs when nothing else does
+    big = _scheduler(memory_budget_mb=100).run([RefreshJob("PCFS", "U", fake_refresh, ("U", "PCFS", 0.0), memory_mb=800)])
+    assert big["PCFS/U"].success
+
+
+def test_invalid_isolation_rejected():
+    with pytest.raises(ValueError):
+        RefreshScheduler(isolation="fork")
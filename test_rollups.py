@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for the 1h/1d rollup pyramid (pi_monitor.rollups).
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.ingest import write_parquet
+from pi_monitor.parquet_database import ParquetDatabase
+from pi_monitor.rollups import envelope_points
+
+
+def _rows(times, tags=("T1", "T2")):
+    rng = np.random.default_rng(7)
+    return pd.concat(
+        [pd.DataFrame({"time": times, "value": rng.normal(10.0 * (i + 1), 1.0, len(times)),
+                       "plant": "PCFS", "unit": "K-99-01", "tag": tag})
+         for i, tag in enumerate(tags)],
+        ignore_index=True,
+    )
+
+
+def test_rollups_build_incrementally_and_match_raw(tmp_path):
+    processed = tmp_path / "processed"
+    times = pd.date_range("2025-01-01", "2025-02-10 05:54", freq="6min")
+    df = _rows(times)
+    master = processed / "K-99-01_1y_0p1h.parquet"
+    write_parquet(df[df["time"] < "2025-02-05 12:30"], master)
+
+    db = ParquetDatabase(tmp_path)
+    first = db.rollups.update("K-99-01")
+    assert first["1h"] > 0 and first["1d"] > 0
+    # Month partitions for the hourly level, year partitions for daily
+    assert (db.rollups.unit_dir("K-99-01") / "1h" / "2025-01.parquet").exists()
+
+    write_parquet(df, master)
+    second = db.rollups.update("K-99-01")
+    assert 0 < second["1h"] < first["1h"]
+    assert db.rollups.update("K-99-01") == {"1h": 0, "1d": 0}
+
+    start, end = pd.Timestamp("2025-01-03 07:12"), pd.Timestamp("2025-02-10 05:30")
+    t1 = df[(df["tag"] == "T1") & (df["time"] >= start) & (df["time"] <= end)]
+    assert db.get_tag_extremes("K-99-01", "T1", start, end) == (t1["value"].min(), t1["value"].max())
+
+    hourly = db.get_tag_rollup("K-99-01", "T1", start, end, max_points=1000)
+    assert hourly.attrs["level"] == "1h"
+    raw = df[df["tag"] == "T1"].assign(hour=lambda d: d["time"].dt.floor("h"))
+    expected = raw[(raw["hour"] >= start.floor("h")) & (raw["time"] <= end)].groupby("hour")["value"]
+    assert len(hourly) == expected.ngroups
+    assert np.allclose(hourly["max"].to_numpy(), expected.max().to_numpy())
+    assert np.allclose(hourly["mean"].to_numpy(), expected.mean().to_numpy())
+    # The open hour (05:00-05:54) comes from raw rows
+    assert hourly["time"].iloc[-1] == pd.Timestamp("2025-02-10 05:00")
+
+    daily = db.get_tag_rollup("K-99-01", "T2", start, end, max_points=100)
+    assert daily.attrs["level"] == "1d"
+    jan10 = df[(df["tag"] == "T2") & (df["time"].dt.floor("D") == "2025-01-10")]["value"]
+    row = daily.set_index("time").loc[pd.Timestamp("2025-01-10")]
+    assert row["count"] == 240 and np.isclose(row["mean"], jan10.mean())
+    assert row["last"] == jan10.iloc[-1]
+
+    assert db.get_tag_rollup("K-99-01", "T1", end - pd.Timedelta(hours=6), end, max_points=1000).attrs["level"] == "raw"
+    env = envelope_points(hourly)
+    assert len(env) == 2 * len(hourly)
+    assert env["value"].max() == hourly["max"].max()
+
+
+def test_reads_do_not_build_rollups(tmp_path):
+    processed = tmp_path / "processed"
+    times = pd.date_range("2025-01-01", "2025-01-05", freq="6min")
+    df = _rows(times)
+    write_parquet(df, processed / "K-99-01_1y_0p1h.parquet")
+
+    db = ParquetDatabase(tmp_path)
+    start, end = times[0], times[-1]
+    t1 = df[df["tag"] == "T1"]["value"]
+    # Exact from raw rows, and nothing is written on the read path
+    assert db.get_tag_extremes("K-99-01", "T1", start, end) == (t1.min(), t1.max())
+    assert db.get_tag_rollup("K-99-01", "T1", start, end, max_points=200).attrs["level"] == "1h"
+    assert not db.rollups.has_unit("K-99-01")
+
+
+def test_late_rows_reaggregate_stored_hours_and_days(tmp_path):
+    processed = tmp_path / "processed"
+    times = pd.date_range("2025-01-01", "2025-01-06 05:54", freq="6min")
+    df = _rows(times)
+    master = processed / "K-99-01_1y_0p1h.parquet"
+    write_parquet(df, master)
+
+    db = ParquetDatabase(tmp_path)
+    db.rollups.update("K-99-01")
+
+    # A spike lands in hours that are already rolled up
+    spike = pd.Timestamp("2025-01-03 10:18")
+    late = df.copy()
+    late.loc[(late["tag"] == "T1") & (late["time"] == spike), "value"] = 1000.0
+    write_parquet(late, master)
+    from pi_monitor.rollups import note_rows_written
+
+    note_rows_written(processed, "K-99-01", spike)
+    start, end = pd.Timestamp("2025-01-01"), pd.Timestamp("2025-01-06 05:00")
+    # Until the next update reads take the marked span from raw rows
+    assert db.get_tag_extremes("K-99-01", "T1", start, end)[1] == 1000.0
+
+    written = db.rollups.update("K-99-01")
+    assert written["1h"] > 0 and written["1d"] > 0
+    assert db.rollups.pending_change("K-99-01") is None
+    assert db.get_tag_extremes("K-99-01", "T1", start, end)[1] == 1000.0
+    daily = db.rollups.query("K-99-01", "T1", start, end, level="1d")
+    assert daily.set_index("time").loc["2025-01-03", "max"] == 1000.0
+
+    # The refresh hook passes the earliest written time directly
+    late.loc[(late["tag"] == "T2") & (late["time"] == spike), "value"] = -1000.0
+    write_parquet(late, master)
+    db.rollups.update("K-99-01", changed_from=spike)
+    assert db.get_tag_extremes("K-99-01", "T2", start, end)[0] == -1000.0
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for the process-wide ParquetDatabase and its DuckDB cursor pool.
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.ingest import write_parquet
+from pi_monitor.parquet_database import ParquetDatabase
+
+
+def _write(processed: Path) -> pd.DataFrame:
+    times = pd.date_range("2025-01-01", periods=50, freq="6min")
+    df = pd.concat(
+        [pd.DataFrame({"time": times, "value": float(i), "plant": "PCFS", "unit": "K-99-01", "tag": f"T{i}"})
+         for i in range(4)],
+        ignore_index=True,
+    )
+    write_parquet(df, processed / "K-99-01_1y_0p1h.dedup.parquet")
+    return df
+
+
+def test_shared_instance_reuses_pooled_cursors_across_threads(tmp_path, monkeypatch):
+    monkeypatch.setenv("DISABLE_DUCKDB", "0")
+    df = _write(tmp_path / "processed")
+
+    db = ParquetDatabase.shared(tmp_path)
+    assert ParquetDatabase.shared(tmp_path) is db
+    assert db.conn is not None
+
+    start = df["time"].iloc[10]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        frames = list(pool.map(lambda t: db._read_unit_tag_base("K-99-01", t, start_time=start),
+                               ["T0", "T1", "T2", "T3"] * 3))
+    assert all(len(f) == 40 for f in frames)
+    assert 0 < len(db._cursor_pool) <= 4
+
+    latest = db.get_tag_latest_timestamps("K-99-01")
+    assert latest["T3"] == df["time"].max()
+
+    # Invalidation drops pooled cursors without reconnecting
+    conn = db.conn
+    gen = db.generation
+    db.invalidate_cache()
+    assert db.generation == gen + 1
+    assert db._cursor_pool == []
+    assert db.conn is conn
+    assert len(db._read_unit_base("K-99-01")) == len(df)
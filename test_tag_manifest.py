@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-tag watermark manifest and the ParquetDatabase
+freshness queries that answer from it.
+"""
+
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.ingest import write_parquet
+from pi_monitor.parquet_database import ParquetDatabase
+from pi_monitor.tag_manifest import TagManifest, manifest_path_for
+
+
+def _unit_frame(now: datetime) -> pd.DataFrame:
+    fresh = pd.date_range(now - timedelta(hours=5), now - timedelta(minutes=6), freq="6min")
+    stale = pd.date_range(now - timedelta(days=3), now - timedelta(days=2), freq="6min")
+    parts = [
+        pd.DataFrame({"time": fresh, "value": range(len(fresh)), "tag": "TI_001"}),
+        pd.DataFrame({"time": fresh, "value": 1.5, "tag": "PI_002"}),
+        pd.DataFrame({"time": stale, "value": 7.0, "tag": "FI_003"}),
+    ]
+    df = pd.concat(parts, ignore_index=True)
+    df["plant"] = "PCFS"
+    df["unit"] = "K-99-01"
+    return df
+
+
+def test_writer_creates_manifest_and_db_answers_from_it(tmp_path):
+    processed = tmp_path / "processed"
+    now = datetime.now().replace(microsecond=0)
+    df = _unit_frame(now)
+    target = processed / "K-99-01_1y_0p1h.parquet"
+    write_parquet(df, target)
+
+    assert manifest_path_for(target).exists()
+    m = TagManifest.load(target)
+    assert m is not None
+    assert m.total_rows == len(df)
+    assert m.tags["TI_001"]["last_value"] == float(df[df.tag == "TI_001"]["value"].iloc[-1])
+
+    db = ParquetDatabase(tmp_path)
+    assert db.get_latest_timestamp("K-99-01") == df["time"].max()
+    assert db.get_latest_timestamp("K-99-01", "FI_003") == df[df.tag == "FI_003"]["time"].max()
+    assert db.check_tag_freshness("K-99-01", max_age_hours=1.0) == (True, 2, 3)
+    assert set(db.get_tag_latest_timestamps("K-99-01")) == {"TI_001", "PI_002", "FI_003"}
+
+    info = db.get_data_freshness_info("K-99-01")
+    assert info["total_records"] == len(df)
+    assert info["fresh_tag_count"] == 2 and info["total_tag_count"] == 3
+    assert not info["is_stale"]
+
+
+def test_stale_manifest_is_rebuilt_by_scan(tmp_path):
+    processed = tmp_path / "processed"
+    processed.mkdir(parents=True)
+    now = datetime.now().replace(microsecond=0)
+    df = _unit_frame(now)
+    target = processed / "K-99-01_1y_0p1h.parquet"
+    write_parquet(df, target)
+
+    # Rewrite the file behind the manifest's back with one tag only
+    df[df.tag == "FI_003"].to_parquet(target, index=False)
+    assert TagManifest.load(target) is None
+
+    db = ParquetDatabase(tmp_path)
+    assert db.get_tag_latest_timestamps("K-99-01").keys() == {"FI_003"}
+    assert TagManifest.load(target) is not None
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for per-tag watermark incremental fetch planning (pi_monitor.tag_watermarks).
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.ingest import write_parquet
+from pi_monitor.parquet_database import ParquetDatabase
+from pi_monitor.parquet_io import table_to_pandas
+from pi_monitor.tag_manifest import _naive_local
+from pi_monitor.tag_watermarks import fetch_batches_to_parquet, plan_fetch, stored_tag_names, trim_to_watermarks
+from pi_monitor.webapi import client_from_env, fetch_tags_via_webapi
+
+NOW = pd.Timestamp("2025-06-01 12:00")
+HOUR = pd.Timedelta(hours=1)
+QUIET = {"tags": [], "anomaly_rate": 0.0, "flatline_rate": 0.0, "trip_rate": 0.0, "bad_rate": 0.0}
+K12 = ["PCFS.K-12-01.12TI-007.PV", "PCFS.K-12-01.12PI-007.PV", "PCFS.K-12-01.12LI-001.PV"]
+
+
+def test_plan_starts_each_tag_at_its_own_watermark():
+    marks = {
+        "P_A": NOW - pd.Timedelta(minutes=12),
+        "P_B": NOW - pd.Timedelta(minutes=30),
+        "P_LAG": NOW - pd.Timedelta(days=3),
+        "P_DONE": NOW,
+    }
+    batches = plan_fetch(["P.A", "P.B", "P.LAG", "P.DONE", "P.NEW"], marks, now=NOW, tolerance=HOUR,
+                         new_tag_lookback=pd.Timedelta(days=1))
+    # Oldest first: the lagging tag alone, the new tag alone, then the current tags together
+    assert [b.tags for b in batches] == [["P.LAG"], ["P.NEW"], ["P.B", "P.A"]]
+    assert batches[0].start == marks["P_LAG"] + pd.Timedelta(minutes=6)
+    assert batches[1].start == NOW - pd.Timedelta(days=1) and batches[1].since == {"P.NEW": None}
+    assert batches[2].start == marks["P_B"] + pd.Timedelta(minutes=6)
+    assert batches[2].relative_start(NOW) == "-1440s"
+    # Capped batch count merges the closest starts
+    merged = plan_fetch(["P.A", "P.B", "P.LAG", "P.NEW"], marks, now=NOW, tolerance=HOUR, max_batches=2,
+                        new_tag_lookback=pd.Timedelta(days=1))
+    assert [sorted(b.tags) for b in merged] == [["P.LAG"], ["P.A", "P.B", "P.NEW"]]
+    # Never clamped: a tag 45 days behind starts at its own watermark, not at a lookback limit
+    stale = {"P_OLD": NOW - pd.Timedelta(days=45)}
+    assert plan_fetch(["P.OLD"], stale, now=NOW)[0].start == stale["P_OLD"] + pd.Timedelta(minutes=6)
+    # A span-limited fetcher pages from the real start instead of skipping ahead
+    old = plan_fetch(["P.OLD"], stale, now=NOW)[0]
+    assert old.relative_end(HOUR, NOW) == f"-{int((NOW - old.start - HOUR).total_seconds())}s"
+    assert batches[2].relative_end(HOUR, NOW) == "*"
+    assert batches[2].relative_end(None, NOW) == "*"
+
+
+def test_trim_drops_rows_at_or_before_each_watermark():
+    assert stored_tag_names("P.A B/1") == ["P_A B/1", "P_A_B_1"]
+    times = pd.date_range(NOW - 3 * HOUR, NOW, freq="h")
+    df = pd.DataFrame({"time": list(times) * 3, "value": 1.0,
+                       "tag": ["P_A"] * 4 + ["P_B"] * 4 + ["P_NEW"] * 4})
+    out = trim_to_watermarks(df, {"P.A": NOW - HOUR, "P.B": NOW - 3 * HOUR, "P.NEW": None})
+    assert out.groupby("tag")["time"].min().to_dict() == {
+        "P_A": NOW, "P_B": NOW - 2 * HOUR, "P_NEW": NOW - 3 * HOUR}
+    # UTC fetch results are compared in local time
+    utc = df.assign(time=df["time"].dt.tz_localize(datetime.now().astimezone().tzinfo).dt.tz_convert("UTC"))
+    assert len(trim_to_watermarks(utc, {"P.A": NOW - HOUR})) == len(df) - 3
+
+
+@pytest.mark.parametrize("webapi_sim", [QUIET], indirect=True)
+def test_lagging_tag_is_fetched_from_its_own_watermark(webapi_sim, monkeypatch, tmp_path):
+    monkeypatch.setenv("PI_WEBAPI_ASYNC", "0")
+    now = pd.Timestamp.now().floor("6min")
+    tags = ["PCFS.K-12-01.12TI-007.PV", "PCFS.K-12-01.12PI-007.PV", "PCFS.K-12-01.12LI-001.PV"]
+    ends = {tags[0]: now - HOUR, tags[1]: now - 90 * pd.Timedelta(minutes=1), tags[2]: now - pd.Timedelta(days=2)}
+    stored = pd.concat([
+        pd.DataFrame({"time": pd.date_range(end=end, periods=20, freq="6min"), "value": 1.0,
+                      "plant": "PCFS", "unit": "K-12-01", "tag": tag.replace(".", "_")})
+        for tag, end in ends.items()
+    ], ignore_index=True)
+    write_parquet(stored, tmp_path / "processed" / "K-12-01_1y_0p1h.parquet")
+    db = ParquetDatabase(tmp_path)
+
+    batches = plan_fetch(tags, db.get_tag_latest_timestamps("K-12-01"), step="-0.1h")
+    assert [b.tags for b in batches] == [[tags[2]], [tags[1], tags[0]]]
+    frames = [fetch_tags_via_webapi(b.tags, "SIM", b.relative_start(), "*", "-0.1h",
+                                    base_url=webapi_sim.url, auth_mode="none") for b in batches]
+    since = {t: m for b in batches for t, m in b.since.items()}
+    new = trim_to_watermarks(pd.concat(frames, ignore_index=True), since)
+    new["time"] = _naive_local(new["time"])
+
+    first = new.groupby("tag")["time"].min()
+    for tag, end in ends.items():
+        # The first new row follows the tag's own watermark (one step, plus request latency
+        # of the relative start); nothing at or before it
+        assert end < first[tag.replace(".", "_")] <= end + pd.Timedelta(minutes=7), tag
+    # Two days of the lagging tag, not of every tag
+    counts = new.groupby("tag").size()
+    assert counts[tags[2].replace(".", "_")] > 10 * counts[tags[0].replace(".", "_")]
+
+
+@pytest.mark.parametrize("webapi_sim", [{**QUIET, "tags": K12}], indirect=True)
+def test_batches_stream_to_parquet_trimmed_to_watermarks(webapi_sim, monkeypatch, tmp_path):
+    """The incremental refresh's Web API leg: one file per batch, one row group per tag."""
+    monkeypatch.setenv("PI_WEBAPI_ADAPTIVE", "0")
+    now = pd.Timestamp.now().floor("6min")
+    tags = K12
+    marks = {tags[0].replace(".", "_"): now - HOUR, tags[1].replace(".", "_"): now - 2 * HOUR,
+             tags[2].replace(".", "_"): now - pd.Timedelta(days=2)}
+    batches = plan_fetch(tags, marks, now=now, step="-0.1h")
+    # Starts well before the watermarks: rows at or before them are dropped before writing
+    for b in batches:
+        b.start -= 3 * HOUR
+    client = client_from_env("SIM", base_url=webapi_sim.url, auth_mode="none")
+
+    files, pending = fetch_batches_to_parquet(batches, tmp_path, plant="PCFS", unit="K-12-01", server="SIM",
+                                              client=client)
+    assert not pending and [f.name for f in files] == ["K-12-01_batch_0.parquet", "K-12-01_batch_1.parquet"]
+    assert pq.ParquetFile(files[1]).metadata.num_row_groups == 2
+    new = pd.concat([table_to_pandas(pq.read_table(f)) for f in files], ignore_index=True)
+    assert list(new.columns) == ["time", "value", "plant", "unit", "tag"]
+    first = new.groupby("tag", observed=True)["time"].min()
+    for name, mark in marks.items():
+        assert mark < first[name] <= mark + pd.Timedelta(minutes=7), name
+    # Unknown tags leave their batch for the Excel fallback
+    missing = plan_fetch(["PCFS.NO.SUCH.TAG"], {}, now=now)
+    files, pending = fetch_batches_to_parquet(missing, tmp_path / "x", plant="PCFS", unit="K-12-01",
+                                              server="SIM", client=client)
+    assert not files and pending == missing
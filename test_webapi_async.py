@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for the asyncio PI Web API client (pi_monitor.webapi_async) against a local mock server.
+"""
+
+import json
+import sys
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+pytest.importorskip("aiohttp")
+
+from pi_monitor.webapi import fetch_tags_via_webapi
+from pi_monitor import webapi_async
+from pi_monitor.webapi_async import async_fetch_enabled, fetch_tags_via_webapi_async
+
+
+class _Mock(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    throttled: set = set()
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code, body):
+        payload = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        q = urllib.parse.parse_qs(url.query)
+        if (self.headers.get("Authorization") or "").startswith("Negotiate"):
+            # Negotiate falls back to NTLM here: single-leg tokens are rejected
+            return self._send(401, {})
+        if url.path.endswith("/system"):
+            return self._send(200, {})
+        if url.path.endswith("/points"):
+            tag = q["path"][0].rsplit("\\", 1)[-1]
+            if tag == "MISSING":
+                return self._send(404, {"Errors": ["not found"]})
+            # First lookup of every tag is throttled once
+            with self.lock:
+                first = tag not in self.throttled
+                self.throttled.add(tag)
+            if first:
+                return self._send(429, {})
+            return self._send(200, {"WebId": "W" + tag})
+        if url.path.endswith("/interpolated"):
+            n = int(url.path.split("/")[-2].rsplit("_", 1)[-1])
+            items = [{"Timestamp": f"2025-01-01T00:{6 * i:02d}:00Z", "Value": float(n * 10 + i)} for i in range(5)]
+            items.append({"Timestamp": "2025-01-01T00:30:00Z", "Value": {"Name": "Bad Input"}})
+            return self._send(200, {"Items": items})
+        return self._send(404, {})
+
+
+@pytest.fixture
+def mock_url(monkeypatch, tmp_path):
+    _Mock.throttled = set()
+    monkeypatch.setenv("PI_WEBID_CACHE", str(tmp_path / "webids.sqlite"))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Mock)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/piwebapi"
+    server.shutdown()
+
+
+def test_async_fetch_matches_threaded_fetch(mock_url, monkeypatch):
+    tags = [f"PCFS.K-99-01.T_{i}" for i in range(16)] + ["MISSING", "# comment"]
+    kwargs = dict(base_url=mock_url, auth_mode="none", retries=2)
+
+    out = fetch_tags_via_webapi_async(tags, "SRV", "-1h", "*", "-0.1h", concurrency=8, **kwargs)
+    assert out["tag"].nunique() == 16 and len(out) == 16 * 5
+    assert out["time"].is_monotonic_increasing
+    t7 = out[out["tag"] == "PCFS_K-99-01_T_7"].sort_values("time")
+    assert t7["value"].tolist() == [70.0, 71.0, 72.0, 73.0, 74.0]
+
+    # The threaded path returns the same rows
+    _Mock.throttled = set()
+    monkeypatch.setenv("PI_WEBAPI_ASYNC", "0")
+    threaded = fetch_tags_via_webapi(tags, "SRV", "-1h", "*", "-0.1h", qps=1000, **kwargs)
+    key = ["tag", "time"]
+    pd.testing.assert_frame_equal(
+        out.sort_values(key).reset_index(drop=True), threaded.sort_values(key).reset_index(drop=True)
+    )
+
+
+def test_fetch_tags_via_webapi_uses_async_client_in_auto_mode(mock_url, monkeypatch):
+    monkeypatch.setenv("PI_WEBAPI_ASYNC", "auto")
+    calls = []
+    import pi_monitor.webapi_async as wa
+
+    real = wa.fetch_tags_via_webapi_async
+    monkeypatch.setattr(wa, "fetch_tags_via_webapi_async", lambda *a, **k: calls.append(k) or real(*a, **k))
+    out = fetch_tags_via_webapi(["A_1", "B_2"], "SRV", "-1h", "*", "-0.1h", base_url=mock_url, auth_mode="none")
+    assert calls and set(out["tag"]) == {"A_1", "B_2"}
+
+
+def test_windows_auth_goes_async_when_negotiate_is_available(monkeypatch):
+    monkeypatch.setenv("PI_WEBAPI_ASYNC", "auto")
+    monkeypatch.setattr(webapi_async, "_negotiate_available", lambda: False)
+    assert not async_fetch_enabled("windows") and async_fetch_enabled("basic") and async_fetch_enabled("none")
+    monkeypatch.setattr(webapi_async, "_negotiate_available", lambda: True)
+    assert async_fetch_enabled("windows", "https://pi/piwebapi")
+    monkeypatch.setenv("PI_WEBAPI_ASYNC", "0")
+    assert not async_fetch_enabled("windows")
+
+
+def test_rejected_negotiate_falls_back_to_threaded_fetch(mock_url, monkeypatch):
+    monkeypatch.setenv("PI_WEBAPI_ASYNC", "1")
+    monkeypatch.setattr(webapi_async, "_NEGOTIATE_REJECTED", set())
+    monkeypatch.setattr(webapi_async, "_negotiate_available", lambda: True)
+    monkeypatch.setattr(webapi_async, "_negotiate_header", lambda host: "Negotiate dG9rZW4=")
+    with pytest.raises(webapi_async.AsyncAuthRejected):
+        fetch_tags_via_webapi_async(["T_1"], "SRV", "-1h", "*", "-0.1h", base_url=mock_url, auth_mode="windows")
+    # Through fetch_tags_via_webapi the unit still arrives (threaded client, its own auth)
+    out = fetch_tags_via_webapi(["T_1", "T_2"], "SRV", "-1h", "*", "-0.1h", base_url=mock_url,
+                                auth_mode="windows", bulk=False)
+    assert set(out["tag"]) == {"T_1", "T_2"}
+    # 'auto' keeps the rejecting server on the threaded client from now on
+    monkeypatch.setenv("PI_WEBAPI_ASYNC", "auto")
+    assert not async_fetch_enabled("windows", mock_url)
+    assert async_fetch_enabled("windows", "https://other/piwebapi")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for the PI Web API bulk fetch mode (/batch + /streamsets) against a local mock server.
+"""
+
+import json
+import sys
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pyarrow.parquet as pq
+import pytest
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.webapi import client_from_env, fetch_tags_to_parquet, fetch_tags_via_webapi
+
+
+class _Mock(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    calls: Counter = Counter()
+    streamset_sizes: list = []
+    max_webids = 8  # larger streamset requests are rejected with 414
+    points = 50
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code, body):
+        payload = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    @classmethod
+    def _items(cls, tag):
+        n = int(tag.rsplit("_", 1)[-1])
+        return [{"Timestamp": f"2025-01-01T{i // 10:02d}:{6 * (i % 10):02d}:00Z", "Value": float(n * 1000 + i)}
+                for i in range(cls.points)]
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        q = urllib.parse.parse_qs(url.query)
+        self.calls[url.path.rsplit("/", 1)[-1] if "/streams/" not in url.path else "stream"] += 1
+        if url.path.endswith("/system"):
+            return self._send(200, {})
+        if url.path.endswith("/streamsets/interpolated"):
+            webids = q["webId"]
+            if len(webids) > self.max_webids:
+                return self._send(414, {})
+            self.streamset_sizes.append(len(webids))
+            return self._send(200, {"Items": [{"WebId": w, "Items": self._items(w[1:])} for w in webids]})
+        if url.path.endswith("/points"):
+            tag = q["path"][0].rsplit("\\", 1)[-1]
+            return self._send(200, {"WebId": "W" + tag})
+        if url.path.endswith("/interpolated"):
+            return self._send(200, {"Items": self._items(url.path.split("/")[-2][1:])})
+        return self._send(404, {})
+
+    def do_POST(self):
+        self.calls["batch"] += 1
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        out = {}
+        for key, sub in body.items():
+            path = urllib.parse.parse_qs(urllib.parse.urlsplit(sub["Resource"]).query)["path"][0]
+            tag = path.rsplit("\\", 1)[-1]
+            if tag.endswith("MISSING_0"):
+                out[key] = {"Status": 404, "Content": {"Errors": ["not found"]}}
+            elif tag.endswith("BUSY_0"):
+                out[key] = {"Status": 503, "Content": {}}
+            else:
+                out[key] = {"Status": 200, "Content": {"WebId": "W" + tag}}
+        return self._send(200, out)
+
+
+@pytest.fixture
+def mock_url(monkeypatch, tmp_path):
+    _Mock.calls = Counter()
+    _Mock.streamset_sizes = []
+    monkeypatch.setenv("PI_WEBAPI_ASYNC", "0")
+    monkeypatch.setenv("PI_WEBID_CACHE", str(tmp_path / "webids.sqlite"))
+    monkeypatch.setenv("PI_WEBAPI_BATCH_SIZE", "25")
+    monkeypatch.setenv("PI_WEBAPI_BULK_INITIAL", "20")
+    monkeypatch.setenv("PI_WEBAPI_BULK_TARGET_ITEMS", "300")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Mock)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/piwebapi"
+    server.shutdown()
+
+
+def test_bulk_mode_uses_batch_and_adaptive_streamsets(mock_url):
+    tags = [f"PCFS.K-99-01.T_{i}" for i in range(60)] + ["PCFS.K-99-01.MISSING_0", "PCFS.K-99-01.BUSY_0"]
+    out = fetch_tags_via_webapi(tags, "SRV", "-5h", "*", "-0.1h", base_url=mock_url, auth_mode="none", qps=1000)
+
+    # 60 resolved tags + the transiently failed one via the per-tag fallback
+    assert out["tag"].nunique() == 61 and len(out) == 61 * 50
+    assert "PCFS_K-99-01_MISSING_0" not in set(out["tag"])
+    t9 = out[out["tag"] == "PCFS_K-99-01_T_9"].sort_values("time")
+    assert t9["value"].iloc[0] == 9000.0 and t9["value"].iloc[-1] == 9049.0
+    assert out["time"].is_monotonic_increasing
+
+    # 62 tags in 3 batch calls; per-tag requests only for the 503 tag
+    assert _Mock.calls["batch"] == 3
+    assert _Mock.calls["points"] == 1 and _Mock.calls["stream"] == 1
+    # 20 WebIds -> 414 -> 10 -> 8 ... then sized to ~300 items (6 tags of 50 points)
+    assert max(_Mock.streamset_sizes) <= 8
+    assert _Mock.streamset_sizes[-2] == 6
+    assert sum(_Mock.streamset_sizes) == 60
+    assert _Mock.calls["interpolated"] < 15
+
+
+def test_bulk_disabled_keeps_per_tag_requests(mock_url):
+    tags = [f"PCFS.K-99-01.T_{i}" for i in range(5)]
+    out = fetch_tags_via_webapi(tags, "SRV", "-5h", "*", "-0.1h", base_url=mock_url, auth_mode="none",
+                                qps=1000, bulk=False)
+    assert out["tag"].nunique() == 5
+    assert _Mock.calls["batch"] == 0 and _Mock.calls["points"] == 5 and _Mock.calls["stream"] == 5
+
+
+def test_parquet_fetch_goes_bulk_and_is_paced_without_controller(mock_url, monkeypatch, tmp_path):
+    monkeypatch.setenv("PI_WEBAPI_ADAPTIVE", "0")
+    monkeypatch.setenv("PI_WEBAPI_QPS", "25")
+    tags = [f"PCFS.K-99-01.T_{i}" for i in range(20)] + ["PCFS.K-99-01.MISSING_0", "PCFS.K-99-01.BUSY_0"]
+    client = client_from_env("SRV", base_url=mock_url, auth_mode="none")
+    assert client.controller is None and client.limiter.qps == 25
+
+    started = time.monotonic()
+    out = tmp_path / "K-99-01_batch_0.parquet"
+    stats = fetch_tags_to_parquet(tags, out, plant="PCFS", unit="K-99-01", server="SRV",
+                                  start="-5h", end="*", step="-0.1h", client=client)
+    elapsed = time.monotonic() - started
+
+    assert stats["written"] == 21 and stats["rows"] == 21 * 50
+    assert pq.ParquetFile(out).metadata.num_row_groups == 21
+    # /batch + /streamsets; per-tag requests only for the 503 tag
+    assert _Mock.calls["batch"] == 1 and sum(_Mock.streamset_sizes) == 20
+    assert _Mock.calls["points"] == 1 and _Mock.calls["stream"] == 1
+    # PI_WEBAPI_QPS paces every request when there is no adaptive controller
+    requests = sum(_Mock.calls.values())
+    assert elapsed >= 0.9 * (requests - 1) / 25
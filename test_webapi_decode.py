@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming Web API response decoder (pi_monitor.webapi_decode) and fetch_tags_to_parquet.
+"""
+
+import json
+import sys
+import threading
+import urllib.parse
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.tag_manifest import TagManifest
+from pi_monitor.webapi import PIWebAPIClient, _items_frame, fetch_tags_to_parquet, fetch_tags_via_webapi
+from pi_monitor.webapi_decode import decode_items
+from pi_monitor.webid_cache import WebIdCache
+
+
+def _body(n, tag_no=1):
+    items = []
+    for i in range(n):
+        ts = (pd.Timestamp("2025-01-01", tz="UTC") + pd.Timedelta(minutes=6 * i)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        if i % 7 == 3:
+            value = {"Name": "Bad Input", "Value": 307, "IsSystem": True}
+        elif i % 11 == 5:
+            value = -1.25e-3 * i
+        else:
+            value = tag_no * 1000 + i
+        items.append({"Timestamp": ts, "Value": value, "UnitsAbbreviation": "", "Good": True,
+                      "Questionable": False, "Substituted": False, "Annotated": False})
+    items.append({"Timestamp": "2025-02-01T00:00:00.5Z", "Value": 1.5, "Good": True})
+    return json.dumps({"Links": {}, "Items": items, "UnitsAbbreviation": ""}).encode()
+
+
+@pytest.mark.parametrize("chunk", [1, 7, 64, 1 << 16])
+def test_stream_decode_matches_json_parsing(chunk):
+    body = _body(300)
+    expected = _items_frame(json.loads(body))
+    decoded = decode_items((body[i:i + chunk] for i in range(0, len(body), chunk)), capacity=10).frame()
+    assert len(decoded) == 300 - len(range(3, 300, 7)) + 1
+    pd.testing.assert_frame_equal(decoded, expected)
+
+
+class _Mock(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code, payload):
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        q = urllib.parse.parse_qs(url.query)
+        if url.path.endswith("/system"):
+            return self._send(200, b"{}")
+        if url.path.endswith("/points"):
+            tag = q["path"][0].rsplit("\\", 1)[-1]
+            if tag == "MISSING":
+                return self._send(404, b"{}")
+            return self._send(200, json.dumps({"WebId": "W" + tag}).encode())
+        if url.path.endswith("/interpolated"):
+            n = int(url.path.split("/")[-2].rsplit("_", 1)[-1])
+            return self._send(200, _body(200 + 10 * n, n) if n else b'{"Items": []}')
+        return self._send(404, b"{}")
+
+
+@pytest.fixture
+def mock_url(monkeypatch, tmp_path):
+    monkeypatch.setenv("PI_WEBAPI_ASYNC", "0")
+    monkeypatch.setenv("PI_WEBID_CACHE", str(tmp_path / "webids.sqlite"))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Mock)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/piwebapi"
+    server.shutdown()
+
+
+def test_fetch_tags_to_parquet_writes_one_row_group_per_tag(mock_url, tmp_path):
+    tags = [f"PCFS.K-01-01.T_{i}" for i in range(1, 6)] + ["PCFS.K-01-01.T_0", "MISSING"]
+    client = PIWebAPIClient(base_url=mock_url, auth_mode="none", webid_cache=WebIdCache(tmp_path / "w.sqlite"))
+    out = tmp_path / "K-01-01_1y_0p1h.parquet"
+    stats = fetch_tags_to_parquet(tags, out, plant="PCFS", unit="K-01-01", server="SRV",
+                                  start="-1h", end="*", step="-0.1h", client=client, max_workers=2)
+    assert (stats["tags"], stats["written"], stats["empty"], stats["failed"]) == (7, 5, 2, 0)
+
+    pf = pq.ParquetFile(out)
+    assert pf.metadata.num_row_groups == 5
+    df = pf.read().to_pandas()
+    assert list(df.columns) == ["time", "value", "plant", "unit", "tag"]
+    assert set(df["plant"]) == {"PCFS"} and df["tag"].nunique() == 5
+
+    # Same rows as the frame-based fetch (naive local time, like the unit files)
+    ref = fetch_tags_via_webapi(tags, "SRV", "-1h", "*", "-0.1h", base_url=mock_url, auth_mode="none", bulk=False)
+    ref["time"] = ref["time"].dt.tz_convert(datetime.now().astimezone().tzinfo).dt.tz_localize(None)
+    key = ["tag", "time"]
+    got = df[["time", "value", "tag"]].astype({"tag": str}).sort_values(key).reset_index(drop=True)
+    want = ref[["time", "value", "tag"]].sort_values(key).reset_index(drop=True)
+    assert len(got) == stats["rows"] == len(want)
+    assert np.array_equal(got["time"].to_numpy("datetime64[ns]"), want["time"].to_numpy("datetime64[ns]"))
+    assert np.allclose(got["value"].to_numpy(), want["value"].to_numpy())
+
+    m = TagManifest.load(out)
+    assert m is not None and m.tags["PCFS_K-01-01_T_3"]["rows"] == len(got[got["tag"] == "PCFS_K-01-01_T_3"])
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the recorded and summary Web API fetch modes (pi_monitor.webapi_modes) against the simulator.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.parquet_database import ParquetDatabase
+from pi_monitor.tag_manifest import _naive_local
+from pi_monitor.webapi import fetch_tags_via_webapi
+from pi_monitor.webapi_modes import interpolate_to_grid, summary_frame
+
+TAGS = ["PCFS.K-12-01.12TI-007.PV", "PCFS.K-12-01.12PI-007.PV", "PCFS.K-12-01.12LI-001.PV"]
+QUIET = {"tags": [], "anomaly_rate": 0.0, "flatline_rate": 0.0, "trip_rate": 0.0, "bad_rate": 0.0}
+START, END = "2025-05-30T00:00:00Z", "2025-05-31T00:00:00Z"
+
+
+def test_interpolate_to_grid_and_summary_frame():
+    events = pd.DataFrame({"time": pd.to_datetime(["2025-01-01 00:03", "2025-01-01 00:15", "2025-01-01 00:21"], utc=True),
+                           "value": [1.0, 5.0, 2.0]})
+    grid = pd.date_range("2025-01-01 00:00", "2025-01-01 00:30", freq="6min", tz="UTC")
+    out = interpolate_to_grid(events, grid)
+    # 00:00 precedes the first event; the tail holds the last value
+    assert list(out["time"]) == list(grid[1:])
+    assert np.allclose(out["value"], [2.0, 4.0, 3.5, 2.0, 2.0])
+
+    data = {"Items": [
+        {"Type": "Average", "Value": {"Timestamp": "2025-01-01T00:00:00Z", "Value": 2.5}},
+        {"Type": "Average", "Value": {"Timestamp": "2025-01-01T01:00:00Z", "Value": {"Name": "Calc Failed"}}},
+        {"Type": "Minimum", "Value": {"Timestamp": "2025-01-01T00:00:00Z", "Value": 1}},
+        {"Type": "Maximum", "Value": {"Timestamp": "2025-01-01T00:00:00Z", "Value": 4}},
+        {"Type": "Maximum", "Value": {"Timestamp": "2025-01-01T01:00:00Z", "Value": 9}},
+    ]}
+    s = summary_frame(data)
+    assert list(s.columns) == ["time", "value", "min", "max"] and len(s) == 1
+    assert s.iloc[0][["value", "min", "max"]].tolist() == [2.5, 1.0, 4.0]
+
+
+@pytest.mark.parametrize("webapi_sim", [QUIET], indirect=True)
+@pytest.mark.parametrize("bulk", [True, False])
+def test_recorded_mode_matches_interpolated_grid(webapi_sim, monkeypatch, bulk):
+    monkeypatch.setenv("PI_WEBAPI_ASYNC", "0")
+    common = dict(base_url=webapi_sim.url, auth_mode="none", bulk=bulk)
+    interp = fetch_tags_via_webapi(TAGS, "SIM", START, END, "-0.1h", **common)
+    recorded = fetch_tags_via_webapi(TAGS, "SIM", START, END, "-0.1h", mode="recorded", **common)
+    key = ["tag", "time"]
+    interp, recorded = (f.sort_values(key).reset_index(drop=True) for f in (interp, recorded))
+    assert len(recorded) == len(interp) == 3 * 241
+    assert (recorded["time"] == interp["time"]).all() and (recorded["tag"] == interp["tag"]).all()
+    # Within the compression deviation of the simulated archive
+    for tag, g in recorded.groupby("tag"):
+        err = np.abs(g["value"].to_numpy() - interp.loc[g.index, "value"].to_numpy())
+        assert err.max() < 0.1 * interp.loc[g.index, "value"].abs().mean(), tag
+    items = webapi_sim.stats()["items"]
+    assert items["recorded"] * 2 < items["interpolated"]
+
+
+@pytest.mark.parametrize("webapi_sim", [QUIET], indirect=True)
+def test_summary_mode_feeds_hourly_rollups(webapi_sim, monkeypatch, tmp_path):
+    monkeypatch.setenv("PI_WEBAPI_ASYNC", "0")
+    common = dict(base_url=webapi_sim.url, auth_mode="none")
+    hourly = fetch_tags_via_webapi(TAGS, "SIM", START, END, "-0.1h", mode="summary", **common)
+    assert set(hourly.columns) >= {"time", "value", "min", "max", "tag"}
+    assert len(hourly) == 3 * 24 and hourly["tag"].nunique() == 3
+    assert (hourly["min"] <= hourly["value"]).all() and (hourly["value"] <= hourly["max"]).all()
+    assert webapi_sim.stats()["items"]["summary"] == 3 * 24 * 3
+
+    # Hourly means agree with client-side means of the interpolated values
+    raw = fetch_tags_via_webapi(TAGS, "SIM", START, END, "-0.1h", **common)
+    raw = raw[raw["time"] < pd.Timestamp(END)]
+    client = raw.groupby(["tag", raw["time"].dt.floor("h")])["value"].mean()
+    server = hourly.set_index(["tag", "time"])["value"].sort_index()
+    assert np.allclose(server.to_numpy(), client.sort_index().to_numpy(), rtol=0.01)
+
+    db = ParquetDatabase(tmp_path)
+    added = db.rollups.ingest_hourly("K-12-01", hourly, START, END)
+    assert added["1h"] == 72
+    tag = "PCFS_K-12-01_12TI-007_PV"
+    lo, hi = _naive_local(pd.Series(pd.to_datetime([START, END]))).tolist()
+    got = db.rollups.query("K-12-01", tag, lo, hi - pd.Timedelta(hours=1), level="1h", update=False)
+    want = hourly[hourly["tag"] == tag].sort_values("time")
+    assert len(got) == 24 and np.allclose(got["max"].to_numpy(), want["max"].to_numpy())
+    assert (got["count"] == 10).all()
+    # A later, adjacent day extends the stored span; a detached one is refused
+    nxt = fetch_tags_via_webapi(TAGS, "SIM", END, "2025-06-01T00:00:00Z", "-0.1h", mode="summary", **common)
+    db.rollups.ingest_hourly("K-12-01", nxt, END, "2025-06-01T00:00:00Z")
+    assert db.rollups.extremes("K-12-01", tag, lo, hi + pd.Timedelta(days=1), update=False)[1] == max(
+        want["max"].max(), nxt[nxt["tag"] == tag]["max"].max())
+    with pytest.raises(ValueError):
+        db.rollups.ingest_hourly("K-12-01", hourly.assign(time=hourly["time"] + pd.Timedelta(days=30)))
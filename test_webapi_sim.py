@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for the local PI Web API simulator (pi_monitor.webapi_sim) driving the real fetch paths.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.webapi import PIWebAPIClient, fetch_tags_via_webapi
+from pi_monitor.webapi_sim import SimConfig, signal, tag_kind
+
+TAGS = ["PCFS.K-12-01.12SI-401B.PV", "PCFS.K-12-01.12TI-007.PV", "PCM.C-202.XIAHH-2202B.PV",
+        "PCFS.K-12-01.12PI-007.PV", "PCFS.K-12-01.12FI-004A.PV"]
+
+
+def test_signals_are_deterministic_and_carry_events():
+    assert [tag_kind(t) for t in TAGS] == ["speed", "temperature", "vibration", "pressure", "flow"]
+    t = np.arange(1_735_689_600, 1_735_689_600 + 365 * 86400, 360, dtype=np.float64)
+    v = signal(TAGS[0], t)
+    # Any sub-range gives the same values; another seed does not
+    assert np.array_equal(v[5000:5100], signal(TAGS[0], t[5000:5100]), equal_nan=True)
+    assert not np.allclose(np.nan_to_num(v), np.nan_to_num(signal(TAGS[0], t, SimConfig(seed=1))))
+    # Trips (speed 0), flatlines (repeated values), Bad Input (NaN)
+    assert (v == 0).any() and (np.diff(v) == 0).sum() > 50 and np.isnan(v).any()
+    quiet = signal(TAGS[0], t, SimConfig(anomaly_rate=0, flatline_rate=0, trip_rate=0, bad_rate=0))
+    assert not np.isnan(quiet).any() and quiet.min() > 5000
+
+
+@pytest.mark.parametrize("webapi_sim", [{"tags": TAGS, "now": "2025-06-01T00:00:00Z"}], indirect=True)
+def test_bulk_and_per_tag_paths_agree(webapi_sim, monkeypatch):
+    monkeypatch.setenv("PI_WEBAPI_ASYNC", "0")
+    common = dict(base_url=webapi_sim.url, auth_mode="none")
+    bulk = fetch_tags_via_webapi(TAGS + ["PCFS.K-12-01.NOPE.PV"], "SIM", "-1d", "*", "-0.1h", **common)
+    per_tag = fetch_tags_via_webapi(TAGS, "SIM", "-1d", "*", "-0.1h", bulk=False, **common)
+    assert bulk["tag"].nunique() == 5 and len(bulk) == len(per_tag) > 5 * 230
+    key = ["tag", "time"]
+    pd.testing.assert_frame_equal(bulk.sort_values(key).reset_index(drop=True),
+                                  per_tag.sort_values(key).reset_index(drop=True), check_dtype=False)
+    assert bulk["time"].max() == pd.Timestamp("2025-06-01", tz="UTC")
+    calls = webapi_sim.stats()["calls"]
+    assert calls["batch"] >= 1 and calls["streamsets"] >= 1 and calls["streams"] == 5
+
+
+@pytest.mark.parametrize("webapi_sim", [{"tags": [], "rate_429": 0.15, "rate_503": 0.1, "rate_timeout": 0.05,
+                                         "timeout_s": 1.0, "capacity": 8, "seed": 3}], indirect=True)
+def test_faults_are_retried(webapi_sim, monkeypatch):
+    monkeypatch.setenv("PI_WEBAPI_ASYNC", "0")
+    tags = [f"SIM.T-01.{i:02d}TI-1.PV" for i in range(40)]
+    out = fetch_tags_via_webapi(tags, "SIM", "-2h", "*", "-0.1h", base_url=webapi_sim.url, auth_mode="none",
+                                bulk=False, retries=8, timeout=0.5)
+    assert out["tag"].nunique() == 40
+    s = webapi_sim.stats()
+    assert s["statuses"].get(429, 0) > 0 and s["statuses"].get(503, 0) > 0
+    assert s["calls"]["streams"] > 40  # timed-out and throttled requests were repeated
+
+
+def test_max_items_and_unknown_webid_errors(webapi_sim):
+    webapi_sim.config.max_items = 100
+    client = PIWebAPIClient(base_url=webapi_sim.url, auth_mode="none")
+    webid = client.resolve_point_webid("SIM", "PCFS.K-12-01.12SI-401B.PV")
+    assert webid and client.resolve_point_webid("SIM", "NOT.A.TAG") is None
+    assert len(client.fetch_interpolated(webid, "*-5h", "*", "6m")) > 40
+    with pytest.raises(Exception) as e:
+        client.fetch_interpolated(webid, "*-1d", "*", "6m")
+    assert e.value.response.status_code == 400
+    with pytest.raises(Exception) as e:
+        client.fetch_interpolated("SIMbm9wZQ", "*-1h", "*", "6m")
+    assert e.value.response.status_code == 404
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent WebId cache (pi_monitor.webid_cache) and its use by the Web API clients.
+"""
+
+import json
+import sys
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pi_monitor.webapi import PIWebAPIClient, fetch_tags_via_webapi
+from pi_monitor.webid_cache import WebIdCache, prewarm, read_tag_files
+
+
+class _Mock(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    calls: Counter = Counter()
+    prefix = "W"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code, body):
+        payload = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        q = urllib.parse.parse_qs(url.query)
+        if url.path.endswith("/system"):
+            return self._send(200, {})
+        if url.path.endswith("/points"):
+            self.calls["points"] += 1
+            tag = q["path"][0].rsplit("\\", 1)[-1]
+            if tag.startswith("MISSING"):
+                return self._send(404, {"Errors": ["not found"]})
+            return self._send(200, {"WebId": self.prefix + tag})
+        if url.path.endswith("/interpolated"):
+            self.calls["stream"] += 1
+            webid = url.path.split("/")[-2]
+            if not webid.startswith(self.prefix):
+                return self._send(404, {"Errors": ["unknown WebId"]})
+            return self._send(200, {"Items": [{"Timestamp": "2025-01-01T00:00:00Z", "Value": 1.0}]})
+        return self._send(404, {})
+
+    def do_POST(self):
+        self.calls["batch"] += 1
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        out = {}
+        for key, sub in body.items():
+            tag = urllib.parse.parse_qs(urllib.parse.urlsplit(sub["Resource"]).query)["path"][0].rsplit("\\", 1)[-1]
+            self.calls["batch_items"] += 1
+            if tag.startswith("MISSING"):
+                out[key] = {"Status": 404, "Content": {}}
+            else:
+                out[key] = {"Status": 200, "Content": {"WebId": self.prefix + tag}}
+        return self._send(200, out)
+
+
+@pytest.fixture
+def mock_url(monkeypatch):
+    _Mock.calls = Counter()
+    _Mock.prefix = "W"
+    monkeypatch.setenv("PI_WEBAPI_ASYNC", "0")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Mock)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/piwebapi"
+    server.shutdown()
+
+
+def test_cache_ttls_and_server_key(tmp_path):
+    cache = WebIdCache(tmp_path / "w.sqlite", ttl_s=3600, negative_ttl_s=0.2)
+    cache.put_many("\\\\PTSG-1", {"A": "WA", "B": "WB"}, ["GONE"])
+
+    # Another instance (another process) sees the entries; server names are normalized
+    other = WebIdCache(tmp_path / "w.sqlite", ttl_s=3600, negative_ttl_s=0.2)
+    assert other.lookup("ptsg-1", ["A", "B", "GONE", "NEW"]) == {"A": "WA", "B": "WB", "GONE": None}
+    assert other.get("PTSG-1", "NEW") == (False, None)
+
+    time.sleep(0.25)
+    assert other.lookup("PTSG-1", ["A", "GONE"]) == {"A": "WA"}
+    assert other.purge_expired() == 1 and other.counts() == {"resolved": 2, "missing": 0}
+
+
+def test_clients_reuse_cached_webids(mock_url, tmp_path, monkeypatch):
+    monkeypatch.setenv("PI_WEBID_CACHE", str(tmp_path / "webids.sqlite"))
+    tags = [f"T_{i}" for i in range(6)] + ["MISSING_1"]
+
+    # Per-tag path: a 404 lookup is negative-cached and not retried
+    out = fetch_tags_via_webapi(tags, "SRV", "-1h", "*", "-0.1h", base_url=mock_url, auth_mode="none",
+                                qps=1000, bulk=False)
+    assert out["tag"].nunique() == 6 and _Mock.calls["points"] == 7
+
+    # Second run: no lookups at all, bulk or per-tag
+    _Mock.calls = Counter()
+    fetch_tags_via_webapi(tags, "SRV", "-1h", "*", "-0.1h", base_url=mock_url, auth_mode="none", qps=1000)
+    fetch_tags_via_webapi(tags, "SRV", "-1h", "*", "-0.1h", base_url=mock_url, auth_mode="none",
+                          qps=1000, bulk=False)
+    assert _Mock.calls["points"] == 0 and _Mock.calls["batch_items"] == 0
+
+    # Points recreated on the server: cached WebIds are rejected, dropped and resolved again
+    _Mock.prefix = "X"
+    _Mock.calls = Counter()
+    out = fetch_tags_via_webapi(tags[:2], "SRV", "-1h", "*", "-0.1h", base_url=mock_url, auth_mode="none",
+                                qps=1000, bulk=False)
+    assert out["tag"].nunique() == 2 and _Mock.calls["points"] == 2
+
+
+def test_prewarm_resolves_uncached_tags_in_batches(mock_url, tmp_path):
+    tag_file = tmp_path / "tags_x.txt"
+    tag_file.write_text("# header\nA_1\nA_2\n\nMISSING_2\nA_1\n")
+    tags = read_tag_files([tag_file])
+    assert tags == ["A_1", "A_2", "MISSING_2"]
+
+    client = PIWebAPIClient(base_url=mock_url, auth_mode="none", webid_cache=WebIdCache(tmp_path / "w.sqlite"))
+    assert prewarm(client, "SRV", tags) == {"tags": 3, "cached": 0, "resolved": 2, "missing": 1, "failed": 0}
+    assert prewarm(client, "SRV", tags)["cached"] == 3
+    assert _Mock.calls["batch"] == 1 and client.resolve_point_webid("SRV", "A_2") == "WA_2"